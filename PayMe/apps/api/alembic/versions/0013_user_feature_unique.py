@@ -0,0 +1,43 @@
+"""unique (user_id, feature_key, source) on user_features
+
+Revision ID: 0013_user_feature_unique
+Revises: 0012_plaid_balance
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0013_user_feature_unique"
+down_revision = "0012_plaid_balance"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the most recently updated row for each (user_id, feature_key, source)
+    # before adding the constraint that backs set-based feature upserts.
+    op.execute(
+        """
+        DELETE FROM user_features uf
+        USING (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, feature_key, source
+                       ORDER BY updated_at DESC NULLS LAST, last_seen_at DESC NULLS LAST, id
+                   ) AS rn
+            FROM user_features
+        ) ranked
+        WHERE uf.id = ranked.id AND ranked.rn > 1;
+
+        ALTER TABLE user_features
+            ADD CONSTRAINT uq_user_feature_source UNIQUE (user_id, feature_key, source);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE user_features DROP CONSTRAINT IF EXISTS uq_user_feature_source;
+        """
+    )
@@ -0,0 +1,50 @@
+"""add sync_jobs queue for background Gmail/Plaid ingestion
+
+Revision ID: 0014_sync_jobs
+Revises: 0013_user_feature_unique
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0014_sync_jobs"
+down_revision = "0013_user_feature_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_jobs (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            provider VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            trigger VARCHAR(30) NOT NULL DEFAULT 'manual',
+            attempt_count INTEGER NOT NULL DEFAULT 0,
+            run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            started_at TIMESTAMPTZ,
+            completed_at TIMESTAMPTZ,
+            result_json JSONB,
+            error_message TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_sync_job_claim
+            ON sync_jobs(status, run_after);
+        CREATE INDEX IF NOT EXISTS idx_sync_job_user
+            ON sync_jobs(user_id, created_at);
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_sync_job_active
+            ON sync_jobs(user_id, provider)
+            WHERE status IN ('queued', 'running');
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TABLE IF EXISTS sync_jobs;
+        """
+    )
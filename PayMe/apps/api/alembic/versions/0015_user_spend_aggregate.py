@@ -0,0 +1,74 @@
+"""add user_spend_aggregate for incrementally maintained Plaid features
+
+Revision ID: 0015_user_spend_aggregate
+Revises: 0014_sync_jobs
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0015_user_spend_aggregate"
+down_revision = "0014_sync_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_spend_aggregate (
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            key VARCHAR(255) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            total_cents BIGINT NOT NULL DEFAULT 0,
+            last_seen TIMESTAMPTZ,
+            PRIMARY KEY (user_id, key)
+        );
+        """
+    )
+    # Backfill from stored transactions.  Keys mirror _normalize_token in
+    # the Plaid sync paths: lowercase, non-alphanumeric runs -> '_', trimmed.
+    op.execute(
+        """
+        INSERT INTO user_spend_aggregate (user_id, key, count, total_cents, last_seen)
+        SELECT user_id, key, COUNT(*), SUM(amount_cents), MAX(posted_at)
+        FROM (
+            SELECT user_id, amount_cents, posted_at,
+                   'merchant:' || btrim(regexp_replace(lower(merchant_name), '[^a-z0-9]+', '_', 'g'), '_') AS key
+            FROM plaid_transactions
+            WHERE merchant_name IS NOT NULL AND merchant_name <> ''
+            UNION ALL
+            SELECT user_id, amount_cents, posted_at,
+                   'category:' || btrim(regexp_replace(lower(category), '[^a-z0-9]+', '_', 'g'), '_')
+            FROM plaid_transactions
+            WHERE category IS NOT NULL AND category <> ''
+            UNION ALL
+            SELECT user_id, amount_cents, posted_at, 'subscription:active'
+            FROM plaid_transactions
+            WHERE is_subscription
+        ) keyed
+        GROUP BY user_id, key
+        ON CONFLICT (user_id, key) DO NOTHING;
+        """
+    )
+    # Plaid feature counts previously reflected only the last sync delta.
+    op.execute(
+        """
+        UPDATE user_features uf
+        SET value_json = jsonb_build_object('count', agg.count),
+            confidence = LEAST(0.95, 0.75 + LEAST(0.2, agg.count * 0.04)),
+            updated_at = NOW()
+        FROM user_spend_aggregate agg
+        WHERE uf.source = 'plaid'
+          AND uf.user_id = agg.user_id
+          AND uf.feature_key = agg.key;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TABLE IF EXISTS user_spend_aggregate;
+        """
+    )
@@ -0,0 +1,155 @@
+"""move raw Gmail/Plaid payloads to compressed side tables
+
+Revision ID: 0016_raw_payload_tables
+Revises: 0015_user_spend_aggregate
+Create Date: 2026-10-19
+
+Existing raw_json values are copied in keyset-paginated chunks, compressed
+with zlib (a codec payload_store always reads; its per-row codec column lets
+the app write zstd later), then the raw_json columns are dropped.  DROP
+COLUMN does not rewrite the table; run VACUUM FULL (or pg_repack) on
+gmail_messages and plaid_transactions afterwards to reclaim the space right
+away.
+"""
+
+import json
+import zlib
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0016_raw_payload_tables"
+down_revision = "0015_user_spend_aggregate"
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_SIZE = 2000
+
+# Frozen copy of payload_store's encoding as of this revision, so upgrading
+# and downgrading do not depend on current settings or application code.
+_BACKFILL_CODEC = "zlib"
+_BACKFILL_LEVEL = 6
+
+
+def _encode_payload(payload) -> tuple[str, bytes]:
+    data = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return _BACKFILL_CODEC, zlib.compress(data, _BACKFILL_LEVEL)
+
+
+def _decode_payload(codec: str, data: bytes):
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError("zstandard is required to read zstd payloads: pip install zstandard") from exc
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec != "none":
+        raise ValueError(f"Unknown payload codec: {codec}")
+    return json.loads(data)
+
+
+# (hot table, payload table, provider id column)
+_TABLES = (
+    ("gmail_messages", "gmail_message_payloads", "provider_msg_id"),
+    ("plaid_transactions", "plaid_transaction_payloads", "provider_txn_id"),
+)
+
+
+def upgrade() -> None:
+    for hot, cold, id_col in _TABLES:
+        op.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {cold} (
+                user_id UUID NOT NULL,
+                {id_col} VARCHAR(255) NOT NULL,
+                codec VARCHAR(10) NOT NULL,
+                payload BYTEA NOT NULL,
+                PRIMARY KEY (user_id, {id_col}),
+                FOREIGN KEY (user_id, {id_col}) REFERENCES {hot}(user_id, {id_col})
+                    ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED
+            );
+            -- Payloads are already compressed; skip TOAST's pglz pass.
+            ALTER TABLE {cold} ALTER COLUMN payload SET STORAGE EXTERNAL;
+            """
+        )
+
+    bind = op.get_bind()
+    for hot, cold, id_col in _TABLES:
+        _backfill(bind, hot, cold, id_col)
+
+    # Check the deferred foreign keys now: ALTER TABLE refuses to run on a
+    # table with pending trigger events.
+    op.execute("SET CONSTRAINTS ALL IMMEDIATE")
+    for hot, _cold, _id_col in _TABLES:
+        op.execute(f"ALTER TABLE {hot} DROP COLUMN IF EXISTS raw_json")
+
+
+def _backfill(bind, hot: str, cold: str, id_col: str) -> None:
+    insert = sa.text(
+        f"""
+        INSERT INTO {cold} (user_id, {id_col}, codec, payload)
+        VALUES (:user_id, :provider_id, :codec, :payload)
+        ON CONFLICT DO NOTHING
+        """
+    )
+    last_id = None
+    while True:
+        rows = bind.execute(
+            sa.text(
+                f"""
+                SELECT id, user_id, {id_col}, raw_json FROM {hot}
+                WHERE raw_json IS NOT NULL AND (CAST(:last_id AS UUID) IS NULL OR id > :last_id)
+                ORDER BY id
+                LIMIT :limit
+                """
+            ),
+            {"last_id": last_id, "limit": BACKFILL_CHUNK_SIZE},
+        ).all()
+        if not rows:
+            return
+        params = []
+        for row_id, user_id, provider_id, raw in rows:
+            codec, data = _encode_payload(raw)
+            params.append({"user_id": user_id, "provider_id": provider_id, "codec": codec, "payload": data})
+        bind.execute(insert, params)
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for hot, cold, id_col in _TABLES:
+        op.execute(f"ALTER TABLE {hot} ADD COLUMN IF NOT EXISTS raw_json JSONB")
+        restore = sa.text(
+            f"UPDATE {hot} SET raw_json = CAST(:raw AS JSONB) WHERE user_id = :user_id AND {id_col} = :provider_id"
+        )
+        last_key = None
+        while True:
+            rows = bind.execute(
+                sa.text(
+                    f"""
+                    SELECT user_id, {id_col}, codec, payload FROM {cold}
+                    WHERE CAST(:last_user AS UUID) IS NULL
+                       OR (user_id, {id_col}) > (CAST(:last_user AS UUID), :last_provider_id)
+                    ORDER BY user_id, {id_col}
+                    LIMIT :limit
+                    """
+                ),
+                {
+                    "last_user": last_key[0] if last_key else None,
+                    "last_provider_id": last_key[1] if last_key else None,
+                    "limit": BACKFILL_CHUNK_SIZE,
+                },
+            ).all()
+            if not rows:
+                break
+            bind.execute(
+                restore,
+                [
+                    {"user_id": user_id, "provider_id": provider_id, "raw": json.dumps(_decode_payload(codec, data))}
+                    for user_id, provider_id, codec, data in rows
+                ],
+            )
+            last_key = (rows[-1][0], rows[-1][1])
+        op.execute(f"DROP TABLE IF EXISTS {cold}")
@@ -0,0 +1,35 @@
+"""add resumable messages.list checkpoint to gmail_oauth_tokens
+
+Revision ID: 0017_gmail_sync_checkpoint
+Revises: 0016_raw_payload_tables
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0017_gmail_sync_checkpoint"
+down_revision = "0016_raw_payload_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE gmail_oauth_tokens
+            ADD COLUMN IF NOT EXISTS resume_page_token TEXT,
+            ADD COLUMN IF NOT EXISTS resume_query VARCHAR(120),
+            ADD COLUMN IF NOT EXISTS resume_history_id VARCHAR(80);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE gmail_oauth_tokens
+            DROP COLUMN IF EXISTS resume_history_id,
+            DROP COLUMN IF EXISTS resume_query,
+            DROP COLUMN IF EXISTS resume_page_token;
+        """
+    )
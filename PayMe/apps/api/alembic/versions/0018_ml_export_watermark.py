@@ -0,0 +1,65 @@
+"""incremental ML feedback export: watermark table, unique sample key, scan indexes
+
+Revision ID: 0018_ml_export_watermark
+Revises: 0017_gmail_sync_checkpoint
+Create Date: 2026-10-19
+
+Duplicate (user_id, settlement_id) rows in ml_feedback_samples are collapsed
+to the most recently updated one before the unique constraint is added, so
+the export can upsert with ON CONFLICT.
+"""
+
+from alembic import op
+
+revision = "0018_ml_export_watermark"
+down_revision = "0017_gmail_sync_checkpoint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ml_export_watermarks (
+            name VARCHAR(50) PRIMARY KEY,
+            watermark TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        DELETE FROM ml_feedback_samples s
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, settlement_id ORDER BY updated_at DESC, id DESC
+            ) AS rn
+            FROM ml_feedback_samples
+        ) ranked
+        WHERE s.id = ranked.id AND ranked.rn > 1;
+
+        DROP INDEX IF EXISTS idx_ml_feedback_user_settlement;
+        ALTER TABLE ml_feedback_samples
+            ADD CONSTRAINT uq_ml_feedback_user_settlement UNIQUE (user_id, settlement_id);
+
+        CREATE INDEX IF NOT EXISTS idx_match_results_pair_latest
+            ON match_results(user_id, settlement_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_match_results_created_at
+            ON match_results(created_at);
+        CREATE INDEX IF NOT EXISTS idx_user_settlement_pref_updated_at
+            ON user_settlement_preferences(updated_at);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP INDEX IF EXISTS idx_user_settlement_pref_updated_at;
+        DROP INDEX IF EXISTS idx_match_results_created_at;
+        DROP INDEX IF EXISTS idx_match_results_pair_latest;
+
+        ALTER TABLE ml_feedback_samples DROP CONSTRAINT IF EXISTS uq_ml_feedback_user_settlement;
+        CREATE INDEX IF NOT EXISTS idx_ml_feedback_user_settlement
+            ON ml_feedback_samples(user_id, settlement_id);
+
+        DROP TABLE IF EXISTS ml_export_watermarks;
+        """
+    )
@@ -0,0 +1,50 @@
+"""add training_jobs queue for out-of-process ranker training
+
+Revision ID: 0019_training_jobs
+Revises: 0018_ml_export_watermark
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0019_training_jobs"
+down_revision = "0018_ml_export_watermark"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS training_jobs (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            phase VARCHAR(20),
+            request_count INTEGER NOT NULL DEFAULT 1,
+            cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+            progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+            iteration INTEGER NOT NULL DEFAULT 0,
+            loss_history JSONB NOT NULL DEFAULT '[]',
+            started_at TIMESTAMPTZ,
+            heartbeat_at TIMESTAMPTZ,
+            completed_at TIMESTAMPTZ,
+            result_json JSONB,
+            error_message TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_training_job_claim
+            ON training_jobs(status, created_at);
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_training_job_queued
+            ON training_jobs(status)
+            WHERE status = 'queued';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TABLE IF EXISTS training_jobs;
+        """
+    )
@@ -0,0 +1,29 @@
+"""add training_jobs.mode for incremental / full ranker training
+
+Revision ID: 0020_training_job_mode
+Revises: 0019_training_jobs
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0020_training_job_mode"
+down_revision = "0019_training_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE training_jobs ADD COLUMN IF NOT EXISTS mode VARCHAR(20) NOT NULL DEFAULT 'auto';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE training_jobs DROP COLUMN IF EXISTS mode;
+        """
+    )
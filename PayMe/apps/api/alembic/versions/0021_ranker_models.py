@@ -0,0 +1,45 @@
+"""add ranker_models registry of versioned ranker weights
+
+Revision ID: 0021_ranker_models
+Revises: 0020_training_job_mode
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0021_ranker_models"
+down_revision = "0020_training_job_mode"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ranker_models (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            version INTEGER NOT NULL,
+            mode VARCHAR(20) NOT NULL DEFAULT 'full',
+            weights JSONB NOT NULL,
+            metrics JSONB NOT NULL DEFAULT '{}',
+            promoted BOOLEAN NOT NULL DEFAULT FALSE,
+            is_active BOOLEAN NOT NULL DEFAULT FALSE,
+            activated_at TIMESTAMPTZ,
+            training_job_id UUID REFERENCES training_jobs(id),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            CONSTRAINT uq_ranker_model_version UNIQUE (version)
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_ranker_model_active
+            ON ranker_models(is_active)
+            WHERE is_active;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TABLE IF EXISTS ranker_models;
+        """
+    )
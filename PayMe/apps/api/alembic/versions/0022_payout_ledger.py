@@ -0,0 +1,102 @@
+"""add double-entry payout ledger with running balances
+
+Revision ID: 0022_payout_ledger
+Revises: 0021_ranker_models
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0022_payout_ledger"
+down_revision = "0021_ranker_models"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ledger_entries (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            entry_type VARCHAR(30) NOT NULL,
+            attorney_id UUID NOT NULL REFERENCES attorney_accounts(id),
+            settlement_id UUID NOT NULL REFERENCES settlements(id),
+            debit_account VARCHAR(20) NOT NULL,
+            credit_account VARCHAR(20) NOT NULL,
+            amount_cents BIGINT NOT NULL,
+            approval_id UUID REFERENCES claim_approvals(id),
+            transfer_id UUID REFERENCES payout_transfers(id),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_ledger_entries_approval
+            ON ledger_entries(approval_id);
+        CREATE INDEX IF NOT EXISTS idx_ledger_entries_attorney_settlement
+            ON ledger_entries(attorney_id, settlement_id, created_at);
+
+        CREATE TABLE IF NOT EXISTS ledger_balances (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            attorney_id UUID NOT NULL REFERENCES attorney_accounts(id),
+            settlement_id UUID REFERENCES settlements(id),
+            account VARCHAR(20) NOT NULL,
+            balance_cents BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            CONSTRAINT uq_ledger_balance UNIQUE NULLS NOT DISTINCT (attorney_id, settlement_id, account)
+        );
+
+        -- Entries are append-only; corrections are new postings.
+        CREATE OR REPLACE FUNCTION ledger_entries_immutable() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'ledger_entries is append-only';
+        END;
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS trg_ledger_entries_immutable ON ledger_entries;
+        CREATE TRIGGER trg_ledger_entries_immutable
+            BEFORE UPDATE OR DELETE ON ledger_entries
+            FOR EACH ROW EXECUTE FUNCTION ledger_entries_immutable();
+
+        -- Opening balances: holds of approved claimants and completed transfers
+        -- to date, one entry per approval so later postings release exactly
+        -- what it holds.
+        INSERT INTO ledger_entries
+            (entry_type, attorney_id, settlement_id, debit_account, credit_account,
+             amount_cents, approval_id)
+        SELECT 'opening_balance', ca.attorney_id, ca.settlement_id, 'held', 'fund',
+               COALESCE(ca.approved_amount_cents, s.payout_min_cents, 0), ca.id
+        FROM claim_approvals ca
+        JOIN settlements s ON s.id = ca.settlement_id
+        WHERE ca.status = 'approved'
+          AND COALESCE(ca.approved_amount_cents, s.payout_min_cents, 0) <> 0;
+
+        INSERT INTO ledger_entries
+            (entry_type, attorney_id, settlement_id, debit_account, credit_account,
+             amount_cents, approval_id, transfer_id)
+        SELECT 'opening_balance', ca.attorney_id, ca.settlement_id, 'disbursed', 'fund',
+               pt.amount_cents, ca.id, pt.id
+        FROM payout_transfers pt
+        JOIN claim_approvals ca ON ca.id = pt.approval_id
+        WHERE pt.status = 'completed' AND pt.amount_cents <> 0;
+
+        WITH postings AS (
+            SELECT attorney_id, settlement_id, debit_account AS account, amount_cents AS delta
+            FROM ledger_entries
+            UNION ALL
+            SELECT attorney_id, settlement_id, credit_account, -amount_cents
+            FROM ledger_entries
+        )
+        INSERT INTO ledger_balances (attorney_id, settlement_id, account, balance_cents)
+        SELECT attorney_id, settlement_id, account, SUM(delta)
+        FROM postings
+        GROUP BY GROUPING SETS ((attorney_id, settlement_id, account), (attorney_id, account))
+        ON CONFLICT ON CONSTRAINT uq_ledger_balance DO NOTHING;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TABLE IF EXISTS ledger_balances;
+        DROP TABLE IF EXISTS ledger_entries;
+        DROP FUNCTION IF EXISTS ledger_entries_immutable();
+        """
+    )
@@ -0,0 +1,35 @@
+"""add indexes for keyset-paginated payout history
+
+Revision ID: 0023_payout_history_indexes
+Revises: 0022_payout_ledger
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0023_payout_history_indexes"
+down_revision = "0022_payout_ledger"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # History pages walk transfers in (created_at, id) order and keep those
+    # whose batch belongs to the attorney.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_payout_batch_attorney
+            ON payout_batches(attorney_id, settlement_id);
+        CREATE INDEX IF NOT EXISTS idx_payout_transfer_created
+            ON payout_transfers(created_at DESC, id DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP INDEX IF EXISTS idx_payout_transfer_created;
+        DROP INDEX IF EXISTS idx_payout_batch_attorney;
+        """
+    )
@@ -0,0 +1,28 @@
+"""add heartbeat_at to sync_jobs
+
+Revision ID: 0024_sync_job_heartbeat
+Revises: 0023_payout_history_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0024_sync_job_heartbeat"
+down_revision = "0023_payout_history_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Refreshed by the sync worker after every page/chunk; running jobs whose
+    # heartbeat goes stale are re-queued (or failed once out of retries).
+    op.execute(
+        """
+        ALTER TABLE sync_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+        UPDATE sync_jobs SET heartbeat_at = started_at WHERE status = 'running';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE sync_jobs DROP COLUMN IF EXISTS heartbeat_at;")
@@ -0,0 +1,45 @@
+"""record activation history on ranker_models for step-by-step rollback
+
+Revision ID: 0025_ranker_model_history
+Revises: 0024_sync_job_heartbeat
+Create Date: 2026-10-19
+
+previous_version is the version a model replaced when it was activated;
+rolled_back_at marks models a rollback moved away from.  Existing rows are
+linked to the model activated just before them.
+"""
+
+from alembic import op
+
+revision = "0025_ranker_model_history"
+down_revision = "0024_sync_job_heartbeat"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE ranker_models ADD COLUMN IF NOT EXISTS previous_version INTEGER;
+        ALTER TABLE ranker_models ADD COLUMN IF NOT EXISTS rolled_back_at TIMESTAMPTZ;
+
+        WITH ordered AS (
+            SELECT id, LAG(version) OVER (ORDER BY activated_at) AS previous_version
+            FROM ranker_models
+            WHERE activated_at IS NOT NULL
+        )
+        UPDATE ranker_models rm
+        SET previous_version = ordered.previous_version
+        FROM ordered
+        WHERE rm.id = ordered.id;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE ranker_models DROP COLUMN IF EXISTS rolled_back_at;
+        ALTER TABLE ranker_models DROP COLUMN IF EXISTS previous_version;
+        """
+    )
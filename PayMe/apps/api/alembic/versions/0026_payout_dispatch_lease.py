@@ -0,0 +1,26 @@
+"""add dispatched_at lease to payout_transfers
+
+Revision ID: 0026_payout_dispatch_lease
+Revises: 0025_ranker_model_history
+Create Date: 2026-10-19
+
+process_payout_batch leases a chunk of transfers (dispatched_at = now) and
+commits before calling the payout provider, so no row lock is held while
+requests are in flight.  Another run skips leased transfers until
+payout_dispatch_lease_seconds have passed.
+"""
+
+from alembic import op
+
+revision = "0026_payout_dispatch_lease"
+down_revision = "0025_ranker_model_history"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE payout_transfers ADD COLUMN IF NOT EXISTS dispatched_at TIMESTAMPTZ;")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE payout_transfers DROP COLUMN IF EXISTS dispatched_at;")
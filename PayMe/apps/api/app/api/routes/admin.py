@@ -1,12 +1,16 @@
+from collections.abc import Iterator
+from datetime import datetime
 from pathlib import Path
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import desc, func, select
 from sqlalchemy.orm import Session
 
 from app.core.db import get_db
 from app.core.settings import settings
+from app.core.streaming import ndjson_chunks
 from app.models.entities import (
     Event,
     GmailEvidence,
@@ -19,7 +23,33 @@ from app.models.entities import (
     User,
     UserFeature,
 )
-from app.services.ml.feedback import export_labeled_samples, get_labeled_dataset
+from app.services.ml.dataset_export import (
+    ARROW_AVAILABLE,
+    COLUMNAR_FORMATS,
+    MEDIA_TYPES,
+    columnar_chunks,
+)
+from app.services.ml.feedback import (
+    export_labeled_samples,
+    get_labeled_dataset,
+    iter_dataset_partitions,
+    iter_labeled_dataset,
+    refresh_labeled_samples,
+)
+from app.services.ml.model_registry import (
+    activate_model,
+    list_models,
+    ranker_model_to_dict,
+    rollback_model,
+)
+from app.services.ml.training_jobs import (
+    TRAINING_MODES,
+    cancel_training_job,
+    enqueue_training,
+    get_training_job,
+    list_training_jobs,
+    training_job_to_dict,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -219,13 +249,14 @@ def stats_for_user(user_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/ml/export-labeled")
-def ml_export_labeled(db: Session = Depends(get_db)):
+def ml_export_labeled(full: bool = False, db: Session = Depends(get_db)):
     """Materialize labeled training samples from match results + claim outcomes.
 
-    Upserts rows into ml_feedback_samples and returns the count and sample list.
+    Upserts rows changed since the last export (every row with ``full=true``)
+    into ml_feedback_samples and returns the count and sample list.
     """
     _require_admin_enabled()
-    samples = export_labeled_samples(db)
+    samples = export_labeled_samples(db, full=full)
     return {
         "count": len(samples),
         "samples": samples,
@@ -233,51 +264,164 @@ def ml_export_labeled(db: Session = Depends(get_db)):
 
 
 @router.get("/ml/dataset")
-def ml_dataset(db: Session = Depends(get_db)):
-    """Return all rows from ml_feedback_samples for offline training consumption."""
+def ml_dataset(
+    since: datetime | None = None,
+    label_only: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Return rows from ml_feedback_samples for offline training consumption."""
     _require_admin_enabled()
-    rows = get_labeled_dataset(db)
+    rows = get_labeled_dataset(db, since=since, label_only=label_only)
     return {
         "count": len(rows),
         "rows": rows,
     }
 
 
-@router.post("/ml/train")
-def ml_train(db: Session = Depends(get_db)):
-    """Export labeled data, train the ranker, and auto-promote weights if metrics improve.
+_DATASET_FORMAT = Query(default="ndjson", pattern="^(ndjson|arrow|parquet)$")
 
-    Steps:
-      1. Materialise labeled samples via export_labeled_samples (upserts ml_feedback_samples)
-      2. Write feedback_export.json so train_ranker can read it
-      3. Run training: new weights are only promoted to artifacts/weights.json when
-         precision@5 strictly beats the currently active model
-      4. Return {promoted, weights_version, new_metrics, previous_metrics}
+
+def _require_format_available(fmt: str) -> None:
+    if fmt in COLUMNAR_FORMATS and not ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail='pyarrow is not installed: pip install -e ".[arrow]"')
+
+
+def _dataset_stream(
+    db: Session, fmt: str, since: datetime | None, label_only: bool, headers: dict | None = None
+) -> StreamingResponse:
+    """Stream ml_feedback_samples as NDJSON, an Arrow IPC stream, or Parquet.
+
+    Rows are read through a server-side cursor on a session of their own, so
+    the stream does not depend on when the request-scoped session is closed.
     """
+    bind = db.get_bind()
+
+    def body() -> Iterator[bytes]:
+        with Session(bind=bind) as stream_db:
+            if fmt in COLUMNAR_FORMATS:
+                partitions = iter_dataset_partitions(stream_db, since=since, label_only=label_only)
+                yield from columnar_chunks(partitions, fmt)
+            else:
+                yield from ndjson_chunks(iter_labeled_dataset(stream_db, since=since, label_only=label_only))
+
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/ml/dataset/stream")
+def ml_dataset_stream(
+    format: str = _DATASET_FORMAT,  # noqa: A002
+    since: datetime | None = None,
+    label_only: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Stream ml_feedback_samples rows (optionally updated since / labeled only) as
+    NDJSON, Arrow IPC stream, or Parquet, in constant memory."""
     _require_admin_enabled()
-    import json as _json
-    import sys
+    _require_format_available(format)
+    return _dataset_stream(db, format, since, label_only)
 
-    # 1. Materialise labels
-    samples = export_labeled_samples(db)
 
-    # 2. Resolve artifacts dir (container vs local dev)
-    _artifacts = Path("/workspace/artifacts") if Path("/workspace").exists() else Path("artifacts")
-    _artifacts.mkdir(parents=True, exist_ok=True)
-    (_artifacts / "feedback_export.json").write_text(
-        _json.dumps(samples, indent=2, default=str), encoding="utf-8"
-    )
+@router.get("/ml/export-labeled/stream")
+def ml_export_labeled_stream(
+    full: bool = False,
+    format: str = _DATASET_FORMAT,  # noqa: A002
+    label_only: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Refresh ml_feedback_samples like /ml/export-labeled, then stream the changed rows.
+
+    Counts are returned in the X-Sample-Count / X-Labeled-Count (rows read)
+    and X-Changed-Count (rows inserted or changed, i.e. streamed) headers.
+    """
+    _require_admin_enabled()
+    _require_format_available(format)
+    summary = refresh_labeled_samples(db, full=full)
+    headers = {
+        "X-Sample-Count": str(summary["sample_count"]),
+        "X-Labeled-Count": str(summary["labeled_count"]),
+        "X-Changed-Count": str(summary["changed_count"]),
+    }
+    return _dataset_stream(db, format, summary["exported_at"], label_only, headers)
+
 
-    # 3. Import and run trainer (sys.path ensures it's findable in the container)
-    _scripts = "/workspace/scripts"
-    if _scripts not in sys.path:
-        sys.path.insert(0, _scripts)
+@router.post("/ml/train", status_code=status.HTTP_202_ACCEPTED)
+def ml_train(mode: str = "auto", db: Session = Depends(get_db)):
+    """Queue a ranker training run and return the job handle immediately.
 
-    try:
-        import train_ranker  # type: ignore[import]  # noqa: PLC0415
+    The training worker (app/services/ml/training_worker.py) refreshes
+    ml_feedback_samples, writes the .npy training arrays, and runs
+    app.services.ml.ranker in a child process; new weights are only promoted
+    when precision@5 strictly beats the active model.  Runs are serialized: a
+    request made while a job is already queued returns that job.  Poll
+    GET /admin/ml/train/jobs/{job_id} for progress, per-iteration loss, and
+    the {promoted, weights_version, mode, new_metrics, previous_metrics} result.
+
+    ``mode``: ``full`` refits on all labeled samples; ``incremental``
+    warm-starts from the active weights and trains on new samples only;
+    ``auto`` is incremental with a full refit every ML_TRAIN_FULL_REFIT_EVERY
+    versions.
+    """
+    _require_admin_enabled()
+    if mode not in TRAINING_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(TRAINING_MODES)}")
+    job = enqueue_training(db, mode)
+    db.commit()
+    return training_job_to_dict(job)
 
-        return train_ranker.main(artifacts_dir=_artifacts)
-    except ImportError as exc:
-        raise HTTPException(status_code=500, detail=f"Trainer module not available: {exc}") from exc
-    except SystemExit as exc:
-        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+@router.get("/ml/train/jobs")
+def ml_train_jobs(limit: int = Query(default=20, le=100), db: Session = Depends(get_db)):
+    _require_admin_enabled()
+    return [training_job_to_dict(job) for job in list_training_jobs(db, limit)]
+
+
+@router.get("/ml/train/jobs/{job_id}")
+def ml_train_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Status, phase, progress (0..1), elapsed time and loss history of a training job."""
+    _require_admin_enabled()
+    job = get_training_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return training_job_to_dict(job)
+
+
+@router.post("/ml/train/jobs/{job_id}/cancel")
+def ml_train_job_cancel(job_id: UUID, db: Session = Depends(get_db)):
+    """Cancel a queued job, or ask the worker to stop a running one (409 if finished)."""
+    _require_admin_enabled()
+    job = cancel_training_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    if job.status in ("done", "failed"):
+        raise HTTPException(status_code=409, detail=f"Training job already {job.status}")
+    db.commit()
+    return training_job_to_dict(job)
+
+
+@router.get("/ml/models")
+def ml_models(limit: int = Query(default=20, le=100), db: Session = Depends(get_db)):
+    """Registered ranker versions, newest first, with weights, metrics and which one is active."""
+    _require_admin_enabled()
+    return [ranker_model_to_dict(model) for model in list_models(db, limit)]
+
+
+@router.post("/ml/models/{version}/activate")
+def ml_model_activate(version: int, db: Session = Depends(get_db)):
+    """Serve this version's weights; every API process swaps to it on commit."""
+    _require_admin_enabled()
+    model = activate_model(db, version)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Ranker model not found")
+    db.commit()
+    return ranker_model_to_dict(model)
+
+
+@router.post("/ml/models/rollback")
+def ml_model_rollback(db: Session = Depends(get_db)):
+    """Re-activate the version the active one replaced (409 if there is none)."""
+    _require_admin_enabled()
+    model = rollback_model(db)
+    if model is None:
+        raise HTTPException(status_code=409, detail="No previously active ranker model")
+    db.commit()
+    return ranker_model_to_dict(model)
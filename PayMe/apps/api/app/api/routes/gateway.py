@@ -5,12 +5,16 @@ payout batch execution, and reconciliation.
 
 Auth: JWT Bearer token required.  The requesting user must have role
 'attorney', 'admin', or 'super_user'.  The AttorneyAccount is resolved
-from the current user's user_id FK.
+from the current user's user_id FK.  The payout provider's status callbacks
+are authenticated by their HMAC signature instead.
 """
 
+from collections.abc import Iterator
+from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.orm import Session
@@ -25,12 +29,21 @@ from app.services.gateway.attorney_service import (
     list_submitted_claimants,
     reject_claimant,
 )
+from app.services.gateway.payout_history import (
+    DEFAULT_PAGE_SIZE,
+    EXPORT_MEDIA_TYPES,
+    MAX_PAGE_SIZE,
+    export_chunks,
+    iter_payout_history,
+    list_payout_history,
+)
+from app.services.gateway.payout_provider import SIGNATURE_HEADER, verify_callback_signature
 from app.services.gateway.payout_service import (
+    apply_provider_callback,
     create_payout_batch,
     execute_payouts,
     get_account_balance,
     get_batch_reconciliation,
-    list_payout_history,
     process_payout_batch,
 )
 
@@ -65,6 +78,14 @@ async def get_attorney(
     return attorney
 
 
+async def verified_provider_callback(request: Request) -> "PayoutCallbackRequest":
+    """Parse a payout provider callback after checking its body signature."""
+    body = await request.body()
+    if not verify_callback_signature(body, request.headers.get(SIGNATURE_HEADER)):
+        raise HTTPException(status_code=401, detail="Invalid payout callback signature")
+    return PayoutCallbackRequest.model_validate_json(body)
+
+
 # ---------------------------------------------------------------------------
 # Request / Response schemas
 # ---------------------------------------------------------------------------
@@ -106,6 +127,13 @@ class ExecutePayoutsRequest(BaseModel):
     idempotency_key: str
 
 
+class PayoutCallbackRequest(BaseModel):
+    id: str | None = None  # provider transfer id
+    idempotency_key: str
+    status: str  # pending|processing|completed|failed
+    failure_reason: str | None = None
+
+
 class CreateQuestionRequest(BaseModel):
     question_text: str
     question_type: str = "text"  # text|yes_no|date|amount|select
@@ -349,11 +377,66 @@ def execute_payouts_route(
 
 @router.get("/payouts/history")
 def get_payout_history(
+    status: list[str] | None = Query(default=None),
+    settlement_id: UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     attorney: AttorneyAccount = Depends(get_attorney),
 ):
-    """Return all past payout transfers for this attorney's settlements."""
-    return list_payout_history(db, attorney=attorney)
+    """Return one page of this attorney's payout transfers, newest first.
+
+    Pass the response's next_cursor as ``cursor`` for the following page.
+    """
+    try:
+        return list_payout_history(
+            db,
+            attorney=attorney,
+            status=status,
+            settlement_id=settlement_id,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/payouts/history/export")
+def export_payout_history(
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    status: list[str] | None = Query(default=None),
+    settlement_id: UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: Session = Depends(get_db),
+    attorney: AttorneyAccount = Depends(get_attorney),
+) -> StreamingResponse:
+    """Stream every matching payout transfer as CSV or NDJSON.
+
+    Rows are read through a server-side cursor on a session of their own, so
+    the stream does not depend on when the request-scoped session is closed.
+    """
+    bind = db.get_bind()
+    attorney_id = attorney.id
+
+    def body() -> Iterator[bytes]:
+        with Session(bind=bind) as stream_db:
+            rows = iter_payout_history(
+                stream_db,
+                stream_db.get(AttorneyAccount, attorney_id),
+                status=status,
+                settlement_id=settlement_id,
+                since=since,
+                until=until,
+            )
+            yield from export_chunks(rows, format)
+
+    headers = {"Content-Disposition": f'attachment; filename="payout_history.{format}"'}
+    return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
 
 
 # ---------------------------------------------------------------------------
@@ -410,6 +493,25 @@ def process_payout_batch_route(
     }
 
 
+@router.post("/payouts/callbacks")
+def payout_callback_route(
+    callback: PayoutCallbackRequest = Depends(verified_provider_callback),
+    db: Session = Depends(get_db),
+):
+    """Apply a payout provider status callback to its transfer (idempotent)."""
+    transfer = apply_provider_callback(
+        db,
+        idempotency_key=callback.idempotency_key,
+        status=callback.status,
+        provider_transfer_id=callback.id,
+        failure_reason=callback.failure_reason,
+    )
+    if transfer is None:
+        raise HTTPException(status_code=404, detail="Payout transfer not found")
+    db.commit()
+    return {"transfer_id": str(transfer.id), "status": transfer.status}
+
+
 @router.get("/payouts/{batch_id}/reconcile")
 def reconcile_payout_batch_route(
     batch_id: UUID,
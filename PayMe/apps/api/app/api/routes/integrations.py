@@ -1,3 +1,5 @@
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
@@ -7,8 +9,7 @@ from app.core.auth import get_current_user
 from app.core.db import get_db
 from app.core.logging import app_logger
 from app.models.entities import User
-from app.services.ingestion.gmail_sync import sync_gmail
-from app.services.ingestion.plaid_sync import sync_plaid
+from app.services.ingestion.sync_jobs import enqueue_sync, get_sync_job, job_to_dict
 
 router = APIRouter(prefix="/integrations", tags=["integrations"])
 
@@ -136,12 +137,12 @@ setTimeout(() => window.close(), 150);
             },
         )
         
-        # Automatically sync Gmail after successful OAuth connection
+        # Automatically queue a Gmail sync after successful OAuth connection
         try:
-            sync_gmail(db, user)
+            job = enqueue_sync(db, user.id, "gmail", trigger="oauth_callback")
             db.commit()
             app_logger.info(
-                f"gmail_oauth_callback_sync_ok user_id={user.id}",
+                f"gmail_oauth_callback_sync_queued user_id={user.id} job_id={job.id}",
                 extra={
                     "request_id": getattr(request.state, "request_id", ""),
                     "path": request.url.path,
@@ -150,7 +151,8 @@ setTimeout(() => window.close(), 150);
                 },
             )
         except Exception:  # noqa: BLE001
-            # Don't fail the OAuth flow if sync fails
+            # Don't fail the OAuth flow if the sync cannot be queued
+            db.rollback()
             app_logger.warning(
                 f"gmail_oauth_callback_sync_failed user_id={user.id}",
                 extra={
@@ -248,89 +250,48 @@ def gmail_revoke_route(request: Request, db: Session = Depends(get_db), user: Us
 
 
 # ---------------------------------------------------------------------------
-# Gmail — sync
+# Gmail / Plaid — sync (queued; see services/ingestion/sync_jobs.py)
 # ---------------------------------------------------------------------------
 
 
-@router.post("/gmail/sync")
+def _enqueue_sync_route(request: Request, db: Session, user: User, provider: str) -> dict:
+    job = enqueue_sync(db, user.id, provider)
+    db.commit()
+    app_logger.info(
+        f"{provider}_sync_queued user_id={user.id} job_id={job.id} status={job.status}",
+        extra={
+            "request_id": getattr(request.state, "request_id", ""),
+            "path": request.url.path,
+            "method": request.method,
+            "status_code": 202,
+        },
+    )
+    return job_to_dict(job)
+
+
+@router.post("/gmail/sync", status_code=status.HTTP_202_ACCEPTED)
 def gmail_sync_route(request: Request, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    """Run Gmail sync for the authenticated user.
+    """Queue a Gmail sync for the authenticated user and return the job handle.
 
-    Dispatches to mock or real sync depending on settings.mock_gmail.
+    A sync already queued or running for the user is returned instead of a
+    new one.  Poll GET /integrations/sync/jobs/{job_id} for the result.
     """
-    try:
-        result = sync_gmail(db, user)
-        db.commit()
-        app_logger.info(
-            f"gmail_sync_ok user_id={user.id} inserted_messages={result.get('inserted_messages', 'n/a')}",
-            extra={
-                "request_id": getattr(request.state, "request_id", ""),
-                "path": request.url.path,
-                "method": request.method,
-                "status_code": 200,
-            },
-        )
-        return result
-    except ValueError as exc:
-        app_logger.warning(
-            f"gmail_sync_failed user_id={user.id} error={str(exc)[:300]}",
-            extra={
-                "request_id": getattr(request.state, "request_id", ""),
-                "path": request.url.path,
-                "method": request.method,
-                "status_code": 400,
-            },
-        )
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-    except Exception as exc:  # noqa: BLE001
-        app_logger.warning(
-            f"gmail_sync_failed user_id={user.id} error={str(exc)[:300]}",
-            extra={
-                "request_id": getattr(request.state, "request_id", ""),
-                "path": request.url.path,
-                "method": request.method,
-                "status_code": 400,
-            },
-        )
-        raise
+    return _enqueue_sync_route(request, db, user, "gmail")
 
 
-# ---------------------------------------------------------------------------
-# Plaid — existing sync (now dispatched through sync_plaid)
-# ---------------------------------------------------------------------------
+@router.post("/plaid/sync", status_code=status.HTTP_202_ACCEPTED)
+def plaid_sync_route(request: Request, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Queue a Plaid sync for the authenticated user and return the job handle."""
+    return _enqueue_sync_route(request, db, user, "plaid")
 
 
-@router.post("/plaid/sync")
-def plaid_sync_route(request: Request, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    try:
-        result = sync_plaid(db, user)
-        db.commit()
-        app_logger.info(
-            f"plaid_sync_ok user_id={user.id} inserted_transactions={result.get('inserted_transactions', 'n/a')}",
-            extra={
-                "request_id": getattr(request.state, "request_id", ""),
-                "path": request.url.path,
-                "method": request.method,
-                "status_code": 200,
-            },
-        )
-        return result
-    except ValueError as exc:
-        # Commit any state changes (e.g. requires_reauth flag) before returning the error.
-        try:
-            db.commit()
-        except Exception:  # noqa: BLE001
-            db.rollback()
-        app_logger.warning(
-            f"plaid_sync_failed user_id={user.id} error={str(exc)[:300]}",
-            extra={
-                "request_id": getattr(request.state, "request_id", ""),
-                "path": request.url.path,
-                "method": request.method,
-                "status_code": 400,
-            },
-        )
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+@router.get("/sync/jobs/{job_id}")
+def sync_job_route(job_id: uuid.UUID, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Return a sync job's status; `result` holds the sync summary once done."""
+    job = get_sync_job(db, job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job_to_dict(job)
 
 
 # ---------------------------------------------------------------------------
@@ -423,12 +384,12 @@ def plaid_exchange_route(
         },
     )
     
-    # Automatically sync Plaid after successful token exchange
+    # Automatically queue a Plaid sync after successful token exchange
     try:
-        sync_plaid(db, user)
+        job = enqueue_sync(db, user.id, "plaid", trigger="plaid_exchange")
         db.commit()
         app_logger.info(
-            f"plaid_exchange_post_sync_ok user_id={user.id}",
+            f"plaid_exchange_post_sync_queued user_id={user.id} job_id={job.id}",
             extra={
                 "request_id": getattr(request.state, "request_id", ""),
                 "path": request.url.path,
@@ -437,7 +398,8 @@ def plaid_exchange_route(
             },
         )
     except Exception:  # noqa: BLE001
-        # Don't fail the exchange flow if sync fails
+        # Don't fail the exchange flow if the sync cannot be queued
+        db.rollback()
         app_logger.warning(
             f"plaid_exchange_post_sync_failed user_id={user.id}",
             extra={
@@ -17,17 +17,54 @@ class Settings(BaseSettings):
     ranker_default_urgency_weight: float = 0.03
     ranker_default_ease_weight: float = 0.02
 
+    # Track 1: ML feedback export (app/services/ml/feedback.py)
+    ml_export_chunk_size: int = 1000  # rows streamed and upserted per round trip
+    ml_export_watermark_overlap_seconds: int = 300  # re-scan window for late-committing writes
+    ml_artifacts_dir: str = ""  # weights/metrics/exports; empty = /workspace/artifacts or ./artifacts
+    ml_train_poll_interval_seconds: float = 2.0  # worker idle sleep between claim attempts
+    ml_train_progress_interval_seconds: float = 1.0  # progress writes / cancel checks while running
+    ml_train_timeout_seconds: int = 3600  # running training is terminated after this long
+    ml_train_heartbeat_timeout_seconds: int = 120  # running jobs without a heartbeat are failed
+    ml_train_full_refit_every: int = 7  # mode=auto: every Nth version refits on all data
+    ml_registry_listen: bool = True  # API processes LISTEN for ranker model activations
+    ml_registry_reconnect_seconds: float = 5.0  # listener retry delay after losing its connection
+
     # Track 2: Gmail real OAuth
     google_client_id: str = ""
     google_client_secret: str = ""
     google_redirect_uri: str = "http://localhost:8000/integrations/gmail/oauth/callback"
     web_app_url: str = "http://localhost:15173"
+    gmail_api_base_url: str = "https://gmail.googleapis.com"
+    gmail_batch_size: int = 100  # sub-requests per batch call (Gmail max: 100)
+    gmail_batch_concurrency: int = 4  # batch calls in flight at once
+    gmail_batch_max_retries: int = 5  # rounds of 429/5xx backoff before failing the sync
+    gmail_list_page_size: int = 500  # messages.list maxResults (Gmail max: 500)
+    gmail_page_prefetch: int = 2  # list/history pages fetched ahead of the page being written
+    google_http_pool_size: int = 8  # idle keep-alive connections kept per Google host
+    google_http_timeout_seconds: float = 60.0
 
     # Track 3: Plaid real integration
     plaid_client_id: str = ""
     plaid_secret: str = ""
     plaid_env: str = "sandbox"  # sandbox | development | production
 
+    # Ingestion sync queue (app/services/ingestion/sync_jobs.py)
+    sync_max_concurrency: int = 4  # running sync jobs across all providers
+    sync_gmail_max_concurrency: int = 2
+    sync_plaid_max_concurrency: int = 2
+    sync_gmail_starts_per_minute: int = 30  # job starts per rolling minute
+    sync_plaid_starts_per_minute: int = 30
+    sync_max_retries: int = 3
+    sync_retry_delay_seconds: int = 30  # doubled on each retry
+    sync_heartbeat_interval_seconds: float = 10.0  # heartbeat writes while a sync runs
+    sync_heartbeat_timeout_seconds: int = 300  # running jobs without a heartbeat are re-queued
+    sync_poll_interval_seconds: float = 2.0
+    sync_schedule_interval_seconds: int = 300  # how often the worker enqueues periodic syncs
+
+    # Raw provider payload storage (app/services/ingestion/payload_store.py)
+    raw_payload_codec: str = "zstd"  # zstd | zlib | none; zstd falls back to zlib without zstandard
+    raw_payload_compression_level: int = 3
+
     # Track 4: Autofill agent
     autofill_artifacts_dir: str = "/tmp/autofill-artifacts"
     autofill_max_retries: int = 3
@@ -36,6 +73,19 @@ class Settings(BaseSettings):
     # Track 5: Gateway / payouts
     gateway_api_key_salt: str = "change-me-gateway-salt"
     token_encryption_key: str = ""  # Fernet key for encrypting OAuth/bank tokens at rest
+    payout_chunk_size: int = 1000  # transfers decided, written and committed per round
+    payout_provider: str = "mock"  # mock (in-process simulation) | http (payout_provider.HttpPayoutProvider)
+    payout_provider_base_url: str = "http://localhost:8089"  # mock_payout_server's default port
+    payout_provider_api_key: str = ""
+    payout_provider_callback_url: str = ""  # public URL of POST /gateway/payouts/callbacks
+    payout_provider_webhook_secret: str = "change-me-payout-webhook"  # HMAC key for callbacks
+    payout_provider_concurrency: int = 16  # requests in flight at once
+    payout_provider_rate_per_second: float = 50.0  # token bucket refill rate; 0 = unlimited
+    payout_provider_burst: int = 50  # token bucket capacity
+    payout_provider_max_retries: int = 4  # retries of 429/5xx/timeouts per transfer
+    payout_provider_timeout_seconds: float = 10.0
+    payout_dispatch_lease_seconds: int = 300  # leased transfers other runs skip while a chunk is in flight
+    payout_provider_status_poll_seconds: int = 600  # look up transfers processing this long
 
     # Demo / provisioning
     mock_provision_password: str = "TestUser!2026"
@@ -0,0 +1,32 @@
+"""Byte-chunk encoders for streaming responses and exports.
+
+Shared by the ML dataset export and the gateway payout history export, so
+neither pulls in the other's dependencies.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator
+
+FLUSH_BYTES = 64 * 1024
+
+
+def compact_json(row: dict) -> str:
+    return json.dumps(row, separators=(",", ":"), default=str)
+
+
+def ndjson_chunks(rows: Iterable[dict], flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON, yielding roughly flush_bytes at a time."""
+    buffer: list[str] = []
+    size = 0
+    for row in rows:
+        line = compact_json(row) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode()
@@ -171,8 +171,18 @@ def _provision_demo_users() -> None:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    from app.services.ml.model_registry import (  # noqa: PLC0415
+        start_registry_listener,
+        stop_registry_listener,
+    )
+
     _provision_demo_users()
-    yield
+    listener = start_registry_listener() if settings.ml_registry_listen else None
+    try:
+        yield
+    finally:
+        if listener is not None:
+            stop_registry_listener(listener)
 
 
 app = FastAPI(title="PayMe Lite API", lifespan=lifespan)
@@ -3,17 +3,21 @@ from datetime import datetime
 
 from sqlalchemy import (
     JSON,
+    BigInteger,
     Boolean,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    ForeignKeyConstraint,
     Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import Mapped, mapped_column
@@ -86,7 +90,10 @@ class SettlementFeatureIndex(Base):
 
 class UserFeature(Base):
     __tablename__ = "user_features"
-    __table_args__ = (Index("idx_user_feature", "user_id", "feature_key"),)
+    __table_args__ = (
+        Index("idx_user_feature", "user_id", "feature_key"),
+        UniqueConstraint("user_id", "feature_key", "source", name="uq_user_feature_source"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
@@ -116,7 +123,12 @@ class MatchRun(Base):
 
 class MatchResult(Base):
     __tablename__ = "match_results"
-    __table_args__ = (Index("idx_user_latest_results", "user_id", "created_at"),)
+    __table_args__ = (
+        Index("idx_user_latest_results", "user_id", "created_at"),
+        # Latest result per (user, settlement) and the ML export watermark scan.
+        Index("idx_match_results_pair_latest", "user_id", "settlement_id", "created_at"),
+        Index("idx_match_results_created_at", "created_at"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("match_runs.id"), nullable=False)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -131,7 +143,10 @@ class MatchResult(Base):
 
 class UserSettlementPreference(Base):
     __tablename__ = "user_settlement_preferences"
-    __table_args__ = (UniqueConstraint("user_id", "settlement_id", name="uq_user_settlement_pref"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "settlement_id", name="uq_user_settlement_pref"),
+        Index("idx_user_settlement_pref_updated_at", "updated_at"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     settlement_id: Mapped[uuid.UUID] = mapped_column(
@@ -144,7 +159,9 @@ class UserSettlementPreference(Base):
     claim_submitted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     claim_outcome_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     claim_feedback_json: Mapped[dict | None] = mapped_column(JSON)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
 
 class Event(Base):
@@ -180,7 +197,29 @@ class GmailMessage(Base):
     from_domain: Mapped[str | None] = mapped_column(String(255))
     subject: Mapped[str | None] = mapped_column(String(500))
     snippet: Mapped[str | None] = mapped_column(Text)
-    raw_json: Mapped[dict | None] = mapped_column(JSON)
+
+
+class GmailMessagePayload(Base):
+    """Compressed raw Gmail API payload, kept off the hot gmail_messages table.
+
+    Written alongside GmailMessage by the sync paths and only read through
+    services/ingestion/payload_store.py.
+    """
+
+    __tablename__ = "gmail_message_payloads"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "provider_msg_id"],
+            ["gmail_messages.user_id", "gmail_messages.provider_msg_id"],
+            ondelete="CASCADE",
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    provider_msg_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(10), nullable=False)  # zstd|zlib|none
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
 
 
 class GmailEvidence(Base):
@@ -211,7 +250,43 @@ class PlaidTransaction(Base):
     amount_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     category: Mapped[str | None] = mapped_column(String(100))
     is_subscription: Mapped[bool] = mapped_column(Boolean, default=False)
-    raw_json: Mapped[dict | None] = mapped_column(JSON)
+
+
+class PlaidTransactionPayload(Base):
+    """Compressed raw Plaid transaction payload, kept off the hot plaid_transactions table."""
+
+    __tablename__ = "plaid_transaction_payloads"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "provider_txn_id"],
+            ["plaid_transactions.user_id", "plaid_transactions.provider_txn_id"],
+            ondelete="CASCADE",
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    provider_txn_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(10), nullable=False)  # zstd|zlib|none
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class UserSpendAggregate(Base):
+    """Running per-user totals behind Plaid features (merchant:X, category:X, subscription:active).
+
+    Maintained incrementally by every Plaid sync from the rows it adds,
+    modifies and removes; see services/ingestion/spend_aggregate.py.
+    """
+
+    __tablename__ = "user_spend_aggregate"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_cents: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_seen: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
 
 # ---------------------------------------------------------------------------
@@ -224,7 +299,7 @@ class MlFeedbackSample(Base, TimestampMixin):
 
     __tablename__ = "ml_feedback_samples"
     __table_args__ = (
-        Index("idx_ml_feedback_user_settlement", "user_id", "settlement_id"),
+        UniqueConstraint("user_id", "settlement_id", name="uq_ml_feedback_user_settlement"),
         Index("idx_ml_feedback_label", "label"),
     )
 
@@ -246,6 +321,81 @@ class MlFeedbackSample(Base, TimestampMixin):
     export_version: Mapped[int] = mapped_column(Integer, default=1)
 
 
+class MlExportWatermark(Base):
+    """High-water mark of the last incremental export, one row per export name."""
+
+    __tablename__ = "ml_export_watermarks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    watermark: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class TrainingJob(Base, TimestampMixin):
+    """Ranker training run, claimed by the training worker and run in a child process."""
+
+    __tablename__ = "training_jobs"
+    __table_args__ = (
+        Index("idx_training_job_claim", "status", "created_at"),
+        # At most one queued job: requests made while one is waiting coalesce
+        # onto it, so runs are serialized with at most one pending behind the
+        # running one.
+        Index(
+            "uq_training_job_queued",
+            "status",
+            unique=True,
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status: Mapped[str] = mapped_column(String(20), default="queued")  # queued|running|done|failed|cancelled
+    mode: Mapped[str] = mapped_column(String(20), default="auto")  # auto|full|incremental (requested)
+    phase: Mapped[str | None] = mapped_column(String(20))  # exporting|loading|training|evaluating
+    request_count: Mapped[int] = mapped_column(Integer, default=1)  # requests coalesced onto this job
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, default=False)
+    progress: Mapped[float] = mapped_column(Float, default=0.0)  # 0..1
+    iteration: Mapped[int] = mapped_column(Integer, default=0)
+    loss_history: Mapped[list] = mapped_column(JSON, default=list)  # loss after each optimiser iteration
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    result_json: Mapped[dict | None] = mapped_column(JSON)
+    error_message: Mapped[str | None] = mapped_column(Text)
+
+
+class RankerModel(Base, TimestampMixin):
+    """Versioned ranker weights and metrics; exactly one row is active at a time."""
+
+    __tablename__ = "ranker_models"
+    __table_args__ = (
+        UniqueConstraint("version", name="uq_ranker_model_version"),
+        Index(
+            "uq_ranker_model_active",
+            "is_active",
+            unique=True,
+            postgresql_where=text("is_active"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)  # train_ranker weights_vN version
+    mode: Mapped[str] = mapped_column(String(20), default="full")  # full|incremental
+    # Feature weights plus the weights.json metadata keys (_version, _mode, ...).
+    weights: Mapped[dict] = mapped_column(JSON, nullable=False)
+    metrics: Mapped[dict] = mapped_column(JSON, default=dict)
+    promoted: Mapped[bool] = mapped_column(Boolean, default=False)  # passed the trainer's promotion rule
+    is_active: Mapped[bool] = mapped_column(Boolean, default=False)
+    activated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    previous_version: Mapped[int | None] = mapped_column(Integer)  # version this one replaced when activated
+    rolled_back_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    training_job_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("training_jobs.id")
+    )
+
+
 # ---------------------------------------------------------------------------
 # Track 2: Gmail real OAuth tokens
 # ---------------------------------------------------------------------------
@@ -264,6 +414,10 @@ class GmailOAuthToken(Base, TimestampMixin):
     token_expiry: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     scopes: Mapped[str | None] = mapped_column(Text)
     gmail_history_id: Mapped[str | None] = mapped_column(String(80))  # last synced historyId
+    # Checkpoint of an interrupted initial messages.list sync (cleared once it completes).
+    resume_page_token: Mapped[str | None] = mapped_column(Text)
+    resume_query: Mapped[str | None] = mapped_column(String(120))
+    resume_history_id: Mapped[str | None] = mapped_column(String(80))
     granted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     revoked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
@@ -293,6 +447,38 @@ class PlaidItem(Base, TimestampMixin):
     balance_current_cents: Mapped[int | None] = mapped_column(Integer)
 
 
+class SyncJob(Base, TimestampMixin):
+    """Queued Gmail/Plaid ingestion run, claimed by the sync worker."""
+
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        Index("idx_sync_job_claim", "status", "run_after"),
+        Index("idx_sync_job_user", "user_id", "created_at"),
+        # At most one queued/running job per (user, provider): duplicate
+        # requests coalesce onto the active job.
+        Index(
+            "uq_sync_job_active",
+            "user_id",
+            "provider",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    provider: Mapped[str] = mapped_column(String(20), nullable=False)  # gmail|plaid
+    status: Mapped[str] = mapped_column(String(20), default="queued")  # queued|running|done|failed
+    trigger: Mapped[str] = mapped_column(String(30), default="manual")  # manual|scheduled|oauth_callback|plaid_exchange
+    attempt_count: Mapped[int] = mapped_column(Integer, default=0)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    result_json: Mapped[dict | None] = mapped_column(JSON)
+    error_message: Mapped[str | None] = mapped_column(Text)
+
+
 # ---------------------------------------------------------------------------
 # Track 4: Autofill agent service
 # ---------------------------------------------------------------------------
@@ -462,6 +648,65 @@ class PayoutTransfer(Base, TimestampMixin):
     failure_reason: Mapped[str | None] = mapped_column(Text)
     initiated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Lease: set while a run has this transfer in flight to the provider (see process_payout_batch).
+    dispatched_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class LedgerEntry(Base):
+    """Immutable double-entry posting against an attorney's settlement fund.
+
+    Each entry moves amount_cents from credit_account to debit_account
+    (fund | held | disbursed); see services/gateway/ledger.py.
+    """
+
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        Index("idx_ledger_entries_approval", "approval_id"),
+        Index("idx_ledger_entries_attorney_settlement", "attorney_id", "settlement_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    entry_type: Mapped[str] = mapped_column(String(30), nullable=False)
+    # approval_hold|hold_release|disbursement|failure_release|opening_balance
+    attorney_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("attorney_accounts.id"), nullable=False
+    )
+    settlement_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("settlements.id"), nullable=False
+    )
+    debit_account: Mapped[str] = mapped_column(String(20), nullable=False)
+    credit_account: Mapped[str] = mapped_column(String(20), nullable=False)
+    amount_cents: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    approval_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("claim_approvals.id"))
+    transfer_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("payout_transfers.id"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class LedgerBalance(Base):
+    """Running balance of one ledger account, maintained with every posting.
+
+    settlement_id NULL holds the attorney-wide total across settlements.
+    """
+
+    __tablename__ = "ledger_balances"
+    __table_args__ = (
+        UniqueConstraint(
+            "attorney_id",
+            "settlement_id",
+            "account",
+            name="uq_ledger_balance",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    attorney_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("attorney_accounts.id"), nullable=False
+    )
+    settlement_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("settlements.id"))
+    account: Mapped[str] = mapped_column(String(20), nullable=False)  # fund|held|disbursed
+    balance_cents: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 # ---------------------------------------------------------------------------
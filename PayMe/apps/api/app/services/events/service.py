@@ -1,3 +1,7 @@
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.models.entities import Event
@@ -8,3 +12,14 @@ def emit_event(db: Session, event_type: str, user_id=None, payload: dict | None
     db.add(event)
     db.flush()
     return event
+
+
+def emit_events(db: Session, event_type: str, events: Iterable[tuple[uuid.UUID | None, dict]]) -> int:
+    """Insert many events of one type with a single executemany; events are (user_id, payload)."""
+    rows = [
+        {"id": uuid.uuid4(), "type": event_type, "user_id": user_id, "payload_json": payload}
+        for user_id, payload in events
+    ]
+    if rows:
+        db.execute(insert(Event), rows)
+    return len(rows)
@@ -27,6 +27,7 @@ from app.models.entities import (
     UserSettlementPreference,
 )
 from app.services.events.service import emit_event
+from app.services.gateway.ledger import hold_approvals, release_holds
 
 
 # ---------------------------------------------------------------------------
@@ -211,6 +212,8 @@ def approve_claimant(
     """
     Upsert a ClaimApproval record with status='approved'.
 
+    Holds the amount the payout transfer will carry (amount_cents, else the
+    settlement's payout_min_cents) in the ledger, replacing any earlier hold.
     Raises ValueError if the settlement has no linked SettlementAccount.
     Emits claimant_approved.
     """
@@ -228,10 +231,12 @@ def approve_claimant(
         )
 
     existing = db.scalar(
-        select(ClaimApproval).where(
+        select(ClaimApproval)
+        .where(
             ClaimApproval.user_id == user_id,
             ClaimApproval.settlement_id == settlement_id,
         )
+        .with_for_update()
     )
 
     now = datetime.now(timezone.utc)
@@ -257,6 +262,12 @@ def approve_claimant(
         db.add(approval)
 
     db.flush()
+    if amount_cents is None:
+        settlement = db.get(Settlement, settlement_id)
+        hold = (settlement.payout_min_cents or 0) if settlement else 0
+    else:
+        hold = amount_cents
+    hold_approvals(db, [(approval.id, attorney.id, settlement_id, hold)])
     emit_event(
         db,
         "claimant_approved",
@@ -337,13 +348,16 @@ def reject_claimant(
 ) -> ClaimApproval:
     """
     Upsert a ClaimApproval record with status='rejected'.
+    Releases the approval's ledger hold, if any.
     Emits claimant_rejected.
     """
     existing = db.scalar(
-        select(ClaimApproval).where(
+        select(ClaimApproval)
+        .where(
             ClaimApproval.user_id == user_id,
             ClaimApproval.settlement_id == settlement_id,
         )
+        .with_for_update()
     )
 
     now = datetime.now(timezone.utc)
@@ -367,6 +381,8 @@ def reject_claimant(
         db.add(approval)
 
     db.flush()
+    if existing is not None:
+        release_holds(db, [approval.id])
     emit_event(
         db,
         "claimant_rejected",
@@ -0,0 +1,252 @@
+"""Double-entry ledger of attorney settlement funds with running balances.
+
+Every money movement is an immutable ``ledger_entries`` row scoped to one
+(attorney, settlement) that debits one account and credits another:
+
+    approval_hold    held      <- fund   claimant approved for a payout
+    hold_release     fund      <- held   approval replaced or rejected first
+    disbursement     disbursed <- held   transfer completed
+    failure_release  fund      <- held   transfer failed
+    opening_balance  held/disbursed <- fund   history before the ledger (migration 0022)
+
+``post_entries`` inserts the entries and folds them into ``ledger_balances``
+in the same transaction with one ``INSERT ... ON CONFLICT DO UPDATE SET
+balance_cents = balance_cents + excluded.balance_cents``, both per
+settlement and into the attorney-wide row (settlement_id NULL).  Balances
+are debit-positive: held and disbursed count up, fund goes negative by what
+has been committed.  Reading a balance is a unique-key lookup rather than a
+SUM over transfers and approvals.
+
+Holds are tracked per approval (entries carry approval_id), so releasing or
+disbursing always moves exactly what is held for that approval, under the
+attorney who placed it, even if the amount or settlement minimum changed
+since.  Balance rows are upserted in sorted key order, so concurrent
+postings lock them in the same order and cannot deadlock.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterable
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam, case, func, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import LedgerBalance, LedgerEntry
+
+FUND = "fund"
+HELD = "held"
+DISBURSED = "disbursed"
+ACCOUNTS = (FUND, HELD, DISBURSED)
+
+# entry_type -> (debit_account, credit_account)
+POSTINGS = {
+    "approval_hold": (HELD, FUND),
+    "hold_release": (FUND, HELD),
+    "disbursement": (DISBURSED, HELD),
+    "failure_release": (FUND, HELD),
+}
+
+
+@dataclass(frozen=True)
+class Posting:
+    entry_type: str
+    attorney_id: UUID
+    settlement_id: UUID
+    amount_cents: int
+    approval_id: UUID | None = None
+    transfer_id: UUID | None = None
+
+
+def post_entries(db: Session, postings: Iterable[Posting]) -> int:
+    """Append postings to the ledger and apply them to the running balances.
+
+    Zero amounts are dropped.  Returns the number of entries written.
+    """
+    rows = []
+    deltas: dict[tuple[str, str, str], int] = {}
+    for posting in postings:
+        if posting.amount_cents == 0:
+            continue
+        debit, credit = POSTINGS[posting.entry_type]
+        rows.append(
+            {
+                "id": uuid.uuid4(),
+                "entry_type": posting.entry_type,
+                "attorney_id": posting.attorney_id,
+                "settlement_id": posting.settlement_id,
+                "debit_account": debit,
+                "credit_account": credit,
+                "amount_cents": posting.amount_cents,
+                "approval_id": posting.approval_id,
+                "transfer_id": posting.transfer_id,
+            }
+        )
+        # Keys as strings so the per-settlement and attorney-wide ("") rows sort together.
+        for scope in (str(posting.settlement_id), ""):
+            for account, sign in ((debit, 1), (credit, -1)):
+                key = (str(posting.attorney_id), scope, account)
+                deltas[key] = deltas.get(key, 0) + sign * posting.amount_cents
+    if not rows:
+        return 0
+    db.execute(insert(LedgerEntry), rows)
+
+    balances = [
+        {
+            "id": uuid.uuid4(),
+            "attorney_id": UUID(attorney_id),
+            "settlement_id": UUID(scope) if scope else None,
+            "account": account,
+            "balance_cents": delta,
+        }
+        for (attorney_id, scope, account), delta in sorted(deltas.items())
+        if delta
+    ]
+    if balances:
+        table = LedgerBalance.__table__
+        stmt = pg_insert(table).values(balances)
+        db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_ledger_balance",
+                set_={
+                    "balance_cents": table.c.balance_cents + stmt.excluded.balance_cents,
+                    "updated_at": func.now(),
+                },
+            )
+        )
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Approval holds
+# ---------------------------------------------------------------------------
+
+
+def current_holds(db: Session, approval_ids: Iterable[UUID]) -> dict[UUID, Posting]:
+    """What each approval currently holds, as (attorney, settlement, amount).
+
+    Approvals without a hold are absent.  One indexed query for any number
+    of approvals (the ids are bound as a single array).
+    """
+    ids = list(dict.fromkeys(approval_ids))
+    if not ids:
+        return {}
+    held = func.sum(
+        case((LedgerEntry.debit_account == HELD, LedgerEntry.amount_cents), else_=0)
+        - case((LedgerEntry.credit_account == HELD, LedgerEntry.amount_cents), else_=0)
+    )
+    rows = db.execute(
+        select(LedgerEntry.approval_id, LedgerEntry.attorney_id, LedgerEntry.settlement_id, held)
+        .where(
+            LedgerEntry.approval_id
+            == any_(bindparam("approval_ids", ids, type_=ARRAY(PG_UUID(as_uuid=True))))
+        )
+        .group_by(LedgerEntry.approval_id, LedgerEntry.attorney_id, LedgerEntry.settlement_id)
+        .having(held != 0)
+    )
+    return {
+        approval_id: Posting("approval_hold", attorney_id, settlement_id, int(amount), approval_id)
+        for approval_id, attorney_id, settlement_id, amount in rows
+    }
+
+
+def release_holds(db: Session, approval_ids: Iterable[UUID], entry_type: str = "hold_release") -> int:
+    """Return whatever the approvals hold to the fund.  Returns entries written."""
+    return post_entries(
+        db,
+        (
+            Posting(entry_type, hold.attorney_id, hold.settlement_id, hold.amount_cents, hold.approval_id)
+            for hold in current_holds(db, approval_ids).values()
+        ),
+    )
+
+
+def hold_approvals(db: Session, holds: Iterable[tuple[UUID, UUID, UUID, int]]) -> int:
+    """(Re)place the hold of each (approval_id, attorney_id, settlement_id, amount_cents).
+
+    An approval's previous hold is released first, so approving twice holds
+    the new amount once.
+    """
+    holds = list(holds)
+    previous = current_holds(db, (approval_id for approval_id, *_rest in holds))
+    return post_entries(
+        db,
+        [
+            Posting("hold_release", old.attorney_id, old.settlement_id, old.amount_cents, old.approval_id)
+            for old in previous.values()
+        ]
+        + [
+            Posting("approval_hold", attorney_id, settlement_id, amount, approval_id)
+            for approval_id, attorney_id, settlement_id, amount in holds
+        ],
+    )
+
+
+def settle_transfers(
+    db: Session,
+    attorney_id: UUID,
+    settlement_id: UUID,
+    transfers: Iterable[tuple[UUID, UUID, int, bool]],
+) -> int:
+    """Post the outcome of each (approval_id, transfer_id, amount_cents, completed).
+
+    Completed transfers move their amount from held to disbursed; when the
+    hold differs from the transfer amount it is first trued up to it.
+    Failed transfers release the hold.  attorney_id / settlement_id (the
+    batch's) are used for transfers whose approval holds nothing.
+    """
+    transfers = list(transfers)
+    holds = current_holds(db, (approval_id for approval_id, *_rest in transfers))
+    postings = []
+    for approval_id, transfer_id, amount, completed in transfers:
+        hold = holds.get(approval_id)
+        owner = (hold.attorney_id, hold.settlement_id) if hold else (attorney_id, settlement_id)
+        held = hold.amount_cents if hold else 0
+        if not completed:
+            postings.append(Posting("failure_release", *owner, held, approval_id, transfer_id))
+            continue
+        if held > amount:
+            postings.append(Posting("hold_release", *owner, held - amount, approval_id, transfer_id))
+        elif held < amount:
+            postings.append(Posting("approval_hold", *owner, amount - held, approval_id, transfer_id))
+        postings.append(Posting("disbursement", *owner, amount, approval_id, transfer_id))
+    return post_entries(db, postings)
+
+
+# ---------------------------------------------------------------------------
+# Balance reads
+# ---------------------------------------------------------------------------
+
+
+def get_balances(db: Session, attorney_id: UUID, settlement_id: UUID | None = None) -> dict[str, int]:
+    """{account: balance_cents} for one settlement, or attorney-wide when settlement_id is None."""
+    scope = (
+        LedgerBalance.settlement_id.is_(None)
+        if settlement_id is None
+        else LedgerBalance.settlement_id == settlement_id
+    )
+    balances = dict.fromkeys(ACCOUNTS, 0)
+    for account, balance in db.execute(
+        select(LedgerBalance.account, LedgerBalance.balance_cents).where(
+            LedgerBalance.attorney_id == attorney_id, scope
+        )
+    ):
+        balances[account] = int(balance)
+    return balances
+
+
+def settlement_balances(db: Session, attorney_id: UUID) -> dict[UUID, dict[str, int]]:
+    """{settlement_id: {account: balance_cents}} for every settlement the attorney has postings in."""
+    balances: dict[UUID, dict[str, int]] = {}
+    for settlement_id, account, balance in db.execute(
+        select(LedgerBalance.settlement_id, LedgerBalance.account, LedgerBalance.balance_cents)
+        .where(LedgerBalance.attorney_id == attorney_id, LedgerBalance.settlement_id.is_not(None))
+        .order_by(LedgerBalance.settlement_id)
+    ):
+        balances.setdefault(settlement_id, dict.fromkeys(ACCOUNTS, 0))[account] = int(balance)
+    return balances
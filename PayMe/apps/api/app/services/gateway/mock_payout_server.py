@@ -0,0 +1,246 @@
+"""Local HTTP payout API for development, tests and the provider benchmark.
+
+Speaks the protocol HttpPayoutProvider expects:
+
+- ``POST /transfers`` with an ``Idempotency-Key`` header answers 202
+  ``{"id", "status": "pending"}``.  Repeating a key returns the original
+  transfer (200) without creating or settling it again.
+- Each new transfer settles ``settle_delay`` seconds later with the same
+  deterministic outcome as the in-process mock (payout_service), and a
+  signed status callback ``{"id", "idempotency_key", "reference", "status",
+  "failure_reason"}`` is POSTed to the request's ``callback_url``.  Transfers
+  sent without one keep their callback in ``pending_callbacks`` for the
+  caller to deliver.
+- ``GET /transfers/{idempotency_key}`` returns the transfer (its status is
+  'pending' until it settles), or 404 for an unknown key.
+- ``latency`` delays every response; ``transient_failures`` answers the first
+  N requests with 503; ``rate_limit`` (requests per second) answers requests
+  over the limit with 429 and a Retry-After header.
+
+Run standalone with ``python -m app.services.gateway.mock_payout_server``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.parse import unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.gateway.payout_provider import SIGNATURE_HEADER, mock_transfer_succeeds, sign_callback
+
+
+class MockPayoutServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        settle_delay: float = 0.0,
+        transient_failures: int = 0,
+        rate_limit: float = 0.0,
+        webhook_secret: str | None = None,
+        callback_workers: int = 4,
+    ) -> None:
+        self.latency = latency
+        self.settle_delay = settle_delay
+        self.transient_failures = transient_failures
+        self.rate_limit = rate_limit
+        self.webhook_secret = webhook_secret
+        self.requests = 0
+        self.created = 0
+        self.replayed = 0
+        self.rate_limited = 0
+        self.max_in_flight = 0
+        self.callbacks_sent = 0
+        self.callback_errors = 0
+        self.pending_callbacks: list[tuple[bytes, dict[str, str]]] = []
+        self.transfers: dict[str, dict] = {}  # idempotency key -> transfer
+        self._in_flight = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        self._settle: queue.Queue = queue.Queue()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._deliver_callbacks, daemon=True) for _ in range(callback_workers)
+        ]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> MockPayoutServer:
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for _ in self._threads[1:]:
+            self._settle.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait_for_callbacks(self, count: int, timeout: float = 10.0) -> bool:
+        """Block until ``count`` callbacks were delivered or kept (False on timeout)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.callbacks_sent + self.callback_errors + len(self.pending_callbacks) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    # -- request handling ---------------------------------------------------
+
+    def _throttled(self) -> bool:
+        """Fixed one-second window limiter; caller holds the lock."""
+        if self.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        return self._window_count > self.rate_limit
+
+    def _create(self, key: str, body: dict) -> tuple[int, dict, dict[str, str]]:
+        with self._lock:
+            self.requests += 1
+            if self.transient_failures > 0:
+                self.transient_failures -= 1
+                return 503, {"error": "temporarily_unavailable"}, {}
+            if self._throttled():
+                self.rate_limited += 1
+                return 429, {"error": "rate_limited"}, {"Retry-After": "1"}
+            existing = self.transfers.get(key)
+            if existing is not None:
+                self.replayed += 1
+                return 200, existing, {}
+            transfer = {"id": f"mptr_{uuid.uuid4().hex}", "status": "pending", "failure_reason": None}
+            self.transfers[key] = transfer
+            self.created += 1
+        self._settle.put((time.monotonic() + self.settle_delay, key, body))
+        return 202, transfer, {}
+
+    def _deliver_callbacks(self) -> None:
+        while True:
+            item = self._settle.get()
+            if item is None:
+                return
+            due, key, body = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            succeeded = mock_transfer_succeeds(key)
+            with self._lock:
+                transfer = self.transfers[key]
+                transfer["status"] = "completed" if succeeded else "failed"
+                transfer["failure_reason"] = None if succeeded else "mock_bank_decline"
+                payload = json.dumps(
+                    {**transfer, "idempotency_key": key, "reference": body.get("reference")}
+                ).encode()
+            headers = {
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign_callback(payload, self.webhook_secret),
+            }
+            callback_url = body.get("callback_url")
+            if not callback_url:
+                with self._lock:
+                    self.pending_callbacks.append((payload, headers))
+                continue
+            try:
+                request = urllib.request.Request(callback_url, data=payload, headers=headers, method="POST")
+                with urllib.request.urlopen(request, timeout=10):
+                    pass
+            except OSError:
+                with self._lock:
+                    self.callback_errors += 1
+            else:
+                with self._lock:
+                    self.callbacks_sent += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                prefix = "/transfers/"
+                if not self.path.startswith(prefix) or len(self.path) == len(prefix):
+                    self._reply(404, {"error": "not_found"})
+                    return
+                with server._lock:
+                    server.requests += 1
+                    transfer = server.transfers.get(unquote(self.path[len(prefix) :]))
+                    payload = dict(transfer) if transfer is not None else None
+                if payload is None:
+                    self._reply(404, {"error": "transfer_not_found"})
+                else:
+                    self._reply(200, payload)
+
+            def do_POST(self) -> None:  # noqa: N802
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path != "/transfers":
+                    self._reply(404, {"error": "not_found"})
+                    return
+                key = self.headers.get("Idempotency-Key")
+                if not key:
+                    self._reply(400, {"error": "idempotency_key_required"})
+                    return
+                with server._lock:
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    status, payload, headers = server._create(key, json.loads(body or b"{}"))
+                    self._reply(status, payload, headers)
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _reply(self, status: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local mock payout API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--settle-delay", type=float, default=1.0, help="seconds until the status callback")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second before 429s")
+    args = parser.parse_args()
+    with MockPayoutServer(
+        args.host, args.port, latency=args.latency, settle_delay=args.settle_delay, rate_limit=args.rate_limit
+    ) as server:
+        print(f"mock payout API listening on {server.base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
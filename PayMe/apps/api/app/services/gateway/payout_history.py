@@ -0,0 +1,193 @@
+"""Attorney payout history: keyset-paginated pages and streaming exports.
+
+Transfers are listed newest first, ordered by (created_at, id) descending.
+A page ends with an opaque ``next_cursor`` holding the last row's sort key,
+and the next page starts strictly after it (``(created_at, id) < cursor``).
+Each page costs the same whatever its depth, and rows inserted meanwhile
+never shift or repeat a page the way OFFSET does.
+
+Filters (all optional, combinable): transfer status (one or several),
+settlement, and a created_at range ``since <= created_at < until``.
+
+``iter_payout_history`` walks the same query through a server-side cursor
+in ``chunk_size`` partitions, and ``csv_chunks`` / ``ndjson_chunks`` encode
+its rows for a ``StreamingResponse``, so an export of hundreds of thousands
+of transfers holds one partition in memory at a time.
+"""
+
+from __future__ import annotations
+
+import base64
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.streaming import FLUSH_BYTES, ndjson_chunks
+from app.models.entities import AttorneyAccount, PayoutBatch, PayoutTransfer, Settlement, User
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+HISTORY_FIELDS = (
+    "transfer_id",
+    "batch_id",
+    "user_id",
+    "email",
+    "first_name",
+    "last_name",
+    "settlement_id",
+    "settlement_title",
+    "amount_cents",
+    "status",
+    "provider_transfer_id",
+    "failure_reason",
+    "created_at",
+    "initiated_at",
+    "completed_at",
+)
+
+
+def encode_cursor(created_at: datetime, transfer_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(transfer_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, transfer_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(transfer_id)
+    except (TypeError, ValueError) as exc:  # binascii.Error and JSONDecodeError are ValueErrors
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from exc
+
+
+def _history_query(
+    attorney: AttorneyAccount,
+    status: Sequence[str] | None = None,
+    settlement_id: UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Select:
+    stmt = (
+        select(
+            PayoutTransfer.id.label("transfer_id"),
+            PayoutTransfer.batch_id,
+            PayoutTransfer.user_id,
+            User.email,
+            User.first_name,
+            User.last_name,
+            PayoutBatch.settlement_id,
+            Settlement.title.label("settlement_title"),
+            PayoutTransfer.amount_cents,
+            PayoutTransfer.status,
+            PayoutTransfer.provider_transfer_id,
+            PayoutTransfer.failure_reason,
+            PayoutTransfer.created_at,
+            PayoutTransfer.initiated_at,
+            PayoutTransfer.completed_at,
+        )
+        .join(PayoutBatch, PayoutBatch.id == PayoutTransfer.batch_id)
+        .join(User, User.id == PayoutTransfer.user_id)
+        .join(Settlement, Settlement.id == PayoutBatch.settlement_id)
+        .where(PayoutBatch.attorney_id == attorney.id)
+        .order_by(PayoutTransfer.created_at.desc(), PayoutTransfer.id.desc())
+    )
+    if status:
+        stmt = stmt.where(PayoutTransfer.status.in_(status))
+    if settlement_id is not None:
+        stmt = stmt.where(PayoutBatch.settlement_id == settlement_id)
+    if since is not None:
+        stmt = stmt.where(PayoutTransfer.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(PayoutTransfer.created_at < until)
+    return stmt
+
+
+def _row_dict(row) -> dict:
+    item = dict(row._mapping)
+    for key in ("transfer_id", "batch_id", "user_id", "settlement_id"):
+        item[key] = str(item[key])
+    for key in ("created_at", "initiated_at", "completed_at"):
+        if item[key] is not None:
+            item[key] = item[key].isoformat()
+    return item
+
+
+def list_payout_history(
+    db: Session,
+    attorney: AttorneyAccount,
+    *,
+    status: Sequence[str] | None = None,
+    settlement_id: UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """Return one page of this attorney's payout transfers, newest first.
+
+    Returns {"items": [...], "next_cursor": str | None}; pass next_cursor
+    back to get the following page.  Raises ValueError for a bad cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = _history_query(attorney, status, settlement_id, since, until)
+    if cursor:
+        after = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(PayoutTransfer.created_at, PayoutTransfer.id) < after)
+    # One extra row tells whether another page exists.
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].transfer_id)
+    return {"items": [_row_dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+def iter_payout_history(
+    db: Session,
+    attorney: AttorneyAccount,
+    *,
+    status: Sequence[str] | None = None,
+    settlement_id: UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[dict]:
+    """Yield every matching transfer (page order) through a server-side cursor."""
+    stmt = _history_query(attorney, status, settlement_id, since, until)
+    for partition in db.execute(stmt.execution_options(yield_per=chunk_size)).partitions():
+        for row in partition:
+            yield _row_dict(row)
+
+
+def csv_chunks(rows: Iterable[dict], flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """Encode history rows as CSV (header first), yielding roughly flush_bytes at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=HISTORY_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= flush_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_chunks(rows: Iterable[dict], fmt: str) -> Iterator[bytes]:
+    """Encode history rows as ``csv`` or ``ndjson``."""
+    if fmt == "csv":
+        return csv_chunks(rows)
+    if fmt == "ndjson":
+        return ndjson_chunks(rows)
+    raise ValueError(f"Unsupported export format: {fmt}")
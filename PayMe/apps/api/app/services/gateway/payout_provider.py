@@ -0,0 +1,331 @@
+"""Pluggable async payout providers and the concurrent dispatcher that drives them.
+
+``settings.payout_provider`` selects how process_payout_batch pays transfers:
+
+- ``mock`` (default): the in-process deterministic simulation in
+  payout_service; no network calls.
+- ``http``: ``HttpPayoutProvider`` POSTs each transfer to
+  ``settings.payout_provider_base_url`` (the bank/payout API, or the local
+  ``mock_payout_server`` for development and benchmarks).
+
+Dispatch (``dispatch_transfers``):
+- Up to ``payout_provider_concurrency`` requests are in flight at once over a
+  shared keep-alive connection pool.
+- A token bucket caps request starts at ``payout_provider_rate_per_second``
+  (bursts of up to ``payout_provider_burst``), so a chunk of thousands of
+  transfers never trips the provider's own rate limit.
+- Every attempt carries the transfer's idempotency key as the
+  ``Idempotency-Key`` header.  Timeouts, connection errors, 429 and 5xx are
+  retried with exponential backoff (honouring Retry-After); the key makes a
+  retry of a request the provider already accepted return the original
+  transfer instead of paying twice.
+- Transfers still failing after ``payout_provider_max_retries`` come back
+  with status ``error`` and are left pending for the next run.
+
+Providers answer ``completed`` / ``failed`` for transfers settled inline, or
+``processing`` for accepted transfers whose outcome arrives later as a signed
+status callback (``POST /gateway/payouts/callbacks``, see
+payout_service.apply_provider_callback).  ``query_transfers`` looks accepted
+transfers up by idempotency key (``GET /transfers/{key}``), so
+process_payout_batch can settle the ones whose callback never arrived.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import random
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, replace
+from typing import Protocol
+from urllib.parse import quote
+from uuid import UUID
+
+from app.core.settings import settings
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional: pip install -e ".[payouts]"
+    httpx = None  # type: ignore[assignment]
+
+SIGNATURE_HEADER = "X-Payout-Signature"
+
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+_BACKOFF_BASE_SECONDS = 0.2
+_BACKOFF_MAX_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class TransferRequest:
+    transfer_id: UUID
+    idempotency_key: str
+    amount_cents: int
+
+
+@dataclass(frozen=True)
+class TransferResult:
+    transfer_id: UUID
+    # completed | failed | processing (awaiting callback) | error (retries exhausted)
+    # | missing (status query only: the provider has no transfer for the key)
+    status: str
+    provider_transfer_id: str | None = None
+    failure_reason: str | None = None
+    attempts: int = 1
+
+
+class ProviderRetryableError(Exception):
+    """A transient provider failure; the same request may be retried."""
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PayoutProvider(Protocol):
+    async def submit(self, request: TransferRequest) -> TransferResult:
+        """Send one transfer; raise ProviderRetryableError for transient failures."""
+        ...
+
+    async def status(self, request: TransferRequest) -> TransferResult:
+        """Look up a submitted transfer by its idempotency key."""
+        ...
+
+    async def aclose(self) -> None: ...
+
+
+# ---------------------------------------------------------------------------
+# Mock outcomes
+# ---------------------------------------------------------------------------
+
+
+def mock_transfer_succeeds(idempotency_key: str) -> bool:
+    """
+    Deterministically decide whether a mock transfer should succeed.
+
+    Shared by the in-process mock (payout_service) and mock_payout_server so
+    both settle a key the same way.  Uses the last byte of the SHA-256 hash
+    of the key: values >= 230 (the top ~10% of the byte range) fail.  This
+    gives a stable ~90% success rate.
+    """
+    digest = hashlib.sha256(idempotency_key.encode()).digest()
+    return digest[-1] < 230  # 230/256 ≈ 89.8%
+
+
+# ---------------------------------------------------------------------------
+# Callback signatures
+# ---------------------------------------------------------------------------
+
+
+def sign_callback(body: bytes, secret: str | None = None) -> str:
+    secret = settings.payout_provider_webhook_secret if secret is None else secret
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_callback_signature(body: bytes, signature: str | None) -> bool:
+    return signature is not None and hmac.compare_digest(sign_callback(body), signature)
+
+
+# ---------------------------------------------------------------------------
+# HTTP provider
+# ---------------------------------------------------------------------------
+
+
+def _retry_after(response) -> float:
+    value = response.headers.get("Retry-After", "")
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return 0.0
+
+
+class HttpPayoutProvider:
+    """Payout API client: ``POST {base_url}/transfers`` with an Idempotency-Key header.
+
+    Response bodies carry ``id`` (provider transfer id), ``status``
+    (pending | processing | completed | failed) and ``failure_reason``.
+    Non-retryable 4xx answers fail the transfer.  ``GET
+    {base_url}/transfers/{idempotency_key}`` returns the same body for a
+    submitted transfer, or 404.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        callback_url: str | None = None,
+        timeout: float | None = None,
+        max_connections: int | None = None,
+    ) -> None:
+        if httpx is None:
+            raise RuntimeError('HttpPayoutProvider requires httpx: pip install -e ".[payouts]"')
+        connections = max_connections or settings.payout_provider_concurrency
+        api_key = api_key or settings.payout_provider_api_key
+        self.callback_url = settings.payout_provider_callback_url if callback_url is None else callback_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url or settings.payout_provider_base_url,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=timeout or settings.payout_provider_timeout_seconds,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+
+    async def submit(self, request: TransferRequest) -> TransferResult:
+        body = {"reference": str(request.transfer_id), "amount_cents": request.amount_cents}
+        if self.callback_url:
+            body["callback_url"] = self.callback_url
+        try:
+            response = await self._client.post(
+                "/transfers", json=body, headers={"Idempotency-Key": request.idempotency_key}
+            )
+        except httpx.TransportError as exc:
+            # Timeouts and dropped connections may hide an accepted request; the
+            # idempotency key makes the retry safe.
+            raise ProviderRetryableError(f"{type(exc).__name__}: {exc}") from exc
+        return self._result(request, response)
+
+    async def status(self, request: TransferRequest) -> TransferResult:
+        try:
+            key = quote(request.idempotency_key, safe="")
+            response = await self._client.get(f"/transfers/{key}")
+        except httpx.TransportError as exc:
+            raise ProviderRetryableError(f"{type(exc).__name__}: {exc}") from exc
+        if response.status_code == 404:
+            return TransferResult(request.transfer_id, "missing")
+        return self._result(request, response)
+
+    @staticmethod
+    def _result(request: TransferRequest, response) -> TransferResult:
+        if response.status_code in _RETRYABLE_STATUSES:
+            raise ProviderRetryableError(f"HTTP {response.status_code}", _retry_after(response))
+        if response.status_code >= 400:
+            reason = f"provider_rejected_{response.status_code}"
+            return TransferResult(request.transfer_id, "failed", failure_reason=reason)
+        data = response.json()
+        status = data.get("status")
+        if status in ("pending", "processing"):
+            status = "processing"
+        elif status not in ("completed", "failed"):
+            raise ProviderRetryableError(f"unexpected provider status {status!r}")
+        return TransferResult(
+            request.transfer_id,
+            status,
+            provider_transfer_id=data.get("id"),
+            failure_reason=data.get("failure_reason"),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_PROVIDERS: dict[str, Callable[[], PayoutProvider]] = {
+    "http": HttpPayoutProvider,
+}
+
+
+def get_payout_provider(name: str | None = None) -> PayoutProvider:
+    """Instantiate the provider registered under name (default settings.payout_provider)."""
+    name = name or settings.payout_provider
+    factory = _PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown payout provider {name!r}; expected one of {sorted(_PROVIDERS)}")
+    return factory()
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float, burst: int | None = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = float(max(1, burst or int(rate) or 1))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in arrival order.
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def dispatch_transfers(
+    provider: PayoutProvider,
+    requests: Sequence[TransferRequest],
+    *,
+    concurrency: int | None = None,
+    rate_per_second: float | None = None,
+    burst: int | None = None,
+    max_retries: int | None = None,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    query: bool = False,
+) -> list[TransferResult]:
+    """Submit requests concurrently; results come back in request order.
+
+    ``query=True`` asks for each transfer's status instead of submitting it,
+    under the same concurrency, rate limit and retries.  ``rate_per_second``
+    <= 0 disables the token bucket.
+    """
+    concurrency = max(1, concurrency or settings.payout_provider_concurrency)
+    rate = settings.payout_provider_rate_per_second if rate_per_second is None else rate_per_second
+    max_retries = settings.payout_provider_max_retries if max_retries is None else max_retries
+    bucket = TokenBucket(rate, burst or settings.payout_provider_burst) if rate > 0 else None
+    in_flight = asyncio.Semaphore(concurrency)
+    call = provider.status if query else provider.submit
+
+    async def send(request: TransferRequest) -> TransferResult:
+        attempt = 0
+        while True:
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                async with in_flight:
+                    result = await call(request)
+                return replace(result, attempts=attempt + 1)
+            except ProviderRetryableError as exc:
+                if attempt >= max_retries:
+                    return TransferResult(
+                        request.transfer_id, "error", failure_reason=str(exc), attempts=attempt + 1
+                    )
+                backoff = min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * (2**attempt))
+                await sleep(max(exc.retry_after, backoff + random.uniform(0, backoff / 2)))
+                attempt += 1
+
+    return list(await asyncio.gather(*(send(request) for request in requests)))
+
+
+def _run_dispatch(
+    requests: Sequence[TransferRequest], provider: str | None, query: bool
+) -> list[TransferResult]:
+    async def run() -> list[TransferResult]:
+        client = get_payout_provider(provider)
+        try:
+            return await dispatch_transfers(client, requests, query=query)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def submit_transfers(requests: Sequence[TransferRequest], provider: str | None = None) -> list[TransferResult]:
+    """Dispatch requests with a fresh provider from synchronous code (payout_service)."""
+    return _run_dispatch(requests, provider, query=False)
+
+
+def query_transfers(
+    requests: Sequence[TransferRequest], provider: str | None = None
+) -> list[TransferResult]:
+    """Look up submitted transfers with a fresh provider from synchronous code (payout_service)."""
+    return _run_dispatch(requests, provider, query=True)
@@ -6,16 +6,36 @@ returns the existing record rather than creating a duplicate.
 Mock execution simulates a 90% success / 10% failure rate using a
 deterministic hash of each transfer's idempotency_key so results are
 reproducible across repeated test runs.
+
+Batch processing is set-based: each chunk of transfers is decided in memory
+and written with one ``UPDATE ... FROM unnest(...)`` per table, then
+committed, so large batches take a handful of round trips per chunk and an
+interrupted run resumes from the transfers still pending.
+
+With ``settings.payout_provider = "http"`` each chunk is sent to the payout
+API through payout_provider (concurrent, rate limited, retried with the
+transfer's idempotency key).  The chunk is leased (``dispatched_at``) and
+committed first, so no row lock or transaction is held while requests are in
+flight.  Transfers the provider accepts stay 'processing' until its status
+callback is applied by ``apply_provider_callback``; the batch is finalized
+when the last one lands.  A callback that never arrives is made up for on
+the next run, which looks up transfers processing for longer than
+``payout_provider_status_poll_seconds`` (``_reconcile_processing``).
 """
 
-import hashlib
+import logging
 import uuid
-from datetime import datetime, timezone
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import Row, String, Text, any_, bindparam, column, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
+from app.core.settings import settings
 from app.models.entities import (
     AttorneyAccount,
     ClaimApproval,
@@ -23,10 +43,18 @@ from app.models.entities import (
     PayoutTransfer,
     Settlement,
     SettlementAccount,
-    User,
     UserSettlementPreference,
 )
-from app.services.events.service import emit_event
+from app.services.events.service import emit_event, emit_events
+from app.services.gateway.ledger import get_balances, hold_approvals, settle_transfers, settlement_balances
+from app.services.gateway.payout_provider import (
+    TransferRequest,
+    mock_transfer_succeeds,
+    query_transfers,
+    submit_transfers,
+)
+
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -34,6 +62,26 @@ from app.services.events.service import emit_event
 # ---------------------------------------------------------------------------
 
 
+def _insert_transfers(
+    db: Session, batch_id: UUID, approvals: list[tuple[UUID, UUID, int]]
+) -> None:
+    """Bulk-insert one pending transfer per (approval_id, user_id, amount_cents)."""
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "batch_id": batch_id,
+            "approval_id": approval_id,
+            "user_id": user_id,
+            "amount_cents": amount,
+            "status": "pending",
+            "idempotency_key": f"transfer:{batch_id}:{approval_id}",
+        }
+        for approval_id, user_id, amount in approvals
+    ]
+    if rows:
+        db.execute(insert(PayoutTransfer), rows)
+
+
 def create_payout_batch(
     db: Session,
     attorney: AttorneyAccount,
@@ -87,27 +135,18 @@ def create_payout_batch(
     db.add(batch)
     db.flush()  # populate batch.id before creating transfers
 
-    transfers = []
-    total_cents = 0
-    for approval in approvals:
-        amount = (
+    transfers = [
+        (
+            approval.id,
+            approval.user_id,
             approval.approved_amount_cents
             if approval.approved_amount_cents is not None
-            else fallback_amount
-        )
-        transfer_idem_key = f"transfer:{batch.id}:{approval.id}"
-        transfer = PayoutTransfer(
-            id=uuid.uuid4(),
-            batch_id=batch.id,
-            approval_id=approval.id,
-            user_id=approval.user_id,
-            amount_cents=amount,
-            status="pending",
-            idempotency_key=transfer_idem_key,
+            else fallback_amount,
         )
-        db.add(transfer)
-        transfers.append(transfer)
-        total_cents += amount
+        for approval in approvals
+    ]
+    _insert_transfers(db, batch.id, transfers)
+    total_cents = sum(amount for _aid, _uid, amount in transfers)
 
     batch.total_transfers = len(transfers)
     batch.total_amount_cents = total_cents
@@ -132,119 +171,388 @@ def create_payout_batch(
 # ---------------------------------------------------------------------------
 
 
-def _mock_transfer_succeeds(idempotency_key: str) -> bool:
-    """
-    Deterministically decide whether a transfer should succeed.
+def _decide_transfer(transfer_id: UUID, idempotency_key: str) -> tuple[str, str | None, str | None]:
+    """Return (status, provider_transfer_id, failure_reason) for one mock transfer."""
+    if mock_transfer_succeeds(idempotency_key):
+        return "completed", f"mock-{transfer_id}", None
+    return "failed", None, "mock_bank_decline"
+
+
+def _values(name: str, columns: list, rows: list[tuple]):
+    """A named row set for ``UPDATE ... FROM``, bound as one array per column.
 
-    Uses the last byte of the SHA-256 hash of the key: if it is >= 26
-    (i.e. the key falls in the top ~10% of the byte range) the transfer
-    fails; otherwise it succeeds.  This gives a stable ~90% success rate.
+    ``unnest(:ids, :statuses, ...) AS name(id, status, ...)`` keeps the SQL
+    text independent of the row count, so the statement compiles once and
+    sends len(columns) parameters instead of one per cell (a multi-row
+    VALUES list of a 1000-transfer chunk spends longer compiling than
+    executing).
     """
-    digest = hashlib.sha256(idempotency_key.encode()).digest()
-    return digest[-1] < 230  # 230/256 ≈ 89.8%
+    arrays = [
+        bindparam(f"{name}_{col.name}", [row[i] for row in rows], type_=ARRAY(col.type))
+        for i, col in enumerate(columns)
+    ]
+    return func.unnest(*arrays).table_valued(*columns).render_derived(name=name)
 
 
-def process_payout_batch(db: Session, batch_id: UUID) -> PayoutBatch:
+def _apply_transfer_outcomes(
+    db: Session,
+    batch: PayoutBatch,
+    outcomes: list[tuple[Row, str, str | None, str | None]],
+    now: datetime,
+) -> None:
+    """Write one chunk of decided transfers with a bulk UPDATE per table.
+
+    ``outcomes`` holds (transfer row, status, provider_transfer_id,
+    failure_reason).  Batch counters and the chunk's ledger entries are
+    written in the same transaction, so a committed chunk is never counted
+    twice.
     """
-    Execute all pending transfers in the batch (mock — no real bank API).
+    transfer_values = _values(
+        "outcome",
+        [
+            column("id", PG_UUID(as_uuid=True)),
+            column("status", String),
+            column("provider_transfer_id", String),
+            column("failure_reason", Text),
+        ],
+        [(row.id, status, ref, reason) for row, status, ref, reason in outcomes],
+    )
+    db.execute(
+        update(PayoutTransfer)
+        .where(PayoutTransfer.id == transfer_values.c.id)
+        .values(
+            status=transfer_values.c.status,
+            provider_transfer_id=transfer_values.c.provider_transfer_id,
+            failure_reason=transfer_values.c.failure_reason,
+            initiated_at=func.coalesce(PayoutTransfer.initiated_at, now),
+            completed_at=now,
+            dispatched_at=None,
+        )
+    )
 
-    For each pending transfer:
-      - Sets status='processing', initiated_at=now()
-      - Simulates success or failure deterministically
-      - On success: status='completed', provider_transfer_id=mock ref
-      - On failure: status='failed', failure_reason='mock_bank_decline'
-      - Updates the linked ClaimApproval accordingly
+    # Approvals follow their transfer: completed -> paid, failed -> failed.
+    approval_values = _values(
+        "outcome",
+        [column("id", PG_UUID(as_uuid=True)), column("status", String)],
+        [
+            (row.approval_id, "paid" if status == "completed" else "failed")
+            for row, status, _ref, _reason in outcomes
+        ],
+    )
+    db.execute(
+        update(ClaimApproval)
+        .where(ClaimApproval.id == approval_values.c.id)
+        .values(status=approval_values.c.status)
+    )
 
-    Updates batch counters and sets a terminal status:
-      - 'completed'  — all transfers succeeded
-      - 'partial'    — mixed results
-      - 'failed'     — all transfers failed (or no transfers)
+    # Ledger: completed transfers are disbursed from the hold, failed ones release it.
+    settle_transfers(
+        db,
+        batch.attorney_id,
+        batch.settlement_id,
+        [
+            (row.approval_id, row.id, row.amount_cents, status == "completed")
+            for row, status, _ref, _reason in outcomes
+        ],
+    )
 
-    Emits payout_transfer_completed / payout_transfer_failed per transfer,
-    then payout_batch_completed.
-    """
-    batch = db.get(PayoutBatch, batch_id)
-    if batch is None:
-        raise ValueError(f"PayoutBatch {batch_id} not found")
+    completed = [(row, ref) for row, status, ref, _reason in outcomes if status == "completed"]
+    failed = [(row, reason) for row, status, _ref, reason in outcomes if status == "failed"]
+    if completed:
+        # Sync user-facing claim status to paid_out
+        paid_users = _values(
+            "paid", [column("user_id", PG_UUID(as_uuid=True))], [(row.user_id,) for row, _ref in completed]
+        )
+        db.execute(
+            update(UserSettlementPreference)
+            .where(
+                UserSettlementPreference.user_id == paid_users.c.user_id,
+                UserSettlementPreference.settlement_id == batch.settlement_id,
+            )
+            .values(claim_status="paid_out", claim_outcome_at=now)
+        )
 
-    pending_transfers = db.scalars(
-        select(PayoutTransfer).where(
-            PayoutTransfer.batch_id == batch_id,
-            PayoutTransfer.status == "pending",
+    db.execute(
+        update(PayoutBatch)
+        .where(PayoutBatch.id == batch.id)
+        .values(
+            successful_transfers=func.coalesce(PayoutBatch.successful_transfers, 0) + len(completed),
+            failed_transfers=func.coalesce(PayoutBatch.failed_transfers, 0) + len(failed),
         )
+    )
+
+    if completed:
+        emit_event(
+            db,
+            "payout_transfers_completed",
+            payload={
+                "batch_id": str(batch.id),
+                "count": len(completed),
+                "amount_cents": sum(row.amount_cents for row, _ref in completed),
+                "transfer_ids": [str(row.id) for row, _ref in completed],
+            },
+        )
+    if failed:
+        emit_event(
+            db,
+            "payout_transfers_failed",
+            payload={
+                "batch_id": str(batch.id),
+                "count": len(failed),
+                "failure_reasons": dict(Counter(reason for _row, reason in failed)),
+                "transfer_ids": [str(row.id) for row, _reason in failed],
+            },
+        )
+
+
+_TRANSFER_COLUMNS = (
+    PayoutTransfer.id,
+    PayoutTransfer.batch_id,
+    PayoutTransfer.approval_id,
+    PayoutTransfer.user_id,
+    PayoutTransfer.amount_cents,
+    PayoutTransfer.idempotency_key,
+    PayoutTransfer.status,
+)
+
+
+def _mark_transfers_processing(
+    db: Session, accepted: list[tuple[Row, str | None]], now: datetime
+) -> None:
+    """Record provider-accepted transfers as 'processing' until their callback arrives."""
+    accepted_values = _values(
+        "accepted",
+        [column("id", PG_UUID(as_uuid=True)), column("provider_transfer_id", String)],
+        [(row.id, ref) for row, ref in accepted],
+    )
+    db.execute(
+        update(PayoutTransfer)
+        .where(PayoutTransfer.id == accepted_values.c.id, PayoutTransfer.status == "pending")
+        .values(
+            status="processing",
+            provider_transfer_id=accepted_values.c.provider_transfer_id,
+            initiated_at=now,
+            dispatched_at=None,
+        )
+    )
+
+
+def _ids_param(name: str, ids: list[UUID]):
+    return any_(bindparam(name, ids, type_=ARRAY(PG_UUID(as_uuid=True))))
+
+
+def _lease_free(now: datetime):
+    lease_cutoff = now - timedelta(seconds=settings.payout_dispatch_lease_seconds)
+    return or_(PayoutTransfer.dispatched_at.is_(None), PayoutTransfer.dispatched_at < lease_cutoff)
+
+
+def _claimable(batch_id: UUID, now: datetime):
+    """Pending transfers of the batch that no other run holds a live lease on."""
+    return (
+        PayoutTransfer.batch_id == batch_id,
+        PayoutTransfer.status == "pending",
+        _lease_free(now),
+    )
+
+
+def _lease_pending(db: Session, batch_id: UUID, chunk_size: int) -> list[Row]:
+    """Lease the next chunk of claimable transfers; the caller commits before dispatching.
+
+    The leased rows keep status 'pending', so callbacks, reports and a run
+    that outlives the lease treat them exactly as before.
+    """
+    now = datetime.now(timezone.utc)
+    chunk = (
+        select(PayoutTransfer.id)
+        .where(*_claimable(batch_id, now))
+        .order_by(PayoutTransfer.id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    )
+    return db.execute(
+        update(PayoutTransfer)
+        .where(PayoutTransfer.id.in_(chunk.scalar_subquery()))
+        .values(dispatched_at=now)
+        .returning(*_TRANSFER_COLUMNS)
+        .execution_options(synchronize_session=False)
     ).all()
 
+
+def _send_to_provider(db: Session, batch: PayoutBatch, rows: list[Row]) -> int:
+    """Dispatch one leased chunk to the payout provider and record the answers.
+
+    Runs the requests with no transaction open, then locks the chunk's rows
+    that are still 'pending' (a callback may have settled some meanwhile)
+    and writes only those.  Returns the number of transfers the provider
+    could not be reached for; they stay 'pending' with their lease released.
+    """
+    results = submit_transfers(
+        [TransferRequest(row.id, row.idempotency_key, row.amount_cents) for row in rows]
+    )
     now = datetime.now(timezone.utc)
-    success_count = 0
-    failure_count = 0
-
-    for transfer in pending_transfers:
-        transfer.status = "processing"
-        transfer.initiated_at = now
-        db.flush()
-
-        if _mock_transfer_succeeds(transfer.idempotency_key):
-            transfer.status = "completed"
-            transfer.completed_at = now
-            transfer.provider_transfer_id = f"mock-{transfer.id}"
-            success_count += 1
-
-            # Update linked approval
-            approval = db.get(ClaimApproval, transfer.approval_id)
-            if approval is not None:
-                approval.status = "paid"
-
-            # Sync user-facing claim status to paid_out
-            pref = db.scalar(
-                select(UserSettlementPreference).where(
-                    UserSettlementPreference.user_id == transfer.user_id,
-                    UserSettlementPreference.settlement_id == batch.settlement_id,
+    still_pending = set(
+        db.scalars(
+            select(PayoutTransfer.id)
+            .where(
+                PayoutTransfer.id == _ids_param("leased_ids", [row.id for row in rows]),
+                PayoutTransfer.status == "pending",
+            )
+            .with_for_update()
+        )
+    )
+    outcomes = []
+    accepted = []
+    unreachable = []
+    for row, result in zip(rows, results, strict=True):
+        if row.id not in still_pending:
+            continue
+        if result.status in ("completed", "failed"):
+            outcomes.append((row, result.status, result.provider_transfer_id, result.failure_reason))
+        elif result.status == "processing":
+            accepted.append((row, result.provider_transfer_id))
+        else:
+            unreachable.append(row.id)
+    if outcomes:
+        _apply_transfer_outcomes(db, batch, outcomes, now)
+    if accepted:
+        _mark_transfers_processing(db, accepted, now)
+    if unreachable:
+        db.execute(
+            update(PayoutTransfer)
+            .where(PayoutTransfer.id == _ids_param("unreachable_ids", unreachable))
+            .values(dispatched_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        logger.warning(
+            "payout_provider_unreachable batch_id=%s transfers=%d error=%s",
+            batch.id,
+            len(unreachable),
+            next(r.failure_reason for r in results if r.status == "error"),
+        )
+    return len(unreachable)
+
+
+def _reconcile_processing(db: Session, batch: PayoutBatch, chunk_size: int) -> None:
+    """Settle 'processing' transfers whose status callback never arrived.
+
+    Transfers accepted more than payout_provider_status_poll_seconds ago are
+    leased and committed like a dispatch chunk, then looked up with the
+    provider's status query.  Settled ones are written like a callback; ones
+    the provider has no record of go back to 'pending' (their idempotency
+    key makes the resend safe); the rest wait for the next run.
+    """
+    while True:
+        now = datetime.now(timezone.utc)
+        poll_cutoff = now - timedelta(seconds=settings.payout_provider_status_poll_seconds)
+        stale = (
+            select(PayoutTransfer.id)
+            .where(
+                PayoutTransfer.batch_id == batch.id,
+                PayoutTransfer.status == "processing",
+                PayoutTransfer.initiated_at <= poll_cutoff,
+                _lease_free(now),
+            )
+            .order_by(PayoutTransfer.id)
+            .limit(chunk_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = db.execute(
+            update(PayoutTransfer)
+            .where(PayoutTransfer.id.in_(stale.scalar_subquery()))
+            .values(dispatched_at=now)
+            .returning(*_TRANSFER_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        if not rows:
+            return
+
+        results = query_transfers(
+            [TransferRequest(row.id, row.idempotency_key, row.amount_cents) for row in rows]
+        )
+        still_processing = set(
+            db.scalars(
+                select(PayoutTransfer.id)
+                .where(
+                    PayoutTransfer.id == _ids_param("polled_ids", [row.id for row in rows]),
+                    PayoutTransfer.status == "processing",
                 )
+                .with_for_update()
             )
-            if pref is not None:
-                pref.claim_status = "paid_out"
-                pref.claim_outcome_at = now
-
-            emit_event(
-                db,
-                "payout_transfer_completed",
-                user_id=transfer.user_id,
-                payload={
-                    "transfer_id": str(transfer.id),
-                    "batch_id": str(batch_id),
-                    "amount_cents": transfer.amount_cents,
-                    "provider_transfer_id": transfer.provider_transfer_id,
-                },
+        )
+        outcomes = []
+        missing = []
+        for row, result in zip(rows, results, strict=True):
+            if row.id not in still_processing:
+                continue
+            if result.status in ("completed", "failed"):
+                outcomes.append((row, result.status, result.provider_transfer_id, result.failure_reason))
+            elif result.status == "missing":
+                missing.append(row.id)
+        if outcomes:
+            _apply_transfer_outcomes(db, batch, outcomes, datetime.now(timezone.utc))
+        if missing:
+            db.execute(
+                update(PayoutTransfer)
+                .where(PayoutTransfer.id == _ids_param("missing_ids", missing))
+                .values(status="pending", provider_transfer_id=None, initiated_at=None)
+                .execution_options(synchronize_session=False)
             )
-        else:
-            transfer.status = "failed"
-            transfer.completed_at = now
-            transfer.failure_reason = "mock_bank_decline"
-            failure_count += 1
-
-            approval = db.get(ClaimApproval, transfer.approval_id)
-            if approval is not None:
-                approval.status = "failed"
-
-            emit_event(
-                db,
-                "payout_transfer_failed",
-                user_id=transfer.user_id,
-                payload={
-                    "transfer_id": str(transfer.id),
-                    "batch_id": str(batch_id),
-                    "failure_reason": transfer.failure_reason,
-                },
+        # Release the lease: whatever is still processing is looked up again next run.
+        db.execute(
+            update(PayoutTransfer)
+            .where(PayoutTransfer.id == _ids_param("polled_ids", [row.id for row in rows]))
+            .values(dispatched_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        unreachable = [r for r in results if r.status == "error"]
+        if unreachable:
+            logger.warning(
+                "payout_provider_unreachable batch_id=%s transfers=%d error=%s",
+                batch.id,
+                len(unreachable),
+                unreachable[0].failure_reason,
             )
+            return
+        logger.info(
+            "payout_transfers_reconciled batch_id=%s polled=%d settled=%d resubmitted=%d",
+            batch.id,
+            len(rows),
+            len(outcomes),
+            len(missing),
+        )
 
-    # Accumulate counters (handles partial re-processing or empty batches)
-    batch.successful_transfers = (batch.successful_transfers or 0) + success_count
-    batch.failed_transfers = (batch.failed_transfers or 0) + failure_count
-    batch.completed_at = now
 
+def _finalize_batch(db: Session, batch: PayoutBatch) -> None:
+    """
+    Set the batch's terminal status once no transfer is pending or processing:
+      - 'completed'  — all transfers succeeded
+      - 'partial'    — mixed results
+      - 'failed'     — all transfers failed (or no transfers)
+
+    The batch row is locked first, so of several concurrent callers (runs,
+    provider callbacks) exactly one sees the last transfer land and emits
+    payout_batch_completed.
+    """
+    db.refresh(batch, with_for_update=True)
+    if batch.status not in ("queued", "processing"):
+        return
+    unfinished = db.scalar(
+        select(PayoutTransfer.id)
+        .where(
+            PayoutTransfer.batch_id == batch.id,
+            PayoutTransfer.status.in_(("pending", "processing")),
+        )
+        .limit(1)
+    )
+    if unfinished is not None:
+        return
+
+    batch.completed_at = datetime.now(timezone.utc)
     total = batch.total_transfers or 0
-    completed = batch.successful_transfers
-    failed = batch.failed_transfers
+    completed = batch.successful_transfers or 0
+    failed = batch.failed_transfers or 0
 
     if total == 0 or failed == total:
         batch.status = "failed"
@@ -258,20 +566,171 @@ def process_payout_batch(db: Session, batch_id: UUID) -> PayoutBatch:
         db,
         "payout_batch_completed",
         payload={
-            "batch_id": str(batch_id),
+            "batch_id": str(batch.id),
             "status": batch.status,
             "successful_transfers": batch.successful_transfers,
             "failed_transfers": batch.failed_transfers,
         },
     )
+
+
+def process_payout_batch(
+    db: Session, batch_id: UUID, chunk_size: int | None = None
+) -> PayoutBatch:
+    """
+    Execute all pending transfers in the batch.
+
+    Transfers are processed ``chunk_size`` at a time (default
+    ``settings.payout_chunk_size``), and each chunk is committed:
+      - Mock provider: the chunk's pending transfers are claimed with FOR
+        UPDATE SKIP LOCKED and decided in memory (deterministic mock:
+        success -> 'completed' with a mock provider ref, failure -> 'failed'
+        with failure_reason='mock_bank_decline').
+      - HTTP provider: the chunk is leased (dispatched_at) and committed,
+        then dispatched concurrently outside any transaction; concurrent
+        runs skip leased transfers until payout_dispatch_lease_seconds
+        pass.  Accepted transfers become 'processing' and settle via
+        apply_provider_callback.  If the provider stays unreachable the run
+        stops after the chunk and those transfers remain 'pending'.
+        Before dispatching, transfers processing for longer than
+        payout_provider_status_poll_seconds are looked up with the
+        provider's status query (see _reconcile_processing), so a lost
+        callback does not hold the batch open.
+      - Transfers, their ClaimApprovals ('paid' / 'failed'), the paid
+        claimants' preferences ('paid_out') and the batch counters are written
+        with one bulk UPDATE each.
+    An interrupted run leaves the rest 'pending', so calling this again
+    resumes where it stopped.
+
+    Once no transfer is pending or processing the batch gets its terminal
+    status (see _finalize_batch).
+
+    Emits one payout_transfers_completed / payout_transfers_failed per chunk,
+    then payout_batch_completed.
+    """
+    batch = db.get(PayoutBatch, batch_id)
+    if batch is None:
+        raise ValueError(f"PayoutBatch {batch_id} not found")
+    chunk_size = chunk_size or settings.payout_chunk_size
+
+    if batch.status == "queued":
+        batch.status = "processing"
+        batch.initiated_at = datetime.now(timezone.utc)
+        db.commit()
+
+    if settings.payout_provider != "mock":
+        _reconcile_processing(db, batch, chunk_size)
+
+    while True:
+        now = datetime.now(timezone.utc)
+        if settings.payout_provider == "mock":
+            rows = db.execute(
+                select(*_TRANSFER_COLUMNS)
+                .where(*_claimable(batch_id, now))
+                .order_by(PayoutTransfer.id)
+                .limit(chunk_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                break
+            outcomes = [(row, *_decide_transfer(row.id, row.idempotency_key)) for row in rows]
+            _apply_transfer_outcomes(db, batch, outcomes, now)
+            db.commit()
+            continue
+        rows = _lease_pending(db, batch_id, chunk_size)
+        db.commit()
+        if not rows:
+            break
+        unreachable = _send_to_provider(db, batch, rows)
+        db.commit()
+        if unreachable:
+            break
+
+    # Pending rows locked by a concurrent run, or transfers awaiting a provider
+    # callback, leave the batch 'processing'; whoever settles the last one finalizes it.
+    _finalize_batch(db, batch)
     return batch
 
 
+def apply_provider_callback(
+    db: Session,
+    idempotency_key: str,
+    status: str,
+    provider_transfer_id: str | None = None,
+    failure_reason: str | None = None,
+) -> PayoutTransfer | None:
+    """Reconcile one transfer from a payout provider status callback.
+
+    Terminal statuses ('completed' / 'failed') are written exactly like a
+    processed chunk (approval, preference, batch counters, aggregated event)
+    and may finalize the batch.  Duplicate or out-of-order callbacks for a
+    transfer that already settled are ignored.  Returns None for an unknown
+    idempotency_key.
+    """
+    row = db.execute(
+        select(*_TRANSFER_COLUMNS)
+        .where(PayoutTransfer.idempotency_key == idempotency_key)
+        .with_for_update()
+    ).one_or_none()
+    if row is None:
+        return None
+    if status in ("completed", "failed") and row.status in ("pending", "processing"):
+        batch = db.get(PayoutBatch, row.batch_id)
+        outcome = (row, status, provider_transfer_id, failure_reason if status == "failed" else None)
+        _apply_transfer_outcomes(db, batch, [outcome], datetime.now(timezone.utc))
+        _finalize_batch(db, batch)
+    return db.get(PayoutTransfer, row.id)
+
+
 # ---------------------------------------------------------------------------
-# Reconciliation report
+# Execute payouts (approve + batch + process)
 # ---------------------------------------------------------------------------
 
 
+def _upsert_approvals(
+    db: Session,
+    attorney: AttorneyAccount,
+    requested: dict[tuple[UUID, UUID], int | None],
+    now: datetime,
+) -> list[Row]:
+    """Approve every (user_id, settlement_id) -> amount with INSERT ... ON CONFLICT.
+
+    Existing approvals are re-pointed at this attorney and re-approved.
+    Returns (id, user_id, settlement_id, approved_amount_cents) rows.
+    """
+    table = ClaimApproval.__table__
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "settlement_id": settlement_id,
+            "attorney_id": attorney.id,
+            "approved_amount_cents": amount_cents,
+            "status": "approved",
+            "approved_at": now,
+            "rejected_at": None,
+        }
+        for (user_id, settlement_id), amount_cents in requested.items()
+    ]
+    if not rows:
+        return []
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_claim_approval_user_settlement",
+        set_={
+            "attorney_id": stmt.excluded.attorney_id,
+            "approved_amount_cents": stmt.excluded.approved_amount_cents,
+            "status": stmt.excluded.status,
+            "approved_at": stmt.excluded.approved_at,
+            "rejected_at": None,
+            "updated_at": func.now(),
+        },
+    ).returning(table.c.id, table.c.user_id, table.c.settlement_id, table.c.approved_amount_cents)
+    # executemany: SQLAlchemy sends the rows as multi-row pages of one
+    # cached statement and collects every page's RETURNING rows.
+    return db.execute(stmt, rows).all()
+
+
 def execute_payouts(
     db: Session,
     attorney: AttorneyAccount,
@@ -284,7 +743,19 @@ def execute_payouts(
 
     Groups by settlement, creates one PayoutBatch per settlement, processes
     each batch immediately (mock simulation).  Fully idempotent via per-batch
-    idempotency keys derived from the caller-supplied idempotency_key.
+    idempotency keys derived from the caller-supplied idempotency_key: a
+    retry returns (or resumes) the batches it already created without
+    re-approving their claimants.
+
+    Set-based throughout, so the cost is a fixed number of statements per
+    chunk of items rather than per item:
+      - active settlement accounts and existing batches are preloaded with
+        one query each;
+      - approvals are upserted with INSERT ... ON CONFLICT, their ledger
+        holds placed in one posting, batches and transfers bulk-inserted,
+        and the claimant_approved events written with one executemany.
+    Items for settlements without an active settlement account are skipped;
+    a repeated (user_id, settlement_id) item keeps its last amount.
 
     Returns {"batches": [...reconciliation dicts], "total_items": int, "total_approved": int}
     """
@@ -292,219 +763,187 @@ def execute_payouts(
         return {"batches": [], "total_items": 0, "total_approved": 0}
 
     now = datetime.now(timezone.utc)
-    approved_approvals: list[ClaimApproval] = []
-
-    # Step 1: approve every item that has an active settlement account
+    requested: dict[tuple[UUID, UUID], int | None] = {}
     for item in items:
-        user_id = UUID(str(item["user_id"]))
-        settlement_id = UUID(str(item["settlement_id"]))
-        amount_cents = item.get("amount_cents")
-
-        sa = db.scalar(
-            select(SettlementAccount).where(
-                SettlementAccount.settlement_id == settlement_id,
+        key = (UUID(str(item["user_id"])), UUID(str(item["settlement_id"])))
+        requested[key] = item.get("amount_cents")
+
+    # Step 1: preload which settlements can pay out and which batches exist.
+    funded = set(
+        db.scalars(
+            select(SettlementAccount.settlement_id).where(
+                SettlementAccount.settlement_id.in_({sid for _uid, sid in requested}),
                 SettlementAccount.status == "active",
             )
         )
-        if sa is None:
-            continue  # no bank account — skip silently
-
-        existing = db.scalar(
-            select(ClaimApproval).where(
-                ClaimApproval.user_id == user_id,
-                ClaimApproval.settlement_id == settlement_id,
-            )
-        )
-        if existing is not None:
-            existing.attorney_id = attorney.id
-            existing.approved_amount_cents = amount_cents
-            existing.status = "approved"
-            existing.approved_at = now
-            existing.rejected_at = None
-            approval = existing
-        else:
-            approval = ClaimApproval(
-                id=uuid.uuid4(),
-                user_id=user_id,
-                settlement_id=settlement_id,
-                attorney_id=attorney.id,
-                approved_amount_cents=amount_cents,
-                status="approved",
-                approved_at=now,
-            )
-            db.add(approval)
-
-        db.flush()
-        emit_event(
-            db,
-            "claimant_approved",
-            user_id=user_id,
-            payload={
-                "approval_id": str(approval.id),
-                "attorney_id": str(attorney.id),
-                "settlement_id": str(settlement_id),
-                "amount_cents": amount_cents,
-            },
-        )
-        approved_approvals.append(approval)
-
-    if not approved_approvals:
+    )
+    requested = {key: amount for key, amount in requested.items() if key[1] in funded}
+    if not requested:
         return {"batches": [], "total_items": len(items), "total_approved": 0}
 
-    # Step 2: group approvals by settlement and create+process one batch each
-    settlement_approvals: dict[UUID, list[ClaimApproval]] = {}
-    for approval in approved_approvals:
-        settlement_approvals.setdefault(approval.settlement_id, []).append(approval)
-
-    batch_results = []
-    for settlement_id, approvals in settlement_approvals.items():
-        batch_idem = f"{idempotency_key}:sid:{settlement_id}"
-
-        existing_batch = db.scalar(
-            select(PayoutBatch).where(PayoutBatch.idempotency_key == batch_idem)
+    # Settlements in first-seen item order, like the per-item loop this replaced.
+    settlement_ids = dict.fromkeys(sid for _uid, sid in requested)
+    batch_keys = {sid: f"{idempotency_key}:sid:{sid}" for sid in settlement_ids}
+    existing_batches = {
+        batch.settlement_id: batch
+        for batch in db.scalars(
+            select(PayoutBatch).where(PayoutBatch.idempotency_key.in_(batch_keys.values()))
         )
-        if existing_batch is not None:
-            batch_results.append(get_batch_reconciliation(db, existing_batch.id))
-            continue
+    }
 
-        settlement_obj = db.get(Settlement, settlement_id)
-        fallback = (settlement_obj.payout_min_cents or 0) if settlement_obj else 0
-
-        batch = PayoutBatch(
-            id=uuid.uuid4(),
-            attorney_id=attorney.id,
-            settlement_id=settlement_id,
-            status="queued",
-            idempotency_key=batch_idem,
-            total_transfers=0,
-            successful_transfers=0,
-            failed_transfers=0,
-            total_amount_cents=0,
-        )
-        db.add(batch)
-        db.flush()
-
-        total_cents = 0
-        for approval in approvals:
-            amount = (
-                approval.approved_amount_cents
-                if approval.approved_amount_cents is not None
-                else fallback
+    # Step 2: approve the claimants of settlements not batched yet.
+    approvals = _upsert_approvals(
+        db,
+        attorney,
+        {key: amount for key, amount in requested.items() if key[1] not in existing_batches},
+        now,
+    )
+    fallbacks = {
+        settlement_id: payout_min or 0
+        for settlement_id, payout_min in db.execute(
+            select(Settlement.id, Settlement.payout_min_cents).where(
+                Settlement.id.in_({row.settlement_id for row in approvals})
             )
-            db.add(
-                PayoutTransfer(
-                    id=uuid.uuid4(),
-                    batch_id=batch.id,
-                    approval_id=approval.id,
-                    user_id=approval.user_id,
-                    amount_cents=amount,
-                    status="pending",
-                    idempotency_key=f"transfer:{batch.id}:{approval.id}",
-                )
+        )
+    }
+    amounts = {
+        row.id: row.approved_amount_cents
+        if row.approved_amount_cents is not None
+        else fallbacks.get(row.settlement_id, 0)
+        for row in approvals
+    }
+    hold_approvals(db, ((row.id, attorney.id, row.settlement_id, amounts[row.id]) for row in approvals))
+    emit_events(
+        db,
+        "claimant_approved",
+        (
+            (
+                row.user_id,
+                {
+                    "approval_id": str(row.id),
+                    "attorney_id": str(attorney.id),
+                    "settlement_id": str(row.settlement_id),
+                    "amount_cents": row.approved_amount_cents,
+                },
             )
-            total_cents += amount
-
-        batch.total_transfers = len(approvals)
-        batch.total_amount_cents = total_cents
-        db.flush()
+            for row in approvals
+        ),
+    )
 
-        emit_event(
+    # Step 3: one batch per new settlement, transfers bulk-inserted.
+    settlement_approvals: dict[UUID, list[Row]] = {}
+    for row in approvals:
+        settlement_approvals.setdefault(row.settlement_id, []).append(row)
+    new_batches: dict[UUID, dict] = {}
+    for settlement_id, rows in settlement_approvals.items():
+        transfers = [(row.id, row.user_id, amounts[row.id]) for row in rows]
+        new_batches[settlement_id] = {
+            "id": uuid.uuid4(),
+            "attorney_id": attorney.id,
+            "settlement_id": settlement_id,
+            "status": "queued",
+            "idempotency_key": batch_keys[settlement_id],
+            "total_transfers": len(transfers),
+            "successful_transfers": 0,
+            "failed_transfers": 0,
+            "total_amount_cents": sum(amount for _aid, _uid, amount in transfers),
+            "_transfers": transfers,
+        }
+    if new_batches:
+        db.execute(
+            insert(PayoutBatch),
+            [{k: v for k, v in spec.items() if k != "_transfers"} for spec in new_batches.values()],
+        )
+        for spec in new_batches.values():
+            _insert_transfers(db, spec["id"], spec["_transfers"])
+        emit_events(
             db,
             "payout_batch_created",
-            payload={
-                "batch_id": str(batch.id),
-                "attorney_id": str(attorney.id),
-                "settlement_id": str(settlement_id),
-                "total_transfers": batch.total_transfers,
-                "total_amount_cents": total_cents,
-            },
+            (
+                (
+                    None,
+                    {
+                        "batch_id": str(spec["id"]),
+                        "attorney_id": str(attorney.id),
+                        "settlement_id": str(spec["settlement_id"]),
+                        "total_transfers": spec["total_transfers"],
+                        "total_amount_cents": spec["total_amount_cents"],
+                    },
+                )
+                for spec in new_batches.values()
+            ),
         )
 
-        processed = process_payout_batch(db, batch.id)
+    # Step 4: process new batches; a retried request resumes interrupted ones.
+    batch_results = []
+    for settlement_id in batch_keys:
+        existing_batch = existing_batches.get(settlement_id)
+        if existing_batch is None:
+            batch_id = new_batches[settlement_id]["id"]
+        elif existing_batch.status in ("queued", "processing"):
+            batch_id = existing_batch.id
+        else:
+            batch_results.append(get_batch_reconciliation(db, existing_batch.id))
+            continue
+        processed = process_payout_batch(db, batch_id)
         batch_results.append(get_batch_reconciliation(db, processed.id))
 
     return {
         "batches": batch_results,
         "total_items": len(items),
-        "total_approved": len(approved_approvals),
+        "total_approved": len(requested),
     }
 
 
-def list_payout_history(
-    db: Session,
-    attorney: AttorneyAccount,
-) -> list[dict]:
-    """Return all payout transfers for batches owned by this attorney."""
-    rows = (
-        db.query(PayoutTransfer, PayoutBatch, User, Settlement)
-        .join(PayoutBatch, PayoutBatch.id == PayoutTransfer.batch_id)
-        .join(User, User.id == PayoutTransfer.user_id)
-        .join(Settlement, Settlement.id == PayoutBatch.settlement_id)
-        .filter(PayoutBatch.attorney_id == attorney.id)
-        .order_by(PayoutTransfer.created_at.desc())
-        .all()
-    )
-    return [
-        {
-            "transfer_id": str(transfer.id),
-            "batch_id": str(batch.id),
-            "user_id": str(transfer.user_id),
-            "email": user.email,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "settlement_id": str(batch.settlement_id),
-            "settlement_title": settlement.title,
-            "amount_cents": transfer.amount_cents,
-            "status": transfer.status,
-            "provider_transfer_id": transfer.provider_transfer_id,
-            "failure_reason": transfer.failure_reason,
-            "initiated_at": transfer.initiated_at,
-            "completed_at": transfer.completed_at,
-        }
-        for transfer, batch, user, settlement in rows
-    ]
+# ---------------------------------------------------------------------------
+# Reconciliation report
+# ---------------------------------------------------------------------------
 
 
 def get_account_balance(db: Session, attorney: AttorneyAccount) -> dict:
-    """Return a sandbox balance summary for this attorney's settlement fund.
-
-    The sandbox starts with a fixed $100,000 balance.  Disbursed = sum of
-    completed transfers; pending = sum of approved-but-not-yet-paid amounts;
-    available = sandbox balance - disbursed.
+    """Return a sandbox balance summary for this attorney's settlement funds.
+
+    The sandbox starts with a fixed $100,000 balance.  Disbursed (completed
+    transfers) and pending (held for approved, not yet paid claimants) are
+    the attorney's running ledger balances, so the read does not scan payout
+    history; available = sandbox balance - disbursed.  ``settlements``
+    breaks the same figures down per settlement, including linked
+    settlement accounts with nothing posted yet.
     """
     SANDBOX_BALANCE_CENTS = 10_000_000  # $100,000.00
 
-    disbursed = db.scalar(
-        select(func.coalesce(func.sum(PayoutTransfer.amount_cents), 0))
-        .join(PayoutBatch, PayoutBatch.id == PayoutTransfer.batch_id)
+    totals = get_balances(db, attorney.id)
+    per_settlement = settlement_balances(db, attorney.id)
+    accounts = db.execute(
+        select(SettlementAccount.settlement_id, SettlementAccount.bank_name)
         .where(
-            PayoutBatch.attorney_id == attorney.id,
-            PayoutTransfer.status == "completed",
-        )
-    ) or 0
-
-    pending = db.scalar(
-        select(func.coalesce(func.sum(ClaimApproval.approved_amount_cents), 0))
-        .where(
-            ClaimApproval.attorney_id == attorney.id,
-            ClaimApproval.status == "approved",
-        )
-    ) or 0
-
-    sa = db.scalar(
-        select(SettlementAccount).where(
             SettlementAccount.attorney_id == attorney.id,
             SettlementAccount.status == "active",
         )
-    )
-    bank_name = sa.bank_name if sa else "Sandbox Bank"
+        .order_by(SettlementAccount.linked_at)
+    ).all()
+    bank_names = {settlement_id: bank_name for settlement_id, bank_name in accounts}
+    bank_name = next((name for _sid, name in accounts if name), None) or "Sandbox Bank"
+
+    settlements = []
+    for settlement_id in dict.fromkeys([*bank_names, *per_settlement]):
+        balances = per_settlement.get(settlement_id, {})
+        settlements.append(
+            {
+                "settlement_id": str(settlement_id),
+                "bank_name": bank_names.get(settlement_id),
+                "disbursed_cents": balances.get("disbursed", 0),
+                "pending_approval_cents": balances.get("held", 0),
+            }
+        )
 
     return {
         "bank_name": bank_name,
         "sandbox_balance_cents": SANDBOX_BALANCE_CENTS,
-        "disbursed_cents": int(disbursed),
-        "pending_approval_cents": int(pending),
-        "available_cents": SANDBOX_BALANCE_CENTS - int(disbursed),
+        "disbursed_cents": totals["disbursed"],
+        "pending_approval_cents": totals["held"],
+        "available_cents": SANDBOX_BALANCE_CENTS - totals["disbursed"],
+        "settlements": settlements,
     }
 
 
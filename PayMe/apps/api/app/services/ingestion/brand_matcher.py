@@ -0,0 +1,162 @@
+"""Compiled brand/keyword extraction shared by the Gmail ingestion paths.
+
+All extraction patterns (built-in brands, subscription and gambling keywords,
+and every ``Settlement.covered_brands`` entry) are compiled into a single
+Aho-Corasick automaton.  A message is scanned once, character by character,
+so extraction cost depends on the text length, not on the number of brands.
+
+Match semantics:
+- Built-in patterns match as substrings, exactly like the former
+  ``BRAND_MAP`` / ``any(k in text ...)`` loops ("mcdonald" matches "mcdonald's").
+- Settlement-derived brands must match whole words; short covered brands such
+  as "meta" or "delta" would otherwise fire inside unrelated words.
+- Each feature key is reported at most once per message.
+
+``get_matcher(db)`` caches the compiled automaton and rebuilds it only when
+the brand dictionary (built-ins + covered brands) changes.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import deque
+from collections.abc import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.entities import Settlement
+
+# pattern -> feature key.  Substring semantics (see module docstring).
+BUILTIN_PATTERNS: dict[str, str] = {
+    "amazon": "merchant:amazon",
+    "uber": "merchant:uber",
+    "at&t": "merchant:at&t",
+    "paramount": "merchant:paramount",
+    "walmart": "merchant:walmart",
+    "united airlines": "merchant:united_airlines",
+    "united air": "merchant:united_airlines",
+    "mcdonald": "merchant:mcdonald_s",
+    "starbucks": "merchant:starbucks",
+    "kfc": "merchant:kfc",
+    "prime": "subscription:prime",
+    "paramount+": "subscription:paramount_plus",
+    "casino": "category:gambling",
+    "sportsbook": "category:gambling",
+    "bet": "category:gambling",
+    "gambling": "category:gambling",
+}
+
+
+def _normalize_token(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+class BrandMatcher:
+    """Aho-Corasick automaton over (pattern, feature_key, whole_word) entries."""
+
+    def __init__(self, entries: Iterable[tuple[str, str, bool]]) -> None:
+        # Node 0 is the root.  _goto[n] maps a character to the child node.
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Per node: (pattern_length, feature_key, whole_word) for every pattern
+        # ending here, including those inherited through failure links.
+        self._out: list[list[tuple[int, str, bool]]] = [[]]
+        self.pattern_count = 0
+        for pattern, feature_key, whole_word in entries:
+            self._add(pattern.lower(), feature_key, whole_word)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, feature_key: str, whole_word: bool) -> None:
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), feature_key, whole_word))
+        self.pattern_count += 1
+
+    def _build_failure_links(self) -> None:
+        queue: deque[int] = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def extract(self, text: str) -> set[str]:
+        """Return the feature keys whose patterns occur in text (case-insensitive)."""
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[str] = set()
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, feature_key, whole_word in out[node]:
+                if feature_key in found:
+                    continue
+                if whole_word:
+                    start = i - length + 1
+                    if start > 0 and text[start - 1].isalnum():
+                        continue
+                    if i < last and text[i + 1].isalnum():
+                        continue
+                found.add(feature_key)
+        return found
+
+
+def build_entries(covered_brands: Iterable[str] = ()) -> list[tuple[str, str, bool]]:
+    """Combine built-in patterns with settlement covered brands.
+
+    Covered brands are stored as normalized tokens ("wells_fargo"); they are
+    matched as the spaced phrase ("wells fargo") and map to merchant:<token>.
+    """
+    entries = [(pattern, key, False) for pattern, key in BUILTIN_PATTERNS.items()]
+    builtin = set(BUILTIN_PATTERNS)
+    for brand in covered_brands:
+        token = _normalize_token(brand or "")
+        if not token:
+            continue
+        phrase = token.replace("_", " ")
+        if phrase not in builtin:
+            entries.append((phrase, f"merchant:{token}", True))
+    return sorted(set(entries))
+
+
+_cache_lock = threading.Lock()
+_cached: tuple[tuple, BrandMatcher] | None = None
+
+
+def get_matcher(db: Session | None = None) -> BrandMatcher:
+    """Return the compiled matcher for the current brand dictionary.
+
+    With a db session, every settlement's covered_brands are included.  The
+    automaton is rebuilt only when the resulting dictionary differs from the
+    one the cached matcher was compiled from.
+    """
+    global _cached
+    covered: list[str] = []
+    if db is not None:
+        for brands in db.scalars(select(Settlement.covered_brands).where(Settlement.covered_brands.is_not(None))):
+            covered.extend(brands)
+    entries = tuple(build_entries(covered))
+    with _cache_lock:
+        if _cached is None or _cached[0] != entries:
+            _cached = (entries, BrandMatcher(entries))
+        return _cached[1]
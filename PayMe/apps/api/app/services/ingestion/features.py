@@ -0,0 +1,107 @@
+"""Set-based UserFeature / GmailEvidence upserts shared by every sync path.
+
+Gmail mock/real and Plaid mock/real sync used to run one or two SELECTs per
+feature key and then mutate ORM rows.  ``upsert_features`` writes the whole
+feature dict in one ``INSERT ... ON CONFLICT`` per table instead, relying on
+``uq_user_feature_source`` (user_id, feature_key, source) and
+``uq_user_evidence`` (user_id, evidence_type, key).
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import GmailEvidence, UserFeature
+
+
+def gmail_confidence(count: int) -> float:
+    """Confidence for a Gmail-derived feature seen in `count` messages."""
+    return min(0.95, 0.7 + min(0.2, count * 0.05))
+
+
+def plaid_confidence(count: int) -> float:
+    """Confidence for a Plaid-derived feature seen in `count` transactions."""
+    return min(0.95, 0.75 + min(0.2, count * 0.04))
+
+
+def upsert_features(
+    db: Session,
+    user_id: uuid.UUID,
+    source: str,
+    features: dict[str, tuple[int, float]],
+    *,
+    value_json: dict | bool | None = None,
+    evidence_type: str | None = None,
+    now: datetime | None = None,
+) -> int:
+    """Upsert UserFeature rows (and optionally GmailEvidence rows) for a user.
+
+    features maps feature_key -> (count, confidence).  Each row's value_json is
+    ``{"count": count}`` unless a fixed value_json is given.  When
+    evidence_type is set, matching GmailEvidence rows are upserted as well.
+
+    Existing rows keep first_seen_at; count, confidence and last_seen_at are
+    overwritten.  Returns the number of feature keys written.
+    """
+    if not features:
+        return 0
+    now = now or datetime.now(UTC)
+
+    feature_rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "feature_key": key,
+            "value_json": {"count": count} if value_json is None else value_json,
+            "confidence": confidence,
+            "first_seen_at": now,
+            "last_seen_at": now,
+            "source": source,
+            "updated_at": now,
+        }
+        for key, (count, confidence) in features.items()
+    ]
+    stmt = pg_insert(UserFeature).values(feature_rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "feature_key", "source"],
+            set_={
+                "value_json": stmt.excluded.value_json,
+                "confidence": stmt.excluded.confidence,
+                "last_seen_at": stmt.excluded.last_seen_at,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    )
+
+    if evidence_type is not None:
+        evidence_rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "evidence_type": evidence_type,
+                "key": key,
+                "first_seen_at": now,
+                "last_seen_at": now,
+                "count": count,
+                "confidence": confidence,
+                "examples_json": [],
+            }
+            for key, (count, confidence) in features.items()
+        ]
+        stmt = pg_insert(GmailEvidence).values(evidence_rows)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id", "evidence_type", "key"],
+                set_={
+                    "count": stmt.excluded.count,
+                    "confidence": stmt.excluded.confidence,
+                    "last_seen_at": stmt.excluded.last_seen_at,
+                },
+            )
+        )
+    return len(features)
@@ -0,0 +1,109 @@
+"""Streaming readers for the mock Gmail / Plaid fixture files.
+
+Mock sync used to ``json.loads`` the whole fixture, which does not scale to
+load-test fixtures with millions of records.  Records are now streamed from
+disk and handed to the ingestion writer in fixed-size chunks, so memory stays
+bounded by the chunk size rather than the fixture size.
+
+Two formats are accepted:
+- NDJSON (``*.ndjson``): one JSON object per line.  Preferred for large
+  fixtures; ``scripts/provision_large_test_user.py`` writes this format.
+- A JSON array (``*.json``): the original format, decoded element by element
+  with ``JSONDecoder.raw_decode`` over a sliding read buffer.
+
+The format is sniffed from the first non-whitespace character, not the file
+extension.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+FIXTURE_ROOTS = (
+    Path("/workspace/fixtures"),
+    Path(__file__).resolve().parents[5] / "fixtures",
+)
+DEFAULT_CHUNK_SIZE = 1000
+_READ_SIZE = 64 * 1024
+_ARRAY_SEPARATORS = " \t\r\n,"
+
+
+def resolve_fixture(name: str, roots: Iterable[Path] = FIXTURE_ROOTS) -> Path:
+    """Locate fixture `name` (e.g. "gmail/sample_messages"), without extension.
+
+    Each root is checked for ``<name>.ndjson`` before ``<name>.json``.  If no
+    file exists the JSON path under the last root is returned, so callers get
+    the usual FileNotFoundError when opening it.
+    """
+    candidate = None
+    for root in roots:
+        for suffix in (".ndjson", ".json"):
+            candidate = root / f"{name}{suffix}"
+            if candidate.exists():
+                return candidate
+    assert candidate is not None
+    return candidate
+
+
+def iter_records(path: Path, read_size: int = _READ_SIZE) -> Iterator[dict]:
+    """Yield fixture records one at a time from an NDJSON file or a JSON array."""
+    with path.open(encoding="utf-8") as fh:
+        head = fh.read(read_size)
+        stripped = head.lstrip()
+        if stripped.startswith("["):
+            yield from _iter_json_array(fh, stripped[1:], read_size)
+            return
+        fh.seek(0)
+        for line_no, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path}:{line_no}: invalid NDJSON record: {exc.msg}") from exc
+
+
+def iter_chunks(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[dict]]:
+    """Yield fixture records in lists of at most chunk_size."""
+    chunk: list[dict] = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_json_array(fh: TextIO, buf: str, read_size: int) -> Iterator[dict]:
+    """Decode the elements of a top-level JSON array whose "[" was already consumed."""
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in _ARRAY_SEPARATORS:
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely an element split across reads; fetch more below.
+                if eof:
+                    raise
+            else:
+                yield record
+                continue
+        if eof:
+            raise ValueError("unterminated JSON array in fixture")
+        # Drop consumed text so the buffer never holds more than one element
+        # plus one read.
+        chunk = fh.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
@@ -15,43 +15,39 @@ from __future__ import annotations
 
 import json
 import logging
+import threading
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import closing
 from datetime import UTC, datetime, timedelta
 from typing import Any
+from urllib.parse import urlencode
 
-from sqlalchemy import and_, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.crypto import decrypt_token, encrypt_token
 from app.core.settings import settings
-from app.models.entities import (
-    GmailEvidence,
-    GmailMessage,
-    GmailOAuthToken,
-    User,
-    UserFeature,
-)
+from app.models.entities import GmailMessage, GmailMessagePayload, GmailOAuthToken, User
 from app.services.events.service import emit_event
+from app.services.ingestion.brand_matcher import BrandMatcher, get_matcher
+from app.services.ingestion.features import gmail_confidence, upsert_features
+from app.services.ingestion.gmail_batch import fetch_message_metadata
+from app.services.ingestion.google_transport import build_service, google_http, http_pool
+from app.services.ingestion.payload_store import payload_row, payload_writer
+from app.services.ingestion.prefetch import prefetch
+from app.services.ingestion.writer import IngestionWriter
 
 logger = logging.getLogger(__name__)
 
 GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
-# Re-use the same feature extraction logic as the mock sync.
-BRAND_MAP = {
-    "amazon": "merchant:amazon",
-    "uber": "merchant:uber",
-    "at&t": "merchant:at&t",
-    "paramount": "merchant:paramount",
-    "walmart": "merchant:walmart",
-}
-
 _GOOGLE_IMPORT_ERROR: ImportError | None = None
 
 try:
     from google.auth.transport.requests import Request as GoogleRequest
     from google.oauth2.credentials import Credentials
     from google_auth_oauthlib.flow import Flow
-    from googleapiclient.discovery import build as google_build
 except ImportError as _exc:
     _GOOGLE_IMPORT_ERROR = _exc
 
@@ -138,8 +134,9 @@ def exchange_oauth_code(db: Session, user: User, code: str, state: str) -> dict:
     # Derive the Gmail address from the token info endpoint.
     gmail_email: str | None = None
     try:
-        service = google_build("oauth2", "v2", credentials=credentials)
-        userinfo = service.userinfo().get().execute()
+        with google_http() as http:
+            service = build_service("oauth2", "v2", credentials, http)
+            userinfo = service.userinfo().get().execute()
         gmail_email = userinfo.get("email")
     except Exception:  # noqa: BLE001
         pass  # Non-fatal — we still store the token.
@@ -202,12 +199,10 @@ def revoke_gmail_access(db: Session, user: User) -> dict:
 
     # Attempt to call Google's revoke endpoint; treat errors as non-fatal.
     try:
-        import requests as _requests  # noqa: PLC0415
-
         access_token = decrypt_token(token_row.access_token_enc)
-        _requests.post(
-            "https://oauth2.googleapis.com/revoke",
-            params={"token": access_token},
+        http_pool.request(
+            "POST",
+            f"https://oauth2.googleapis.com/revoke?{urlencode({'token': access_token})}",
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             timeout=10,
         )
@@ -215,6 +210,7 @@ def revoke_gmail_access(db: Session, user: User) -> dict:
         logger.warning("Failed to call Google revoke endpoint; marking token revoked locally.")
 
     token_row.revoked_at = datetime.now(UTC)
+    _forget_credentials(user.id)
     emit_event(db, "gmail_oauth_revoked", user.id, {})
     db.flush()
     return {"status": "ok"}
@@ -272,6 +268,62 @@ def _build_credentials(token_row: GmailOAuthToken) -> "Credentials":
     return creds
 
 
+# Single-flight refresh: concurrent syncs for one user (sync worker threads,
+# an OAuth callback racing a scheduled sync) share one token refresh instead
+# of each spending a refresh round trip.  Refreshed credentials are cached
+# per user under the encrypted token values they were built from and the
+# one written back, so a sync that read the row before the refresh was
+# committed still finds them.
+_credentials_lock = threading.Lock()
+_refresh_locks: dict[uuid.UUID, threading.Lock] = {}
+_credentials_cache: dict[uuid.UUID, tuple[frozenset[str], "Credentials"]] = {}
+
+
+def _refresh_lock(user_id: uuid.UUID) -> threading.Lock:
+    with _credentials_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+
+def _forget_credentials(user_id: uuid.UUID) -> None:
+    with _credentials_lock:
+        _credentials_cache.pop(user_id, None)
+
+
+def _still_valid(creds: "Credentials") -> bool:
+    expiry = creds.expiry
+    if not isinstance(expiry, datetime):
+        return False
+    if expiry.tzinfo is not None:
+        expiry = expiry.astimezone(UTC).replace(tzinfo=None)
+    return expiry - datetime.utcnow() > timedelta(seconds=60)
+
+
+def _get_credentials(token_row: GmailOAuthToken) -> "Credentials":
+    """Valid credentials for token_row, refreshing at most once per user at a time.
+
+    Writes refreshed tokens back onto token_row (encrypted).
+    """
+    user_id = token_row.user_id
+    with _refresh_lock(user_id):
+        cached = _credentials_cache.get(user_id)
+        if cached and token_row.access_token_enc in cached[0] and _still_valid(cached[1]):
+            return cached[1]
+
+        read_enc = token_row.access_token_enc
+        creds = _build_credentials(token_row)
+        if creds.token and creds.token != decrypt_token(read_enc):
+            # Refreshed: persist (do not log the raw value).
+            token_row.access_token_enc = encrypt_token(creds.token)
+            if creds.refresh_token:
+                token_row.refresh_token_enc = encrypt_token(creds.refresh_token)
+            if creds.expiry:
+                token_row.token_expiry = (
+                    creds.expiry if creds.expiry.tzinfo else creds.expiry.replace(tzinfo=UTC)
+                )
+        _credentials_cache[user_id] = (frozenset({read_enc, token_row.access_token_enc}), creds)
+        return creds
+
+
 def _extract_message_fields(full_msg: dict) -> dict:
     """Extract subject, from_domain, snippet from a Gmail API message object."""
     headers: list[dict] = full_msg.get("payload", {}).get("headers", [])
@@ -293,93 +345,129 @@ def _extract_message_fields(full_msg: dict) -> dict:
     }
 
 
-def _derive_token_counts(subject: str, snippet: str) -> dict[str, int]:
-    """Apply the same token-extraction logic used by the mock sync."""
-    token_counts: dict[str, int] = {}
-    text = f"{subject} {snippet}".lower()
-    for token, feature_key in BRAND_MAP.items():
-        if token in text:
-            token_counts[feature_key] = token_counts.get(feature_key, 0) + 1
-    if "prime" in text:
-        token_counts["subscription:prime"] = token_counts.get("subscription:prime", 0) + 1
-    if "paramount+" in text:
-        token_counts["subscription:paramount_plus"] = token_counts.get("subscription:paramount_plus", 0) + 1
-    if any(k in text for k in ["casino", "sportsbook", "bet", "gambling"]):
-        token_counts["category:gambling"] = token_counts.get("category:gambling", 0) + 1
-    return token_counts
-
-
-def _upsert_features(db: Session, user: User, token_counts: dict[str, int], now: datetime) -> None:
-    """Upsert GmailEvidence + UserFeature rows for the given token_counts."""
-    for key, count in token_counts.items():
-        confidence = min(0.95, 0.7 + min(0.2, count * 0.05))
-
-        evidence = db.scalar(
-            select(GmailEvidence).where(
-                and_(
-                    GmailEvidence.user_id == user.id,
-                    GmailEvidence.evidence_type == "merchant",
-                    GmailEvidence.key == key,
-                )
-            )
-        )
-        if not evidence:
-            db.add(
-                GmailEvidence(
-                    user_id=user.id,
-                    evidence_type="merchant",
-                    key=key,
-                    first_seen_at=now,
-                    last_seen_at=now,
-                    count=count,
-                    confidence=confidence,
-                    examples_json=[],
-                )
-            )
-        else:
-            evidence.count = count
-            evidence.last_seen_at = now
-            evidence.confidence = confidence
-
-        feature = db.scalar(
-            select(UserFeature).where(
-                and_(
-                    UserFeature.user_id == user.id,
-                    UserFeature.feature_key == key,
-                    UserFeature.source == "gmail",
-                )
-            )
+def _derive_token_counts(matcher: BrandMatcher, subject: str, snippet: str) -> dict[str, int]:
+    """Apply the shared brand/keyword matcher used by the mock sync."""
+    return {feature_key: 1 for feature_key in matcher.extract(f"{subject} {snippet}")}
+
+
+def _store_messages(
+    db: Session,
+    user: User,
+    access_token: str,
+    msg_ids: list[str],
+    matcher: BrandMatcher,
+    token_counts: dict[str, int],
+) -> tuple[int, str | None]:
+    """Batch-fetch metadata for msg_ids, bulk-insert new GmailMessage rows and
+    accumulate extracted token counts into token_counts.
+
+    Returns (inserted, historyId of the first fetched message).
+    """
+    if not msg_ids:
+        return 0, None
+    fetched = fetch_message_metadata(access_token, msg_ids)
+
+    first_history_id: str | None = None
+    writer = IngestionWriter(db, GmailMessage, conflict_cols=("user_id", "provider_msg_id"))
+    payloads = payload_writer(db, GmailMessagePayload)
+    for msg_id in dict.fromkeys(msg_ids):
+        full_msg = fetched.get(msg_id)
+        if full_msg is None:
+            continue  # Deleted between list and fetch.
+        if first_history_id is None:
+            first_history_id = full_msg.get("historyId")
+
+        fields = _extract_message_fields(full_msg)
+        writer.add(
+            {
+                "user_id": user.id,
+                "provider_msg_id": msg_id,
+                "internal_date": fields["internal_date"],
+                "from_domain": fields["from_domain"],
+                "subject": fields["subject"],
+                "snippet": fields["snippet"],
+            }
         )
-        if not feature:
-            db.add(
-                UserFeature(
-                    user_id=user.id,
-                    feature_key=key,
-                    value_json=True,
-                    confidence=confidence,
-                    first_seen_at=now,
-                    last_seen_at=now,
-                    source="gmail",
-                )
-            )
-        else:
-            feature.confidence = confidence
-            feature.last_seen_at = now
-            feature.updated_at = now
+        payloads.add(payload_row(GmailMessagePayload, user.id, msg_id, full_msg))
+
+        counts = _derive_token_counts(matcher, fields["subject"], fields["snippet"])
+        for k, v in counts.items():
+            token_counts[k] = token_counts.get(k, 0) + v
+    writer.flush()
+    payloads.flush()
+    inserted = writer.inserted
+    return inserted, first_history_id
+
+
+def _history_pages(user_service, start_history_id: str) -> Iterator[dict]:
+    """Yield every history.list page after start_history_id."""
+    page_token: str | None = None
+    while True:
+        list_kwargs: dict[str, Any] = {
+            "userId": "me",
+            "startHistoryId": start_history_id,
+            "historyTypes": ["messageAdded"],
+        }
+        if page_token:
+            list_kwargs["pageToken"] = page_token
+        page = user_service.history().list(**list_kwargs).execute()
+        yield page
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def _message_list_pages(user_service, query: str, page_token: str | None) -> Iterator[dict]:
+    """Yield messages.list pages for query, starting at page_token."""
+    while True:
+        list_kwargs: dict[str, Any] = {
+            "userId": "me",
+            "q": query,
+            "maxResults": settings.gmail_list_page_size,
+        }
+        if page_token:
+            list_kwargs["pageToken"] = page_token
+        page = user_service.messages().list(**list_kwargs).execute()
+        yield page
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def _commit_page(
+    db: Session, user: User, token_counts: dict[str, int], heartbeat: Callable[[], None] | None
+) -> None:
+    """Upsert features seen so far, commit the page with its checkpoint, then beat."""
+    upsert_features(
+        db,
+        user.id,
+        "gmail",
+        {key: (count, gmail_confidence(count)) for key, count in token_counts.items()},
+        value_json=True,
+        evidence_type="merchant",
+    )
+    db.commit()
+    if heartbeat is not None:
+        heartbeat()
 
 
-def sync_gmail_real(db: Session, user: User) -> dict:
+def sync_gmail_real(db: Session, user: User, heartbeat: Callable[[], None] | None = None) -> dict:
     """Incremental Gmail sync using the Gmail REST API.
 
     1. Load GmailOAuthToken for user; raise ValueError if missing.
     2. Decrypt + refresh access token if needed.
-    3. If gmail_history_id is set: use history.list for incremental sync.
-       Otherwise: use messages.list to fetch the last 90 days.
-    4. Upsert GmailMessage rows.
-    5. Extract features using BRAND_MAP + subscription keywords.
-    6. Upsert UserFeature rows (source='gmail').
-    7. Update gmail_history_id + user.gmail_synced_at.
-    8. Emit event: gmail_sync_completed.
+    3. If gmail_history_id is set: page through history.list for incremental
+       sync.  Otherwise: page through messages.list for the last 90 days,
+       resuming from resume_page_token if a previous run was interrupted.
+       The next page is prefetched in the background (bounded by
+       settings.gmail_page_prefetch) while the current one is written.
+    4. Fetch message metadata through the Gmail batch endpoint
+       (see gmail_batch.fetch_message_metadata) and upsert GmailMessage rows.
+    5. Extract features with the shared brand/keyword matcher.
+    6. Upsert UserFeature + GmailEvidence rows (source='gmail') in bulk.
+    7. Commit each page with its checkpoint (gmail_history_id, or the
+       resume_* columns during an initial sync), then call heartbeat.
+    8. Update user.gmail_synced_at and emit event: gmail_sync_completed.
 
     Returns {status: 'ok', inserted_messages: N, feature_count: M}.
     """
@@ -401,157 +489,99 @@ def sync_gmail_real(db: Session, user: User) -> dict:
         raise ValueError("Gmail OAuth token has been revoked. Re-authorize to continue.")
 
     try:
-        creds = _build_credentials(token_row)
+        creds = _get_credentials(token_row)
     except Exception as exc:  # noqa: BLE001
         emit_event(db, "gmail_sync_failed", user.id, {"reason": "credential_refresh_failed"})
         raise ValueError(f"Failed to refresh Gmail credentials: {exc}") from exc
 
-    # Persist any refreshed tokens back to the DB (do not log the raw value).
-    if creds.token:
-        token_row.access_token_enc = encrypt_token(creds.token)
-    if creds.refresh_token:
-        token_row.refresh_token_enc = encrypt_token(creds.refresh_token)
-    if creds.expiry:
-        token_row.token_expiry = (
-            creds.expiry if creds.expiry.tzinfo else creds.expiry.replace(tzinfo=UTC)
-        )
-
+    inserted = 0
+    all_token_counts: dict[str, int] = {}
     try:
-        service = google_build("gmail", "v1", credentials=creds)
-        user_service = service.users()
-
-        inserted = 0
-        all_token_counts: dict[str, int] = {}
-
-        if token_row.gmail_history_id:
-            # ---------- incremental path ----------
-            history_list_resp = (
-                user_service.history()
-                .list(
-                    userId="me",
-                    startHistoryId=token_row.gmail_history_id,
-                    historyTypes=["messageAdded"],
+        with google_http() as http:
+            service = build_service("gmail", "v1", creds, http)
+            # Only the prefetch thread touches the discovery client; message
+            # metadata is fetched on this thread through gmail_batch.
+            user_service = service.users()
+            matcher = get_matcher(db)
+
+            if token_row.gmail_history_id:
+                # ---------- incremental path ----------
+                pages = prefetch(
+                    _history_pages(user_service, token_row.gmail_history_id),
+                    settings.gmail_page_prefetch,
+                    name="gmail-history",
                 )
-                .execute()
-            )
-            history_items = history_list_resp.get("history", [])
-            new_history_id: str | None = history_list_resp.get("historyId")
-
-            msg_ids_seen: set[str] = set()
-            for item in history_items:
-                for msg_added in item.get("messagesAdded", []):
-                    msg_id = msg_added["message"]["id"]
-                    if msg_id in msg_ids_seen:
-                        continue
-                    msg_ids_seen.add(msg_id)
-                    full_msg = (
-                        user_service.messages()
-                        .get(userId="me", id=msg_id, format="metadata",
-                             metadataHeaders=["Subject", "From"])
-                        .execute()
-                    )
-                    fields = _extract_message_fields(full_msg)
-                    exists = db.scalar(
-                        select(GmailMessage).where(
-                            and_(
-                                GmailMessage.user_id == user.id,
-                                GmailMessage.provider_msg_id == msg_id,
-                            )
-                        )
-                    )
-                    if not exists:
-                        db.add(
-                            GmailMessage(
-                                user_id=user.id,
-                                provider_msg_id=msg_id,
-                                internal_date=fields["internal_date"],
-                                from_domain=fields["from_domain"],
-                                subject=fields["subject"],
-                                snippet=fields["snippet"],
-                                raw_json=full_msg,
-                            )
-                        )
-                        inserted += 1
-
-                    counts = _derive_token_counts(fields["subject"], fields["snippet"])
-                    for k, v in counts.items():
-                        all_token_counts[k] = all_token_counts.get(k, 0) + v
-
-            if new_history_id:
-                token_row.gmail_history_id = new_history_id
-
-        else:
-            # ---------- full (initial) path: last 90 days ----------
-            after_epoch = int(
-                (datetime.now(UTC) - timedelta(days=90)).timestamp()
-            )
-            query = f"after:{after_epoch}"
-            page_token: str | None = None
-            new_history_id = None
-
-            while True:
-                list_kwargs: dict[str, Any] = {
-                    "userId": "me",
-                    "q": query,
-                    "maxResults": 500,
-                }
-                if page_token:
-                    list_kwargs["pageToken"] = page_token
-                list_resp = user_service.messages().list(**list_kwargs).execute()
-                messages_page = list_resp.get("messages", [])
-
-                for msg_ref in messages_page:
-                    msg_id = msg_ref["id"]
-                    full_msg = (
-                        user_service.messages()
-                        .get(userId="me", id=msg_id, format="metadata",
-                             metadataHeaders=["Subject", "From"])
-                        .execute()
-                    )
-                    if not new_history_id:
-                        new_history_id = full_msg.get("historyId")
-
-                    fields = _extract_message_fields(full_msg)
-                    exists = db.scalar(
-                        select(GmailMessage).where(
-                            and_(
-                                GmailMessage.user_id == user.id,
-                                GmailMessage.provider_msg_id == msg_id,
-                            )
+                with closing(pages) as prefetched:
+                    for page in prefetched:
+                        history_items = page.get("history", [])
+                        msg_ids = [
+                            msg_added["message"]["id"]
+                            for item in history_items
+                            for msg_added in item.get("messagesAdded", [])
+                        ]
+                        page_inserted, _ = _store_messages(
+                            db, user, creds.token, msg_ids, matcher, all_token_counts
                         )
-                    )
-                    if not exists:
-                        db.add(
-                            GmailMessage(
-                                user_id=user.id,
-                                provider_msg_id=msg_id,
-                                internal_date=fields["internal_date"],
-                                from_domain=fields["from_domain"],
-                                subject=fields["subject"],
-                                snippet=fields["snippet"],
-                                raw_json=full_msg,
-                            )
+                        inserted += page_inserted
+
+                        # Checkpoint: a restarted sync lists history after the
+                        # last record written; the final page moves the
+                        # checkpoint to the mailbox's current historyId.
+                        if page.get("nextPageToken"):
+                            checkpoint = history_items[-1].get("id") if history_items else None
+                        else:
+                            checkpoint = page.get("historyId")
+                        if checkpoint:
+                            token_row.gmail_history_id = str(checkpoint)
+                        _commit_page(db, user, all_token_counts, heartbeat)
+
+            else:
+                # ---------- full (initial) path: last 90 days ----------
+                # An interrupted initial sync resumes from its checkpointed page
+                # with the same query (page tokens are bound to it).
+                if token_row.resume_page_token and token_row.resume_query:
+                    query = token_row.resume_query
+                else:
+                    after_epoch = int((datetime.now(UTC) - timedelta(days=90)).timestamp())
+                    query = f"after:{after_epoch}"
+                    token_row.resume_page_token = None
+                    token_row.resume_history_id = None
+                token_row.resume_query = query
+
+                pages = prefetch(
+                    _message_list_pages(user_service, query, token_row.resume_page_token),
+                    settings.gmail_page_prefetch,
+                    name="gmail-list",
+                )
+                with closing(pages) as prefetched:
+                    for page in prefetched:
+                        msg_ids = [msg_ref["id"] for msg_ref in page.get("messages", [])]
+                        page_inserted, page_history_id = _store_messages(
+                            db, user, creds.token, msg_ids, matcher, all_token_counts
                         )
-                        inserted += 1
-
-                    counts = _derive_token_counts(fields["subject"], fields["snippet"])
-                    for k, v in counts.items():
-                        all_token_counts[k] = all_token_counts.get(k, 0) + v
-
-                page_token = list_resp.get("nextPageToken")
-                if not page_token:
-                    break
-
-            if new_history_id:
-                token_row.gmail_history_id = new_history_id
+                        inserted += page_inserted
+                        if not token_row.resume_history_id and page_history_id:
+                            token_row.resume_history_id = page_history_id
+
+                        next_page_token = page.get("nextPageToken")
+                        if next_page_token:
+                            token_row.resume_page_token = next_page_token
+                        else:
+                            # Listing complete: switch to incremental history sync.
+                            if token_row.resume_history_id:
+                                token_row.gmail_history_id = token_row.resume_history_id
+                            token_row.resume_page_token = None
+                            token_row.resume_query = None
+                            token_row.resume_history_id = None
+                        _commit_page(db, user, all_token_counts, heartbeat)
 
     except Exception as exc:  # noqa: BLE001
+        # Drop the partially written page; earlier pages stay committed.
+        db.rollback()
         emit_event(db, "gmail_sync_failed", user.id, {"reason": str(exc)})
         raise ValueError(f"Gmail sync failed: {str(exc)[:500]}") from exc
 
-    now = datetime.now(UTC)
-    _upsert_features(db, user, all_token_counts, now)
-    user.gmail_synced_at = now
+    user.gmail_synced_at = datetime.now(UTC)
 
     emit_event(
         db,
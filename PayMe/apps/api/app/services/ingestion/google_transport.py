@@ -0,0 +1,173 @@
+"""Shared HTTP plumbing for Google API calls (Gmail sync, OAuth, revoke).
+
+Building a discovery-based client per call used to re-read and parse the
+discovery document, and every request opened a fresh TLS connection.  This
+module keeps that setup per process instead of per sync:
+
+- ``discovery_document(api, version)``: the static discovery documents that
+  ship with google-api-python-client, parsed once and cached.
+- ``google_http()``: checks an ``httplib2.Http`` out of a bounded pool for
+  discovery clients.  httplib2 connections are keep-alive but not
+  thread-safe, so each Http is used by one sync at a time and returned when
+  the sync finishes (discarded if it failed mid-request).
+- ``build_service(api, version, credentials, http)``: discovery client from
+  the cached document over a pooled Http.
+- ``http_pool``: keep-alive ``http.client`` connections for the raw calls
+  (Gmail batch endpoint, token revocation), keyed by scheme/host/port.  A
+  request on a reused connection that the server has since closed is retried
+  once on a fresh connection.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import queue
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+from app.core.settings import settings
+
+try:
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:  # pragma: no cover - optional: pip install -e ".[gmail]"
+    httplib2 = None  # type: ignore[assignment]
+
+
+# ---------------------------------------------------------------------------
+# Discovery clients
+# ---------------------------------------------------------------------------
+
+_discovery_docs: dict[tuple[str, str], dict] = {}
+_discovery_lock = threading.Lock()
+
+
+def discovery_document(api: str, version: str) -> dict:
+    """Parsed static discovery document for api/version, cached per process."""
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        with _discovery_lock:
+            doc = _discovery_docs.get(key)
+            if doc is None:
+                raw = get_static_doc(api, version)
+                if raw is None:
+                    raise ValueError(f"No static discovery document for {api} {version}")
+                doc = _discovery_docs[key] = json.loads(raw)
+    return doc
+
+
+_http_idle: queue.LifoQueue = queue.LifoQueue()
+
+
+@contextmanager
+def google_http() -> Iterator[Any]:
+    """Check out a keep-alive httplib2.Http for the duration of one sync."""
+    try:
+        http = _http_idle.get_nowait()
+    except queue.Empty:
+        http = httplib2.Http(timeout=settings.google_http_timeout_seconds)
+    yield http
+    # Only reached on success: an Http abandoned mid-request is not reused.
+    if _http_idle.qsize() < settings.google_http_pool_size:
+        _http_idle.put(http)
+
+
+def build_service(api: str, version: str, credentials, http) -> Any:
+    """Discovery client for api/version from the cached document."""
+    return build_from_document(
+        discovery_document(api, version),
+        http=AuthorizedHttp(credentials, http=http),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Keep-alive connections for raw requests
+# ---------------------------------------------------------------------------
+
+
+class ConnectionPool:
+    """Idle keep-alive ``http.client`` connections keyed by (scheme, host, port)."""
+
+    def __init__(self, max_idle_per_host: int | None = None) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _checkout(
+        self, key: tuple[str, str, int], timeout: float
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                return conn, True
+            self.connections_opened += 1
+        scheme, host, port = key
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return conn_cls(host, port, timeout=timeout), False
+
+    def _checkin(self, key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        limit = self.max_idle_per_host or settings.google_http_pool_size
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < limit:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        """Send one request. Returns (status, headers, body)."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        timeout = settings.google_http_timeout_seconds if timeout is None else timeout
+
+        while True:
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    continue  # Server closed the idle connection; retry on a fresh one.
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return resp.status, resp.headers, data
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+http_pool = ConnectionPool()
@@ -21,11 +21,12 @@ def upsert_onboarding(db: Session, user: User, payload: OnboardingRequest) -> Us
 
     db.execute(delete(UserFeature).where(UserFeature.user_id == user.id, UserFeature.source == "onboarding"))
     now = datetime.now(UTC)
-    for brand in payload.brands_purchased:
+    # uq_user_feature_source allows one row per key; "Amazon" and "amazon" collapse.
+    for feature_key in dict.fromkeys(f"merchant:{brand.lower()}" for brand in payload.brands_purchased):
         db.add(
             UserFeature(
                 user_id=user.id,
-                feature_key=f"merchant:{brand.lower()}",
+                feature_key=feature_key,
                 value_json=True,
                 confidence=0.6,
                 first_seen_at=now,
@@ -0,0 +1,131 @@
+"""Compressed cold storage for raw provider payloads.
+
+GmailMessage and PlaidTransaction rows used to carry the full provider
+payload inline (``raw_json``), widening the hot tables that evidence queries
+and admin counts scan.  Payloads now live in side tables keyed by the same
+natural key as their parent row:
+
+    gmail_message_payloads      (user_id, provider_msg_id)
+    plaid_transaction_payloads  (user_id, provider_txn_id)
+
+Each payload is compact JSON compressed with zstd, or with stdlib zlib when
+the optional ``zstandard`` package is not installed
+(``pip install -e ".[compression]"``).  The codec is stored per row, so
+payloads written under either codec stay readable.
+
+Sync paths buffer payload rows in a second IngestionWriter next to the one
+for the hot table.  Nothing reads a payload back unless ``load_raw_payload``
+or ``load_raw_payloads`` is called.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+import zlib
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.entities import GmailMessagePayload, PlaidTransactionPayload
+from app.services.ingestion.writer import DEFAULT_CHUNK_SIZE, IngestionWriter
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+ZSTD_AVAILABLE = zstandard is not None
+
+# Payload model -> provider id column shared with its parent table.
+_PROVIDER_ID_COLS = {
+    GmailMessagePayload: "provider_msg_id",
+    PlaidTransactionPayload: "provider_txn_id",
+}
+
+
+def _codec() -> str:
+    codec = settings.raw_payload_codec
+    if codec == "zstd" and not ZSTD_AVAILABLE:
+        return "zlib"
+    if codec not in {"zstd", "zlib", "none"}:
+        raise ValueError(f"Unknown raw_payload_codec: {codec}")
+    return codec
+
+
+def encode_payload(payload: Any) -> tuple[str, bytes]:
+    """Serialize and compress a JSON payload. Returns (codec, data)."""
+    data = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    codec = _codec()
+    if codec == "zstd":
+        # ZstdCompressor is not thread-safe; sync worker threads each get their own.
+        data = zstandard.ZstdCompressor(level=settings.raw_payload_compression_level).compress(data)
+    elif codec == "zlib":
+        data = zlib.compress(data, settings.raw_payload_compression_level)
+    return codec, data
+
+
+def decode_payload(codec: str, data: bytes) -> Any:
+    """Inverse of encode_payload."""
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read zstd payloads: pip install zstandard")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec != "none":
+        raise ValueError(f"Unknown payload codec: {codec}")
+    return json.loads(data)
+
+
+def payload_row(model: type, user_id: uuid.UUID, provider_id: str, payload: Any) -> dict:
+    """Build a side-table row for IngestionWriter."""
+    codec, data = encode_payload(payload)
+    return {"user_id": user_id, _PROVIDER_ID_COLS[model]: provider_id, "codec": codec, "payload": data}
+
+
+def payload_writer(
+    db: Session,
+    model: type,
+    update: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> IngestionWriter:
+    """IngestionWriter for a payload table.
+
+    With update=False existing payloads are kept (matches DO NOTHING on the
+    parent); with update=True they are replaced.  The foreign key to the
+    parent row is deferred, so the two writers may flush in either order
+    within a transaction.
+    """
+    return IngestionWriter(
+        db,
+        model,
+        conflict_cols=("user_id", _PROVIDER_ID_COLS[model]),
+        update_cols=("codec", "payload") if update else (),
+        chunk_size=chunk_size,
+    )
+
+
+def load_raw_payloads(
+    db: Session,
+    model: type,
+    user_id: uuid.UUID,
+    provider_ids: Iterable[str],
+) -> dict[str, Any]:
+    """Decoded payloads for the given provider ids; missing ids are omitted."""
+    provider_ids = list(dict.fromkeys(provider_ids))
+    if not provider_ids:
+        return {}
+    id_col = getattr(model, _PROVIDER_ID_COLS[model])
+    rows = db.execute(
+        select(id_col, model.codec, model.payload).where(model.user_id == user_id, id_col.in_(provider_ids))
+    )
+    return {provider_id: decode_payload(codec, data) for provider_id, codec, data in rows}
+
+
+def load_raw_payload(db: Session, model: type, user_id: uuid.UUID, provider_id: str) -> Any | None:
+    """Decoded payload for one provider record, or None if none is stored."""
+    return load_raw_payloads(db, model, user_id, [provider_id]).get(provider_id)
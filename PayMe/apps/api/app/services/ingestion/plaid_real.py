@@ -7,16 +7,20 @@ package is actually available.
 
 from __future__ import annotations
 
-import re
+from collections.abc import Callable
 from datetime import UTC, datetime
 
-from sqlalchemy import and_, select
+from sqlalchemy import String, any_, bindparam, delete, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
 
 from app.core.crypto import decrypt_token, encrypt_token
 from app.core.settings import settings
-from app.models.entities import PlaidItem, PlaidTransaction, User, UserFeature
+from app.models.entities import PlaidItem, PlaidTransaction, PlaidTransactionPayload, User
 from app.services.events.service import emit_event
+from app.services.ingestion.payload_store import payload_row, payload_writer
+from app.services.ingestion.spend_aggregate import SpendDelta, apply_spend_deltas, existing_rows
+from app.services.ingestion.writer import IngestionWriter
 
 try:
     import plaid  # noqa: F401
@@ -72,10 +76,6 @@ def _build_client():
     return plaid_api.PlaidApi(api_client)
 
 
-def _normalize_token(text: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
-
-
 def _make_json_safe(obj):
     """Recursively convert a dict/list to be JSON-serializable.
 
@@ -93,6 +93,46 @@ def _make_json_safe(obj):
     return obj
 
 
+def _field(obj, key: str, default=None):
+    """Read a field from a Plaid SDK model or a plain dict; both support obj[key]."""
+    try:
+        value = obj[key]
+    except (KeyError, AttributeError, TypeError):
+        return default
+    return default if value is None else value
+
+
+def _transaction_row(user_id, txn) -> dict:
+    """Map a Plaid transaction to a PlaidTransaction row dict."""
+    date_val = _field(txn, "date") or _field(txn, "authorized_date")
+    if hasattr(date_val, "year"):  # datetime.date object
+        posted_at = datetime(date_val.year, date_val.month, date_val.day, tzinfo=UTC)
+    elif isinstance(date_val, str):
+        posted_at = datetime.fromisoformat(date_val.replace("Z", "+00:00"))
+    else:
+        posted_at = datetime.now(UTC)
+
+    category = _field(_field(txn, "personal_finance_category", {}), "primary")
+    if not category:
+        category = _field(txn, "category")
+        if isinstance(category, list):
+            category = category[0] if category else None
+
+    return {
+        "user_id": user_id,
+        "provider_txn_id": _field(txn, "transaction_id"),
+        "posted_at": posted_at,
+        "merchant_name": _field(txn, "merchant_name") or _field(txn, "name"),
+        "amount_cents": int(round(float(_field(txn, "amount", 0)) * 100)),
+        "category": category,
+        "is_subscription": bool(_field(txn, "recurring_transaction_id") or _field(txn, "is_subscription", False)),
+    }
+
+
+def _raw_payload(txn) -> dict:
+    return _make_json_safe(txn if isinstance(txn, dict) else txn.to_dict())
+
+
 def _require_credentials() -> None:
     """Raise ValueError if Plaid credentials are not configured."""
     if not settings.plaid_client_id or not settings.plaid_secret:
@@ -228,20 +268,22 @@ def disconnect_item(db: Session, user: User) -> dict:
     return {"status": "ok"}
 
 
-def sync_plaid_real(db: Session, user: User) -> dict:
+def sync_plaid_real(db: Session, user: User, heartbeat: Callable[[], None] | None = None) -> dict:
     """Incremental transaction sync using the Plaid Transactions Sync API.
 
     Steps:
     1. Load PlaidItem for user; raise ValueError if missing or disconnected.
     2. Decrypt access token.
     3. Call /transactions/sync with stored cursor (None = initial full sync).
-    4. Process added / modified / removed transactions.
-    5. Upsert PlaidTransaction rows.
-    6. Derive features (merchant:X, category:X, subscription:active).
-    7. Upsert UserFeature rows (source='plaid').
-    8. Update PlaidItem.cursor and user.plaid_synced_at.
-    9. Handle ITEM_LOGIN_REQUIRED: set status = 'requires_reauth', emit event.
-    10. Emit event: plaid_sync_completed.
+    4. Per page: one IN (...) lookup of the page's stored rows, one bulk
+       upsert of added + modified rows, one DELETE ... = ANY(...) for removals.
+    5. Apply the page's delta to user_spend_aggregate and refresh the
+       touched features (merchant:X, category:X, subscription:active) from
+       the aggregate totals.
+    6. Commit the page together with PlaidItem.cursor, so an interrupted
+       sync resumes from the last completed page, then call heartbeat.
+    7. Handle ITEM_LOGIN_REQUIRED: set status = 'requires_reauth', emit event.
+    8. Update user.plaid_synced_at and emit event: plaid_sync_completed.
     Returns {status: 'ok', inserted_transactions: N, feature_count: M}.
     """
     if not PLAID_AVAILABLE:
@@ -260,8 +302,14 @@ def sync_plaid_real(db: Session, user: User) -> dict:
     access_token = decrypt_token(item.access_token_enc)
     client = _build_client()
 
-    inserted = 0
-    feature_counts: dict[str, int] = {}
+    touched_keys: set[str] = set()
+    writer = IngestionWriter(
+        db,
+        PlaidTransaction,
+        conflict_cols=("user_id", "provider_txn_id"),
+        update_cols=("posted_at", "merchant_name", "amount_cents", "category", "is_subscription"),
+    )
+    payloads = payload_writer(db, PlaidTransactionPayload, update=True)
     cursor = item.cursor  # None on first call triggers full historical pull.
     has_more = True
 
@@ -273,134 +321,66 @@ def sync_plaid_real(db: Session, user: User) -> dict:
             sync_request = TransactionsSyncRequest(**kwargs)
             response = client.transactions_sync(sync_request)
 
-            added = response.added
-            modified = response.modified
-            removed = response.removed
-            has_more = response.has_more
-            cursor = response.next_cursor
-
-            # Process added transactions.
-            for txn in added:
-                txn_id = txn.transaction_id
-                existing_txn = db.scalar(
-                    select(PlaidTransaction).where(
-                        and_(
-                            PlaidTransaction.user_id == user.id,
-                            PlaidTransaction.provider_txn_id == txn_id,
-                        )
-                    )
-                )
-                date_val = getattr(txn, "date", None) or getattr(txn, "authorized_date", None)
-                if hasattr(date_val, "year"):  # datetime.date object
-                    posted_at = datetime(
-                        date_val.year, date_val.month, date_val.day, tzinfo=UTC
-                    )
-                elif isinstance(date_val, str):
-                    posted_at = datetime.fromisoformat(date_val.replace("Z", "+00:00"))
-                else:
-                    posted_at = datetime.now(UTC)
-
-                amount_cents = int(round(float(getattr(txn, "amount", 0)) * 100))
-                merchant_name = getattr(txn, "merchant_name", None) or getattr(txn, "name", None)
-                category_raw = getattr(txn, "personal_finance_category", {})
-                if category_raw and hasattr(category_raw, "primary"):
-                    category = category_raw.primary or getattr(category_raw, "detailed", None)
-                else:
-                    category = getattr(txn, "category", None)
-                    if isinstance(category, list) and category:
-                        category = category[0]
-                is_subscription = bool(
-                    getattr(txn, "recurring_transaction_id", None) or getattr(txn, "is_subscription", False)
-                )
-
-                if not existing_txn:
-                    db.add(
-                        PlaidTransaction(
-                            user_id=user.id,
-                            provider_txn_id=txn_id,
-                            posted_at=posted_at,
-                            merchant_name=merchant_name,
-                            amount_cents=amount_cents,
-                            category=category,
-                            is_subscription=is_subscription,
-                            raw_json=_make_json_safe(txn if isinstance(txn, dict) else txn.to_dict()),
-                        )
-                    )
-                    inserted += 1
-                else:
-                    # Update mutable fields on already-stored transactions.
-                    existing_txn.merchant_name = merchant_name
-                    existing_txn.amount_cents = amount_cents
-                    existing_txn.category = category
-                    existing_txn.is_subscription = is_subscription
-
-                # Accumulate feature signals regardless of insert/update status.
-                if merchant_name:
-                    key = f"merchant:{_normalize_token(merchant_name)}"
-                    feature_counts[key] = feature_counts.get(key, 0) + 1
-                if category:
-                    key = f"category:{_normalize_token(str(category))}"
-                    feature_counts[key] = feature_counts.get(key, 0) + 1
-                if is_subscription:
-                    feature_counts["subscription:active"] = (
-                        feature_counts.get("subscription:active", 0) + 1
-                    )
-
-            # Process modified transactions.
-            for txn in modified:
-                txn_id = txn.transaction_id
-                row = db.scalar(
-                    select(PlaidTransaction).where(
-                        and_(
-                            PlaidTransaction.user_id == user.id,
-                            PlaidTransaction.provider_txn_id == txn_id,
-                        )
+            added_txns = _field(response, "added", [])
+            modified_txns = _field(response, "modified", [])
+            added = [_transaction_row(user.id, txn) for txn in added_txns]
+            modified = [_transaction_row(user.id, txn) for txn in modified_txns]
+            raw_by_id = {_field(txn, "transaction_id"): txn for txn in [*added_txns, *modified_txns]}
+            removed_ids = [_field(txn, "transaction_id") for txn in _field(response, "removed", [])]
+            has_more = bool(_field(response, "has_more", False))
+            cursor = _field(response, "next_cursor")
+
+            # One IN (...) lookup for the page: modified rows only update
+            # transactions we already store, and the stored values of every
+            # replaced or removed row are subtracted from the spend aggregate.
+            existing = existing_rows(
+                db,
+                user.id,
+                [row["provider_txn_id"] for row in added + modified] + removed_ids,
+            )
+            rows = {row["provider_txn_id"]: row for row in added}
+            rows.update((row["provider_txn_id"], row) for row in modified if row["provider_txn_id"] in existing)
+            for txn_id in removed_ids:
+                rows.pop(txn_id, None)
+
+            delta = SpendDelta()
+            for txn_id, row in rows.items():
+                if txn_id in existing:
+                    delta.remove(existing[txn_id])
+                delta.add(row)
+            removed_ids = [txn_id for txn_id in removed_ids if txn_id in existing]
+            for txn_id in removed_ids:
+                delta.remove(existing[txn_id])
+
+            # Added and modified rows go out as one bulk upsert; raw payloads
+            # go to the compressed side table.
+            writer.extend(rows.values())
+            payloads.extend(
+                payload_row(PlaidTransactionPayload, user.id, txn_id, _raw_payload(raw_by_id[txn_id]))
+                for txn_id in rows
+            )
+            writer.flush()
+            payloads.flush()
+
+            if removed_ids:
+                db.execute(
+                    delete(PlaidTransaction).where(
+                        PlaidTransaction.user_id == user.id,
+                        PlaidTransaction.provider_txn_id
+                        == any_(bindparam("removed_ids", removed_ids, type_=ARRAY(String))),
                     )
                 )
-                merchant_name = getattr(txn, "merchant_name", None) or getattr(txn, "name", None)
-                category_raw = getattr(txn, "personal_finance_category", {})
-                if category_raw and hasattr(category_raw, "primary"):
-                    category = category_raw.primary or getattr(category_raw, "detailed", None)
-                else:
-                    category = getattr(txn, "category", None)
-                    if isinstance(category, list) and category:
-                        category = category[0]
-                is_subscription = bool(
-                    getattr(txn, "recurring_transaction_id", None) or getattr(txn, "is_subscription", False)
-                )
 
-                if row:
-                    row.merchant_name = merchant_name
-                    row.category = category
-                    row.is_subscription = is_subscription
-                    row.raw_json = _make_json_safe(txn if isinstance(txn, dict) else txn.to_dict())
-
-                if merchant_name:
-                    key = f"merchant:{_normalize_token(merchant_name)}"
-                    feature_counts[key] = feature_counts.get(key, 0) + 1
-                if category:
-                    key = f"category:{_normalize_token(str(category))}"
-                    feature_counts[key] = feature_counts.get(key, 0) + 1
-                if is_subscription:
-                    feature_counts["subscription:active"] = (
-                        feature_counts.get("subscription:active", 0) + 1
-                    )
+            touched_keys.update(apply_spend_deltas(db, user.id, delta))
 
-            # Process removals.
-            for removed_txn in removed:
-                txn_id = removed_txn.transaction_id
-                row = db.scalar(
-                    select(PlaidTransaction).where(
-                        and_(
-                            PlaidTransaction.user_id == user.id,
-                            PlaidTransaction.provider_txn_id == txn_id,
-                        )
-                    )
-                )
-                if row:
-                    db.delete(row)
+            # Commit the page with its cursor so an interrupted sync resumes here.
+            item.cursor = cursor
+            db.commit()
+            if heartbeat is not None:
+                heartbeat()
 
     except Exception as exc:  # noqa: BLE001
+        db.rollback()
         error_str = str(exc)
         # Check if this is a Plaid ITEM_LOGIN_REQUIRED error.
         if _ITEM_LOGIN_REQUIRED in error_str:
@@ -412,46 +392,14 @@ def sync_plaid_real(db: Session, user: User) -> dict:
         db.flush()
         raise
 
-    # Persist cursor and sync timestamp.
-    item.cursor = cursor
-    now = datetime.now(UTC)
-    user.plaid_synced_at = now
-
-    # Upsert UserFeature rows.
-    for key, count in feature_counts.items():
-        confidence = min(0.95, 0.75 + min(0.2, count * 0.04))
-        feature = db.scalar(
-            select(UserFeature).where(
-                and_(
-                    UserFeature.user_id == user.id,
-                    UserFeature.feature_key == key,
-                    UserFeature.source == "plaid",
-                )
-            )
-        )
-        if not feature:
-            db.add(
-                UserFeature(
-                    user_id=user.id,
-                    feature_key=key,
-                    value_json={"count": count},
-                    confidence=confidence,
-                    first_seen_at=now,
-                    last_seen_at=now,
-                    source="plaid",
-                )
-            )
-        else:
-            feature.value_json = {"count": count}
-            feature.confidence = confidence
-            feature.last_seen_at = now
-            feature.updated_at = now
+    inserted = writer.inserted
+    user.plaid_synced_at = datetime.now(UTC)
 
     emit_event(
         db,
         "plaid_sync_completed",
         user.id,
-        {"inserted_transactions": inserted, "feature_count": len(feature_counts)},
+        {"inserted_transactions": inserted, "feature_count": len(touched_keys)},
     )
     db.flush()
-    return {"status": "ok", "inserted_transactions": inserted, "feature_count": len(feature_counts)}
+    return {"status": "ok", "inserted_transactions": inserted, "feature_count": len(touched_keys)}
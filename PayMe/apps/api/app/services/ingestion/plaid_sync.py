@@ -1,22 +1,25 @@
-import json
-import re
+from collections.abc import Callable, Iterator
 from datetime import UTC, datetime
-from pathlib import Path
 
 from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
 
 from app.core.settings import settings
-from app.models.entities import PlaidItem, PlaidTransaction, User, UserFeature
+from app.models.entities import PlaidItem, PlaidTransaction, PlaidTransactionPayload, User
 from app.services.events.service import emit_event
+from app.services.ingestion.fixture_stream import iter_chunks, resolve_fixture
+from app.services.ingestion.payload_store import payload_row, payload_writer
+from app.services.ingestion.spend_aggregate import SpendDelta, apply_spend_deltas, existing_rows
+from app.services.ingestion.writer import IngestionWriter
 
 
-def sync_plaid(db: Session, user: User) -> dict:
+def sync_plaid(db: Session, user: User, heartbeat: Callable[[], None] | None = None) -> dict:
     """Dispatcher: routes to mock or real Plaid sync based on connection status.
     
     If user has connected Plaid → use real sync.
     If user has NOT connected Plaid → use mock sync.
     Connected users always use real sync, even when mock mode is enabled.
+    heartbeat, if given, is called after every page/chunk written.
     """
     # Check if user has an active Plaid item.
     plaid_item = db.scalar(
@@ -31,66 +34,58 @@ def sync_plaid(db: Session, user: User) -> dict:
     # Connected user -> real sync regardless of global mock flag.
     if plaid_item is not None:
         from app.services.ingestion.plaid_real import sync_plaid_real
-        return sync_plaid_real(db, user)
+        return sync_plaid_real(db, user, heartbeat=heartbeat)
 
     # No connection: allow mock fallback behavior.
     if settings.mock_plaid:
-        return sync_plaid_mock(db, user)
+        return sync_plaid_mock(db, user, heartbeat=heartbeat)
     return {"status": "not_connected", "message": "Connect a bank account first to run real sync."}
 
 
-def _read_fixture_transactions() -> list[dict]:
-    fixture = Path("/workspace/fixtures/plaid/transactions.json")
-    if not fixture.exists():
-        fixture = Path(__file__).resolve().parents[5] / "fixtures/plaid/transactions.json"
-    return json.loads(fixture.read_text(encoding="utf-8"))
+def _fixture_transaction_chunks() -> Iterator[list[dict]]:
+    return iter_chunks(resolve_fixture("plaid/transactions"))
 
 
-def _normalize_token(text: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
-
-
-def sync_plaid_mock(db: Session, user: User) -> dict:
+def sync_plaid_mock(db: Session, user: User, heartbeat: Callable[[], None] | None = None) -> dict:
     emit_event(db, "plaid_sync_started", user.id, {})
     if not settings.mock_plaid:
         emit_event(db, "plaid_sync_failed", user.id, {"reason": "not implemented"})
         return {"status": "not_implemented", "message": "Real Plaid integration is not implemented yet."}
 
-    transactions = _read_fixture_transactions()
-    inserted = 0
-    feature_counts: dict[str, int] = {}
-    for txn in transactions:
-        exists = db.scalar(
-            select(PlaidTransaction).where(
-                and_(PlaidTransaction.user_id == user.id, PlaidTransaction.provider_txn_id == txn["transaction_id"])
-            )
+    delta = SpendDelta()
+    writer = IngestionWriter(db, PlaidTransaction, conflict_cols=("user_id", "provider_txn_id"))
+    payloads = payload_writer(db, PlaidTransactionPayload)
+    # Fixture records are streamed chunk by chunk so large load-test fixtures
+    # never sit in memory at once.
+    for chunk in _fixture_transaction_chunks():
+        rows = {
+            txn["transaction_id"]: {
+                "user_id": user.id,
+                "provider_txn_id": txn["transaction_id"],
+                "posted_at": datetime.fromisoformat(txn["date"].replace("Z", "+00:00")),
+                "merchant_name": txn.get("merchant_name"),
+                "amount_cents": int(round(float(txn["amount"]) * 100)),
+                "category": txn.get("category"),
+                "is_subscription": bool(txn.get("is_subscription", False)),
+            }
+            for txn in chunk
+        }
+        # Rows already stored are left untouched (DO NOTHING), so only new
+        # ones move the spend aggregate.
+        existing = existing_rows(db, user.id, rows)
+        for txn_id, row in rows.items():
+            if txn_id not in existing:
+                delta.add(row)
+        writer.extend(rows.values())
+        payloads.extend(
+            payload_row(PlaidTransactionPayload, user.id, txn["transaction_id"], txn) for txn in chunk
         )
-        if not exists:
-            db.add(
-                PlaidTransaction(
-                    user_id=user.id,
-                    provider_txn_id=txn["transaction_id"],
-                    posted_at=datetime.fromisoformat(txn["date"].replace("Z", "+00:00")),
-                    merchant_name=txn.get("merchant_name"),
-                    amount_cents=int(round(float(txn["amount"]) * 100)),
-                    category=txn.get("category"),
-                    is_subscription=bool(txn.get("is_subscription", False)),
-                    raw_json=txn,
-                )
-            )
-            inserted += 1
+        writer.flush()
+        payloads.flush()
+        if heartbeat is not None:
+            heartbeat()
 
-        merchant_name = txn.get("merchant_name")
-        if merchant_name:
-            key = f"merchant:{_normalize_token(merchant_name)}"
-            feature_counts[key] = feature_counts.get(key, 0) + 1
-        category = txn.get("category")
-        if category:
-            key = f"category:{_normalize_token(category)}"
-            feature_counts[key] = feature_counts.get(key, 0) + 1
-        if txn.get("is_subscription"):
-            sub_key = "subscription:active"
-            feature_counts[sub_key] = feature_counts.get(sub_key, 0) + 1
+    inserted = writer.inserted
 
     now = datetime.now(UTC)
     user.plaid_synced_at = now
@@ -102,35 +97,12 @@ def sync_plaid_mock(db: Session, user: User) -> dict:
     if plaid_item is not None:
         plaid_item.balance_available_cents = 247_83  # $247.83 mock available balance
         plaid_item.balance_current_cents = 312_47   # $312.47 mock current balance
-    for key, count in feature_counts.items():
-        confidence = min(0.95, 0.75 + min(0.2, count * 0.04))
-        feature = db.scalar(
-            select(UserFeature).where(
-                and_(UserFeature.user_id == user.id, UserFeature.feature_key == key, UserFeature.source == "plaid")
-            )
-        )
-        if not feature:
-            db.add(
-                UserFeature(
-                    user_id=user.id,
-                    feature_key=key,
-                    value_json={"count": count},
-                    confidence=confidence,
-                    first_seen_at=now,
-                    last_seen_at=now,
-                    source="plaid",
-                )
-            )
-        else:
-            feature.value_json = {"count": count}
-            feature.confidence = confidence
-            feature.last_seen_at = now
-            feature.updated_at = now
+    touched_keys = apply_spend_deltas(db, user.id, delta, now=now)
     emit_event(
         db,
         "plaid_sync_completed",
         user.id,
-        {"inserted_transactions": inserted, "feature_count": len(feature_counts)},
+        {"inserted_transactions": inserted, "feature_count": len(touched_keys)},
     )
     db.flush()
-    return {"status": "ok", "inserted_transactions": inserted, "feature_count": len(feature_counts)}
+    return {"status": "ok", "inserted_transactions": inserted, "feature_count": len(touched_keys)}
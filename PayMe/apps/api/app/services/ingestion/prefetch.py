@@ -0,0 +1,62 @@
+"""Bounded background prefetch for paginated provider listings.
+
+``prefetch(pages, depth)`` runs the ``pages`` iterator in a daemon thread and
+hands items to the caller through a ``queue.Queue(maxsize=depth)``.  While the
+caller works on one page (fetching message metadata, writing rows), the next
+pages are already being listed, but never more than ``depth`` of them are
+buffered, so memory stays flat however long the listing is.
+
+Exceptions raised by the producer are re-raised in the caller.  Closing the
+generator (``contextlib.closing``) or abandoning it stops the producer at its
+next hand-off.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from typing import TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+_PUT_POLL_SECONDS = 0.1
+
+
+def prefetch(pages: Iterable[T], depth: int = 2, name: str = "prefetch") -> Iterator[T]:
+    """Yield items of pages, produced up to depth items ahead in a background thread."""
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=_PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the consumer
+            put((_DONE, exc))
+            return
+        put((_DONE, None))
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            page, exc = buffer.get()
+            if page is _DONE:
+                if exc is not None:
+                    raise exc
+                return
+            yield page
+    finally:
+        stop.set()
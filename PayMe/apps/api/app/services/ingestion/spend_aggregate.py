@@ -0,0 +1,143 @@
+"""Incrementally maintained spend aggregates behind Plaid features.
+
+Plaid syncs only see a delta (a transactions_sync page or a fixture chunk),
+so counting features from that delta alone loses history.  Instead every
+sync path turns the rows it adds, modifies and removes into per-key deltas:
+
+    added     -> +1 count, +amount for each key of the new row
+    modified  -> -old row, +new row
+    removed   -> -old row
+
+and ``apply_spend_deltas`` folds them into ``user_spend_aggregate`` with one
+``INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count``.
+The plaid UserFeature rows for the touched keys are then rewritten from the
+aggregate totals, so feature counts and confidences stay correct without
+rescanning plaid_transactions.
+
+last_seen only moves forward; removing the latest transaction for a key does
+not roll it back.
+"""
+
+from __future__ import annotations
+
+import re
+import uuid
+from collections.abc import Iterable
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import PlaidTransaction, UserFeature, UserSpendAggregate
+from app.services.ingestion.features import plaid_confidence, upsert_features
+
+# Columns of a PlaidTransaction row that contribute to the aggregate.
+AGGREGATE_COLUMNS = ("merchant_name", "category", "is_subscription", "amount_cents", "posted_at")
+
+
+def _normalize_token(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def spend_keys(row: dict) -> list[str]:
+    """Feature keys a transaction row contributes to."""
+    keys = []
+    if row.get("merchant_name"):
+        keys.append(f"merchant:{_normalize_token(row['merchant_name'])}")
+    if row.get("category"):
+        keys.append(f"category:{_normalize_token(str(row['category']))}")
+    if row.get("is_subscription"):
+        keys.append("subscription:active")
+    return keys
+
+
+class SpendDelta:
+    """Accumulates per-key (count, total_cents, last_seen) changes for one user."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, list] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def add(self, row: dict, sign: int = 1) -> None:
+        for key in spend_keys(row):
+            entry = self.entries.setdefault(key, [0, 0, None])
+            entry[0] += sign
+            entry[1] += sign * int(row.get("amount_cents") or 0)
+            posted_at = row.get("posted_at")
+            if sign > 0 and posted_at is not None and (entry[2] is None or posted_at > entry[2]):
+                entry[2] = posted_at
+
+    def remove(self, row: dict) -> None:
+        self.add(row, sign=-1)
+
+
+def existing_rows(db: Session, user_id: uuid.UUID, txn_ids: Iterable[str]) -> dict[str, dict]:
+    """Stored aggregate columns for the given provider_txn_ids, in one IN (...) query."""
+    txn_ids = list(dict.fromkeys(txn_ids))
+    if not txn_ids:
+        return {}
+    columns = [getattr(PlaidTransaction, c) for c in AGGREGATE_COLUMNS]
+    result = db.execute(
+        select(PlaidTransaction.provider_txn_id, *columns).where(
+            PlaidTransaction.user_id == user_id,
+            PlaidTransaction.provider_txn_id.in_(txn_ids),
+        )
+    )
+    return {row[0]: dict(zip(AGGREGATE_COLUMNS, row[1:])) for row in result}
+
+
+def apply_spend_deltas(
+    db: Session,
+    user_id: uuid.UUID,
+    delta: SpendDelta,
+    now: datetime | None = None,
+) -> dict[str, int]:
+    """Fold delta into user_spend_aggregate and refresh the plaid features it touches.
+
+    Keys whose count drops to zero lose both their aggregate row and their
+    plaid UserFeature.  Returns the new count for every touched key.
+    """
+    rows = [
+        {"user_id": user_id, "key": key, "count": count, "total_cents": total, "last_seen": last_seen}
+        for key, (count, total, last_seen) in delta.entries.items()
+        if count or total
+    ]
+    if not rows:
+        return {}
+    now = now or datetime.now(UTC)
+
+    table = UserSpendAggregate.__table__
+    stmt = pg_insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "total_cents": table.c.total_cents + stmt.excluded.total_cents,
+            "last_seen": func.greatest(table.c.last_seen, stmt.excluded.last_seen),
+        },
+    ).returning(table.c.key, table.c.count)
+    counts = {key: count for key, count in db.execute(stmt)}
+
+    gone = [key for key, count in counts.items() if count <= 0]
+    if gone:
+        db.execute(
+            delete(UserSpendAggregate).where(UserSpendAggregate.user_id == user_id, UserSpendAggregate.key.in_(gone))
+        )
+        db.execute(
+            delete(UserFeature).where(
+                UserFeature.user_id == user_id,
+                UserFeature.source == "plaid",
+                UserFeature.feature_key.in_(gone),
+            )
+        )
+    upsert_features(
+        db,
+        user_id,
+        "plaid",
+        {key: (count, plaid_confidence(count)) for key, count in counts.items() if count > 0},
+        now=now,
+    )
+    return counts
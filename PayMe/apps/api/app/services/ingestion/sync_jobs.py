@@ -0,0 +1,356 @@
+"""Postgres-backed queue for Gmail/Plaid sync runs.
+
+The sync routes enqueue a SyncJob and return immediately; the sync worker
+(``python -m app.services.ingestion.sync_worker``) claims and runs jobs.
+
+- Coalescing: ``uq_sync_job_active`` allows one queued/running job per
+  (user, provider).  Enqueueing while one exists returns that job instead of
+  creating a duplicate.
+- Claiming: ``FOR UPDATE SKIP LOCKED``, like the autofill worker.  Claims are
+  serialized with a transaction-scoped advisory lock so the global and
+  per-provider concurrency limits and per-provider start rate (job starts per
+  rolling minute) hold across worker processes.
+- Retries: ValueError from a sync (e.g. revoked credentials) fails the job;
+  other errors are re-queued with exponential backoff up to sync_max_retries.
+- Liveness: a running sync refreshes ``heartbeat_at`` after every page/chunk
+  (at most once per sync_heartbeat_interval_seconds).  A job whose heartbeat
+  is older than sync_heartbeat_timeout_seconds lost its worker; it is
+  re-queued like any other failed attempt, or failed once out of retries.
+- Scheduling: ``schedule_periodic_syncs`` enqueues incremental syncs for
+  users whose last sync is older than their ``finance_check_frequency``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.entities import SyncJob, User
+from app.services.ingestion.gmail_sync import sync_gmail
+from app.services.ingestion.plaid_sync import sync_plaid
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("gmail", "plaid")
+ACTIVE_STATUSES = {"queued", "running"}
+TERMINAL_STATUSES = {"done", "failed"}
+
+# finance_check_frequency -> minimum age of the last sync before a periodic run.
+FREQUENCY_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+    "biweekly": timedelta(weeks=2),
+    "monthly": timedelta(days=30),
+}
+
+# pg_advisory_xact_lock key serializing claim decisions across workers.
+_CLAIM_LOCK_KEY = 0x5359_4E43  # "SYNC"
+_ACTIVE_WHERE = SyncJob.status.in_(ACTIVE_STATUSES)
+
+
+def _provider_limits(provider: str) -> tuple[int, int]:
+    """(max concurrent running jobs, max job starts per minute) for provider."""
+    return (
+        getattr(settings, f"sync_{provider}_max_concurrency"),
+        getattr(settings, f"sync_{provider}_starts_per_minute"),
+    )
+
+
+def enqueue_sync(
+    db: Session,
+    user_id: uuid.UUID,
+    provider: str,
+    trigger: str = "manual",
+    now: datetime | None = None,
+) -> SyncJob:
+    """Return the active sync job for (user, provider), creating one if needed.
+
+    A request that coalesces onto a queued job pulls its run_after forward,
+    so a manual sync is never held back by a scheduled one.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown sync provider: {provider}")
+    now = now or datetime.now(UTC)
+    stmt = pg_insert(SyncJob).values(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        provider=provider,
+        status="queued",
+        trigger=trigger,
+        attempt_count=0,
+        run_after=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "provider"],
+        index_where=_ACTIVE_WHERE,
+        set_={"run_after": func.least(SyncJob.run_after, stmt.excluded.run_after)},
+    ).returning(SyncJob.id)
+    job_id = db.execute(stmt).scalar_one()
+    job = db.get(SyncJob, job_id, populate_existing=True)
+    assert job is not None
+    return job
+
+
+def get_sync_job(db: Session, job_id: uuid.UUID, user_id: uuid.UUID) -> SyncJob | None:
+    """Fetch a sync job with ownership check. Returns None if not found or not owned."""
+    return db.scalar(select(SyncJob).where(SyncJob.id == job_id, SyncJob.user_id == user_id))
+
+
+def claim_next_job(db: Session, now: datetime | None = None) -> SyncJob | None:
+    """Claim the next runnable job within the concurrency and rate limits.
+
+    Must run in its own short transaction: the advisory lock is held until
+    the caller commits.
+    """
+    now = now or datetime.now(UTC)
+    db.execute(select(func.pg_advisory_xact_lock(_CLAIM_LOCK_KEY)))
+
+    running = dict(
+        db.execute(
+            select(SyncJob.provider, func.count())
+            .where(SyncJob.status == "running")
+            .group_by(SyncJob.provider)
+        ).all()
+    )
+    if sum(running.values()) >= settings.sync_max_concurrency:
+        return None
+    recent_starts = dict(
+        db.execute(
+            select(SyncJob.provider, func.count())
+            .where(SyncJob.started_at > now - timedelta(minutes=1))
+            .group_by(SyncJob.provider)
+        ).all()
+    )
+    eligible = []
+    for provider in PROVIDERS:
+        max_running, max_starts = _provider_limits(provider)
+        if running.get(provider, 0) < max_running and recent_starts.get(provider, 0) < max_starts:
+            eligible.append(provider)
+    if not eligible:
+        return None
+
+    job = db.scalar(
+        select(SyncJob)
+        .where(
+            SyncJob.status == "queued",
+            SyncJob.run_after <= now,
+            SyncJob.provider.in_(eligible),
+        )
+        .order_by(SyncJob.run_after.asc(), SyncJob.created_at.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job is None:
+        return None
+    job.status = "running"
+    job.started_at = now
+    job.heartbeat_at = now
+    job.attempt_count = (job.attempt_count or 0) + 1
+    db.flush()
+    return job
+
+
+class _Heartbeat:
+    """Refreshes a running job's heartbeat_at, at most once per interval.
+
+    Called by the syncs after each page/chunk.  Writes go through their own
+    session so they are visible while the sync's transaction is still open.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], job_id: uuid.UUID) -> None:
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self._next_write = time.monotonic() + settings.sync_heartbeat_interval_seconds
+
+    def __call__(self) -> None:
+        if time.monotonic() < self._next_write:
+            return
+        self._next_write = time.monotonic() + settings.sync_heartbeat_interval_seconds
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(SyncJob)
+                .where(SyncJob.id == self.job_id, SyncJob.status == "running")
+                .values(heartbeat_at=datetime.now(UTC))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+def _dispatch(db: Session, user: User, provider: str, heartbeat: Callable[[], None] | None) -> dict:
+    if provider == "gmail":
+        return sync_gmail(db, user, heartbeat=heartbeat)
+    return sync_plaid(db, user, heartbeat=heartbeat)
+
+
+def run_job(db: Session, job_id: uuid.UUID, heartbeat: Callable[[], None] | None = None) -> SyncJob:
+    """Run a claimed job to completion and record its outcome.
+
+    heartbeat, if given, is called after every page/chunk the sync writes.
+    """
+    job = db.get(SyncJob, job_id)
+    assert job is not None
+    user = db.get(User, job.user_id)
+    provider = job.provider
+    if user is None:
+        return _finish(db, job_id, "failed", error_message="user not found")
+    try:
+        result = _dispatch(db, user, provider, heartbeat)
+        db.commit()
+    except ValueError as exc:
+        # Not retryable (bad/revoked credentials).  Keep state the sync
+        # recorded before failing, e.g. PlaidItem.status = requires_reauth.
+        try:
+            db.commit()
+        except Exception:  # noqa: BLE001
+            db.rollback()
+        logger.warning("sync_job_failed job_id=%s provider=%s error=%s", job_id, provider, str(exc)[:300])
+        return _finish(db, job_id, "failed", error_message=str(exc))
+    except Exception as exc:  # noqa: BLE001
+        db.rollback()
+        logger.exception("sync_job_error job_id=%s provider=%s", job_id, provider)
+        return _retry_or_fail(db, job_id, str(exc))
+    return _finish(db, job_id, "done", result=result)
+
+
+def _finish(
+    db: Session,
+    job_id: uuid.UUID,
+    status: str,
+    result: dict | None = None,
+    error_message: str | None = None,
+) -> SyncJob:
+    job = db.get(SyncJob, job_id, populate_existing=True)
+    job.status = status
+    job.completed_at = datetime.now(UTC)
+    job.result_json = result
+    job.error_message = error_message
+    db.commit()
+    # Load the committed state so callers can read it after the session closes.
+    db.refresh(job)
+    return job
+
+
+def _retry_delay_seconds(attempt_count: int) -> int:
+    return settings.sync_retry_delay_seconds * 2 ** (attempt_count - 1)
+
+
+def _retry_or_fail(db: Session, job_id: uuid.UUID, error_message: str) -> SyncJob:
+    job = db.get(SyncJob, job_id, populate_existing=True)
+    if job.attempt_count >= settings.sync_max_retries:
+        return _finish(db, job_id, "failed", error_message=error_message)
+    delay = _retry_delay_seconds(job.attempt_count)
+    job.status = "queued"
+    job.run_after = datetime.now(UTC) + timedelta(seconds=delay)
+    job.error_message = error_message
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_next_job(session_factory: Callable[[], Session], now: datetime | None = None) -> SyncJob | None:
+    """Claim one job in a short transaction, then run it in a fresh session."""
+    db = session_factory()
+    try:
+        job = claim_next_job(db, now)
+        job_id = job.id if job is not None else None
+        db.commit()
+    finally:
+        db.close()
+    if job_id is None:
+        return None
+
+    db = session_factory()
+    try:
+        return run_job(db, job_id, heartbeat=_Heartbeat(session_factory, job_id))
+    finally:
+        db.close()
+
+
+def requeue_stale_jobs(db: Session, now: datetime | None = None) -> tuple[int, int]:
+    """Recover running jobs whose heartbeat went stale (their worker died).
+
+    The lost run already counted as an attempt when it was claimed, so a
+    stale job is handled like one that raised: failed once it has used
+    sync_max_retries attempts, otherwise re-queued with the usual backoff.
+    Returns (requeued, failed).
+    """
+    now = now or datetime.now(UTC)
+    cutoff = now - timedelta(seconds=settings.sync_heartbeat_timeout_seconds)
+    stale = (
+        SyncJob.status == "running",
+        func.coalesce(SyncJob.heartbeat_at, SyncJob.started_at) < cutoff,
+    )
+    error_message = "sync worker stopped heartbeating"
+    failed = db.execute(
+        update(SyncJob)
+        .where(*stale, SyncJob.attempt_count >= settings.sync_max_retries)
+        .values(status="failed", completed_at=now, error_message=error_message)
+    ).rowcount
+    # Same backoff as _retry_or_fail, computed per row.
+    backoff = literal(timedelta(seconds=_retry_delay_seconds(1))) * func.power(2, SyncJob.attempt_count - 1)
+    requeued = db.execute(
+        update(SyncJob)
+        .where(*stale)
+        .values(status="queued", run_after=literal(now) + backoff, error_message=error_message)
+    ).rowcount
+    return requeued, failed
+
+
+def schedule_periodic_syncs(db: Session, now: datetime | None = None) -> int:
+    """Enqueue incremental syncs that are due per finance_check_frequency.
+
+    Only users who have synced a provider before are scheduled for it; users
+    with an active job for that provider are skipped by the partial unique
+    index.  Returns the number of jobs created.
+    """
+    now = now or datetime.now(UTC)
+    synced_at_cols = {"gmail": User.gmail_synced_at, "plaid": User.plaid_synced_at}
+    created = 0
+    for provider, synced_at in synced_at_cols.items():
+        for frequency, interval in FREQUENCY_INTERVALS.items():
+            due = select(
+                func.gen_random_uuid(),
+                User.id,
+                literal(provider),
+                literal("queued"),
+                literal("scheduled"),
+                literal(0),
+                literal(now),
+            ).where(
+                User.finance_check_frequency == frequency,
+                synced_at.is_not(None),
+                synced_at <= now - interval,
+            )
+            stmt = pg_insert(SyncJob).from_select(
+                ["id", "user_id", "provider", "status", "trigger", "attempt_count", "run_after"], due
+            )
+            stmt = stmt.on_conflict_do_nothing(index_elements=["user_id", "provider"], index_where=_ACTIVE_WHERE)
+            created += len(db.execute(stmt.returning(SyncJob.id)).all())
+    return created
+
+
+def job_to_dict(job: SyncJob) -> dict:
+    return {
+        "job_id": str(job.id),
+        "provider": job.provider,
+        "status": job.status,
+        "trigger": job.trigger,
+        "attempt_count": job.attempt_count,
+        "result": job.result_json,
+        "error_message": job.error_message,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+    }
@@ -0,0 +1,111 @@
+"""Sync worker — runs queued Gmail/Plaid sync jobs.
+
+Run with:
+    python -m app.services.ingestion.sync_worker
+
+Loop:
+    1. Every sync_schedule_interval_seconds: re-queue (or fail, once out of
+       retries) running jobs whose heartbeat is stale, and enqueue periodic
+       syncs that are due (finance_check_frequency).
+    2. sync_max_concurrency threads each claim a job (FOR UPDATE SKIP LOCKED,
+       within the global / per-provider limits) and run it.
+    3. A thread with nothing to claim sleeps sync_poll_interval_seconds.
+
+Any number of worker processes may run; limits are enforced in the database.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.db import SessionLocal
+from app.core.settings import settings
+from app.services.ingestion.sync_jobs import requeue_stale_jobs, run_next_job, schedule_periodic_syncs
+
+logger = logging.getLogger("app.sync_worker")
+
+
+def run_scheduler_tick(session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """Re-queue stale jobs and enqueue due periodic syncs. Returns jobs scheduled."""
+    db = session_factory()
+    try:
+        requeued, failed = requeue_stale_jobs(db)
+        scheduled = schedule_periodic_syncs(db)
+        db.commit()
+    finally:
+        db.close()
+    if requeued or failed or scheduled:
+        logger.info(
+            "sync_scheduler_tick stale_requeued=%s stale_failed=%s scheduled=%s", requeued, failed, scheduled
+        )
+    return scheduled
+
+
+def drain(session_factory: Callable[[], Session] = SessionLocal, max_jobs: int | None = None) -> int:
+    """Run jobs until none is claimable (or max_jobs ran). Returns jobs run."""
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        if run_next_job(session_factory) is None:
+            break
+        ran += 1
+    return ran
+
+
+def _job_loop(session_factory: Callable[[], Session], stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            job = run_next_job(session_factory)
+        except Exception:  # noqa: BLE001
+            logger.exception("sync_worker_claim_failed")
+            job = None
+        if job is None:
+            stop.wait(settings.sync_poll_interval_seconds)
+
+
+def run_worker(session_factory: Callable[[], Session] = SessionLocal, stop: threading.Event | None = None) -> None:
+    """Run the scheduler and job threads until stop is set."""
+    stop = stop or threading.Event()
+    logger.info(
+        "Sync worker started. concurrency=%s gmail=%s/%s per min plaid=%s/%s per min",
+        settings.sync_max_concurrency,
+        settings.sync_gmail_max_concurrency,
+        settings.sync_gmail_starts_per_minute,
+        settings.sync_plaid_max_concurrency,
+        settings.sync_plaid_starts_per_minute,
+    )
+    threads = [
+        threading.Thread(target=_job_loop, args=(session_factory, stop), name=f"sync-worker-{i}", daemon=True)
+        for i in range(settings.sync_max_concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while not stop.is_set():
+            try:
+                run_scheduler_tick(session_factory)
+            except Exception:  # noqa: BLE001
+                logger.exception("sync_scheduler_tick_failed")
+            stop.wait(settings.sync_schedule_interval_seconds)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
+    )
+    try:
+        run_worker()
+    except KeyboardInterrupt:
+        logger.info("Sync worker stopped.")
+
+
+if __name__ == "__main__":
+    main()
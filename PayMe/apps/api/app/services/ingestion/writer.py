@@ -0,0 +1,178 @@
+"""Set-based ingestion writer for provider records (Gmail messages, Plaid transactions).
+
+Sync paths used to run one ``SELECT ... WHERE provider_*_id = ?`` per record
+before ``db.add``.  The unique constraints ``uq_user_provider_msg`` and
+``uq_user_provider_txn`` already guarantee de-duplication, so the writer
+buffers parsed rows and lets Postgres resolve conflicts:
+
+    INSERT ... ON CONFLICT (user_id, provider_*_id) DO NOTHING | DO UPDATE
+    RETURNING (xmax = 0)
+
+``xmax = 0`` is true only for freshly inserted tuples, so the inserted count
+comes back with the statement instead of needing per-row lookups.
+
+On psycopg 3 connections with libpq pipeline support, a flushed chunk is sent
+through a pipeline (one network sync per chunk).  Other drivers fall back to
+one multi-row INSERT per chunk.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from sqlalchemy import JSON, bindparam, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+try:
+    import psycopg
+    from psycopg.types.json import Json
+except ImportError:  # pragma: no cover - psycopg is a hard dependency in production
+    psycopg = None  # type: ignore[assignment]
+    Json = None  # type: ignore[assignment]
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _pipeline_connection(db: Session):
+    """Return the raw psycopg connection if pipeline mode is usable, else None."""
+    if psycopg is None or not psycopg.Pipeline.is_supported():
+        return None
+    driver_conn = db.connection().connection.driver_connection
+    return driver_conn if isinstance(driver_conn, psycopg.Connection) else None
+
+
+class IngestionWriter:
+    """Buffer rows for one table and write them with chunked INSERT ... ON CONFLICT.
+
+    ``conflict_cols`` must match a unique constraint on the table.  When
+    ``update_cols`` is empty conflicting rows are left untouched (DO NOTHING);
+    otherwise those columns are overwritten from the incoming row (DO UPDATE).
+    With ``compare_cols`` a conflicting row is only updated when one of those
+    columns differs from the incoming row, so unchanged rows keep their
+    ``updated_at`` and are not rewritten.
+
+    Rows sharing a conflict key within one flush are collapsed (last one wins),
+    because Postgres refuses to touch the same row twice in one statement.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        model: Any,
+        conflict_cols: Sequence[str],
+        update_cols: Sequence[str] = (),
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        compare_cols: Sequence[str] = (),
+    ) -> None:
+        self.db = db
+        self.table = model.__table__
+        self.conflict_cols = tuple(conflict_cols)
+        self.update_cols = tuple(update_cols)
+        self.compare_cols = tuple(compare_cols)
+        self.chunk_size = chunk_size
+        self.inserted = 0
+        self.changed = 0  # inserted plus updated; rows skipped by compare_cols are not counted
+        self.written = 0
+        self._buffer: dict[tuple, dict] = {}
+        self._json_cols = {c.name for c in self.table.columns if isinstance(c.type, JSON)}
+
+    def __enter__(self) -> "IngestionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def add(self, row: dict) -> None:
+        """Buffer one row; flushes automatically once chunk_size rows are pending."""
+        self._buffer[tuple(row[c] for c in self.conflict_cols)] = row
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def flush(self) -> int:
+        """Write all buffered rows. Returns the number of newly inserted rows."""
+        if not self._buffer:
+            return 0
+        rows = [self._with_defaults(row) for row in self._buffer.values()]
+        self._buffer.clear()
+        # Multi-row VALUES and executemany both need a uniform column set.
+        columns = list(dict.fromkeys(c for row in rows for c in row))
+        rows = [{c: row.get(c) for c in columns} for row in rows]
+        # Pending ORM changes (e.g. the owning user row) must reach the DB first.
+        self.db.flush()
+
+        pipeline_conn = _pipeline_connection(self.db)
+        if pipeline_conn is not None:
+            flags = self._write_pipelined(pipeline_conn, columns, rows)
+        else:
+            flags = [
+                flag
+                for i in range(0, len(rows), self.chunk_size)
+                for flag in self._write_chunk(rows[i : i + self.chunk_size])
+            ]
+        inserted = sum(1 for flag in flags if flag)
+        self.inserted += inserted
+        self.changed += len(flags)
+        self.written += len(rows)
+        return inserted
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _with_defaults(self, row: dict) -> dict:
+        """Fill Python-side column defaults (e.g. uuid4 primary keys) Core inserts skip."""
+        full = dict(row)
+        for col in self.table.columns:
+            if col.name in full or col.default is None:
+                continue
+            default = col.default
+            if default.is_callable:
+                full[col.name] = default.arg(None)
+            elif default.is_scalar:
+                full[col.name] = default.arg
+        return full
+
+    def _statement(self, values):
+        stmt = pg_insert(self.table).values(values)
+        if self.update_cols:
+            changed = None
+            if self.compare_cols:
+                changed = tuple_(*(self.table.c[c] for c in self.compare_cols)).is_distinct_from(
+                    tuple_(*(stmt.excluded[c] for c in self.compare_cols))
+                )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(self.conflict_cols),
+                set_={c: stmt.excluded[c] for c in self.update_cols},
+                where=changed,
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(self.conflict_cols))
+        return stmt.returning(literal_column("(xmax = 0)"))
+
+    def _write_chunk(self, rows: list[dict]) -> list[bool]:
+        """Returns the (xmax = 0) flag of every row inserted or updated."""
+        return list(self.db.execute(self._statement(rows)).scalars())
+
+    def _write_pipelined(self, conn, columns: list[str], rows: list[dict]) -> list[bool]:
+        stmt = self._statement({c: bindparam(c) for c in columns})
+        sql = str(stmt.compile(dialect=self.db.get_bind().dialect))
+        params = [
+            {c: Json(v) if c in self._json_cols and v is not None else v for c, v in row.items()}
+            for row in rows
+        ]
+        flags: list[bool] = []
+        # executemany inside a pipeline queues every INSERT before the first sync.
+        with conn.pipeline(), conn.cursor() as cur:
+            cur.executemany(sql, params, returning=True)
+            while True:
+                flags.extend(flag for (flag,) in cur.fetchall())
+                if not cur.nextset():
+                    break
+        return flags
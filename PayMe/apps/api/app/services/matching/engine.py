@@ -19,11 +19,13 @@ from app.models.entities import (
     UserSettlementPreference,
 )
 from app.services.events.service import emit_event
+from app.services.ml.model_registry import active_weights
 
 VARIANTS = ["rules_only", "rules_vector", "rules_vector_ranker"]
 
 
 def _load_ranker_weights() -> dict:
+    # Used until a model is active in the ranker_models registry.
     # Prefer current working directory for tests/scripts, then fall back to workspace root.
     weights_path = Path("artifacts/weights.json")
     if not weights_path.exists():
@@ -121,7 +123,7 @@ def run_match(db: Session, user: User, top_n: int = 20) -> MatchRun:
 
     settlements = db.scalars(select(Settlement)).all()
     candidate_rows: list[tuple[Settlement, float, list[str], list[str], dict]] = []
-    weights = _load_ranker_weights()
+    weights = active_weights(db, fallback=_load_ranker_weights)
     for settlement in settlements:
         predicates = settlement.eligibility_predicates or {}
         required = predicates.get("required_features", [])
@@ -0,0 +1,234 @@
+"""Streaming serializers for the ML feedback dataset.
+
+The dataset endpoints used to build every sample dict, then one JSON document.
+These helpers turn the chunked cursor output of
+``feedback.iter_dataset_partitions`` into byte chunks that can go straight to a
+``StreamingResponse`` or a file, so memory stays bounded by one chunk:
+
+- ``app.core.streaming.ndjson_chunks(rows)``: one JSON object per line.
+- ``json_array_chunks(rows)``: a compact JSON list (the ``feedback_export.json``
+  format ``app.services.ml.ranker`` reads).
+- ``columnar_chunks(partitions, fmt)``: Arrow IPC stream (``fmt="arrow"``) or
+  Parquet (``fmt="parquet"``), one record batch / row group per partition.
+  Needs the optional ``pyarrow`` package: pip install -e ".[arrow]".
+- ``write_training_arrays(partitions, out_dir)``: the labeled rows as ``.npy``
+  arrays that ``app.services.ml.ranker`` memory-maps instead of parsing JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from app.core.streaming import FLUSH_BYTES, compact_json
+from app.services.ml.feedback import DATASET_FIELDS, FEATURE_KEYS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional: pip install -e ".[arrow]"
+    pa = None  # type: ignore[assignment]
+    pq = None  # type: ignore[assignment]
+
+ARROW_AVAILABLE = pa is not None
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+_UUID_FIELDS = ("id", "user_id", "settlement_id", "run_id")
+
+
+def json_array_chunks(rows: Iterable[dict], flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """Encode rows as one compact JSON list, yielding roughly flush_bytes at a time."""
+    buffer: list[str] = ["["]
+    size = 1
+    first = True
+    for row in rows:
+        item = compact_json(row) if first else "," + compact_json(row)
+        first = False
+        buffer.append(item)
+        size += len(item)
+        if size >= flush_bytes:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            size = 0
+    buffer.append("]")
+    yield "".join(buffer).encode()
+
+
+# ---------------------------------------------------------------------------
+# Arrow / Parquet
+# ---------------------------------------------------------------------------
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def dataset_schema():
+    """Arrow schema for ml_feedback_samples rows, in ``DATASET_FIELDS`` order."""
+    string_fields = {name: pa.string() for name in (*_UUID_FIELDS, "outcome")}
+    float_fields = {name: pa.float64() for name in FEATURE_KEYS}
+    types = {
+        **string_fields,
+        **float_fields,
+        "label": pa.int32(),
+        "export_version": pa.int32(),
+        "created_at": pa.timestamp("us", tz="UTC"),
+        "updated_at": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([pa.field(name, types[name]) for name in DATASET_FIELDS])
+
+
+def record_batch(partition: Sequence[Sequence], schema=None):
+    """Build one Arrow record batch from a partition of dataset rows."""
+    schema = schema or dataset_schema()
+    columns = list(zip(*partition)) if partition else [()] * len(DATASET_FIELDS)
+    arrays = []
+    for name, values in zip(DATASET_FIELDS, columns):
+        if name in _UUID_FIELDS:
+            values = [str(v) if v is not None else None for v in values]
+        arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def columnar_chunks(partitions: Iterable[Sequence[Sequence]], fmt: str) -> Iterator[bytes]:
+    """Encode dataset partitions as an Arrow IPC stream or a Parquet file."""
+    if pa is None:
+        raise ValueError('pyarrow is not installed: pip install -e ".[arrow]"')
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+    schema = dataset_schema()
+    sink = _ChunkSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for partition in partitions:
+            batch = record_batch(partition, schema)
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch]))
+            data = sink.drain()
+            if data:
+                yield data
+    except BaseException:
+        writer.close()
+        raise
+    # Closing writes the end-of-stream marker / Parquet footer.
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+# ---------------------------------------------------------------------------
+# Training arrays (.npy)
+# ---------------------------------------------------------------------------
+# Layout read by app/services/ml/ranker.py (keep the two in sync):
+#   X.npy      float64 (n, len(features)), C order, labeled rows only
+#   y.npy      int8 (n,), 0/1 labels
+#   groups.npy int64 (n,), dense per-user codes (first-seen order)
+#   meta.json  {format, features, sample_count, labeled_count}; written last,
+#              so a directory without it is an incomplete export.
+
+TRAINING_ARRAYS_FORMAT = "payme-ranker-npy/1"
+
+
+def _finish_npy(raw_path: Path, dest: Path, dtype: np.dtype, shape: tuple[int, ...]) -> None:
+    """Prefix raw little-endian array bytes with an .npy header, then move into place."""
+    tmp = dest.with_name(dest.name + ".tmp")
+    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape}
+    with tmp.open("wb") as out, raw_path.open("rb") as raw:
+        np.lib.format.write_array_header_1_0(out, header)
+        shutil.copyfileobj(raw, out, length=1024 * 1024)
+    os.replace(tmp, dest)
+
+
+def write_training_arrays(partitions: Iterable[Sequence[Sequence]], out_dir: Path) -> dict:
+    """Write labeled dataset partitions as memory-mappable .npy arrays.
+
+    Rows are appended to raw scratch files one partition at a time, so memory
+    is bounded by one partition plus the user-code map.  Returns the
+    meta.json contents.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "meta.json").unlink(missing_ok=True)
+    feature_idx = [DATASET_FIELDS.index(name) for name in FEATURE_KEYS]
+    label_idx = DATASET_FIELDS.index("label")
+    user_idx = DATASET_FIELDS.index("user_id")
+
+    x_dtype, y_dtype, g_dtype = np.dtype("<f8"), np.dtype("i1"), np.dtype("<i8")
+    user_codes: dict = {}
+    sample_count = 0
+    labeled_count = 0
+    with tempfile.TemporaryDirectory(dir=out_dir) as scratch:
+        raw = {name: Path(scratch) / f"{name}.raw" for name in ("X", "y", "groups")}
+        with raw["X"].open("wb") as xf, raw["y"].open("wb") as yf, raw["groups"].open("wb") as gf:
+            for partition in partitions:
+                sample_count += len(partition)
+                labeled = [row for row in partition if row[label_idx] is not None]
+                if not labeled:
+                    continue
+                labeled_count += len(labeled)
+                xf.write(
+                    np.array([[row[i] for i in feature_idx] for row in labeled], dtype=x_dtype).tobytes()
+                )
+                yf.write(np.array([row[label_idx] for row in labeled], dtype=y_dtype).tobytes())
+                gf.write(
+                    np.array(
+                        [user_codes.setdefault(row[user_idx], len(user_codes)) for row in labeled],
+                        dtype=g_dtype,
+                    ).tobytes()
+                )
+        _finish_npy(raw["X"], out_dir / "X.npy", x_dtype, (labeled_count, len(feature_idx)))
+        _finish_npy(raw["y"], out_dir / "y.npy", y_dtype, (labeled_count,))
+        _finish_npy(raw["groups"], out_dir / "groups.npy", g_dtype, (labeled_count,))
+
+    meta = {
+        "format": TRAINING_ARRAYS_FORMAT,
+        "features": list(FEATURE_KEYS),
+        "sample_count": sample_count,
+        "labeled_count": labeled_count,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return meta
@@ -2,16 +2,22 @@
 ML feedback loop service — Track 1.
 
 Materializes labeled training samples from match results and claim outcomes,
-then upserts them into the ml_feedback_samples table.
+then upserts them into the ml_feedback_samples table.  Exports are
+incremental: a watermark in ml_export_watermarks records where the last run
+stopped, so each run only re-reads pairs that changed since then.
 """
 
-from datetime import UTC, datetime
+from collections.abc import Callable, Iterator, Sequence
+from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import select
+from sqlalchemy import Row, and_, func, select, union, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.models.entities import MatchResult, MlFeedbackSample, UserSettlementPreference
+from app.core.settings import settings
+from app.models.entities import MatchResult, MlExportWatermark, MlFeedbackSample, UserSettlementPreference
 from app.services.events.service import emit_event
+from app.services.ingestion.writer import IngestionWriter
 
 # ---------------------------------------------------------------------------
 # Label assignment rules
@@ -22,7 +28,13 @@ from app.services.events.service import emit_event
 # no claim_status (None / missing pref)   -> label=0,    outcome='ignored'
 # ---------------------------------------------------------------------------
 
-_FEATURE_KEYS = ("rules_confidence", "similarity", "payout", "urgency", "ease")
+FEATURE_KEYS = ("rules_confidence", "similarity", "payout", "urgency", "ease")
+_SAMPLE_UPDATE_COLS = ("run_id", *FEATURE_KEYS, "label", "outcome", "updated_at")
+# A re-exported sample is only rewritten (and re-stamped) when its training
+# content changed, so updated_at marks new training data for incremental runs.
+_SAMPLE_COMPARE_COLS = (*FEATURE_KEYS, "label", "outcome")
+
+WATERMARK_NAME = "feedback_samples"
 
 
 def _extract_features(reasons_json: dict) -> dict:
@@ -53,118 +65,245 @@ def _assign_label(claim_status: str | None) -> tuple[int | None, str]:
     return 0, "ignored"
 
 
-def export_labeled_samples(db: Session) -> list[dict]:
-    """Join match_results + user_settlement_preferences to create labeled training samples.
+def _claim_watermark(db: Session) -> datetime | None:
+    """Lock the export watermark row (created on first use) and return its value.
+
+    The row lock serialises concurrent exports, so two runs never move the
+    watermark past rows the other has not written yet.
+    """
+    db.execute(
+        pg_insert(MlExportWatermark).values(name=WATERMARK_NAME).on_conflict_do_nothing()
+    )
+    return db.scalar(
+        select(MlExportWatermark.watermark)
+        .where(MlExportWatermark.name == WATERMARK_NAME)
+        .with_for_update()
+    )
 
-    For each (user_id, settlement_id) pair that has a MatchResult, extract feature
-    signals and a label derived from the claim lifecycle, then upsert into
-    ml_feedback_samples.  When a row already exists for a (user_id, settlement_id)
-    pair the label, outcome, and feature snapshot are refreshed.
 
-    Emits an ``ml_export_completed`` event with sample_count and labeled_count.
+def _latest_results_query(since: datetime | None):
+    """Latest MatchResult per (user, settlement) joined to its claim preference.
 
-    Returns a list of exported row dicts.
+    With ``since`` set, only pairs with a match result or preference change at
+    or after ``since`` are returned.
     """
-    match_results = db.scalars(select(MatchResult)).all()
+    pref_join = and_(
+        UserSettlementPreference.user_id == MatchResult.user_id,
+        UserSettlementPreference.settlement_id == MatchResult.settlement_id,
+    )
+    stmt = (
+        select(
+            MatchResult.user_id,
+            MatchResult.settlement_id,
+            MatchResult.run_id,
+            MatchResult.reasons_json,
+            UserSettlementPreference.claim_status,
+        )
+        .outerjoin(UserSettlementPreference, pref_join)
+        .distinct(MatchResult.user_id, MatchResult.settlement_id)
+        .order_by(
+            MatchResult.user_id,
+            MatchResult.settlement_id,
+            MatchResult.created_at.desc(),
+            MatchResult.id.desc(),
+        )
+    )
+    if since is not None:
+        changed = union(
+            select(MatchResult.user_id, MatchResult.settlement_id).where(MatchResult.created_at >= since),
+            select(UserSettlementPreference.user_id, UserSettlementPreference.settlement_id).where(
+                UserSettlementPreference.updated_at >= since
+            ),
+        ).subquery()
+        stmt = stmt.join(
+            changed,
+            and_(
+                changed.c.user_id == MatchResult.user_id,
+                changed.c.settlement_id == MatchResult.settlement_id,
+            ),
+        )
+    return stmt
 
-    # Build a lookup from (user_id, settlement_id) -> UserSettlementPreference
-    prefs = db.scalars(select(UserSettlementPreference)).all()
-    pref_map: dict[tuple, UserSettlementPreference] = {
-        (p.user_id, p.settlement_id): p for p in prefs
-    }
 
-    # Pre-load existing feedback samples keyed by (user_id, settlement_id)
-    existing_samples = db.scalars(select(MlFeedbackSample)).all()
-    sample_map: dict[tuple, MlFeedbackSample] = {
-        (s.user_id, s.settlement_id): s for s in existing_samples
-    }
+def refresh_labeled_samples(
+    db: Session,
+    full: bool = False,
+    on_sample: Callable[[dict], None] | None = None,
+) -> dict:
+    """Upsert labeled training samples for match results changed since the last export.
 
-    exported: list[dict] = []
-    now = datetime.now(UTC)
+    For each (user_id, settlement_id) pair, the latest MatchResult supplies the
+    feature signals and the pair's claim status supplies the label.  Only pairs
+    whose match results or claim preference changed since the stored watermark
+    (minus ``ml_export_watermark_overlap_seconds``) are read; ``full=True``
+    re-exports every pair.  Rows are streamed in ``ml_export_chunk_size``
+    chunks and written with INSERT ... ON CONFLICT (user_id, settlement_id)
+    DO UPDATE, refreshing the label, outcome, and feature snapshot; samples
+    whose features, label and outcome are unchanged are left as they are.
 
-    for mr in match_results:
-        pref = pref_map.get((mr.user_id, mr.settlement_id))
-        claim_status = pref.claim_status if pref else None
-        label, outcome = _assign_label(claim_status)
-        features = _extract_features(mr.reasons_json or {})
-
-        key = (mr.user_id, mr.settlement_id)
-        existing = sample_map.get(key)
-
-        if existing:
-            existing.label = label
-            existing.outcome = outcome
-            existing.run_id = mr.run_id
-            existing.rules_confidence = features["rules_confidence"]
-            existing.similarity = features["similarity"]
-            existing.payout = features["payout"]
-            existing.urgency = features["urgency"]
-            existing.ease = features["ease"]
-            existing.updated_at = now
-        else:
-            sample = MlFeedbackSample(
-                user_id=mr.user_id,
-                settlement_id=mr.settlement_id,
-                run_id=mr.run_id,
-                rules_confidence=features["rules_confidence"],
-                similarity=features["similarity"],
-                payout=features["payout"],
-                urgency=features["urgency"],
-                ease=features["ease"],
-                label=label,
-                outcome=outcome,
-                export_version=1,
-            )
-            db.add(sample)
-            sample_map[key] = sample
-
-        exported.append(
-            {
-                "user_id": str(mr.user_id),
-                "settlement_id": str(mr.settlement_id),
-                "run_id": str(mr.run_id) if mr.run_id else None,
-                "rules_confidence": features["rules_confidence"],
-                "similarity": features["similarity"],
-                "payout": features["payout"],
-                "urgency": features["urgency"],
-                "ease": features["ease"],
-                "label": label,
-                "outcome": outcome,
-            }
-        )
+    ``on_sample`` is called with each exported row dict.  Emits an
+    ``ml_export_completed`` event with sample_count and labeled_count.
+
+    Returns {sample_count, labeled_count, changed_count, exported_at}: rows
+    read, labeled rows read, and samples inserted or changed.  Those changed
+    samples are exactly the ones with ``updated_at == exported_at``.
+    """
+    watermark = _claim_watermark(db)
+    started = db.scalar(select(func.now()))
+    since = None
+    if watermark is not None and not full:
+        since = watermark - timedelta(seconds=settings.ml_export_watermark_overlap_seconds)
+
+    sample_count = 0
+    labeled_count = 0
+    now = datetime.now(UTC)
+    chunk_size = settings.ml_export_chunk_size
 
-    db.flush()
+    with IngestionWriter(
+        db,
+        MlFeedbackSample,
+        conflict_cols=("user_id", "settlement_id"),
+        update_cols=_SAMPLE_UPDATE_COLS,
+        chunk_size=chunk_size,
+        compare_cols=_SAMPLE_COMPARE_COLS,
+    ) as writer:
+        result = db.execute(_latest_results_query(since).execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            for user_id, settlement_id, run_id, reasons_json, claim_status in partition:
+                label, outcome = _assign_label(claim_status)
+                features = _extract_features(reasons_json or {})
+                writer.add(
+                    {
+                        "user_id": user_id,
+                        "settlement_id": settlement_id,
+                        "run_id": run_id,
+                        **features,
+                        "label": label,
+                        "outcome": outcome,
+                        "export_version": 1,
+                        "updated_at": now,
+                    }
+                )
+                sample_count += 1
+                labeled_count += label is not None
+                if on_sample is not None:
+                    on_sample(
+                        {
+                            "user_id": str(user_id),
+                            "settlement_id": str(settlement_id),
+                            "run_id": str(run_id) if run_id else None,
+                            **features,
+                            "label": label,
+                            "outcome": outcome,
+                        }
+                    )
 
-    labeled_count = sum(1 for r in exported if r["label"] is not None)
     emit_event(
         db,
         "ml_export_completed",
-        payload={"sample_count": len(exported), "labeled_count": labeled_count},
+        payload={
+            "sample_count": sample_count,
+            "labeled_count": labeled_count,
+            "incremental": since is not None,
+        },
+    )
+    db.execute(
+        update(MlExportWatermark)
+        .where(MlExportWatermark.name == WATERMARK_NAME)
+        .values(watermark=started)
     )
     db.commit()
 
+    return {
+        "sample_count": sample_count,
+        "labeled_count": labeled_count,
+        "changed_count": writer.changed,
+        "exported_at": now,
+    }
+
+
+def export_labeled_samples(db: Session, full: bool = False) -> list[dict]:
+    """Run ``refresh_labeled_samples`` and return the exported (new or refreshed) row dicts."""
+    exported: list[dict] = []
+    refresh_labeled_samples(db, full=full, on_sample=exported.append)
     return exported
 
 
-def get_labeled_dataset(db: Session) -> list[dict]:
-    """Return all ml_feedback_samples rows as dicts for training consumption."""
-    rows = db.scalars(select(MlFeedbackSample)).all()
-    return [
-        {
-            "id": str(r.id),
-            "user_id": str(r.user_id),
-            "settlement_id": str(r.settlement_id),
-            "run_id": str(r.run_id) if r.run_id else None,
-            "rules_confidence": r.rules_confidence,
-            "similarity": r.similarity,
-            "payout": r.payout,
-            "urgency": r.urgency,
-            "ease": r.ease,
-            "label": r.label,
-            "outcome": r.outcome,
-            "export_version": r.export_version,
-            "created_at": r.created_at.isoformat() if r.created_at else None,
-            "updated_at": r.updated_at.isoformat() if r.updated_at else None,
-        }
-        for r in rows
-    ]
+_DATASET_COLUMNS = (
+    MlFeedbackSample.id,
+    MlFeedbackSample.user_id,
+    MlFeedbackSample.settlement_id,
+    MlFeedbackSample.run_id,
+    MlFeedbackSample.rules_confidence,
+    MlFeedbackSample.similarity,
+    MlFeedbackSample.payout,
+    MlFeedbackSample.urgency,
+    MlFeedbackSample.ease,
+    MlFeedbackSample.label,
+    MlFeedbackSample.outcome,
+    MlFeedbackSample.export_version,
+    MlFeedbackSample.created_at,
+    MlFeedbackSample.updated_at,
+)
+DATASET_FIELDS = tuple(c.key for c in _DATASET_COLUMNS)
+
+
+def iter_dataset_partitions(
+    db: Session,
+    since: datetime | None = None,
+    label_only: bool = False,
+    chunk_size: int | None = None,
+) -> Iterator[Sequence[Row]]:
+    """Stream ml_feedback_samples rows in chunks through a server-side cursor.
+
+    Each partition holds up to ``chunk_size`` rows (default
+    ``ml_export_chunk_size``) whose columns follow ``DATASET_FIELDS``.
+    ``since`` keeps samples updated at or after that time; ``label_only``
+    drops pending (label IS NULL) samples.
+    """
+    stmt = select(*_DATASET_COLUMNS)
+    if since is not None:
+        stmt = stmt.where(MlFeedbackSample.updated_at >= since)
+    if label_only:
+        stmt = stmt.where(MlFeedbackSample.label.is_not(None))
+    chunk_size = chunk_size or settings.ml_export_chunk_size
+    yield from db.execute(stmt.execution_options(yield_per=chunk_size)).partitions()
+
+
+def _dataset_row(row: Row) -> dict:
+    return {
+        "id": str(row.id),
+        "user_id": str(row.user_id),
+        "settlement_id": str(row.settlement_id),
+        "run_id": str(row.run_id) if row.run_id else None,
+        "rules_confidence": row.rules_confidence,
+        "similarity": row.similarity,
+        "payout": row.payout,
+        "urgency": row.urgency,
+        "ease": row.ease,
+        "label": row.label,
+        "outcome": row.outcome,
+        "export_version": row.export_version,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+
+def iter_labeled_dataset(
+    db: Session,
+    since: datetime | None = None,
+    label_only: bool = False,
+) -> Iterator[dict]:
+    """Yield ml_feedback_samples rows as JSON-ready dicts, one chunk in memory at a time."""
+    for partition in iter_dataset_partitions(db, since=since, label_only=label_only):
+        for row in partition:
+            yield _dataset_row(row)
+
+
+def get_labeled_dataset(
+    db: Session,
+    since: datetime | None = None,
+    label_only: bool = False,
+) -> list[dict]:
+    """Return ml_feedback_samples rows as dicts for training consumption."""
+    return list(iter_labeled_dataset(db, since=since, label_only=label_only))
@@ -0,0 +1,367 @@
+"""Postgres-backed registry of ranker weights with cross-process hot swap.
+
+Every training run that produces weights is recorded in ``ranker_models``
+(version, weights, metrics); one row at most is active
+(``uq_ranker_model_active``).
+
+- Activation: ``activate_model`` flips the active row under a
+  transaction-scoped advisory lock and sends ``pg_notify('ranker_models', ...)``
+  carrying the new weights.  Postgres delivers the notification only when the
+  transaction commits, so listeners never see a version that rolled back.
+  Each activation records the version it replaced (``previous_version``);
+  ``rollback_model`` marks the active model rolled back and re-activates
+  that predecessor, so repeated rollbacks walk back through the history.
+- Hot swap: each API process runs ``listen_for_activations`` on a background
+  thread (started from the app lifespan when ``ml_registry_listen`` is set).
+  It holds a dedicated LISTEN connection and swaps the in-memory weights as
+  soon as a notification arrives, so ``active_weights`` costs no file or
+  database I/O per match run.  Without a live listener (scripts, workers,
+  a dropped connection) ``active_weights`` reads the active row instead.
+- Training: the training worker registers each run's weights
+  (``register_training_result``) and activates promoted ones.  Before a run it
+  writes the active model back to ``weights.json`` / ``metrics.json``
+  (``sync_active_artifacts``), so warm starts and promotion comparisons follow
+  rollbacks; weights promoted outside the registry are adopted on first sync.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import uuid
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+
+import psycopg
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.entities import RankerModel
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ranker_models"
+
+# pg_advisory_xact_lock key serializing activations.
+_ACTIVATE_LOCK_KEY = 0x524B_4D44  # "RKMD"
+_LISTEN_POLL_SECONDS = 1.0  # how often the listener checks for shutdown
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+
+def get_model(db: Session, version: int) -> RankerModel | None:
+    return db.scalar(select(RankerModel).where(RankerModel.version == version))
+
+
+def get_active_model(db: Session) -> RankerModel | None:
+    return db.scalar(select(RankerModel).where(RankerModel.is_active.is_(True)))
+
+
+def list_models(db: Session, limit: int = 20) -> list[RankerModel]:
+    return list(db.scalars(select(RankerModel).order_by(RankerModel.version.desc()).limit(limit)))
+
+
+def register_model(
+    db: Session,
+    version: int,
+    weights: dict,
+    metrics: dict | None = None,
+    mode: str = "full",
+    promoted: bool = False,
+    training_job_id: uuid.UUID | None = None,
+) -> RankerModel:
+    """Record (or overwrite) the weights and metrics of one trained version."""
+    model = get_model(db, version)
+    if model is None:
+        model = RankerModel(version=version)
+        db.add(model)
+    model.weights = {**weights, "_version": version}
+    model.metrics = metrics or {}
+    model.mode = mode
+    model.promoted = promoted
+    model.training_job_id = training_job_id
+    db.flush()
+    return model
+
+
+def _lock_activations(db: Session) -> None:
+    db.execute(select(func.pg_advisory_xact_lock(_ACTIVATE_LOCK_KEY)))
+
+
+def activate_model(db: Session, version: int) -> RankerModel | None:
+    """Make ``version`` the active model and notify every listening process on commit.
+
+    The version it replaces becomes its ``previous_version``.  Returns None
+    if the version is not registered.
+    """
+    _lock_activations(db)
+    model = get_model(db, version)
+    if model is None:
+        return None
+    current = get_active_model(db)
+    if current is not None and current.id != model.id:
+        model.previous_version = current.version
+    model.rolled_back_at = None
+    return _activate(db, model)
+
+
+def _activate(db: Session, model: RankerModel) -> RankerModel:
+    """Flip the active row to ``model`` and notify; the caller holds the activation lock."""
+    db.execute(
+        update(RankerModel)
+        .where(RankerModel.is_active.is_(True), RankerModel.id != model.id)
+        .values(is_active=False)
+    )
+    model.is_active = True
+    model.activated_at = datetime.now(UTC)
+    db.flush()
+    payload = json.dumps({"version": model.version, "weights": model.weights})
+    db.execute(select(func.pg_notify(CHANNEL, payload)))
+    logger.info("ranker_model_activated version=%s", model.version)
+    return model
+
+
+def rollback_model(db: Session) -> RankerModel | None:
+    """Mark the active model rolled back and re-activate the one it replaced.
+
+    Follows ``previous_version`` links past models that were themselves
+    rolled back; the restored model keeps its own link, so the next rollback
+    steps further back.  Returns None if there is nothing to roll back to.
+    """
+    _lock_activations(db)
+    current = get_active_model(db)
+    if current is None:
+        return None
+    previous = None
+    version, seen = current.previous_version, {current.version}
+    while version is not None and version not in seen:
+        seen.add(version)
+        candidate = get_model(db, version)
+        if candidate is None:
+            break
+        if candidate.rolled_back_at is None:
+            previous = candidate
+            break
+        version = candidate.previous_version
+    if previous is None:
+        return None
+    current.rolled_back_at = datetime.now(UTC)
+    return _activate(db, previous)
+
+
+def ranker_model_to_dict(model: RankerModel) -> dict:
+    return {
+        "version": model.version,
+        "mode": model.mode,
+        "is_active": model.is_active,
+        "promoted": model.promoted,
+        "weights": model.weights,
+        "metrics": model.metrics,
+        "training_job_id": str(model.training_job_id) if model.training_job_id else None,
+        "activated_at": model.activated_at.isoformat() if model.activated_at else None,
+        "previous_version": model.previous_version,
+        "rolled_back_at": model.rolled_back_at.isoformat() if model.rolled_back_at else None,
+        "created_at": model.created_at.isoformat() if model.created_at else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Training artifacts
+# ---------------------------------------------------------------------------
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def register_training_result(
+    db: Session, artifacts: Path, result: dict, training_job_id: uuid.UUID | None = None
+) -> RankerModel | None:
+    """Register the weights a train_ranker run wrote; activate them if promoted.
+
+    Skipped runs (no new samples) produce no model.
+    """
+    if result.get("skipped") or result.get("weights_version") is None:
+        return None
+    version = int(result["weights_version"])
+    if result.get("promoted"):
+        # weights.json carries the metadata the next run plans from.
+        weights = _read_json(artifacts / "weights.json")
+    else:
+        weights = _read_json(artifacts / f"weights_v{version}.json")
+        if weights is not None:
+            weights["_mode"] = result.get("mode")
+    if weights is None:
+        raise FileNotFoundError(f"weights for version {version} not found in {artifacts}")
+    model = register_model(
+        db,
+        version,
+        weights,
+        metrics=result.get("new_metrics"),
+        mode=result.get("mode") or "full",
+        promoted=bool(result.get("promoted")),
+        training_job_id=training_job_id,
+    )
+    if model.promoted:
+        activate_model(db, version)
+    return model
+
+
+def sync_active_artifacts(db: Session, artifacts: Path) -> RankerModel | None:
+    """Point weights.json / metrics.json at the active model before a training run.
+
+    With no active model, weights.json promoted outside the registry (CLI
+    runs, deployments from before it existed) is registered and activated.
+    """
+    active = get_active_model(db)
+    on_disk = _read_json(artifacts / "weights.json")
+    if active is None:
+        if on_disk is None or "_version" not in on_disk:
+            return None
+        version = int(on_disk["_version"])
+        register_model(
+            db,
+            version,
+            on_disk,
+            metrics=_read_json(artifacts / "metrics.json"),
+            mode=on_disk.get("_mode") or "full",
+            promoted=True,
+        )
+        return activate_model(db, version)
+    if on_disk is None or on_disk.get("_version") != active.version:
+        artifacts.mkdir(parents=True, exist_ok=True)
+        (artifacts / "weights.json").write_text(json.dumps(active.weights, indent=2), encoding="utf-8")
+        (artifacts / "metrics.json").write_text(
+            json.dumps({**active.metrics, "weights_version": active.version}, indent=2),
+            encoding="utf-8",
+        )
+        logger.info("ranker_artifacts_synced version=%s", active.version)
+    return active
+
+
+# ---------------------------------------------------------------------------
+# In-memory active weights
+# ---------------------------------------------------------------------------
+
+
+class _ActiveWeights:
+    """Process-wide copy of the active weights, trusted only while a listener is live.
+
+    ``generation`` increases on every swap or invalidation, so a value read
+    from the database before a notification arrived is never stored over it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._weights: dict | None = None
+        self._generation = 0
+        self._listener: threading.Event | None = None  # stop event of the live listener
+
+    def get(self) -> tuple[dict | None, int]:
+        with self._lock:
+            weights = self._weights if self._listener is not None else None
+            return weights, self._generation
+
+    def store(self, weights: dict, generation: int) -> None:
+        with self._lock:
+            if self._listener is not None and generation == self._generation:
+                self._weights = weights
+
+    def swap(self, weights: dict | None) -> None:
+        with self._lock:
+            self._generation += 1
+            self._weights = weights
+
+    def attach(self, stop: threading.Event) -> None:
+        """A listener connected: drop anything cached, notifications may have been missed."""
+        with self._lock:
+            self._generation += 1
+            self._weights = None
+            if not stop.is_set():
+                self._listener = stop
+
+    def detach(self, stop: threading.Event) -> None:
+        with self._lock:
+            if self._listener is stop:
+                self._listener = None
+                self._weights = None
+                self._generation += 1
+
+
+_active = _ActiveWeights()
+
+
+def active_weights(db: Session, fallback: Callable[[], dict]) -> dict:
+    """Active model weights: from memory while listening, else from the registry.
+
+    ``fallback`` supplies weights when no model is active yet.
+    """
+    weights, generation = _active.get()
+    if weights is not None:
+        return weights
+    model = get_active_model(db)
+    if model is None:
+        return fallback()
+    _active.store(model.weights, generation)
+    return model.weights
+
+
+def _conninfo() -> str:
+    """libpq connection string for settings.database_url (a SQLAlchemy URL)."""
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def _apply_notification(payload: str) -> None:
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("ranker_model_notification_invalid payload=%s", payload[:200])
+        _active.swap(None)  # reload from the registry on next use
+        return
+    _active.swap(message.get("weights"))
+    logger.info("ranker_model_swapped version=%s", message.get("version"))
+
+
+def listen_for_activations(stop: threading.Event) -> None:
+    """LISTEN on the registry channel and swap in-memory weights until stop is set.
+
+    Reconnects after ``ml_registry_reconnect_seconds`` if the connection drops.
+    """
+    while not stop.is_set():
+        try:
+            with psycopg.connect(_conninfo(), autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                _active.attach(stop)
+                while not stop.is_set():
+                    for notify in conn.notifies(timeout=_LISTEN_POLL_SECONDS):
+                        _apply_notification(notify.payload)
+        except psycopg.Error as exc:
+            logger.warning("ranker_registry_listener_disconnected error=%s", exc)
+        finally:
+            _active.detach(stop)
+        stop.wait(settings.ml_registry_reconnect_seconds)
+
+
+def start_registry_listener() -> threading.Event:
+    """Start the listener thread; set (or pass to stop_registry_listener) the returned event to stop it."""
+    stop = threading.Event()
+    threading.Thread(
+        target=listen_for_activations, args=(stop,), name="ranker-registry-listener", daemon=True
+    ).start()
+    return stop
+
+
+def stop_registry_listener(stop: threading.Event) -> None:
+    stop.set()
+    _active.detach(stop)
@@ -0,0 +1,679 @@
+"""Train a logistic-regression-style ranker on labeled feedback samples.
+
+Data source priority:
+  1. artifacts/feedback_export/  (columnar .npy export, memory-mapped; see
+     write_training_arrays in dataset_export.py)
+  2. artifacts/feedback_export.json  (real labeled data as a JSON list)
+  3. artifacts/synthetic_training.json  (fallback synthetic data)
+When both real exports exist, the more recently written one is used.
+
+No external ML libraries required — uses scipy.optimize.minimize + numpy only.
+The training worker calls ``main`` in a child process; ``scripts/train_ranker.py``
+is the command-line entry point.
+
+Outputs:
+  artifacts/weights.json        — active feature weights (only updated on promotion)
+  artifacts/metrics.json        — active model metrics (only updated on promotion)
+  artifacts/weights_vN.json     — versioned snapshot for every training run
+  artifacts/metrics_vN.json     — versioned metrics snapshot for every training run
+
+Evaluation (ranker_eval.py):
+  Exact rank-based AUC plus precision/recall/NDCG@5 and @10 computed per user
+  and averaged, each with a bootstrap confidence interval.
+
+Cross-validation (ranker_cv.py):
+  Full refits run user-grouped k-fold cross-validation (RANKER_CV_FOLDS,
+  default 5) for every L2 strength in RANKER_L2_GRID, fitting (fold, L2)
+  pairs on a process pool (RANKER_CV_WORKERS, default one per CPU) over
+  shared-memory arrays.  The L2 with the best out-of-fold promotion metric is
+  refit on all data, and the reported metrics are that L2's out-of-fold
+  metrics (metrics["evaluation"] == "cross_validation").  With fewer than two
+  users, or RANKER_CV_FOLDS below 2, metrics are in-sample as before.
+
+Auto-promotion:
+  New weights are only written to artifacts/weights.json when the new model's
+  (out-of-fold) per-user precision@5 strictly exceeds the currently active model's
+  (RANKER_PROMOTION_METRIC / RANKER_PROMOTION_REQUIRE_CI change the rule).
+  The version number is embedded in weights.json as "_version" so match runs
+  can record which weight version produced each result.
+
+Incremental mode (--mode incremental, or main(mode="incremental")):
+  Warm-starts from the active artifacts/weights.json and runs a few epochs of
+  mini-batch Adam over artifacts/feedback_export_incremental/ (samples added
+  since those weights were trained), anchored to the old weights.  Cost is
+  O(new samples); the candidate is promoted only if it beats the active
+  weights on the same new samples.  weights.json records "_mode",
+  "_last_full_version" and "_trained_through" so the caller can schedule
+  periodic full refits (see training_jobs.py).
+
+Drift detection:
+  If artifacts/metrics_prev.json exists, compares new precision@5 against it
+  and logs a warning if it drops more than 5 percentage points.
+"""
+
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import count
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import minimize
+
+from app.services.ml import ranker_cv, ranker_eval
+
+log = logging.getLogger(__name__)
+
+FEATURES = ["rules_confidence", "similarity", "payout", "urgency", "ease"]
+ARTIFACTS = Path("artifacts")
+
+# Metric (any key produced by ranker_eval.evaluate) that must improve for a new
+# model to be promoted; with RANKER_PROMOTION_REQUIRE_CI=1 the improvement must
+# clear the bootstrap confidence interval.
+PROMOTION_METRIC = os.environ.get("RANKER_PROMOTION_METRIC", "precision_at_5")
+PROMOTION_REQUIRE_CI = os.environ.get("RANKER_PROMOTION_REQUIRE_CI", "0") == "1"
+
+# Columnar export layout (keep in sync with app/services/ml/dataset_export.py)
+COLUMNAR_DIR = "feedback_export"
+INCREMENTAL_DIR = "feedback_export_incremental"  # samples added since the active weights
+COLUMNAR_FORMAT = "payme-ranker-npy/1"
+
+
+# ---------------------------------------------------------------------------
+# Data loading
+# ---------------------------------------------------------------------------
+
+
+def load_data() -> list[dict]:
+    """Load training rows, preferring real feedback over synthetic data."""
+    feedback_path = ARTIFACTS / "feedback_export.json"
+    synthetic_path = ARTIFACTS / "synthetic_training.json"
+
+    if feedback_path.exists():
+        log.info("Loading real labeled data from %s", feedback_path)
+        rows = json.loads(feedback_path.read_text(encoding="utf-8"))
+    elif synthetic_path.exists():
+        log.info("No feedback export found; falling back to %s", synthetic_path)
+        rows = json.loads(synthetic_path.read_text(encoding="utf-8"))
+    else:
+        raise SystemExit(
+            "No training data found. Run generate_synthetic_training_data.py "
+            "or export real feedback first."
+        )
+    return rows
+
+
+def build_matrices(rows: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Build feature matrix X and label vector y, skipping pending (label=None) rows."""
+    labeled = [r for r in rows if r.get("label") is not None]
+    if not labeled:
+        raise SystemExit("No labeled rows found in training data (all labels are None/pending).")
+
+    X = np.array([[float(r.get(f, 0.0)) for f in FEATURES] for r in labeled], dtype=np.float64)
+    y = np.array([float(r["label"]) for r in labeled], dtype=np.float64)
+    return X, y
+
+
+def build_groups(rows: list[dict]) -> np.ndarray:
+    """Dense per-user codes for the labeled rows, aligned with build_matrices."""
+    codes: dict = {}
+    return np.fromiter(
+        (
+            codes.setdefault(r.get("user_id"), len(codes))
+            for r in rows
+            if r.get("label") is not None
+        ),
+        dtype=np.int64,
+    )
+
+
+@dataclass
+class TrainingData:
+    X: np.ndarray  # (labeled rows, len(FEATURES))
+    y: np.ndarray  # 0/1 labels
+    groups: np.ndarray  # per-user codes, for grouped ranking metrics
+    total_rows: int  # including pending rows
+    source: str
+
+
+def load_columnar(directory: Path) -> TrainingData:
+    """Memory-map a columnar export: X/y/groups are read-only views of the .npy files."""
+    meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != COLUMNAR_FORMAT:
+        raise SystemExit(
+            f"Unsupported columnar export format {meta.get('format')!r} in {directory}"
+        )
+    if meta.get("features") != FEATURES:
+        raise SystemExit(f"Columnar export features {meta.get('features')} do not match {FEATURES}")
+    X = np.load(directory / "X.npy", mmap_mode="r")
+    y = np.load(directory / "y.npy", mmap_mode="r")
+    groups = np.load(directory / "groups.npy", mmap_mode="r")
+    if len(y) == 0:
+        raise SystemExit("No labeled rows found in training data (all labels are None/pending).")
+    return TrainingData(
+        X=X, y=y, groups=groups, total_rows=int(meta["sample_count"]), source=str(directory)
+    )
+
+
+def load_training_data() -> TrainingData:
+    """Load X/y from the newest real export (columnar preferred), else JSON/synthetic."""
+    columnar_meta = ARTIFACTS / COLUMNAR_DIR / "meta.json"
+    feedback_path = ARTIFACTS / "feedback_export.json"
+    if columnar_meta.exists() and (
+        not feedback_path.exists() or columnar_meta.stat().st_mtime >= feedback_path.stat().st_mtime
+    ):
+        log.info("Memory-mapping columnar labeled data from %s", columnar_meta.parent)
+        return load_columnar(columnar_meta.parent)
+
+    rows = load_data()
+    X, y = build_matrices(rows)
+    return TrainingData(X=X, y=y, groups=build_groups(rows), total_rows=len(rows), source="json")
+
+
+# ---------------------------------------------------------------------------
+# Logistic regression via scipy
+# ---------------------------------------------------------------------------
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+
+
+def _binary_cross_entropy(
+    weights: np.ndarray, X: np.ndarray, y: np.ndarray, l2: float = 0.0
+) -> float:
+    """Binary cross-entropy loss plus l2/2 * ||weights||^2."""
+    p = _sigmoid(X @ weights)
+    eps = 1e-12
+    loss = -float(np.mean(y * np.log(p + eps) + (1 - y) * np.log(1 - p + eps)))
+    return loss + 0.5 * l2 * float(weights @ weights)
+
+
+def _gradient(weights: np.ndarray, X: np.ndarray, y: np.ndarray, l2: float = 0.0) -> np.ndarray:
+    p = _sigmoid(X @ weights)
+    return X.T @ (p - y) / len(y) + l2 * weights
+
+
+MAX_ITERATIONS = 500
+
+
+def train(
+    X: np.ndarray,
+    y: np.ndarray,
+    on_iteration: Callable[[int, float], None] | None = None,
+    l2: float = 0.0,
+) -> np.ndarray:
+    """Minimise (L2-regularised) binary cross-entropy to obtain feature weights.
+
+    ``on_iteration(iteration, loss)`` is called after every L-BFGS iteration.
+    """
+    w0 = np.zeros(X.shape[1])
+    callback = None
+    if on_iteration is not None:
+        iterations = count(1)
+
+        def callback(intermediate_result):
+            on_iteration(next(iterations), float(intermediate_result.fun))
+
+    result = minimize(
+        fun=_binary_cross_entropy,
+        x0=w0,
+        jac=_gradient,
+        args=(X, y, l2),
+        method="L-BFGS-B",
+        callback=callback,
+        options={"maxiter": MAX_ITERATIONS, "ftol": 1e-10},
+    )
+    if not result.success:
+        log.warning("Optimiser did not fully converge: %s", result.message)
+    return result.x
+
+
+# ---------------------------------------------------------------------------
+# Incremental (warm-started) updates
+# ---------------------------------------------------------------------------
+
+# Mini-batch Adam over the samples added since the active weights were trained.
+INCREMENTAL_EPOCHS = int(os.environ.get("RANKER_INCREMENTAL_EPOCHS", "5"))
+INCREMENTAL_BATCH_SIZE = int(os.environ.get("RANKER_INCREMENTAL_BATCH_SIZE", "256"))
+INCREMENTAL_LEARNING_RATE = float(os.environ.get("RANKER_INCREMENTAL_LEARNING_RATE", "0.01"))
+# Strength of the L2 pull towards the warm-start weights, so a small or skewed
+# batch of new feedback nudges the model instead of replacing it.
+INCREMENTAL_ANCHOR = float(os.environ.get("RANKER_INCREMENTAL_ANCHOR", "0.01"))
+
+
+def train_incremental(
+    X: np.ndarray,
+    y: np.ndarray,
+    w0: np.ndarray,
+    epochs: int = INCREMENTAL_EPOCHS,
+    batch_size: int = INCREMENTAL_BATCH_SIZE,
+    learning_rate: float = INCREMENTAL_LEARNING_RATE,
+    anchor: float = INCREMENTAL_ANCHOR,
+    seed: int = 0,
+    on_iteration: Callable[[int, float], None] | None = None,
+) -> np.ndarray:
+    """Update w0 with mini-batch Adam on (X, y) only: O(len(y) * epochs).
+
+    Minimises binary cross-entropy + anchor/2 * ||w - w0||^2.
+    ``on_iteration(epoch, loss)`` is called after every epoch with the
+    cross-entropy over all of (X, y).
+    """
+    w0 = np.asarray(w0, dtype=np.float64)
+    w = w0.copy()
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    n = len(y)
+    step = 0
+    for epoch in range(1, epochs + 1):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            batch = np.sort(order[start : start + batch_size])  # sorted: sequential mmap reads
+            Xb = np.asarray(X[batch], dtype=np.float64)
+            yb = np.asarray(y[batch], dtype=np.float64)
+            grad = _gradient(w, Xb, yb) + anchor * (w - w0)
+            step += 1
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1**step)
+            v_hat = v / (1 - beta2**step)
+            w -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+        if on_iteration is not None:
+            on_iteration(epoch, _binary_cross_entropy(w, X, y))
+    return w
+
+
+def load_active_weights(artifacts: Path) -> dict | None:
+    """The promoted weights.json (feature weights plus "_"-prefixed metadata), if any."""
+    path = artifacts / "weights.json"
+    if not path.exists():
+        return None
+    try:
+        weights = json.loads(path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        log.warning("Could not read %s; ignoring it for warm start.", path)
+        return None
+    if not all(f in weights for f in FEATURES):
+        return None
+    return weights
+
+
+# ---------------------------------------------------------------------------
+# Cross-validated L2 selection (ranker_cv.py)
+# ---------------------------------------------------------------------------
+
+CV_FOLDS = int(os.environ.get("RANKER_CV_FOLDS", "5"))  # below 2 disables cross-validation
+L2_GRID = [float(v) for v in os.environ.get("RANKER_L2_GRID", "0,0.001,0.01,0.1,1").split(",")]
+CV_WORKERS = int(os.environ.get("RANKER_CV_WORKERS", "0"))  # 0: one process per CPU
+
+
+def select_l2(
+    cv: "ranker_cv.CVResult", y: np.ndarray, total_rows: int, groups: np.ndarray, metric: str
+) -> tuple[int, dict[str, float]]:
+    """Grid index with the best out-of-fold ``metric`` (ties go to the stronger L2).
+
+    Returns (index, {l2: metric value}); the sweep skips the bootstrap.
+    """
+    sweep: dict[str, float] = {}
+    best = 0
+    for index, l2 in enumerate(cv.l2_grid):
+        values = metrics_from_scores(cv.scores[index], y, total_rows, groups, n_boot=0)
+        if metric not in values:
+            raise SystemExit(f"Unknown promotion metric {metric!r}")
+        sweep[str(l2)] = values[metric]
+        best_value = sweep[str(cv.l2_grid[best])]
+        if values[metric] > best_value or (values[metric] == best_value and l2 > cv.l2_grid[best]):
+            best = index
+    return best, sweep
+
+
+# ---------------------------------------------------------------------------
+# Evaluation metrics
+# ---------------------------------------------------------------------------
+
+
+def _predict_scores(weights: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return _sigmoid(X @ weights)
+
+
+def compute_metrics(
+    weights: np.ndarray,
+    X: np.ndarray,
+    y: np.ndarray,
+    total_rows: int,
+    groups: np.ndarray | None = None,
+    n_boot: int = ranker_eval.DEFAULT_BOOTSTRAP,
+) -> dict:
+    """Evaluate weights with ranker_eval: exact AUC and per-user ranking metrics.
+
+    ``auc_approx`` is kept as the name of the AUC for existing metrics.json
+    readers; it is now the exact rank-based value.
+    """
+    return metrics_from_scores(_predict_scores(weights, X), y, total_rows, groups, n_boot)
+
+
+def metrics_from_scores(
+    scores: np.ndarray,
+    y: np.ndarray,
+    total_rows: int,
+    groups: np.ndarray | None = None,
+    n_boot: int = ranker_eval.DEFAULT_BOOTSTRAP,
+) -> dict:
+    """compute_metrics for precomputed scores (e.g. out-of-fold predictions)."""
+    positive_rate = float(np.mean(y)) if len(y) > 0 else 0.0
+    evaluation = ranker_eval.evaluate(scores, y, groups, n_boot=n_boot)
+    return {
+        **evaluation,
+        "auc_approx": evaluation["auc"],
+        "sample_count": total_rows,
+        "labeled_count": len(y),
+        "positive_rate": positive_rate,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Drift detection
+# ---------------------------------------------------------------------------
+
+
+DRIFT_THRESHOLD = 0.05  # 5 percentage point drop triggers a warning
+
+
+def check_drift(new_metrics: dict, artifacts: Path) -> None:
+    prev_path = artifacts / "metrics_prev.json"
+    if not prev_path.exists():
+        return
+    try:
+        prev = json.loads(prev_path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        log.warning("Could not read metrics_prev.json for drift comparison.")
+        return
+
+    prev_p5 = prev.get("precision_at_5", None)
+    new_p5 = new_metrics.get("precision_at_5", None)
+    if prev_p5 is None or new_p5 is None:
+        return
+    drop = prev_p5 - new_p5
+    if drop > DRIFT_THRESHOLD:
+        log.warning(
+            "DRIFT DETECTED: precision@5 dropped by %.3f (%.3f -> %.3f). "
+            "Review training data quality before deploying new weights.",
+            drop,
+            prev_p5,
+            new_p5,
+        )
+    else:
+        log.info(
+            "Drift check passed: precision@5 delta=%.3f (%.3f -> %.3f)",
+            prev_p5 - new_p5,
+            prev_p5,
+            new_p5,
+        )
+
+
+def _next_version(artifacts: Path) -> int:
+    """Return the next sequential version number based on existing weights_vN.json files."""
+    versions = []
+    for p in artifacts.glob("weights_v*.json"):
+        try:
+            versions.append(int(p.stem.split("_v")[-1]))
+        except ValueError:
+            pass
+    return max(versions, default=0) + 1
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+
+def main(  # noqa: PLW0603
+    artifacts_dir: Path | None = None,
+    promotion_metric: str | None = None,
+    progress: Callable[..., None] | None = None,
+    mode: str = "full",
+    trained_through: str | None = None,
+) -> dict:
+    """Train ranker and auto-promote weights if the promotion metric improves.
+
+    Args:
+        artifacts_dir: Override the artifacts directory (used when called from
+            the training worker). Defaults to the module-level ARTIFACTS path.
+        promotion_metric: ranker_eval metric that must improve (default
+            PROMOTION_METRIC, i.e. per-user precision@5).
+        progress: Called as progress(phase) when a phase starts ("loading",
+            "training", "evaluating") and progress("training", iteration=i,
+            loss=l, max_iterations=n) after every optimiser iteration / epoch.
+        mode: "full" refits from zero on all labeled data; "incremental"
+            warm-starts from the active weights.json and runs mini-batch Adam
+            over artifacts/feedback_export_incremental/ (new samples only).
+            Incremental candidates are compared with the active weights on
+            the same new samples.
+        trained_through: Data cutoff (ISO timestamp) recorded in weights.json
+            as "_trained_through", so the next incremental run knows which
+            samples are new.
+
+    Returns:
+        dict with keys: promoted, weights_version, mode, new_metrics,
+        previous_metrics, timings; plus "skipped" when an incremental run
+        found no new labeled samples.
+    """
+    global ARTIFACTS
+    if artifacts_dir is not None:
+        ARTIFACTS = artifacts_dir
+    ARTIFACTS.mkdir(parents=True, exist_ok=True)
+    if mode not in ("full", "incremental"):
+        raise SystemExit(f"Unknown training mode {mode!r}")
+    report = progress or (lambda phase, **_: None)
+
+    active = load_active_weights(ARTIFACTS)
+    if mode == "incremental" and active is None:
+        raise SystemExit("Incremental training needs an active weights.json; run a full refit first.")
+
+    report("loading")
+    started = time.perf_counter()
+    if mode == "incremental":
+        incremental_dir = ARTIFACTS / INCREMENTAL_DIR
+        meta = json.loads((incremental_dir / "meta.json").read_text(encoding="utf-8"))
+        if not meta.get("labeled_count"):
+            log.info("No new labeled samples since the active weights; nothing to do.")
+            return {
+                "promoted": False,
+                "skipped": "no new labeled samples",
+                "weights_version": active.get("_version"),
+                "mode": mode,
+                "new_metrics": None,
+                "previous_metrics": None,
+                "timings": {"load_seconds": round(time.perf_counter() - started, 4)},
+            }
+        data = load_columnar(incremental_dir)
+    else:
+        data = load_training_data()
+    X, y = data.X, data.y
+    load_seconds = time.perf_counter() - started
+    log.info("Loaded %d total rows from %s in %.2fs", data.total_rows, data.source, load_seconds)
+    log.info("Training on %d labeled samples (%.1f%% positive)", len(y), 100 * float(np.mean(y)))
+
+    metric = promotion_metric or PROMOTION_METRIC
+    l2 = 0.0
+    cv = None
+    cv_seconds = 0.0
+    if mode == "full" and CV_FOLDS >= 2 and len(np.unique(data.groups)) >= 2:
+        report("validating")
+        started = time.perf_counter()
+        cv = ranker_cv.cross_validate(
+            X,
+            y,
+            data.groups,
+            train,
+            L2_GRID,
+            k=CV_FOLDS,
+            workers=CV_WORKERS or None,
+            on_task=lambda done, total: report("validating", iteration=done, max_iterations=total),
+        )
+        best, sweep = select_l2(cv, y, data.total_rows, data.groups, metric)
+        l2 = cv.l2_grid[best]
+        cv_seconds = time.perf_counter() - started
+        log.info(
+            "Cross-validated %d folds x %d L2 values in %.2fs: %s by L2 %s -> l2=%g",
+            int(cv.folds.max()) + 1,
+            len(cv.l2_grid),
+            cv_seconds,
+            metric,
+            sweep,
+            l2,
+        )
+
+    report("training")
+    started = time.perf_counter()
+    if mode == "incremental":
+        warm_start = np.array([float(active[f]) for f in FEATURES])
+        optimised_weights = train_incremental(
+            X,
+            y,
+            warm_start,
+            on_iteration=lambda i, loss: report(
+                "training", iteration=i, loss=loss, max_iterations=INCREMENTAL_EPOCHS
+            ),
+        )
+    else:
+        optimised_weights = train(
+            X,
+            y,
+            on_iteration=lambda i, loss: report(
+                "training", iteration=i, loss=loss, max_iterations=MAX_ITERATIONS
+            ),
+            l2=l2,
+        )
+    train_seconds = time.perf_counter() - started
+
+    # Map weights back to feature names
+    weights_dict = {feat: float(w) for feat, w in zip(FEATURES, optimised_weights)}
+    log.info("Trained weights (%s): %s", mode, weights_dict)
+
+    report("evaluating")
+    started = time.perf_counter()
+    if cv is None:
+        metrics = compute_metrics(
+            optimised_weights, X, y, total_rows=data.total_rows, groups=data.groups
+        )
+        metrics.update(evaluation="in_sample", l2=l2)
+    else:
+        # Promote on out-of-fold scores; in-sample figures are kept for reference only.
+        metrics = metrics_from_scores(cv.scores[best], y, data.total_rows, data.groups)
+        in_sample = compute_metrics(
+            optimised_weights, X, y, total_rows=data.total_rows, groups=data.groups, n_boot=0
+        )
+        metrics.update(
+            evaluation="cross_validation",
+            cv_folds=int(cv.folds.max()) + 1,
+            l2=l2,
+            l2_sweep=sweep,
+            in_sample={name: in_sample[name] for name in ("auc", "precision_at_5", "ndcg_at_5")},
+        )
+    metrics["training_mode"] = mode
+    metrics_seconds = time.perf_counter() - started
+    log.info(
+        "Metrics: precision@5=%.3f  precision@10=%.3f  AUC=%.3f",
+        metrics["precision_at_5"],
+        metrics["precision_at_10"],
+        metrics["auc_approx"],
+    )
+    timings = {
+        "load_seconds": round(load_seconds, 4),
+        "cv_seconds": round(cv_seconds, 4),
+        "train_seconds": round(train_seconds, 4),
+        "metrics_seconds": round(metrics_seconds, 4),
+    }
+    log.info(
+        "Timings: load=%.2fs  train=%.2fs  metrics=%.2fs",
+        load_seconds,
+        train_seconds,
+        metrics_seconds,
+    )
+
+    # Always save a versioned snapshot so every training run is auditable
+    version = _next_version(ARTIFACTS)
+    (ARTIFACTS / f"weights_v{version}.json").write_text(
+        json.dumps(weights_dict, indent=2), encoding="utf-8"
+    )
+    (ARTIFACTS / f"metrics_v{version}.json").write_text(
+        json.dumps({**metrics, "weights_version": version}, indent=2), encoding="utf-8"
+    )
+    log.info("Saved candidate artifacts: weights_v%d.json, metrics_v%d.json", version, version)
+
+    # --- Auto-promotion: only replace active weights if metrics improve ---
+    metrics_path = ARTIFACTS / "metrics.json"
+    metrics_prev_path = ARTIFACTS / "metrics_prev.json"
+    current_metrics: dict | None = None
+    if mode == "incremental":
+        # Score the active weights on the same new samples, so the comparison
+        # is like for like.
+        current_metrics = compute_metrics(
+            warm_start, X, y, total_rows=data.total_rows, groups=data.groups
+        )
+        current_metrics["weights_version"] = active.get("_version")
+    elif metrics_path.exists():
+        try:
+            current_metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            pass
+
+    if metric not in metrics:
+        raise SystemExit(f"Unknown promotion metric {metric!r}")
+    current_value = current_metrics.get(metric, 0.0) if current_metrics else 0.0
+    new_value = metrics[metric]
+    promoted = False
+
+    if ranker_eval.should_promote(
+        metrics, current_metrics, metric, require_ci=PROMOTION_REQUIRE_CI
+    ):
+        # Rotate active metrics → prev before overwriting
+        if metrics_path.exists():
+            metrics_prev_path.write_text(metrics_path.read_text(encoding="utf-8"), encoding="utf-8")
+
+        check_drift(metrics, ARTIFACTS)
+
+        # Embed version in weights.json so engine.py can record it on each match run;
+        # _last_full_version lets callers schedule the periodic full refit.
+        last_full = version if mode == "full" else active.get("_last_full_version", 0)
+        promoted_weights = {
+            **weights_dict,
+            "_version": version,
+            "_mode": mode,
+            "_last_full_version": last_full,
+        }
+        if trained_through is not None:
+            promoted_weights["_trained_through"] = trained_through
+        (ARTIFACTS / "weights.json").write_text(
+            json.dumps(promoted_weights, indent=2), encoding="utf-8"
+        )
+        metrics_path.write_text(
+            json.dumps({**metrics, "weights_version": version}, indent=2), encoding="utf-8"
+        )
+        promoted = True
+        log.info(
+            "PROMOTED v%d (%s): %s=%.3f (was %.3f)", version, mode, metric, new_value, current_value
+        )
+    else:
+        log.info(
+            "NOT promoted: new %s=%.3f did not beat current=%.3f",
+            metric,
+            new_value,
+            current_value,
+        )
+
+    return {
+        "promoted": promoted,
+        "weights_version": version,
+        "mode": mode,
+        "new_metrics": metrics,
+        "previous_metrics": current_metrics,
+        "timings": timings,
+    }
+
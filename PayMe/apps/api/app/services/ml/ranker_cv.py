@@ -0,0 +1,183 @@
+"""Grouped k-fold cross-validation and L2 sweep for the ranker trainer.
+
+``cross_validate`` fits one model per (L2 strength, fold) pair and collects
+out-of-fold scores, so every labeled row is scored by a model that never saw
+its user:
+
+- Folds are grouped by user (``group_folds``): a user's rows are all held out
+  together, which is what per-user ranking metrics need.
+- Tasks run on a process pool.  X, y, the fold assignment and the output
+  score matrix live in ``multiprocessing.shared_memory`` blocks that workers
+  attach to by name, so only (grid index, fold) pairs and the fitted weights
+  cross process boundaries.
+- ``fit`` must be a picklable top-level function ``fit(X, y, l2=...)``
+  returning weights; scores are the linear margins ``X @ w`` (every ranking
+  metric and the AUC only depend on their order).
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+def group_folds(groups: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Fold index (0..k-1) per row; each group lands in exactly one fold.
+
+    Groups are shuffled, then assigned largest-first to the fold with the
+    fewest rows so far, which keeps fold sizes balanced.
+    """
+    unique, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(len(unique))
+    order = shuffled[np.argsort(-counts[shuffled], kind="stable")]
+    fold_of_group = np.empty(len(unique), dtype=np.int16)
+    fold_rows = np.zeros(k, dtype=np.int64)
+    for g in order:
+        fold = int(np.argmin(fold_rows))
+        fold_of_group[g] = fold
+        fold_rows[fold] += counts[g]
+    return fold_of_group[inverse]
+
+
+# ---------------------------------------------------------------------------
+# Shared-memory arrays
+# ---------------------------------------------------------------------------
+
+# Arrays visible to the task function: set by _attach in pool workers, or
+# directly for in-process runs.
+_ARRAYS: dict[str, np.ndarray] = {}
+_BLOCKS: list[SharedMemory] = []  # keep worker attachments alive
+
+
+@dataclass(frozen=True)
+class _SharedSpec:
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _share(array: np.ndarray, blocks: list[SharedMemory]) -> _SharedSpec:
+    """Copy array into a new shared-memory block (appended to blocks); returns its spec."""
+    array = np.asarray(array)
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    # No view may outlive this call: a block with exported buffers cannot be closed.
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return _SharedSpec(block.name, array.shape, array.dtype.str)
+
+
+def _attach(specs: dict[str, _SharedSpec], fit: Callable) -> None:
+    """Pool initializer: map the parent's shared blocks as NumPy arrays."""
+    for key, spec in specs.items():
+        block = SharedMemory(name=spec.name)
+        _BLOCKS.append(block)
+        _ARRAYS[key] = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=block.buf)
+    _ARRAYS["fit"] = fit  # type: ignore[assignment]
+
+
+def _run_task(grid_index: int, fold: int, l2: float) -> tuple[int, int, np.ndarray]:
+    """Fit on every fold but ``fold`` and write margins for ``fold`` into the score matrix."""
+    X, y, folds, scores = _ARRAYS["X"], _ARRAYS["y"], _ARRAYS["folds"], _ARRAYS["scores"]
+    held_out = folds == fold
+    weights = _ARRAYS["fit"](X[~held_out], y[~held_out], l2=l2)  # type: ignore[operator]
+    scores[grid_index, held_out] = X[held_out] @ weights
+    return grid_index, fold, np.asarray(weights)
+
+
+# ---------------------------------------------------------------------------
+# Cross-validation
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class CVResult:
+    l2_grid: list[float]
+    folds: np.ndarray  # fold index per row
+    scores: np.ndarray  # (len(l2_grid), rows) out-of-fold margins
+    fold_weights: dict[tuple[int, int], np.ndarray]  # (grid index, fold) -> weights
+
+
+def default_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def cross_validate(
+    X: np.ndarray,
+    y: np.ndarray,
+    groups: np.ndarray,
+    fit: Callable,
+    l2_grid: Sequence[float],
+    k: int = 5,
+    workers: int | None = None,
+    seed: int = 0,
+    on_task: Callable[[int, int], None] | None = None,
+) -> CVResult:
+    """Out-of-fold scores for every L2 strength, fitting (L2, fold) pairs in parallel.
+
+    ``k`` is capped at the number of groups.  ``on_task(done, total)`` is
+    called after each fitted task.  With ``workers=1`` everything runs in
+    this process (no pool, no shared memory).
+    """
+    n_groups = len(np.unique(groups))
+    k = min(k, n_groups)
+    if k < 2:
+        raise ValueError("cross-validation needs at least two groups")
+    folds = group_folds(groups, k, seed)
+    tasks = [(gi, fold, float(l2)) for gi, l2 in enumerate(l2_grid) for fold in range(k)]
+    workers = min(workers or default_workers(), len(tasks))
+    fold_weights: dict[tuple[int, int], np.ndarray] = {}
+
+    if workers <= 1:
+        scores = np.empty((len(l2_grid), len(y)))
+        _ARRAYS.update(
+            X=np.asarray(X, dtype=np.float64),
+            y=np.asarray(y, dtype=np.float64),
+            folds=folds,
+            scores=scores,
+            fit=fit,  # type: ignore[arg-type]
+        )
+        try:
+            for done, task in enumerate(tasks, 1):
+                gi, fold, weights = _run_task(*task)
+                fold_weights[(gi, fold)] = weights
+                if on_task is not None:
+                    on_task(done, len(tasks))
+        finally:
+            _ARRAYS.clear()
+        return CVResult(list(l2_grid), folds, scores, fold_weights)
+
+    blocks: list[SharedMemory] = []
+    try:
+        specs = {
+            "X": _share(np.asarray(X, dtype=np.float64), blocks),
+            "y": _share(np.asarray(y, dtype=np.float64), blocks),
+            "folds": _share(folds, blocks),
+            "scores": _share(np.empty((len(l2_grid), len(y))), blocks),
+        }
+        # spawn: safe when the caller has threads (e.g. the training worker's child).
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_attach,
+            initargs=(specs, fit),
+        ) as pool:
+            futures = [pool.submit(_run_task, *task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                gi, fold, weights = future.result()
+                fold_weights[(gi, fold)] = weights
+                if on_task is not None:
+                    on_task(done, len(tasks))
+        spec = specs["scores"]
+        scores = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=blocks[-1].buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return CVResult(list(l2_grid), folds, scores, fold_weights)
@@ -0,0 +1,110 @@
+"""Historical match results as NumPy arrays for counterfactual ranker replay.
+
+``load_replay_arrays`` streams every stored MatchResult (optionally filtered by
+time window or experiment variant) into flat arrays that
+``scripts/ranker_replay.py`` re-scores under candidate weight sets.  Feature
+signals and labels are extracted in SQL, so each cursor partition arrives as
+plain numbers and is converted with one ``np.asarray`` call instead of a
+Python loop over ``reasons_json`` dicts.
+
+Row layout: rows are ordered by run, then by logged score (descending), so each
+run's rows are contiguous and in the order the user was shown them.  Labels
+follow ``feedback._assign_label`` on the pair's current claim status, with -1
+for pending claims.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.entities import MatchResult, MatchRun, UserSettlementPreference
+from app.services.ml.feedback import FEATURE_KEYS
+
+PENDING_LABEL = -1
+
+# Same keys and fallbacks as feedback._extract_features, in FEATURE_KEYS order.
+_FEATURE_COLUMNS = (
+    func.coalesce(MatchResult.reasons_json[("confidence_breakdown", "rules")].as_float(), 0.5),
+    func.coalesce(MatchResult.reasons_json["similarity"].as_float(), 0.3),
+    func.coalesce(MatchResult.reasons_json["payout"].as_float(), 0.1),
+    func.coalesce(MatchResult.reasons_json["urgency"].as_float(), 0.3),
+    func.coalesce(MatchResult.reasons_json["ease"].as_float(), 0.4),
+)
+
+_LABEL_COLUMN = case(
+    (UserSettlementPreference.claim_status == "paid_out", 1),
+    (UserSettlementPreference.claim_status.in_(("submitted", "opened")), PENDING_LABEL),
+    else_=0,
+)
+
+
+@dataclass
+class ReplayArrays:
+    X: np.ndarray  # (rows, len(FEATURE_KEYS)) match-time feature signals
+    runs: np.ndarray  # 0-based run index per row; each run's rows are contiguous
+    scores: np.ndarray  # logged score; rows within a run are in logged order
+    labels: np.ndarray  # 1 paid out, 0 not paid out / ignored, -1 pending
+
+    @property
+    def run_count(self) -> int:
+        return int(self.runs[-1]) + 1 if len(self.runs) else 0
+
+    def save(self, path: Path) -> None:
+        np.savez(path, X=self.X, runs=self.runs, scores=self.scores, labels=self.labels)
+
+    @classmethod
+    def load(cls, path: Path) -> ReplayArrays:
+        with np.load(path) as data:
+            return cls(data["X"], data["runs"], data["scores"], data["labels"])
+
+
+def load_replay_arrays(
+    db: Session,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    variants: Sequence[str] | None = None,
+    chunk_size: int | None = None,
+) -> ReplayArrays:
+    """Load stored match results created in [since, until) as ReplayArrays.
+
+    ``variants`` keeps only runs served by those experiment variants.  Rows
+    are streamed through a server-side cursor in ``chunk_size`` partitions
+    (default ``ml_export_chunk_size``).
+    """
+    pref_join = and_(
+        UserSettlementPreference.user_id == MatchResult.user_id,
+        UserSettlementPreference.settlement_id == MatchResult.settlement_id,
+    )
+    run_index = func.dense_rank().over(order_by=MatchResult.run_id) - 1
+    stmt = (
+        select(run_index, MatchResult.score, _LABEL_COLUMN, *_FEATURE_COLUMNS)
+        .outerjoin(UserSettlementPreference, pref_join)
+        .order_by(MatchResult.run_id, MatchResult.score.desc(), MatchResult.id)
+    )
+    if since is not None:
+        stmt = stmt.where(MatchResult.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(MatchResult.created_at < until)
+    if variants:
+        stmt = stmt.join(MatchRun, MatchRun.id == MatchResult.run_id).where(MatchRun.variant.in_(variants))
+
+    chunk_size = chunk_size or settings.ml_export_chunk_size
+    blocks = [
+        np.asarray(partition, dtype=np.float64)
+        for partition in db.execute(stmt.execution_options(yield_per=chunk_size)).tuples().partitions()
+    ]
+    table = np.concatenate(blocks) if blocks else np.empty((0, 3 + len(FEATURE_KEYS)))
+    return ReplayArrays(
+        X=np.ascontiguousarray(table[:, 3:]),
+        runs=table[:, 0].astype(np.int64),
+        scores=table[:, 1].copy(),
+        labels=table[:, 2].astype(np.int8),
+    )
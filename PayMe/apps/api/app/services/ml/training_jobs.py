@@ -0,0 +1,494 @@
+"""Postgres-backed queue for ranker training runs.
+
+POST /admin/ml/train enqueues a TrainingJob and returns immediately; the
+training worker (``python -m app.services.ml.training_worker``) claims and
+runs jobs.
+
+- Serialization: claims take a transaction-scoped advisory lock and only
+  succeed while no job is running, so one training run happens at a time
+  across worker processes.  ``uq_training_job_queued`` allows one queued job:
+  requests made while one is waiting coalesce onto it (``request_count``).
+- Running: the worker exports labeled samples (``refresh_labeled_samples`` +
+  ``write_training_arrays``), then runs ``ranker.main`` in a spawned child
+  process.  The child reports phase changes and the loss after
+  every L-BFGS iteration over a queue; the worker writes them to the job row
+  every ``ml_train_progress_interval_seconds`` together with a heartbeat.
+- Modes: ``full`` refits on every sample; ``incremental`` warm-starts from
+  the active weights and trains on samples updated since they were trained;
+  ``auto`` (default) is incremental with a full refit every
+  ``ml_train_full_refit_every`` versions or when no warm start is possible.
+- Cancelling: a queued job is cancelled at once; a running job gets
+  ``cancel_requested`` and the worker terminates the child at its next
+  progress write.
+- Registry: the active ``ranker_models`` weights are written to
+  ``weights.json`` before each run, and a finished run's weights are
+  registered (and activated when promoted) with the job's completion; see
+  ``model_registry``.
+- Failures: SystemExit from the trainer (e.g. no labeled rows) and any other
+  error fail the job without retry.  Running jobs whose heartbeat is older
+  than ``ml_train_heartbeat_timeout_seconds`` (worker died) are failed by
+  ``fail_stale_training_jobs``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import queue
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.entities import TrainingJob
+from app.services.ml import ranker
+from app.services.ml.dataset_export import write_training_arrays
+from app.services.ml.feedback import iter_dataset_partitions, refresh_labeled_samples
+from app.services.ml.model_registry import register_training_result, sync_active_artifacts
+
+logger = logging.getLogger(__name__)
+
+TRAINING_MODES = ("auto", "full", "incremental")
+ACTIVE_STATUSES = {"queued", "running"}
+TERMINAL_STATUSES = {"done", "failed", "cancelled"}
+
+# Share of overall progress reached when each phase starts, in phase order.
+# Phases reporting iterations (cross-validation tasks, optimiser iterations)
+# advance towards the next phase's mark.
+PHASE_PROGRESS = {
+    "exporting": 0.0,
+    "loading": 0.1,
+    "validating": 0.15,
+    "training": 0.6,
+    "evaluating": 0.9,
+}
+
+# Export directories read by ranker.py (COLUMNAR_DIR / INCREMENTAL_DIR).
+FULL_EXPORT_DIR = "feedback_export"
+INCREMENTAL_EXPORT_DIR = "feedback_export_incremental"
+
+# pg_advisory_xact_lock key serializing claim decisions across workers.
+_CLAIM_LOCK_KEY = 0x5452_4E52  # "TRNR"
+_CHILD_EXIT_GRACE_SECONDS = 10
+
+
+class TrainingCancelled(Exception):
+    """Raised inside the worker when a running job's cancellation is observed."""
+
+
+def artifacts_dir() -> Path:
+    """Directory holding weights.json, metrics and exports (container vs local dev)."""
+    if settings.ml_artifacts_dir:
+        return Path(settings.ml_artifacts_dir)
+    return Path("/workspace/artifacts") if Path("/workspace").exists() else Path("artifacts")
+
+
+# ---------------------------------------------------------------------------
+# Queue
+# ---------------------------------------------------------------------------
+
+
+def enqueue_training(db: Session, mode: str = "auto") -> TrainingJob:
+    """Return the queued training job, creating one if none is waiting.
+
+    Coalescing onto a queued job upgrades it to a full refit if either
+    request asked for one.
+    """
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode: {mode}")
+    stmt = pg_insert(TrainingJob).values(
+        id=uuid.uuid4(),
+        status="queued",
+        mode=mode,
+        request_count=1,
+        cancel_requested=False,
+        progress=0.0,
+        iteration=0,
+        loss_history=[],
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["status"],
+        index_where=TrainingJob.status == "queued",
+        set_={
+            "request_count": TrainingJob.request_count + 1,
+            "mode": case((stmt.excluded.mode == "full", "full"), else_=TrainingJob.mode),
+        },
+    ).returning(TrainingJob.id)
+    job_id = db.execute(stmt).scalar_one()
+    job = db.get(TrainingJob, job_id, populate_existing=True)
+    assert job is not None
+    return job
+
+
+def get_training_job(db: Session, job_id: uuid.UUID) -> TrainingJob | None:
+    return db.get(TrainingJob, job_id)
+
+
+def list_training_jobs(db: Session, limit: int = 20) -> list[TrainingJob]:
+    """Most recent training jobs first."""
+    return list(
+        db.scalars(select(TrainingJob).order_by(TrainingJob.created_at.desc()).limit(limit)).all()
+    )
+
+
+def cancel_training_job(db: Session, job_id: uuid.UUID) -> TrainingJob | None:
+    """Cancel a queued job now, or flag a running one for the worker to stop.
+
+    Finished jobs are returned unchanged.  Returns None if the job does not exist.
+    """
+    job = db.get(TrainingJob, job_id, with_for_update=True)
+    if job is None:
+        return None
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.completed_at = datetime.now(UTC)
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.flush()
+    return job
+
+
+def claim_next_training_job(db: Session, now: datetime | None = None) -> TrainingJob | None:
+    """Claim the queued job unless a training run is already in progress.
+
+    Must run in its own short transaction: the advisory lock is held until
+    the caller commits.
+    """
+    now = now or datetime.now(UTC)
+    db.execute(select(func.pg_advisory_xact_lock(_CLAIM_LOCK_KEY)))
+    running = db.scalar(select(func.count()).where(TrainingJob.status == "running"))
+    if running:
+        return None
+    job = db.scalar(
+        select(TrainingJob)
+        .where(TrainingJob.status == "queued")
+        .order_by(TrainingJob.created_at.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job is None:
+        return None
+    job.status = "running"
+    job.phase = "exporting"
+    job.started_at = now
+    job.heartbeat_at = now
+    db.flush()
+    return job
+
+
+def fail_stale_training_jobs(db: Session, now: datetime | None = None) -> int:
+    """Fail running jobs whose worker stopped sending heartbeats."""
+    now = now or datetime.now(UTC)
+    cutoff = now - timedelta(seconds=settings.ml_train_heartbeat_timeout_seconds)
+    result = db.execute(
+        update(TrainingJob)
+        .where(
+            TrainingJob.status == "running",
+            func.coalesce(TrainingJob.heartbeat_at, TrainingJob.started_at) < cutoff,
+        )
+        .values(
+            status="failed", completed_at=now, error_message="training worker stopped responding"
+        )
+    )
+    return result.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+
+def _train_in_child(artifacts: str, mode: str, trained_through: str | None, events) -> None:
+    """Child process entrypoint: run ranker.main and report over ``events``.
+
+    Messages are ("progress", {phase, iteration, loss, max_iterations}),
+    then exactly one of ("done", result) or ("failed", message).
+    """
+
+    def progress(phase: str, **fields) -> None:
+        events.put(("progress", {"phase": phase, **fields}))
+
+    try:
+        result = ranker.main(
+            artifacts_dir=Path(artifacts),
+            progress=progress,
+            mode=mode,
+            trained_through=trained_through,
+        )
+        events.put(("done", result))
+    except SystemExit as exc:
+        events.put(("failed", str(exc)))
+    except BaseException as exc:  # noqa: BLE001
+        events.put(("failed", f"{type(exc).__name__}: {exc}"))
+
+
+class _Progress:
+    """Buffers a running job's progress and writes it at most once per interval.
+
+    Each write also refreshes the heartbeat and raises TrainingCancelled if
+    cancellation was requested.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], job_id: uuid.UUID) -> None:
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self.phase = "exporting"
+        self.progress = 0.0
+        self.iteration = 0
+        self.losses: list[float] = []
+        self._next_write = 0.0
+
+    def update(
+        self, phase: str, iteration: int = 0, loss: float | None = None, max_iterations: int = 0
+    ) -> None:
+        self.phase = phase
+        self.progress = PHASE_PROGRESS[phase]
+        if iteration and max_iterations:
+            marks = list(PHASE_PROGRESS.values())
+            span = marks[marks.index(self.progress) + 1] - self.progress
+            self.progress += span * min(iteration / max_iterations, 1.0)
+        if phase == "training" and iteration:
+            self.iteration = iteration
+            if loss is not None:
+                self.losses.append(loss)
+        self.tick()
+
+    def tick(self, force: bool = False) -> None:
+        if not force and time.monotonic() < self._next_write:
+            return
+        self._next_write = time.monotonic() + settings.ml_train_progress_interval_seconds
+        db = self.session_factory()
+        try:
+            job = db.get(TrainingJob, self.job_id)
+            job.phase = self.phase
+            job.progress = round(self.progress, 4)
+            job.iteration = self.iteration
+            job.loss_history = list(self.losses)
+            job.heartbeat_at = datetime.now(UTC)
+            cancel_requested = job.cancel_requested
+            db.commit()
+        finally:
+            db.close()
+        if cancel_requested:
+            raise TrainingCancelled()
+
+
+def _ticking(partitions: Iterable, tracker: _Progress) -> Iterator:
+    for partition in partitions:
+        tracker.tick()
+        yield partition
+
+
+def plan_training(requested: str, artifacts: Path) -> tuple[str, datetime | None]:
+    """Resolve a requested mode to ("full", None) or ("incremental", since).
+
+    ``auto`` trains incrementally on samples updated after the active
+    weights' ``_trained_through`` cutoff, except that every
+    ``ml_train_full_refit_every``-th version is a full refit, as is any run
+    without usable active weights.
+    """
+    if requested == "full":
+        return "full", None
+    try:
+        active = json.loads((artifacts / "weights.json").read_text(encoding="utf-8"))
+        since = datetime.fromisoformat(active["_trained_through"])
+    except (OSError, ValueError, KeyError, TypeError):
+        if requested == "incremental":
+            raise ValueError(
+                "Incremental training needs active weights from a training job; run a full refit first"
+            ) from None
+        return "full", None
+    if requested == "auto":
+        since_full = int(active.get("_version", 0)) - int(active.get("_last_full_version", 0))
+        if since_full + 1 >= settings.ml_train_full_refit_every:
+            return "full", None
+    return "incremental", since
+
+
+def _export(
+    db: Session, tracker: _Progress, artifacts: Path, requested_mode: str
+) -> tuple[str, dict, datetime]:
+    """Refresh ml_feedback_samples and write the .npy arrays the ranker memory-maps.
+
+    A full run exports every sample to feedback_export/; an incremental one
+    exports only labeled samples updated after the active weights' cutoff to
+    feedback_export_incremental/.  Returns (mode, export meta, data cutoff).
+    """
+    summary = refresh_labeled_samples(db, on_sample=lambda _row: tracker.tick())
+    mode, since = plan_training(requested_mode, artifacts)
+    if mode == "full":
+        partitions = iter_dataset_partitions(db)
+        out_dir = artifacts / FULL_EXPORT_DIR
+    else:
+        # Samples stamped exactly at the cutoff were part of the previous run.
+        partitions = iter_dataset_partitions(
+            db, since=since + timedelta(microseconds=1), label_only=True
+        )
+        out_dir = artifacts / INCREMENTAL_EXPORT_DIR
+    meta = write_training_arrays(_ticking(partitions, tracker), out_dir)
+    return mode, meta, summary["exported_at"]
+
+
+def _supervise(
+    tracker: _Progress, artifacts: Path, mode: str, trained_through: str
+) -> tuple[str, dict | str | None]:
+    """Run the trainer in a spawned child until it reports, dies, times out or is cancelled.
+
+    Returns (status, result-or-error).
+    """
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    child = ctx.Process(
+        target=_train_in_child,
+        args=(str(artifacts), mode, trained_through, events),
+        name=f"ranker-training-{tracker.job_id}",
+        # Not a daemon: the ranker runs its cross-validation on a process
+        # pool, and daemonic processes may not have children.
+        daemon=False,
+    )
+    child.start()
+    deadline = time.monotonic() + settings.ml_train_timeout_seconds
+    reported = False
+    try:
+        while True:
+            try:
+                kind, payload = events.get(timeout=settings.ml_train_progress_interval_seconds)
+            except queue.Empty:
+                if not child.is_alive():
+                    # The child may have exited right after its last put.
+                    try:
+                        kind, payload = events.get(timeout=1.0)
+                    except queue.Empty:
+                        return "failed", f"training process exited with code {child.exitcode}"
+                else:
+                    kind, payload = "idle", None
+            if kind in ("done", "failed"):
+                reported = True
+                return kind, payload
+            if kind == "progress":
+                tracker.update(**payload)
+            else:
+                tracker.tick()
+            if time.monotonic() > deadline:
+                return "failed", f"training timed out after {settings.ml_train_timeout_seconds}s"
+    finally:
+        # A child that reported is just flushing its queue; anything else
+        # (cancelled, timed out, worker error) is stopped at once.
+        if reported:
+            child.join(timeout=_CHILD_EXIT_GRACE_SECONDS)
+        if child.is_alive():
+            child.terminate()
+            child.join()
+        events.close()
+
+
+def run_training_job(session_factory: Callable[[], Session], job_id: uuid.UUID) -> TrainingJob:
+    """Run a claimed job to completion, cancellation or failure and record the outcome."""
+    tracker = _Progress(session_factory, job_id)
+    artifacts = artifacts_dir()
+    artifacts.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    db = session_factory()
+    try:
+        tracker.tick(force=True)
+        requested_mode = db.get(TrainingJob, job_id).mode
+        sync_active_artifacts(db, artifacts)
+        db.commit()
+        mode, export, trained_through = _export(db, tracker, artifacts, requested_mode)
+        tracker.update("loading")
+        status, outcome = _supervise(tracker, artifacts, mode, trained_through.isoformat())
+    except TrainingCancelled:
+        db.rollback()
+        logger.info("training_job_cancelled job_id=%s", job_id)
+        return _finish(session_factory, job_id, "cancelled", tracker, error_message="cancelled")
+    except Exception as exc:  # noqa: BLE001
+        db.rollback()
+        logger.exception("training_job_error job_id=%s", job_id)
+        return _finish(session_factory, job_id, "failed", tracker, error_message=str(exc))
+    finally:
+        db.close()
+
+    elapsed = round(time.perf_counter() - started, 3)
+    if status == "done":
+        logger.info("training_job_done job_id=%s elapsed=%.1fs", job_id, elapsed)
+        result = {**outcome, "export": export}
+        return _finish(session_factory, job_id, "done", tracker, result=result, artifacts=artifacts)
+    logger.warning("training_job_failed job_id=%s error=%s", job_id, str(outcome)[:300])
+    return _finish(session_factory, job_id, "failed", tracker, error_message=str(outcome))
+
+
+def _finish(
+    session_factory: Callable[[], Session],
+    job_id: uuid.UUID,
+    status: str,
+    tracker: _Progress,
+    result: dict | None = None,
+    error_message: str | None = None,
+    artifacts: Path | None = None,
+) -> TrainingJob:
+    db = session_factory()
+    try:
+        job = db.get(TrainingJob, job_id)
+        if status == "done" and artifacts is not None:
+            # Same transaction as the status change: a done job always has its model registered.
+            register_training_result(db, artifacts, result, training_job_id=job_id)
+        job.status = status
+        job.progress = 1.0 if status == "done" else round(tracker.progress, 4)
+        job.iteration = tracker.iteration
+        job.loss_history = list(tracker.losses)
+        job.completed_at = datetime.now(UTC)
+        job.result_json = result
+        job.error_message = error_message
+        db.commit()
+        # Load the committed state so callers can read it after the session closes.
+        db.refresh(job)
+        return job
+    finally:
+        db.close()
+
+
+def run_next_training_job(session_factory: Callable[[], Session]) -> TrainingJob | None:
+    """Claim one job in a short transaction, then run it."""
+    db = session_factory()
+    try:
+        job = claim_next_training_job(db)
+        job_id = job.id if job is not None else None
+        db.commit()
+    finally:
+        db.close()
+    if job_id is None:
+        return None
+    return run_training_job(session_factory, job_id)
+
+
+def training_job_to_dict(job: TrainingJob, now: datetime | None = None) -> dict:
+    elapsed = None
+    if job.started_at is not None:
+        end = job.completed_at or now or datetime.now(UTC)
+        elapsed = round((end - job.started_at).total_seconds(), 3)
+    losses = job.loss_history or []
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "mode": job.mode,
+        "phase": job.phase,
+        "progress": job.progress,
+        "iteration": job.iteration,
+        "loss": losses[-1] if losses else None,
+        "loss_history": losses,
+        "elapsed_seconds": elapsed,
+        "cancel_requested": job.cancel_requested,
+        "request_count": job.request_count,
+        "result": job.result_json,
+        "error_message": job.error_message,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+    }
@@ -0,0 +1,83 @@
+"""Training worker — runs queued ranker training jobs.
+
+Run with:
+    python -m app.services.ml.training_worker
+
+Loop:
+    1. Fail running jobs whose heartbeat is stale (a worker died mid-run).
+    2. Claim the queued job if no training is running (advisory lock) and run
+       it: export samples, then train in a spawned child process.
+    3. With nothing to claim, sleep ml_train_poll_interval_seconds.
+
+Any number of worker processes may run; only one job trains at a time.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.db import SessionLocal
+from app.core.settings import settings
+from app.services.ml.training_jobs import fail_stale_training_jobs, run_next_training_job
+
+logger = logging.getLogger("app.training_worker")
+
+
+def _fail_stale(session_factory: Callable[[], Session]) -> int:
+    db = session_factory()
+    try:
+        stale = fail_stale_training_jobs(db)
+        db.commit()
+    finally:
+        db.close()
+    if stale:
+        logger.warning("training_jobs_failed_stale count=%s", stale)
+    return stale
+
+
+def drain(session_factory: Callable[[], Session] = SessionLocal, max_jobs: int | None = None) -> int:
+    """Run jobs until none is claimable (or max_jobs ran). Returns jobs run."""
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        if run_next_training_job(session_factory) is None:
+            break
+        ran += 1
+    return ran
+
+
+def run_worker(session_factory: Callable[[], Session] = SessionLocal, stop: threading.Event | None = None) -> None:
+    """Claim and run training jobs until stop is set."""
+    stop = stop or threading.Event()
+    logger.info(
+        "Training worker started. poll=%ss timeout=%ss",
+        settings.ml_train_poll_interval_seconds,
+        settings.ml_train_timeout_seconds,
+    )
+    while not stop.is_set():
+        try:
+            _fail_stale(session_factory)
+            job = run_next_training_job(session_factory)
+        except Exception:  # noqa: BLE001
+            logger.exception("training_worker_claim_failed")
+            job = None
+        if job is None:
+            stop.wait(settings.ml_train_poll_interval_seconds)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
+    )
+    try:
+        run_worker()
+    except KeyboardInterrupt:
+        logger.info("Training worker stopped.")
+
+
+if __name__ == "__main__":
+    main()
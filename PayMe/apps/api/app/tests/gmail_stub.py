@@ -0,0 +1,131 @@
+"""Local stub server emulating the parts of the Gmail API used by ingestion.
+
+Serves POST /batch/gmail/v1 with multipart/mixed responses in the same shape
+Gmail returns, so gmail_batch can be exercised end to end without network
+access.  Rate limiting is simulated by answering the first
+``rate_limited_subrequests`` sub-requests with 429.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+class GmailStubServer:
+    def __init__(self, messages: dict[str, dict], rate_limited_subrequests: int = 0, latency: float = 0.0):
+        self.messages = messages
+        self.rate_limited_subrequests = rate_limited_subrequests
+        self.latency = latency
+        self.batch_calls = 0
+        self.subrequests = 0
+        self.max_in_flight = 0
+        self.connections: set[tuple] = set()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "GmailStubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _answer(self, path: str) -> tuple[int, dict]:
+        with self._lock:
+            self.subrequests += 1
+            if self.rate_limited_subrequests > 0:
+                self.rate_limited_subrequests -= 1
+                return 429, {"error": {"code": 429, "message": "Too many concurrent requests for user"}}
+        msg_id = unquote(urlsplit(path).path.rsplit("/", 1)[-1])
+        msg = self.messages.get(msg_id)
+        if msg is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, msg
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like Gmail, so connection reuse can be observed.
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:  # keep pytest output clean
+                pass
+
+            def do_POST(self) -> None:  # noqa: N802
+                if self.path != "/batch/gmail/v1":
+                    self.send_error(404)
+                    return
+                with stub._lock:
+                    stub.batch_calls += 1
+                    stub.connections.add(self.client_address)
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    boundary = self.headers["Content-Type"].split("boundary=")[-1]
+                    body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+                    out_parts: list[str] = []
+                    for part in body.split(f"--{boundary}"):
+                        part = part.strip()
+                        if not part or part == "--":
+                            continue
+                        head, _, inner = part.partition("\r\n\r\n")
+                        content_id = next(
+                            line.split(":", 1)[1].strip().strip("<>")
+                            for line in head.splitlines()
+                            if line.lower().startswith("content-id")
+                        )
+                        request_line = inner.strip().splitlines()[0]
+                        status, payload = stub._answer(request_line.split()[1])
+                        out_parts.append(
+                            "--resp_boundary\r\n"
+                            "Content-Type: application/http\r\n"
+                            f"Content-ID: <response-{content_id}>\r\n"
+                            "\r\n"
+                            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                            "Content-Type: application/json; charset=UTF-8\r\n"
+                            "\r\n"
+                            f"{json.dumps(payload)}\r\n"
+                        )
+                    out_parts.append("--resp_boundary--\r\n")
+                    data = "".join(out_parts).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "multipart/mixed; boundary=resp_boundary")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+        return Handler
+
+
+def make_message(msg_id: str, subject: str, sender: str = "billing@amazon.com", history_id: str = "1000") -> dict:
+    """Build a Gmail ``format=metadata`` message object."""
+    return {
+        "id": msg_id,
+        "historyId": history_id,
+        "internalDate": "1700000000000",
+        "snippet": subject,
+        "payload": {
+            "headers": [
+                {"name": "Subject", "value": subject},
+                {"name": "From", "value": sender},
+            ]
+        },
+    }
@@ -1,7 +1,7 @@
 from sqlalchemy import select
 
 from app.models.entities import Settlement, User
-from app.tests.conftest import TestingSessionLocal
+from app.tests.conftest import TestingSessionLocal, run_sync
 
 
 def _token(client):
@@ -29,8 +29,8 @@ def test_admin_endpoints_expose_core_data(client, monkeypatch):
         },
         headers=headers,
     )
-    client.post("/integrations/gmail/sync", headers=headers)
-    client.post("/integrations/plaid/sync", headers=headers)
+    run_sync(client, "gmail", headers)
+    run_sync(client, "plaid", headers)
     client.post("/match/run", headers=headers)
 
     users = client.get("/admin/users?limit=10")
@@ -0,0 +1,75 @@
+from app.models.entities import Settlement
+from app.services.ingestion import brand_matcher
+from app.services.ingestion.brand_matcher import BUILTIN_PATTERNS, BrandMatcher, build_entries, get_matcher
+from app.tests.conftest import TestingSessionLocal
+
+
+def _legacy_extract(text: str) -> set[str]:
+    """The substring loops the Gmail sync paths used before the matcher."""
+    text = text.lower()
+    keys = {
+        key
+        for token, key in BUILTIN_PATTERNS.items()
+        if key.startswith("merchant:") and token in text
+    }
+    if "prime" in text:
+        keys.add("subscription:prime")
+    if "paramount+" in text:
+        keys.add("subscription:paramount_plus")
+    if any(k in text for k in ["casino", "sportsbook", "bet", "gambling"]):
+        keys.add("category:gambling")
+    return keys
+
+
+def test_builtin_patterns_match_legacy_substring_semantics():
+    matcher = BrandMatcher(build_entries())
+    samples = [
+        "Your Amazon Prime order has shipped",
+        "Paramount+ renewal receipt",
+        "Uber trip receipt - United Airlines connection",
+        "McDonald's rewards and Starbucks stars",
+        "Welcome bonus from your sportsbook",
+        "Better deals at Walmart",
+        "AT&T autopay confirmation",
+        "KFC order",
+        "Nothing interesting here",
+        "",
+    ]
+    for text in samples:
+        assert matcher.extract(text) == _legacy_extract(text), text
+
+
+def test_settlement_brands_require_whole_words():
+    matcher = BrandMatcher(build_entries(["meta", "wells_fargo"]))
+    assert matcher.extract("Metadata export ready") == set()
+    assert matcher.extract("Your Meta account") == {"merchant:meta"}
+    assert matcher.extract("Wells Fargo statement, wells fargo again") == {"merchant:wells_fargo"}
+    assert matcher.extract("wellsfargo") == set()
+
+
+def test_get_matcher_rebuilds_only_when_dictionary_changes(db_setup):
+    db = TestingSessionLocal()
+    try:
+        first = get_matcher(db)
+        assert get_matcher(db) is first
+
+        db.add(Settlement(title="Delta settlement", covered_brands=["delta"], status="open"))
+        db.commit()
+
+        second = get_matcher(db)
+        assert second is not first
+        assert second.extract("Delta flight confirmation") == {"merchant:delta"}
+        assert get_matcher(db) is second
+    finally:
+        db.close()
+        brand_matcher._cached = None
+
+
+def test_large_dictionary_matches_naive_scan():
+    brands = [f"brand{i:05d}" for i in range(20_000)]
+    matcher = BrandMatcher(build_entries(brands))
+    assert matcher.pattern_count == len(BUILTIN_PATTERNS) + len(brands)
+
+    text = "Receipt from Brand00042 and brand19999; brand123456 is not a brand"
+    expected = {"merchant:brand00042", "merchant:brand19999"}
+    assert matcher.extract(text) == expected
@@ -0,0 +1,68 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.models.entities import GmailEvidence, User, UserFeature
+from app.services.ingestion.features import gmail_confidence, plaid_confidence, upsert_features
+from app.tests.conftest import TestingSessionLocal
+
+
+def _user(db) -> User:
+    user = User(username="features", email="features@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    return user
+
+
+def test_upsert_features_inserts_then_updates_in_place(db_setup):
+    db = TestingSessionLocal()
+    try:
+        user = _user(db)
+        first = datetime(2024, 1, 1, tzinfo=UTC)
+        later = datetime(2024, 2, 1, tzinfo=UTC)
+        upsert_features(
+            db, user.id, "plaid", {"merchant:amazon": (2, 0.8), "category:shopping": (1, 0.79)}, now=first
+        )
+        upsert_features(db, user.id, "plaid", {"merchant:amazon": (5, 0.95)}, now=later)
+        # Same key under another source is a separate row.
+        upsert_features(db, user.id, "gmail", {"merchant:amazon": (1, 0.75)}, value_json=True, now=later)
+        db.commit()
+
+        rows = {
+            (f.source, f.feature_key): f
+            for f in db.scalars(select(UserFeature).where(UserFeature.user_id == user.id))
+        }
+        assert set(rows) == {("plaid", "merchant:amazon"), ("plaid", "category:shopping"), ("gmail", "merchant:amazon")}
+        amazon = rows[("plaid", "merchant:amazon")]
+        assert amazon.value_json == {"count": 5}
+        assert amazon.confidence == 0.95
+        assert amazon.first_seen_at == first
+        assert amazon.last_seen_at == later
+        assert rows[("gmail", "merchant:amazon")].value_json is True
+    finally:
+        db.close()
+
+
+def test_upsert_features_writes_gmail_evidence(db_setup):
+    db = TestingSessionLocal()
+    try:
+        user = _user(db)
+        upsert_features(db, user.id, "gmail", {"merchant:uber": (1, 0.75)}, value_json=True, evidence_type="merchant")
+        upsert_features(db, user.id, "gmail", {"merchant:uber": (3, 0.85)}, value_json=True, evidence_type="merchant")
+        db.commit()
+
+        evidence = db.scalars(select(GmailEvidence).where(GmailEvidence.user_id == user.id)).all()
+        assert len(evidence) == 1
+        assert evidence[0].count == 3
+        assert evidence[0].confidence == 0.85
+        assert evidence[0].examples_json == []
+    finally:
+        db.close()
+
+
+def test_confidence_curves_are_capped():
+    assert gmail_confidence(1) == pytest.approx(0.75)
+    assert plaid_confidence(1) == pytest.approx(0.79)
+    assert gmail_confidence(1000) == pytest.approx(0.9)
+    assert plaid_confidence(1000) == 0.95
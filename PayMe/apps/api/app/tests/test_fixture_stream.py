@@ -0,0 +1,64 @@
+import json
+import tracemalloc
+
+import pytest
+
+from app.services.ingestion.fixture_stream import iter_chunks, iter_records, resolve_fixture
+
+
+def _records(count: int) -> list[dict]:
+    return [{"id": f"msg_{i:05d}", "subject": f"Amazon statement #{i}", "tags": ["a", {"b": "]"}]} for i in range(count)]
+
+
+def test_json_array_and_ndjson_yield_same_records(tmp_path):
+    records = _records(25)
+    array_path = tmp_path / "messages.json"
+    array_path.write_text(json.dumps(records, indent=2), encoding="utf-8")
+    ndjson_path = tmp_path / "messages.ndjson"
+    ndjson_path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n", encoding="utf-8")
+
+    assert list(iter_records(ndjson_path)) == records
+    assert list(iter_records(array_path)) == records
+    # Tiny reads force elements to straddle buffer boundaries.
+    assert list(iter_records(array_path, read_size=7)) == records
+    assert [len(c) for c in iter_chunks(ndjson_path, chunk_size=10)] == [10, 10, 5]
+
+
+def test_empty_and_truncated_arrays(tmp_path):
+    empty = tmp_path / "empty.json"
+    empty.write_text("  [ ]\n", encoding="utf-8")
+    assert list(iter_records(empty)) == []
+
+    truncated = tmp_path / "truncated.json"
+    truncated.write_text(json.dumps(_records(3))[:-20], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_records(truncated, read_size=16))
+
+
+def test_resolve_fixture_prefers_ndjson(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    (second / "gmail").mkdir(parents=True)
+    (second / "gmail/sample_messages.json").write_text("[]", encoding="utf-8")
+    assert resolve_fixture("gmail/sample_messages", roots=(first, second)) == second / "gmail/sample_messages.json"
+
+    (second / "gmail/sample_messages.ndjson").write_text("", encoding="utf-8")
+    assert resolve_fixture("gmail/sample_messages", roots=(first, second)) == second / "gmail/sample_messages.ndjson"
+
+
+def test_streaming_memory_does_not_grow_with_fixture_size(tmp_path):
+    path = tmp_path / "big.json"
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write("[")
+        for i in range(50_000):
+            fh.write(("," if i else "") + json.dumps({"id": i, "snippet": "x" * 100}))
+        fh.write("]")
+
+    tracemalloc.start()
+    try:
+        seen = sum(len(chunk) for chunk in iter_chunks(path, chunk_size=500))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert seen == 50_000
+    # The file is ~7 MB; a streamed read stays within a few chunks' worth.
+    assert peak < 2 * 1024 * 1024
@@ -10,9 +10,10 @@ DB and issue JWTs via create_access_token.
 """
 
 import uuid
+from datetime import datetime, timezone
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 from app.core.security import create_access_token, hash_password
 from app.models.entities import (
@@ -483,6 +484,497 @@ def test_reconciliation_report(client, db):
     assert report["successful"] + report["failed"] == report["total"]
 
 
+def _approved_batch(db, count: int):
+    """Create a settlement with ``count`` approved claimants and a queued batch for them."""
+    from app.services.gateway.payout_service import create_payout_batch
+
+    settlement = _make_settlement(db)
+    users = [_make_user(db) for _ in range(count)]
+    for u in users:
+        _set_submitted(db, u, settlement)
+    _, attorney, _ = _make_attorney_user(db)
+    for u in users:
+        db.add(
+            ClaimApproval(
+                id=uuid.uuid4(),
+                user_id=u.id,
+                settlement_id=settlement.id,
+                attorney_id=attorney.id,
+                status="approved",
+                approved_amount_cents=5000,
+            )
+        )
+    db.flush()
+    batch = create_payout_batch(db, attorney, settlement.id, f"idem-{uuid.uuid4().hex}")
+    db.commit()
+    return settlement, batch.id
+
+
+def test_process_batch_in_chunks_resumes_after_interruption(db, monkeypatch):
+    """Chunks commit as they go; a re-run after a crash finishes only what is pending."""
+    from app.models.entities import Event
+    from app.services.gateway import payout_service
+
+    settlement, batch_id = _approved_batch(db, 7)
+
+    decide = payout_service._decide_transfer
+    calls = []
+
+    def crash_in_second_chunk(transfer_id, key):
+        calls.append(transfer_id)
+        if len(calls) > 3:
+            raise RuntimeError("worker died")
+        return decide(transfer_id, key)
+
+    monkeypatch.setattr(payout_service, "_decide_transfer", crash_in_second_chunk)
+    with pytest.raises(RuntimeError):
+        payout_service.process_payout_batch(db, batch_id, chunk_size=3)
+    db.rollback()
+
+    session = TestingSessionLocal()
+    try:
+        transfers = session.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+        assert sum(t.status == "pending" for t in transfers) == 4
+        assert session.get(PayoutBatch, batch_id).status == "processing"
+    finally:
+        session.close()
+
+    monkeypatch.setattr(payout_service, "_decide_transfer", decide)
+    batch = payout_service.process_payout_batch(db, batch_id, chunk_size=3)
+    db.commit()
+
+    transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+    assert all(t.status in {"completed", "failed"} for t in transfers)
+    completed = {t.user_id for t in transfers if t.status == "completed"}
+    assert batch.successful_transfers == len(completed)
+    assert batch.successful_transfers + batch.failed_transfers == 7
+    assert batch.status in {"completed", "partial", "failed"}
+
+    approvals = db.scalars(select(ClaimApproval).where(ClaimApproval.settlement_id == settlement.id)).all()
+    assert {a.user_id for a in approvals if a.status == "paid"} == completed
+    assert {a.status for a in approvals} <= {"paid", "failed"}
+    prefs = db.scalars(
+        select(UserSettlementPreference).where(UserSettlementPreference.settlement_id == settlement.id)
+    ).all()
+    assert {p.user_id for p in prefs if p.claim_status == "paid_out"} == completed
+
+    # One aggregated event per outcome per chunk: chunks of 3, 3 and 1.
+    chunk_events = [
+        e
+        for e in db.scalars(
+            select(Event).where(Event.type.in_(["payout_transfers_completed", "payout_transfers_failed"]))
+        )
+        if e.payload_json["batch_id"] == str(batch_id)
+    ]
+    assert sum(e.payload_json["count"] for e in chunk_events) == 7
+    assert 3 <= len(chunk_events) <= 6
+
+
+def test_process_batch_via_http_provider_settles_on_callbacks(client, db, monkeypatch):
+    """Accepted transfers stay 'processing' until the provider's signed callbacks land."""
+    from app.core.settings import settings
+    from app.services.gateway.mock_payout_server import MockPayoutServer
+    from app.services.gateway.payout_provider import mock_transfer_succeeds
+    from app.services.gateway.payout_service import process_payout_batch
+
+    settlement, batch_id = _approved_batch(db, 6)
+    with MockPayoutServer(transient_failures=3) as server:
+        monkeypatch.setattr(settings, "payout_provider", "http")
+        monkeypatch.setattr(settings, "payout_provider_base_url", server.base_url)
+        monkeypatch.setattr(settings, "payout_provider_callback_url", "")
+        monkeypatch.setattr(settings, "payout_provider_rate_per_second", 0.0)
+        monkeypatch.setattr("app.services.gateway.payout_provider._BACKOFF_BASE_SECONDS", 0.0)
+
+        batch = process_payout_batch(db, batch_id, chunk_size=4)
+        db.commit()
+        assert batch.status == "processing"
+        transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+        assert {t.status for t in transfers} == {"processing"}
+        assert all(t.provider_transfer_id.startswith("mptr_") for t in transfers)
+        assert server.created == 6
+        assert server.wait_for_callbacks(6)
+
+    forged = client.post(
+        "/gateway/payouts/callbacks",
+        content=server.pending_callbacks[0][0],
+        headers={"X-Payout-Signature": "sha256=forged"},
+    )
+    assert forged.status_code == 401
+
+    # Every callback delivered twice: the duplicates must not count again.
+    for body, headers in server.pending_callbacks * 2:
+        resp = client.post("/gateway/payouts/callbacks", content=body, headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()["status"] in {"completed", "failed"}
+
+    db.expire_all()
+    batch = db.get(PayoutBatch, batch_id)
+    transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+    expected = sum(mock_transfer_succeeds(t.idempotency_key) for t in transfers)
+    assert batch.successful_transfers == expected
+    assert batch.successful_transfers + batch.failed_transfers == 6
+    assert batch.status in {"completed", "partial", "failed"}
+    paid = {t.user_id for t in transfers if t.status == "completed"}
+    prefs = db.scalars(
+        select(UserSettlementPreference).where(UserSettlementPreference.settlement_id == settlement.id)
+    ).all()
+    assert {p.user_id for p in prefs if p.claim_status == "paid_out"} == paid
+
+
+def test_process_batch_reconciles_transfers_whose_callback_was_lost(db, monkeypatch):
+    """A re-run looks up long-processing transfers, so lost callbacks still finalize the batch."""
+    from app.core.settings import settings
+    from app.services.gateway.mock_payout_server import MockPayoutServer
+    from app.services.gateway.payout_provider import mock_transfer_succeeds
+    from app.services.gateway.payout_service import process_payout_batch
+
+    _, batch_id = _approved_batch(db, 5)
+    with MockPayoutServer() as server:
+        monkeypatch.setattr(settings, "payout_provider", "http")
+        monkeypatch.setattr(settings, "payout_provider_base_url", server.base_url)
+        # Nothing listens on the discard port: every callback POST fails.
+        monkeypatch.setattr(settings, "payout_provider_callback_url", "http://127.0.0.1:9/callbacks")
+        monkeypatch.setattr(settings, "payout_provider_rate_per_second", 0.0)
+
+        batch = process_payout_batch(db, batch_id)
+        db.commit()
+        assert batch.status == "processing"
+        assert server.wait_for_callbacks(5)
+        assert server.callback_errors == 5
+
+        # Not yet due for a status query: the re-run leaves them processing.
+        batch = process_payout_batch(db, batch_id)
+        db.commit()
+        assert batch.status == "processing"
+
+        # The provider lost one transfer entirely; it is resubmitted under its key.
+        transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+        del server.transfers[transfers[0].idempotency_key]
+        monkeypatch.setattr(settings, "payout_provider_status_poll_seconds", 0)
+        batch = process_payout_batch(db, batch_id)
+        db.commit()
+        assert server.created == 6
+        assert server.wait_for_callbacks(6)
+
+        batch = process_payout_batch(db, batch_id)
+        db.commit()
+
+    db.expire_all()
+    batch = db.get(PayoutBatch, batch_id)
+    transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+    expected = sum(mock_transfer_succeeds(t.idempotency_key) for t in transfers)
+    assert {t.status for t in transfers} <= {"completed", "failed"}
+    assert all(t.dispatched_at is None for t in transfers)
+    assert batch.successful_transfers == expected
+    assert batch.successful_transfers + batch.failed_transfers == 5
+    assert batch.status in {"completed", "partial", "failed"}
+
+
+def test_process_batch_leaves_transfers_pending_when_provider_unreachable(db, monkeypatch):
+    from app.core.settings import settings
+    from app.services.gateway.payout_service import process_payout_batch
+
+    _, batch_id = _approved_batch(db, 3)
+    monkeypatch.setattr(settings, "payout_provider", "http")
+    monkeypatch.setattr(settings, "payout_provider_base_url", "http://127.0.0.1:9")
+    monkeypatch.setattr(settings, "payout_provider_max_retries", 0)
+
+    batch = process_payout_batch(db, batch_id)
+    db.commit()
+
+    assert batch.status == "processing"
+    transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+    assert {t.status for t in transfers} == {"pending"}
+    assert all(t.dispatched_at is None for t in transfers)
+
+
+def test_process_batch_dispatches_leased_chunk_without_holding_locks(db, monkeypatch):
+    """The chunk's lease is committed before dispatch; no row lock is held while requests run."""
+    from sqlalchemy import text
+
+    from app.core.settings import settings
+    from app.services.gateway import payout_service
+    from app.services.gateway.payout_provider import TransferResult
+
+    _, batch_id = _approved_batch(db, 3)
+    monkeypatch.setattr(settings, "payout_provider", "http")
+    seen = {}
+
+    def submit(requests):
+        other = TestingSessionLocal()
+        try:
+            rows = other.execute(
+                text(
+                    "SELECT status, dispatched_at FROM payout_transfers "
+                    "WHERE batch_id = :batch_id FOR UPDATE NOWAIT"
+                ),
+                {"batch_id": batch_id},
+            ).all()
+            seen["leased"] = [r.dispatched_at is not None and r.status == "pending" for r in rows]
+            # A concurrent run sees nothing to claim while the lease is live.
+            seen["claimable"] = other.scalar(
+                select(func.count()).select_from(PayoutTransfer).where(
+                    *payout_service._claimable(batch_id, datetime.now(timezone.utc))
+                )
+            )
+        finally:
+            other.rollback()
+            other.close()
+        return [TransferResult(r.transfer_id, "processing", f"ptr_{i}", None, 1) for i, r in enumerate(requests)]
+
+    monkeypatch.setattr(payout_service, "submit_transfers", submit)
+    batch = payout_service.process_payout_batch(db, batch_id)
+    db.commit()
+
+    assert seen == {"leased": [True, True, True], "claimable": 0}
+    assert batch.status == "processing"
+    transfers = db.scalars(select(PayoutTransfer).where(PayoutTransfer.batch_id == batch_id)).all()
+    assert {t.status for t in transfers} == {"processing"}
+
+
+def test_execute_payouts_bulk_approves_and_pays_per_settlement(client, db):
+    from app.models.entities import Event, SettlementAccount
+    from app.services.gateway.payout_service import execute_payouts
+
+    funded = [_make_settlement(db), _make_settlement(db)]
+    unfunded = _make_settlement(db)
+    _, attorney, _ = _make_attorney_user(db)
+    for settlement in funded:
+        db.add(
+            SettlementAccount(
+                id=uuid.uuid4(),
+                settlement_id=settlement.id,
+                attorney_id=attorney.id,
+                account_ref_enc="test-ref",
+                status="active",
+            )
+        )
+    users = [_make_user(db) for _ in range(40)]
+    # One claimant was rejected before; the bulk call re-approves them.
+    db.add(
+        ClaimApproval(
+            id=uuid.uuid4(),
+            user_id=users[0].id,
+            settlement_id=funded[0].id,
+            attorney_id=attorney.id,
+            status="rejected",
+        )
+    )
+    db.commit()
+
+    items = [
+        {"user_id": str(u.id), "settlement_id": str(funded[i % 2].id), "amount_cents": 1000 + i}
+        for i, u in enumerate(users)
+    ]
+    items.append({"user_id": str(users[0].id), "settlement_id": str(funded[0].id), "amount_cents": 7777})
+    items.append({"user_id": str(users[1].id), "settlement_id": str(unfunded.id), "amount_cents": 500})
+    idem = f"bulk-{uuid.uuid4().hex}"
+
+    result = execute_payouts(db, attorney, items, idem)
+    db.commit()
+
+    assert result["total_items"] == 42
+    assert result["total_approved"] == 40
+    assert sorted(b["total"] for b in result["batches"]) == [20, 20]
+    for report in result["batches"]:
+        assert report["status"] in {"completed", "partial", "failed"}
+        assert report["successful"] + report["failed"] == report["total"]
+
+    approvals = db.scalars(select(ClaimApproval).where(ClaimApproval.attorney_id == attorney.id)).all()
+    assert len(approvals) == 40
+    assert {a.status for a in approvals} <= {"paid", "failed"}
+    first = next(a for a in approvals if a.user_id == users[0].id)
+    assert first.approved_amount_cents == 7777  # last duplicate item wins
+    assert first.rejected_at is None
+    transfer_amounts = {
+        t.user_id: t.amount_cents
+        for t in db.scalars(select(PayoutTransfer).where(PayoutTransfer.approval_id == first.id))
+    }
+    assert transfer_amounts == {users[0].id: 7777}
+
+    def approved_events() -> int:
+        return sum(
+            e.payload_json["attorney_id"] == str(attorney.id)
+            for e in db.scalars(select(Event).where(Event.type == "claimant_approved"))
+        )
+
+    assert approved_events() == 40
+
+    # A retry returns the same batches without re-approving anyone.
+    again = execute_payouts(db, attorney, items, idem)
+    db.commit()
+    assert sorted(b["batch_id"] for b in again["batches"]) == sorted(
+        b["batch_id"] for b in result["batches"]
+    )
+    assert approved_events() == 40
+    db.expire_all()
+    approvals = db.scalars(select(ClaimApproval).where(ClaimApproval.attorney_id == attorney.id)).all()
+    assert {a.status for a in approvals} <= {"paid", "failed"}
+
+
+def test_ledger_balances_track_holds_and_disbursements_per_settlement(client, db):
+    from app.models.entities import LedgerEntry
+    from app.services.gateway.ledger import get_balances
+
+    first = _make_settlement(db, payout_min_cents=3000)
+    second = _make_settlement(db)
+    users = [_make_user(db) for _ in range(4)]
+    for u in users:
+        _set_submitted(db, u, first)
+    _set_submitted(db, users[0], second)
+    db.commit()
+    attorney_id, token = _register_and_link(client, db, first.id)
+    client.post(
+        f"/gateway/attorneys/{attorney_id}/settlement-accounts",
+        json={
+            "settlement_id": str(second.id),
+            "bank_name": "Second Bank",
+            "account_ref": "routing:000000000:account:222222222",
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    auth = {"Authorization": f"Bearer {token}"}
+
+    def approve(user, settlement, amount):
+        body = {"amount_cents": amount} if amount is not None else {}
+        url = f"/gateway/attorneys/{attorney_id}/approve/{settlement.id}/{user.id}"
+        resp = client.post(url, json=body, headers=auth)
+        assert resp.status_code == 200
+
+    approve(users[0], first, 1000)
+    approve(users[0], first, 1500)  # re-approval replaces the hold
+    approve(users[1], first, None)  # held at the settlement's payout_min_cents
+    approve(users[2], first, 2000)
+    approve(users[3], first, 4000)
+    approve(users[0], second, 9000)
+    resp = client.post(
+        f"/gateway/attorneys/{attorney_id}/reject/{first.id}/{users[3].id}", json={}, headers=auth
+    )
+    assert resp.status_code == 200
+
+    balance = client.get("/gateway/account/balance", headers=auth).json()
+    assert balance["pending_approval_cents"] == 1500 + 3000 + 2000 + 9000
+    assert balance["disbursed_cents"] == 0
+    by_settlement = {s["settlement_id"]: s for s in balance["settlements"]}
+    assert by_settlement[str(first.id)]["pending_approval_cents"] == 6500
+    assert by_settlement[str(second.id)]["pending_approval_cents"] == 9000
+    assert by_settlement[str(second.id)]["bank_name"] == "Second Bank"
+
+    batch = client.post(
+        "/gateway/payouts/batch",
+        json={"settlement_id": str(first.id), "idempotency_key": f"ledger-{uuid.uuid4().hex}"},
+        headers=auth,
+    ).json()
+    client.post(f"/gateway/payouts/{batch['batch_id']}/process", headers=auth)
+
+    db.expire_all()
+    transfers = db.scalars(
+        select(PayoutTransfer).where(PayoutTransfer.batch_id == uuid.UUID(batch["batch_id"]))
+    ).all()
+    paid = sum(t.amount_cents for t in transfers if t.status == "completed")
+    balance = client.get("/gateway/account/balance", headers=auth).json()
+    assert balance["disbursed_cents"] == paid
+    assert balance["available_cents"] == balance["sandbox_balance_cents"] - paid
+    assert balance["pending_approval_cents"] == 9000  # settled holds were disbursed or released
+    by_settlement = {s["settlement_id"]: s for s in balance["settlements"]}
+    assert by_settlement[str(first.id)] == {
+        "settlement_id": str(first.id),
+        "bank_name": "Test Bank",
+        "disbursed_cents": paid,
+        "pending_approval_cents": 0,
+    }
+
+    # Double entry: every account set nets to zero, and totals match the entries.
+    attorney_uuid = uuid.UUID(attorney_id)
+    totals = get_balances(db, attorney_uuid)
+    assert sum(totals.values()) == 0
+    assert totals["fund"] == -(9000 + paid)
+    for settlement in (first, second):
+        assert sum(get_balances(db, attorney_uuid, settlement.id).values()) == 0
+    entries = db.scalars(select(LedgerEntry).where(LedgerEntry.attorney_id == attorney_uuid)).all()
+    entry_types = {e.entry_type for e in entries}
+    assert entry_types >= {"approval_hold", "hold_release"}
+    assert ("disbursement" in entry_types) == (paid > 0)
+    assert ("failure_release" in entry_types) == any(t.status == "failed" for t in transfers)
+    held = sum(e.amount_cents for e in entries if e.debit_account == "held") - sum(
+        e.amount_cents for e in entries if e.credit_account == "held"
+    )
+    assert held == totals["held"]
+
+
+def test_payout_history_pages_filters_and_exports(client, db):
+    import csv
+    import io
+    import json
+
+    from app.services.gateway.payout_service import create_payout_batch, process_payout_batch
+
+    _, attorney, token = _make_attorney_user(db)
+    settlements = [_make_settlement(db), _make_settlement(db)]
+    for settlement, count in zip(settlements, (7, 5)):
+        for _ in range(count):
+            user = _make_user(db)
+            db.add(
+                ClaimApproval(
+                    id=uuid.uuid4(),
+                    user_id=user.id,
+                    settlement_id=settlement.id,
+                    attorney_id=attorney.id,
+                    status="approved",
+                    approved_amount_cents=2500,
+                )
+            )
+        db.flush()
+        batch = create_payout_batch(db, attorney, settlement.id, f"history-{uuid.uuid4().hex}")
+        db.commit()
+        process_payout_batch(db, batch.id)
+    auth = {"Authorization": f"Bearer {token}"}
+
+    def page(**params):
+        resp = client.get("/gateway/payouts/history", params=params, headers=auth)
+        assert resp.status_code == 200
+        return resp.json()
+
+    seen, cursor = [], None
+    while True:
+        data = page(limit=5, **({"cursor": cursor} if cursor else {}))
+        assert len(data["items"]) <= 5
+        seen += data["items"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 12
+    assert len({item["transfer_id"] for item in seen}) == 12
+    keys = [(item["created_at"], item["transfer_id"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    only_second = page(settlement_id=str(settlements[1].id))["items"]
+    assert len(only_second) == 5
+    assert {item["settlement_id"] for item in only_second} == {str(settlements[1].id)}
+    failed = page(status="failed")["items"]
+    assert {item["status"] for item in failed} <= {"failed"}
+    both = page(status=["completed", "failed"])["items"]
+    assert len(both) == 12
+    assert page(since="2100-01-01T00:00:00Z")["items"] == []
+    assert len(page(until="2100-01-01T00:00:00Z")["items"]) == 12
+    assert client.get("/gateway/payouts/history", params={"cursor": "nope"}, headers=auth).status_code == 400
+
+    export = client.get(
+        "/gateway/payouts/history/export",
+        params={"format": "csv", "settlement_id": str(settlements[0].id)},
+        headers=auth,
+    )
+    assert export.status_code == 200
+    assert export.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(export.text)))
+    assert len(rows) == 7
+    assert {row["amount_cents"] for row in rows} == {"2500"}
+
+    export = client.get("/gateway/payouts/history/export", params={"format": "ndjson"}, headers=auth)
+    lines = [json.loads(line) for line in export.text.splitlines()]
+    assert [line["transfer_id"] for line in lines] == [item["transfer_id"] for item in seen]
+
+
 # ---------------------------------------------------------------------------
 # Auth / security
 # ---------------------------------------------------------------------------
@@ -0,0 +1,72 @@
+"""Tests for batched Gmail metadata fetching against a local Gmail stub server."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.services.ingestion.gmail_batch import GmailBatchError, fetch_message_metadata
+from app.tests.gmail_stub import GmailStubServer, make_message
+
+
+def _messages(n: int) -> dict[str, dict]:
+    return {f"m{i:04d}": make_message(f"m{i:04d}", f"Amazon order {i}") for i in range(n)}
+
+
+def test_fetch_splits_into_batches_of_100():
+    messages = _messages(250)
+    with GmailStubServer(messages) as stub:
+        fetched = fetch_message_metadata("tok", list(messages), base_url=stub.base_url, concurrency=3)
+
+    assert fetched == messages
+    assert stub.batch_calls == 3
+    assert stub.subrequests == 250
+
+
+def test_fetch_runs_batches_in_parallel_up_to_concurrency():
+    messages = _messages(400)
+    with GmailStubServer(messages, latency=0.2) as stub:
+        fetch_message_metadata("tok", list(messages), base_url=stub.base_url, concurrency=2)
+
+    assert stub.max_in_flight == 2
+
+
+def test_fetch_skips_missing_messages():
+    messages = _messages(3)
+    with GmailStubServer(messages) as stub:
+        fetched = fetch_message_metadata("tok", ["m0000", "gone", "m0002"], base_url=stub.base_url)
+
+    assert set(fetched) == {"m0000", "m0002"}
+
+
+def test_fetch_retries_rate_limited_subrequests_with_backoff():
+    messages = _messages(150)
+    sleeps: list[float] = []
+    with GmailStubServer(messages, rate_limited_subrequests=120) as stub:
+        fetched = fetch_message_metadata(
+            "tok", list(messages), base_url=stub.base_url, concurrency=4, sleep=sleeps.append
+        )
+
+    assert fetched == messages
+    assert len(sleeps) >= 1
+    assert sleeps == sorted(sleeps)
+
+
+def test_fetch_gives_up_after_max_retries():
+    messages = _messages(5)
+    with GmailStubServer(messages, rate_limited_subrequests=10_000) as stub:
+        with pytest.raises(GmailBatchError):
+            fetch_message_metadata(
+                "tok", list(messages), base_url=stub.base_url, max_retries=2, sleep=lambda _s: None
+            )
+    assert stub.batch_calls == 3
+
+
+def test_batches_reuse_keep_alive_connections():
+    messages = _messages(300)
+    with GmailStubServer(messages) as stub:
+        fetch_message_metadata("tok", list(messages), base_url=stub.base_url, concurrency=1)
+        fetch_message_metadata("tok", list(messages)[:10], base_url=stub.base_url, concurrency=1)
+
+    assert stub.batch_calls == 4
+    # Three batches plus a second sync share one pooled connection.
+    assert len(stub.connections) == 1
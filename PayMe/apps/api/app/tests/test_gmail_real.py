@@ -8,6 +8,7 @@ uses the conftest `client` fixture which manages the test DB schema.
 from __future__ import annotations
 
 import uuid
+from contextlib import nullcontext
 from datetime import UTC, datetime
 from unittest.mock import MagicMock, patch
 
@@ -16,7 +17,8 @@ from sqlalchemy import select
 
 from app.core.crypto import decrypt_token, encrypt_token
 from app.models.entities import GmailOAuthToken, UserFeature
-from app.tests.conftest import TestingSessionLocal
+from app.tests.conftest import TestingSessionLocal, run_sync
+from app.tests.gmail_stub import GmailStubServer
 
 
 # ---------------------------------------------------------------------------
@@ -235,9 +237,6 @@ def test_sync_gmail_real_uses_history_id(client):
     (
         fake_service.users.return_value.history.return_value.list.return_value.execute.return_value
     ) = fake_history_resp
-    (
-        fake_service.users.return_value.messages.return_value.get.return_value.execute.return_value
-    ) = fake_msg
 
     import app.services.ingestion.gmail_real as _gmail_real
 
@@ -247,14 +246,14 @@ def test_sync_gmail_real_uses_history_id(client):
     fake_creds.expiry = datetime(2099, 1, 1, tzinfo=UTC)
     fake_creds.expired = False
 
-    fake_google_build = MagicMock(return_value=fake_service)
+    fake_build_service = MagicMock(return_value=fake_service)
 
     # Insert a GmailOAuthToken row with a history_id directly into the
     # test DB.  We do this via the client's DB session (by patching sync_gmail
     # to first insert the token then call the real sync_gmail_real).
     pre_insert_done = []
 
-    def fake_sync_dispatch(db, user):
+    def fake_sync_dispatch(db, user, heartbeat=None):
         """Insert the token row then call the real incremental sync."""
         if not pre_insert_done:
             db.add(
@@ -271,28 +270,31 @@ def test_sync_gmail_real_uses_history_id(client):
             pre_insert_done.append(True)
 
         with (
+            GmailStubServer({"msg-hist-001": fake_msg}) as stub,
+            patch.object(_gmail_real.settings, "gmail_api_base_url", stub.base_url),
             patch.object(_gmail_real, "_GOOGLE_IMPORT_ERROR", None),
             patch.object(_gmail_real, "_build_credentials", return_value=fake_creds),
-            patch.object(_gmail_real, "google_build", fake_google_build, create=True),
+            patch.object(_gmail_real, "build_service", fake_build_service),
+            patch.object(_gmail_real, "google_http", nullcontext),
         ):
-            return _gmail_real.sync_gmail_real(db, user)
+            return _gmail_real.sync_gmail_real(db, user, heartbeat=heartbeat)
 
-    # Patch the `sync_gmail` name in the integrations router module (where the
-    # route resolves it), NOT in the gmail_sync module (which the route already
+    # Patch the `sync_gmail` name in the sync queue module (where the worker
+    # resolves it), NOT in the gmail_sync module (which sync_jobs already
     # imported and bound to a local name).
-    with patch("app.api.routes.integrations.sync_gmail", side_effect=fake_sync_dispatch):
-        resp = client.post(
-            "/integrations/gmail/sync",
-            headers={"Authorization": f"Bearer {token}"},
-        )
+    with patch("app.services.ingestion.sync_jobs.sync_gmail", side_effect=fake_sync_dispatch):
+        resp = run_sync(client, "gmail", {"Authorization": f"Bearer {token}"})
 
     assert resp.status_code == 200, resp.text
     data = resp.json()
-    assert data["status"] == "ok"
-    assert data["inserted_messages"] == 1
+    assert data["status"] == "done"
+    assert data["result"]["status"] == "ok"
+    assert data["result"]["inserted_messages"] == 1
     # Verify history.list was called (incremental path), not messages.list.
     fake_service.users.return_value.history.return_value.list.assert_called_once()
     fake_service.users.return_value.messages.return_value.list.assert_not_called()
+    # Message metadata comes from the batch endpoint, not per-message get() calls.
+    fake_service.users.return_value.messages.return_value.get.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -307,9 +309,9 @@ def test_sync_gmail_mock_fallback(client, monkeypatch):
     token, _user_id = _signup_and_token(client, suffix="mockfb")
     headers = {"Authorization": f"Bearer {token}"}
 
-    resp = client.post("/integrations/gmail/sync", headers=headers)
+    resp = run_sync(client, "gmail", headers)
     assert resp.status_code == 200, resp.text
-    data = resp.json()
+    data = resp.json()["result"]
     assert data.get("status") == "ok"
     assert data.get("inserted_messages", 0) >= 1
 
@@ -341,7 +343,7 @@ def test_sync_dispatches_to_real_when_mock_disabled():
         mock_db.scalar.return_value = object()  # Simulate connected OAuth token.
         result = gmail_sync.sync_gmail(mock_db, mock_user)
 
-    fake_real.assert_called_once_with(mock_db, mock_user)
+    fake_real.assert_called_once_with(mock_db, mock_user, heartbeat=None)
     assert result["status"] == "ok"
 
 
@@ -365,5 +367,208 @@ def test_sync_dispatches_to_real_when_connected_even_if_mock_enabled():
         mock_db.scalar.return_value = object()  # Simulate connected OAuth token.
         result = gmail_sync.sync_gmail(mock_db, mock_user)
 
-    fake_real.assert_called_once_with(mock_db, mock_user)
+    fake_real.assert_called_once_with(mock_db, mock_user, heartbeat=None)
     assert result["status"] == "ok"
+
+
+# ---------------------------------------------------------------------------
+# Paginated, resumable sync
+# ---------------------------------------------------------------------------
+
+
+def _stub_msg(msg_id: str, history_id: str) -> dict:
+    return {
+        "id": msg_id,
+        "historyId": history_id,
+        "internalDate": "1700000000000",
+        "snippet": "Amazon order shipped",
+        "payload": {"headers": [{"name": "Subject", "value": "Your Amazon order"}]},
+    }
+
+
+def _pages(responses: dict, calls: list):
+    """list() side effect answering by (startHistoryId|q, pageToken); Exception values raise once."""
+
+    def list_(**kwargs):
+        key = (kwargs.get("startHistoryId") or kwargs.get("q"), kwargs.get("pageToken"))
+        calls.append(key)
+        response = responses[key]
+        request = MagicMock()
+        if isinstance(response, Exception):
+            responses[key] = responses[(key[0], key[1], "retry")]
+            request.execute.side_effect = response
+        else:
+            request.execute.return_value = response
+        return request
+
+    return list_
+
+
+def _run_real_sync(db, user, fake_service, messages: dict):
+    import app.services.ingestion.gmail_real as _gmail_real
+
+    fake_creds = MagicMock(token="fake-access-token", refresh_token=None, expiry=None)
+    with (
+        GmailStubServer(messages) as stub,
+        patch.object(_gmail_real.settings, "gmail_api_base_url", stub.base_url),
+        patch.object(_gmail_real, "_GOOGLE_IMPORT_ERROR", None),
+        patch.object(_gmail_real, "_build_credentials", return_value=fake_creds),
+        patch.object(_gmail_real, "build_service", MagicMock(return_value=fake_service)),
+        patch.object(_gmail_real, "google_http", nullcontext),
+    ):
+        return _gmail_real.sync_gmail_real(db, user)
+
+
+def _user_with_token(db, suffix: str, history_id: str | None = None):
+    from app.models.entities import User
+
+    user = User(username=f"gmail_pages_{suffix}", email=f"gmail_pages_{suffix}@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    token_row = GmailOAuthToken(
+        user_id=user.id,
+        access_token_enc=encrypt_token("access-tok"),
+        gmail_history_id=history_id,
+        granted_at=datetime.now(UTC),
+    )
+    db.add(token_row)
+    db.commit()
+    return user, token_row
+
+
+def test_initial_list_sync_resumes_from_checkpointed_page(db_setup):
+    from app.models.entities import GmailMessage
+
+    messages = {m: _stub_msg(m, h) for m, h in [("m1", "501"), ("m2", "502"), ("m3", "503")]}
+    calls: list = []
+    db = TestingSessionLocal()
+    try:
+        user, token_row = _user_with_token(db, "list")
+        responses = {
+            ("q", None): {"messages": [{"id": "m1"}, {"id": "m2"}], "nextPageToken": "p2"},
+            ("q", "p2"): RuntimeError("connection reset"),
+            ("q", "p2", "retry"): {"messages": [{"id": "m3"}]},
+        }
+        answer = _pages(responses, calls)
+        queries: set[str] = set()
+
+        def list_(**kwargs):
+            # The resumed run must reuse the original query with its page token.
+            queries.add(kwargs["q"])
+            return answer(**{**kwargs, "q": "q"})
+
+        fake_service = MagicMock()
+        fake_service.users.return_value.messages.return_value.list.side_effect = list_
+
+        with pytest.raises(ValueError):
+            _run_real_sync(db, user, fake_service, messages)
+        db.refresh(token_row)
+        assert token_row.resume_page_token == "p2"
+        assert token_row.resume_history_id == "501"
+        assert token_row.gmail_history_id is None
+        assert set(db.scalars(select(GmailMessage.provider_msg_id))) == {"m1", "m2"}
+
+        result = _run_real_sync(db, user, fake_service, messages)
+        db.commit()
+        assert result["inserted_messages"] == 1
+        assert calls == [("q", None), ("q", "p2"), ("q", "p2")]
+        assert len(queries) == 1
+        db.refresh(token_row)
+        assert token_row.gmail_history_id == "501"
+        assert token_row.resume_page_token is None and token_row.resume_query is None
+        assert set(db.scalars(select(GmailMessage.provider_msg_id))) == {"m1", "m2", "m3"}
+    finally:
+        db.close()
+
+
+def test_history_sync_follows_pages_and_checkpoints_history_id(db_setup):
+    from app.models.entities import GmailMessage
+
+    messages = {"m1": _stub_msg("m1", "101"), "m2": _stub_msg("m2", "150")}
+    calls: list = []
+    responses = {
+        ("100", None): {
+            "history": [{"id": "101", "messagesAdded": [{"message": {"id": "m1"}}]}],
+            "nextPageToken": "hp2",
+            "historyId": "200",
+        },
+        ("100", "hp2"): RuntimeError("backend error"),
+        ("100", "hp2", "retry"): {},
+        ("101", None): {
+            "history": [{"id": "150", "messagesAdded": [{"message": {"id": "m2"}}]}],
+            "historyId": "200",
+        },
+    }
+    db = TestingSessionLocal()
+    try:
+        user, token_row = _user_with_token(db, "history", history_id="100")
+        fake_service = MagicMock()
+        fake_service.users.return_value.history.return_value.list.side_effect = _pages(responses, calls)
+
+        with pytest.raises(ValueError):
+            _run_real_sync(db, user, fake_service, messages)
+        db.refresh(token_row)
+        assert token_row.gmail_history_id == "101"
+
+        result = _run_real_sync(db, user, fake_service, messages)
+        db.commit()
+        assert result["inserted_messages"] == 1
+        assert calls == [("100", None), ("100", "hp2"), ("101", None)]
+        db.refresh(token_row)
+        assert token_row.gmail_history_id == "200"
+        assert set(db.scalars(select(GmailMessage.provider_msg_id))) == {"m1", "m2"}
+    finally:
+        db.close()
+
+
+# ---------------------------------------------------------------------------
+# Credential refresh and discovery caching
+# ---------------------------------------------------------------------------
+
+
+def test_concurrent_syncs_share_one_credential_refresh():
+    import threading
+    import time
+    from types import SimpleNamespace
+
+    import app.services.ingestion.gmail_real as _gmail_real
+
+    user_id = uuid.uuid4()
+    stored = encrypt_token("expired-access")
+    rows = [
+        SimpleNamespace(user_id=user_id, access_token_enc=stored, refresh_token_enc=None)
+        for _ in range(4)
+    ]
+    refreshed = MagicMock(token="fresh-access", refresh_token=None, expiry=datetime(2099, 1, 1))
+    refreshes: list[str] = []
+
+    def slow_refresh(token_row):
+        refreshes.append(token_row.access_token_enc)
+        time.sleep(0.2)
+        return refreshed
+
+    results: list = []
+    with patch.object(_gmail_real, "_build_credentials", side_effect=slow_refresh):
+        threads = [
+            threading.Thread(target=lambda r=row: results.append(_gmail_real._get_credentials(r)))
+            for row in rows
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(refreshes) == 1
+    assert results == [refreshed] * 4
+    # Only the refreshing sync writes the new token back.
+    written = [row.access_token_enc for row in rows if row.access_token_enc != stored]
+    assert len(written) == 1
+    assert decrypt_token(written[0]) == "fresh-access"
+    _gmail_real._forget_credentials(user_id)
+
+
+def test_discovery_document_is_parsed_once():
+    pytest.importorskip("googleapiclient")
+    from app.services.ingestion.google_transport import discovery_document
+
+    assert discovery_document("gmail", "v1") is discovery_document("gmail", "v1")
@@ -1,7 +1,7 @@
 from sqlalchemy import select
 
 from app.models.entities import GmailEvidence, GmailMessage, UserFeature
-from app.tests.conftest import TestingSessionLocal
+from app.tests.conftest import TestingSessionLocal, run_sync
 
 
 def _token(client):
@@ -16,12 +16,14 @@ def test_gmail_sync_idempotent(client, monkeypatch):
     monkeypatch.setattr(_mod.settings, "mock_gmail", True)
     token = _token(client)
     headers = {"Authorization": f"Bearer {token}"}
-    first = client.post("/integrations/gmail/sync", headers=headers)
+    first = run_sync(client, "gmail", headers)
     assert first.status_code == 200
-    assert first.json()["inserted_messages"] >= 1
-    second = client.post("/integrations/gmail/sync", headers=headers)
+    assert first.json()["status"] == "done"
+    assert first.json()["result"]["inserted_messages"] >= 1
+    second = run_sync(client, "gmail", headers)
     assert second.status_code == 200
-    assert second.json()["inserted_messages"] == 0
+    assert second.json()["job_id"] != first.json()["job_id"]
+    assert second.json()["result"]["inserted_messages"] == 0
     db = TestingSessionLocal()
     try:
         messages = db.scalars(select(GmailMessage)).all()
@@ -0,0 +1,95 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.entities import GmailMessage, PlaidTransaction, User
+from app.services.ingestion import writer as writer_mod
+from app.services.ingestion.writer import IngestionWriter
+from app.tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture(params=["pipeline", "multi_values"])
+def db(request, db_setup, monkeypatch):
+    if request.param == "multi_values":
+        monkeypatch.setattr(writer_mod, "_pipeline_connection", lambda _db: None)
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _user(db) -> User:
+    user = User(username="writer", email="writer@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    return user
+
+
+def _msg(user, msg_id: str, subject: str = "Amazon order") -> dict:
+    return {
+        "user_id": user.id,
+        "provider_msg_id": msg_id,
+        "internal_date": datetime(2024, 1, 1, tzinfo=UTC),
+        "subject": subject,
+        "snippet": msg_id,
+    }
+
+
+def test_writer_inserts_and_skips_existing(db):
+    user = _user(db)
+    with IngestionWriter(db, GmailMessage, ("user_id", "provider_msg_id"), chunk_size=2) as writer:
+        writer.extend(_msg(user, f"m{i}") for i in range(5))
+    assert writer.inserted == 5
+
+    with IngestionWriter(db, GmailMessage, ("user_id", "provider_msg_id")) as again:
+        again.extend(_msg(user, f"m{i}", subject="changed") for i in range(3, 7))
+    assert again.inserted == 2
+
+    db.commit()
+    assert db.scalar(select(func.count()).select_from(GmailMessage)) == 7
+    row = db.scalar(select(GmailMessage).where(GmailMessage.provider_msg_id == "m3"))
+    assert row.subject == "Amazon order"
+    assert row.snippet == "m3"
+
+
+def test_writer_upsert_updates_and_counts_only_inserts(db):
+    user = _user(db)
+
+    def txn(txn_id: str, amount: int) -> dict:
+        return {
+            "user_id": user.id,
+            "provider_txn_id": txn_id,
+            "posted_at": datetime(2024, 1, 1, tzinfo=UTC),
+            "merchant_name": "Amazon",
+            "amount_cents": amount,
+        }
+
+    writer = IngestionWriter(
+        db, PlaidTransaction, ("user_id", "provider_txn_id"), update_cols=("amount_cents",)
+    )
+    writer.extend([txn("t1", 100), txn("t2", 200)])
+    assert writer.flush() == 2
+    # Duplicate keys inside one buffer collapse to the last row.
+    writer.extend([txn("t1", 150), txn("t3", 300), txn("t1", 175)])
+    assert writer.flush() == 1
+    assert writer.inserted == 3
+
+    amounts = dict(db.execute(select(PlaidTransaction.provider_txn_id, PlaidTransaction.amount_cents)).all())
+    assert amounts == {"t1": 175, "t2": 200, "t3": 300}
+
+    # With compare_cols, rows whose compared columns are unchanged are not rewritten.
+    compared = IngestionWriter(
+        db,
+        PlaidTransaction,
+        ("user_id", "provider_txn_id"),
+        update_cols=("amount_cents", "merchant_name"),
+        compare_cols=("amount_cents",),
+    )
+    unchanged = {**txn("t2", 200), "merchant_name": "Not written"}
+    compared.extend([txn("t1", 180), unchanged, txn("t4", 400)])
+    assert compared.flush() == 1
+    assert compared.changed == 2
+    merchants = dict(db.execute(select(PlaidTransaction.provider_txn_id, PlaidTransaction.merchant_name)).all())
+    assert merchants["t2"] == "Amazon"
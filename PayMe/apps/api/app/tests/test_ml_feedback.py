@@ -24,6 +24,7 @@ from app.models.entities import (
     UserSettlementPreference,
 )
 from app.services.ml.feedback import _assign_label, export_labeled_samples, get_labeled_dataset
+from app.services.ml.replay import load_replay_arrays
 from app.tests.conftest import TestingSessionLocal
 
 
@@ -298,6 +299,80 @@ def test_get_labeled_dataset_schema(db):
     assert expected_keys.issubset(rows[0].keys())
 
 
+def test_export_uses_latest_match_result_per_pair(db):
+    """Only the newest MatchResult for a (user, settlement) pair feeds the sample."""
+    from datetime import timedelta
+
+    user = _make_user(db)
+    settlement = _make_settlement(db)
+    old_run = _make_run(db, user)
+    new_run = _make_run(db, user)
+    old = _make_match_result(db, old_run, user, settlement, {"confidence_breakdown": {"rules": 0.2}})
+    old.created_at = datetime.now(UTC) - timedelta(days=1)
+    _make_match_result(db, new_run, user, settlement, {"confidence_breakdown": {"rules": 0.9}})
+    db.commit()
+
+    samples = export_labeled_samples(db)
+    target = [s for s in samples if s["settlement_id"] == str(settlement.id)]
+    assert len(target) == 1
+    assert target[0]["run_id"] == str(new_run.id)
+    assert target[0]["rules_confidence"] == 0.9
+
+
+def test_export_is_incremental_after_watermark(db, monkeypatch):
+    """A second export only revisits pairs whose match result or claim changed."""
+    from app.core.settings import settings
+    from app.services.matching.preferences import set_claim_outcome
+
+    monkeypatch.setattr(settings, "ml_export_watermark_overlap_seconds", 0)
+    user = _make_user(db)
+    first_settlement = _make_settlement(db)
+    second_settlement = _make_settlement(db)
+    run = _make_run(db, user)
+    _make_match_result(db, run, user, first_settlement)
+    _make_match_result(db, run, user, second_settlement)
+    _make_pref(db, user, first_settlement, "submitted")
+    db.commit()
+
+    assert len(export_labeled_samples(db)) == 2
+    assert export_labeled_samples(db) == []
+
+    set_claim_outcome(db, user.id, first_settlement.id, "paid_out")
+    db.commit()
+    changed = export_labeled_samples(db)
+    assert [(s["settlement_id"], s["label"]) for s in changed] == [(str(first_settlement.id), 1)]
+
+    # Untouched pairs keep their sample; full=True revisits everything.
+    assert len(get_labeled_dataset(db)) == 2
+    assert len(export_labeled_samples(db, full=True)) == 2
+
+
+def test_load_replay_arrays_groups_runs_in_logged_order(db):
+    """Replay arrays hold match-time signals per run, best logged score first."""
+    user = _make_user(db)
+    paid, pending, ignored = _make_settlement(db), _make_settlement(db), _make_settlement(db)
+    first_run, second_run = _make_run(db, user), _make_run(db, user)
+    for run in (first_run, second_run):
+        run.variant = "replay_test"
+    low = _make_match_result(db, first_run, user, paid, {"confidence_breakdown": {"rules": 0.3}, "payout": 0.9})
+    low.score = 0.2
+    _make_match_result(db, first_run, user, pending, {"confidence_breakdown": {"rules": 0.7}})
+    _make_match_result(db, second_run, user, ignored)
+    _make_pref(db, user, paid, "paid_out")
+    _make_pref(db, user, pending, "submitted")
+    db.commit()
+
+    arrays = load_replay_arrays(db, variants=["replay_test"], chunk_size=2)
+    assert arrays.run_count == 2
+    assert sorted(arrays.runs.tolist()) == arrays.runs.tolist()
+    first = arrays.runs == (0 if first_run.id < second_run.id else 1)
+    assert arrays.scores[first].tolist() == [0.75, 0.2]
+    assert arrays.labels[first].tolist() == [-1, 1]
+    assert arrays.labels[~first].tolist() == [0]
+    # rules_confidence, similarity, payout, urgency, ease (defaults as in _extract_features)
+    assert arrays.X[first].tolist() == [[0.7, 0.3, 0.1, 0.3, 0.4], [0.3, 0.3, 0.9, 0.3, 0.4]]
+
+
 # ---------------------------------------------------------------------------
 # Endpoint tests
 # ---------------------------------------------------------------------------
@@ -378,46 +453,190 @@ def test_admin_ml_dataset_endpoint(client):
     assert isinstance(body["rows"], list)
 
 
-def test_admin_ml_train_endpoint_structure(client, monkeypatch):
-    """POST /admin/ml/train returns 200 with promoted/metrics fields (trainer mocked)."""
-    import sys
-    import types
-
-    mock_tr = types.ModuleType("train_ranker")
-    mock_tr.main = lambda artifacts_dir=None: {  # type: ignore[attr-defined]
-        "promoted": True,
-        "weights_version": 1,
-        "new_metrics": {
-            "precision_at_5": 0.8,
-            "precision_at_10": 0.7,
-            "auc_approx": 0.75,
-            "sample_count": 2,
-            "labeled_count": 2,
-            "positive_rate": 0.5,
-        },
-        "previous_metrics": None,
-    }
-    monkeypatch.setitem(sys.modules, "train_ranker", mock_tr)
+# ---------------------------------------------------------------------------
+# Streaming dataset endpoints
+# ---------------------------------------------------------------------------
+
 
-    response = client.post("/admin/ml/train")
+def _seed_samples(statuses: list[str | None]) -> None:
+    db = TestingSessionLocal()
+    try:
+        user = _make_user(db)
+        run = _make_run(db, user)
+        for status in statuses:
+            settlement = _make_settlement(db)
+            _make_match_result(db, run, user, settlement)
+            if status is not None:
+                _make_pref(db, user, settlement, status)
+        db.commit()
+        export_labeled_samples(db)
+    finally:
+        db.close()
+
+
+def test_admin_ml_dataset_stream_ndjson(client):
+    """NDJSON stream yields one sample per line; label_only drops pending samples."""
+    import json
+
+    _seed_samples(["paid_out", "submitted", None])
+
+    response = client.get("/admin/ml/dataset/stream")
     assert response.status_code == 200
-    body = response.json()
-    assert set(body.keys()) >= {"promoted", "weights_version", "new_metrics", "previous_metrics"}
-    assert isinstance(body["promoted"], bool)
-    assert isinstance(body["weights_version"], int)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["outcome"] for r in rows) == ["ignored", "paid_out", "pending"]
 
+    labeled = client.get("/admin/ml/dataset/stream", params={"label_only": "true"})
+    assert sorted(json.loads(line)["label"] for line in labeled.text.splitlines()) == [0, 1]
 
-def test_admin_ml_train_no_labeled_data_returns_422(client, monkeypatch):
-    """POST /admin/ml/train returns 422 when trainer raises SystemExit (no labeled rows)."""
-    import sys
-    import types
 
-    mock_tr = types.ModuleType("train_ranker")
-    mock_tr.main = lambda artifacts_dir=None: (_ for _ in ()).throw(  # type: ignore[attr-defined]
-        SystemExit("No labeled rows found in training data (all labels are None/pending).")
-    )
-    monkeypatch.setitem(sys.modules, "train_ranker", mock_tr)
+def test_admin_ml_dataset_stream_columnar(client):
+    """Arrow IPC and Parquet streams decode to the same rows as the NDJSON stream."""
+    import io
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    _seed_samples(["paid_out", "not_paid_out", "opened"])
+
+    arrow = client.get("/admin/ml/dataset/stream", params={"format": "arrow"})
+    assert arrow.status_code == 200
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert table.num_rows == 3
+    assert sorted(table.column("outcome").to_pylist()) == ["not_paid_out", "paid_out", "pending"]
+
+    parquet = client.get("/admin/ml/dataset/stream", params={"format": "parquet", "label_only": "true"})
+    assert parquet.status_code == 200
+    table = pq.read_table(io.BytesIO(parquet.content))
+    assert sorted(table.column("label").to_pylist()) == [0, 1]
+
+
+def test_admin_ml_export_labeled_stream_returns_refreshed_rows(client):
+    """The export stream upserts samples, then streams only the rows it refreshed."""
+    import json
+
+    _seed_samples(["paid_out"])
+    db = TestingSessionLocal()
+    try:
+        user = _make_user(db)
+        run = _make_run(db, user)
+        settlement = _make_settlement(db)
+        _make_match_result(db, run, user, settlement)
+        db.commit()
+        settlement_id = str(settlement.id)
+    finally:
+        db.close()
+
+    response = client.get("/admin/ml/export-labeled/stream")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Samples re-read in the overlap window but unchanged are not rewritten or streamed.
+    assert response.headers["x-sample-count"] == "2"
+    assert response.headers["x-changed-count"] == str(len(rows)) == "1"
+    assert settlement_id in {r["settlement_id"] for r in rows}
 
-    response = client.post("/admin/ml/train")
-    assert response.status_code == 422
-    assert "No labeled rows" in response.json()["detail"]
+    assert client.get("/admin/ml/dataset/stream", params={"format": "csv"}).status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# Training jobs
+# ---------------------------------------------------------------------------
+
+
+def test_admin_ml_train_queues_job_and_worker_trains(client, monkeypatch, tmp_path):
+    """POST /admin/ml/train returns 202 at once; the worker trains and records progress."""
+    from app.services.ml import training_jobs
+    from app.services.ml.training_worker import drain
+
+    monkeypatch.setattr(training_jobs.settings, "ml_artifacts_dir", str(tmp_path))
+    db = TestingSessionLocal()
+    try:
+        user = _make_user(db)
+        run = _make_run(db, user)
+        labeled = [(0.9, "paid_out"), (0.2, "submitted"), (0.3, "not_paid_out"), (0.8, "paid_out")]
+        for rules, status in labeled:
+            settlement = _make_settlement(db)
+            _make_match_result(db, run, user, settlement, {"confidence_breakdown": {"rules": rules}})
+            _make_pref(db, user, settlement, status)
+        _make_match_result(db, run, user, _make_settlement(db))
+        db.commit()
+    finally:
+        db.close()
+
+    queued = client.post("/admin/ml/train")
+    assert queued.status_code == 202
+    job = queued.json()
+    assert job["status"] == "queued"
+    # A second request while the first is waiting coalesces onto it.
+    again = client.post("/admin/ml/train").json()
+    assert again["job_id"] == job["job_id"]
+    assert again["request_count"] == 2
+
+    assert drain(TestingSessionLocal) == 1
+    body = client.get(f"/admin/ml/train/jobs/{job['job_id']}").json()
+    assert body["status"] == "done", body["error_message"]
+    assert body["progress"] == 1.0
+    assert body["iteration"] == len(body["loss_history"]) > 0
+    assert body["loss"] == body["loss_history"][-1]
+    assert body["elapsed_seconds"] > 0
+    result = body["result"]
+    assert set(result) >= {"promoted", "weights_version", "new_metrics", "previous_metrics"}
+    assert result["promoted"] is True
+    assert result["export"]["labeled_count"] == 4
+    assert (tmp_path / "weights.json").exists()
+    # The promoted weights are registered and active.
+    models = client.get("/admin/ml/models").json()
+    assert [(m["version"], m["is_active"], m["training_job_id"]) for m in models] == [
+        (result["weights_version"], True, job["job_id"])
+    ]
+
+    # Finished jobs cannot be cancelled; the next request creates a new job.
+    assert client.post(f"/admin/ml/train/jobs/{job['job_id']}/cancel").status_code == 409
+    assert client.post("/admin/ml/train", params={"mode": "nightly"}).status_code == 400
+
+    # The next auto run trains incrementally on the one sample labeled since.
+    db = TestingSessionLocal()
+    try:
+        user = _make_user(db)
+        settlement = _make_settlement(db)
+        _make_match_result(db, _make_run(db, user), user, settlement, {"confidence_breakdown": {"rules": 0.7}})
+        _make_pref(db, user, settlement, "paid_out")
+        db.commit()
+    finally:
+        db.close()
+    follow_up = client.post("/admin/ml/train").json()
+    assert follow_up["job_id"] != job["job_id"]
+    assert drain(TestingSessionLocal) == 1
+    body = client.get(f"/admin/ml/train/jobs/{follow_up['job_id']}").json()
+    assert body["status"] == "done", body["error_message"]
+    assert body["result"]["mode"] == "incremental"
+    assert body["result"]["export"]["labeled_count"] == 1
+    models = client.get("/admin/ml/models").json()
+    assert models[0]["version"] == body["result"]["weights_version"]
+    assert models[0]["mode"] == "incremental"
+    assert sum(m["is_active"] for m in models) == 1
+
+
+def test_admin_ml_train_no_labeled_data_fails_job(client, monkeypatch, tmp_path):
+    """Trainer SystemExit (no labeled rows) fails the job with the trainer's message."""
+    from app.services.ml import training_jobs
+    from app.services.ml.training_worker import drain
+
+    monkeypatch.setattr(training_jobs.settings, "ml_artifacts_dir", str(tmp_path))
+    job_id = client.post("/admin/ml/train").json()["job_id"]
+    drain(TestingSessionLocal)
+
+    body = client.get(f"/admin/ml/train/jobs/{job_id}").json()
+    assert body["status"] == "failed"
+    assert "No labeled rows" in body["error_message"]
+
+
+def test_admin_ml_train_cancel_queued_job(client):
+    from app.services.ml.training_worker import drain
+
+    job_id = client.post("/admin/ml/train").json()["job_id"]
+    cancelled = client.post(f"/admin/ml/train/jobs/{job_id}/cancel")
+    assert cancelled.status_code == 200
+    assert cancelled.json()["status"] == "cancelled"
+    assert drain(TestingSessionLocal) == 0
+    assert client.get(f"/admin/ml/train/jobs/{uuid.uuid4()}").status_code == 404
@@ -0,0 +1,119 @@
+import json
+import time
+
+from app.models.entities import RankerModel
+from app.services.ml import model_registry
+from app.services.ml.model_registry import (
+    activate_model,
+    active_weights,
+    get_active_model,
+    get_model,
+    register_model,
+    rollback_model,
+    start_registry_listener,
+    stop_registry_listener,
+    sync_active_artifacts,
+)
+from app.tests.conftest import TEST_DATABASE_URL, TestingSessionLocal
+
+WEIGHTS = {"rules_confidence": 0.5, "similarity": 0.2, "payout": 0.1, "urgency": 0.1, "ease": 0.1}
+
+
+def _defaults() -> dict:
+    return {"_version": None}
+
+
+def test_activate_and_rollback_keep_one_active_model(db_setup):
+    db = TestingSessionLocal()
+    try:
+        assert active_weights(db, _defaults) == {"_version": None}
+        for version in (1, 2, 3):
+            register_model(db, version, {**WEIGHTS, "payout": version / 10}, {"precision_at_5": 0.5})
+        assert activate_model(db, 9) is None
+        activate_model(db, 1)
+        activate_model(db, 3)
+        db.commit()
+
+        assert active_weights(db, _defaults)["_version"] == 3
+        assert db.query(RankerModel).filter(RankerModel.is_active.is_(True)).count() == 1
+
+        assert rollback_model(db).version == 1
+        db.commit()
+        assert get_active_model(db).version == 1
+        assert active_weights(db, _defaults)["payout"] == 0.1
+    finally:
+        db.close()
+
+
+def test_rollback_walks_back_through_activation_history(db_setup):
+    db = TestingSessionLocal()
+    try:
+        for version in (1, 2, 3):
+            register_model(db, version, {**WEIGHTS, "payout": version / 10})
+            activate_model(db, version)
+        db.commit()
+
+        # Each rollback steps one activation further back instead of toggling.
+        assert rollback_model(db).version == 2
+        assert rollback_model(db).version == 1
+        assert rollback_model(db) is None
+        assert get_active_model(db).version == 1
+
+        # A new activation links to the restored model, skipping the rolled-back ones.
+        register_model(db, 4, WEIGHTS)
+        activate_model(db, 4)
+        assert rollback_model(db).version == 1
+        assert get_model(db, 4).rolled_back_at is not None
+    finally:
+        db.close()
+
+
+def test_sync_active_artifacts_adopts_and_restores_weights_file(db_setup, tmp_path):
+    db = TestingSessionLocal()
+    try:
+        promoted = {**WEIGHTS, "_version": 4, "_mode": "full", "_last_full_version": 4}
+        (tmp_path / "weights.json").write_text(json.dumps(promoted), encoding="utf-8")
+        (tmp_path / "metrics.json").write_text(json.dumps({"precision_at_5": 0.4}), encoding="utf-8")
+        # Weights promoted before the registry existed become the active model.
+        assert sync_active_artifacts(db, tmp_path).version == 4
+        assert get_active_model(db).metrics == {"precision_at_5": 0.4}
+
+        register_model(db, 5, {**WEIGHTS, "_mode": "incremental"}, {"precision_at_5": 0.6})
+        activate_model(db, 5)
+        sync_active_artifacts(db, tmp_path)
+        on_disk = json.loads((tmp_path / "weights.json").read_text(encoding="utf-8"))
+        assert on_disk["_version"] == 5
+        metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+        assert metrics == {"precision_at_5": 0.6, "weights_version": 5}
+    finally:
+        db.close()
+
+
+def test_listener_swaps_weights_on_activation(db_setup, monkeypatch):
+    monkeypatch.setattr(model_registry.settings, "database_url", TEST_DATABASE_URL)
+    stop = start_registry_listener()
+    try:
+        deadline = time.monotonic() + 10
+        while model_registry._active._listener is not stop:
+            assert time.monotonic() < deadline, "listener did not connect"
+            time.sleep(0.05)
+
+        db = TestingSessionLocal()
+        try:
+            register_model(db, 7, {**WEIGHTS, "similarity": 0.7})
+            activate_model(db, 7)
+            # Nothing is swapped before the activation commits.
+            time.sleep(0.2)
+            assert model_registry._active.get()[0] is None
+            db.commit()
+        finally:
+            db.close()
+
+        while model_registry._active.get()[0] is None:
+            assert time.monotonic() < deadline, "activation was not delivered"
+            time.sleep(0.05)
+        # Served from memory: no session needed.
+        assert active_weights(None, _defaults)["similarity"] == 0.7
+    finally:
+        stop_registry_listener(stop)
+    assert model_registry._active.get()[0] is None
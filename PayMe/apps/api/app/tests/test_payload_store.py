@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.models.entities import GmailMessage, GmailMessagePayload, User
+from app.services.ingestion import payload_store
+from app.services.ingestion.payload_store import (
+    decode_payload,
+    encode_payload,
+    load_raw_payload,
+    load_raw_payloads,
+)
+from app.tests.conftest import TestingSessionLocal, run_sync
+
+PAYLOAD = {"id": "m1", "payload": {"headers": [{"name": "Subject", "value": "Amazon order"}] * 20}}
+
+
+@pytest.mark.parametrize("codec", ["zstd", "zlib", "none"])
+def test_encode_decode_round_trip(monkeypatch, codec):
+    if codec == "zstd" and not payload_store.ZSTD_AVAILABLE:
+        pytest.skip("zstandard not installed")
+    monkeypatch.setattr(payload_store.settings, "raw_payload_codec", codec)
+    stored_codec, data = encode_payload(PAYLOAD)
+    assert stored_codec == codec
+    assert decode_payload(stored_codec, data) == PAYLOAD
+    if codec != "none":
+        assert len(data) < len(json.dumps(PAYLOAD))
+
+
+def test_zstd_falls_back_to_zlib_without_zstandard(monkeypatch):
+    monkeypatch.setattr(payload_store, "ZSTD_AVAILABLE", False)
+    monkeypatch.setattr(payload_store.settings, "raw_payload_codec", "zstd")
+    codec, data = encode_payload(PAYLOAD)
+    assert codec == "zlib"
+    with pytest.raises(RuntimeError):
+        decode_payload("zstd", data)
+
+
+def test_sync_stores_payloads_off_the_hot_table(client, monkeypatch):
+    import app.services.ingestion.gmail_sync as _mod
+
+    monkeypatch.setattr(_mod.settings, "mock_gmail", True)
+    token = client.post(
+        "/auth/signup",
+        json={"username": "payloads", "email": "payloads@example.com", "password": "password123"},
+    ).json()["access_token"]
+    assert run_sync(client, "gmail", {"Authorization": f"Bearer {token}"}).json()["status"] == "done"
+
+    db = TestingSessionLocal()
+    try:
+        user = db.scalar(select(User).where(User.username == "payloads"))
+        msg_ids = list(db.scalars(select(GmailMessage.provider_msg_id).where(GmailMessage.user_id == user.id)))
+        payloads = load_raw_payloads(db, GmailMessagePayload, user.id, msg_ids)
+        assert set(payloads) == set(msg_ids)
+        assert all(payload["id"] == msg_id for msg_id, payload in payloads.items())
+        assert load_raw_payload(db, GmailMessagePayload, user.id, "missing") is None
+
+        # Payloads go away with their message.
+        db.execute(delete(GmailMessage).where(GmailMessage.provider_msg_id == msg_ids[0]))
+        db.commit()
+        assert load_raw_payload(db, GmailMessagePayload, user.id, msg_ids[0]) is None
+    finally:
+        db.close()
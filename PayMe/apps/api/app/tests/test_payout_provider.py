@@ -0,0 +1,117 @@
+"""Tests for concurrent payout dispatch against the local mock payout server."""
+
+import asyncio
+import time
+import uuid
+
+from app.services.gateway.mock_payout_server import MockPayoutServer
+from app.services.gateway.payout_provider import (
+    HttpPayoutProvider,
+    TokenBucket,
+    TransferRequest,
+    dispatch_transfers,
+    mock_transfer_succeeds,
+    verify_callback_signature,
+)
+
+
+def _requests(count: int) -> list[TransferRequest]:
+    return [TransferRequest(uuid.uuid4(), f"transfer:test:{i}", 1000 + i) for i in range(count)]
+
+
+def _dispatch(base_url: str, requests: list[TransferRequest], **kwargs):
+    async def run():
+        provider = HttpPayoutProvider(base_url=base_url, callback_url="", max_connections=16)
+        try:
+            return await dispatch_transfers(provider, requests, **kwargs)
+        finally:
+            await provider.aclose()
+
+    return asyncio.run(run())
+
+
+def test_dispatch_bounds_concurrency_and_keeps_request_order():
+    requests = _requests(24)
+    with MockPayoutServer(latency=0.05) as server:
+        results = _dispatch(server.base_url, requests, concurrency=4, rate_per_second=0)
+
+    assert [r.transfer_id for r in results] == [r.transfer_id for r in requests]
+    assert {r.status for r in results} == {"processing"}
+    assert all(r.provider_transfer_id.startswith("mptr_") for r in results)
+    assert server.created == 24
+    assert server.max_in_flight == 4
+
+
+def test_dispatch_retries_transient_failures_without_duplicate_transfers():
+    requests = _requests(10)
+    sleeps: list[float] = []
+
+    async def record_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+
+    with MockPayoutServer(transient_failures=6) as server:
+        results = _dispatch(server.base_url, requests, concurrency=2, rate_per_second=0, sleep=record_sleep)
+        # A client retry after the provider already accepted replays the original transfer.
+        again = _dispatch(server.base_url, requests[:3], rate_per_second=0)
+
+    assert {r.status for r in results} == {"processing"}
+    assert sum(r.attempts for r in results) == 16
+    assert len(sleeps) == 6
+    assert server.created == 10
+    assert server.replayed == 3
+    assert [r.provider_transfer_id for r in again] == [r.provider_transfer_id for r in results[:3]]
+
+
+def test_dispatch_gives_up_after_max_retries():
+    with MockPayoutServer(transient_failures=100) as server:
+        results = _dispatch(
+            server.base_url, _requests(2), rate_per_second=0, max_retries=2, sleep=lambda _s: asyncio.sleep(0)
+        )
+
+    assert {r.status for r in results} == {"error"}
+    assert {r.attempts for r in results} == {3}
+    assert server.created == 0
+
+
+def test_status_query_reports_settled_and_unknown_transfers():
+    requests = _requests(8)
+    unknown = TransferRequest(uuid.uuid4(), "transfer:test:never/sent", 1)
+    with MockPayoutServer() as server:
+        _dispatch(server.base_url, requests, rate_per_second=0)
+        assert server.wait_for_callbacks(8)
+        results = _dispatch(server.base_url, [*requests, unknown], rate_per_second=0, query=True)
+
+    assert server.created == 8
+    assert [r.status for r in results[:-1]] == [
+        "completed" if mock_transfer_succeeds(r.idempotency_key) else "failed" for r in requests
+    ]
+    assert [r.provider_transfer_id for r in results[:-1]] == [
+        t["id"] for t in (server.transfers[r.idempotency_key] for r in requests)
+    ]
+    assert results[-1].status == "missing"
+
+
+def test_token_bucket_paces_request_starts():
+    async def run() -> float:
+        bucket = TokenBucket(rate=100, burst=5)
+        start = time.monotonic()
+        for _ in range(25):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 5 tokens up front, the other 20 refill at 100/s.
+    assert 0.18 <= asyncio.run(run()) < 1.0
+
+
+def test_mock_server_sends_signed_deterministic_callbacks():
+    requests = _requests(20)
+    with MockPayoutServer(webhook_secret="s3cret") as server:
+        _dispatch(server.base_url, requests, rate_per_second=0)
+        assert server.wait_for_callbacks(20)
+
+    assert len(server.pending_callbacks) == 20
+    from app.services.gateway.payout_provider import sign_callback
+
+    for body, headers in server.pending_callbacks:
+        assert headers["X-Payout-Signature"] == sign_callback(body, "s3cret")
+        assert not verify_callback_signature(body, "sha256=forged")
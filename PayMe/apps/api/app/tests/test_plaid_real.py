@@ -12,8 +12,16 @@ from unittest.mock import MagicMock, patch
 import pytest
 from sqlalchemy import select
 
-from app.models.entities import Event, PlaidItem, PlaidTransaction, UserFeature
-from app.tests.conftest import TestingSessionLocal
+from app.models.entities import (
+    Event,
+    PlaidItem,
+    PlaidTransaction,
+    PlaidTransactionPayload,
+    UserFeature,
+    UserSpendAggregate,
+)
+from app.services.ingestion.payload_store import load_raw_payloads
+from app.tests.conftest import TestingSessionLocal, run_sync
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -264,11 +272,12 @@ def test_sync_uses_cursor_for_incremental(client):
         )
         assert exch_resp.status_code == 200, exch_resp.text
 
-        resp1 = client.post("/integrations/plaid/sync", headers=_auth(token))
-        assert resp1.status_code == 200, resp1.text
+        # The exchange already queued a sync; the first request coalesces onto it.
+        resp1 = run_sync(client, "plaid", _auth(token))
+        assert resp1.json()["status"] == "done", resp1.text
 
-        resp2 = client.post("/integrations/plaid/sync", headers=_auth(token))
-        assert resp2.status_code == 200, resp2.text
+        resp2 = run_sync(client, "plaid", _auth(token))
+        assert resp2.json()["status"] == "done", resp2.text
 
     assert call_count[0] == 2
 
@@ -281,6 +290,114 @@ def test_sync_uses_cursor_for_incremental(client):
         db.close()
 
 
+def _txn(txn_id: str, merchant: str, amount: float) -> dict:
+    return {
+        "transaction_id": txn_id,
+        "date": date(2024, 3, 1),
+        "merchant_name": merchant,
+        "name": merchant,
+        "amount": amount,
+        "personal_finance_category": {"primary": "SHOPPING"},
+    }
+
+
+def test_sync_pages_commit_cursor_and_resume(db_setup):
+    """Each page commits with its cursor; a failed page resumes from the last one."""
+    from app.models.entities import User
+    from app.services.ingestion.plaid_real import sync_plaid_real
+
+    pages = {
+        None: {
+            "added": [_txn("txn_a", "Amazon", 10.0), _txn("txn_b", "Target", 20.0)],
+            "modified": [],
+            "removed": [],
+            "next_cursor": "cursor_1",
+            "has_more": True,
+        },
+        "cursor_1": {
+            "added": [_txn("txn_c", "Walmart", 30.0)],
+            "modified": [_txn("txn_a", "Amazon", 12.5), _txn("txn_unknown", "Nowhere", 1.0)],
+            "removed": [{"transaction_id": "txn_b"}],
+            "next_cursor": "cursor_2",
+            "has_more": False,
+        },
+    }
+    requested: list = []
+    fail_once = ["cursor_1"]
+
+    def fake_transactions_sync(request):
+        cursor = request.cursor
+        requested.append(cursor)
+        if cursor in fail_once:
+            fail_once.remove(cursor)
+            raise RuntimeError("connection reset")
+        return pages[cursor]
+
+    def fake_request(access_token, cursor=None):
+        return MagicMock(cursor=cursor)
+
+    mock_client = MagicMock()
+    mock_client.transactions_sync.side_effect = fake_transactions_sync
+
+    db = TestingSessionLocal()
+    try:
+        user = User(username="plaid_pages", email="plaid_pages@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        db.add(PlaidItem(user_id=user.id, item_id="item-pages", access_token_enc="enc"))
+        db.commit()
+
+        with (
+            patch(f"{_PLAID_MODULE}.PLAID_AVAILABLE", True),
+            patch(f"{_PLAID_MODULE}._build_client", return_value=mock_client),
+            patch(f"{_PLAID_MODULE}.TransactionsSyncRequest", side_effect=fake_request),
+            patch(f"{_PLAID_MODULE}.decrypt_token", return_value="access-sandbox-pages"),
+            patch("app.core.settings.settings.plaid_client_id", "test_client_id"),
+            patch("app.core.settings.settings.plaid_secret", "test_secret"),
+        ):
+            with pytest.raises(RuntimeError):
+                sync_plaid_real(db, user)
+            item = db.scalar(select(PlaidItem).where(PlaidItem.user_id == user.id))
+            assert item.cursor == "cursor_1"
+            ids = set(db.scalars(select(PlaidTransaction.provider_txn_id)))
+            assert ids == {"txn_a", "txn_b"}
+
+            result = sync_plaid_real(db, user)
+            db.commit()
+
+        assert requested == [None, "cursor_1", "cursor_1"]
+        assert result["inserted_transactions"] == 1
+        rows = {t.provider_txn_id: t for t in db.scalars(select(PlaidTransaction))}
+        assert set(rows) == {"txn_a", "txn_c"}
+        assert rows["txn_a"].amount_cents == 1250
+        db.refresh(item)
+        assert item.cursor == "cursor_2"
+
+        # The aggregate reflects the full history, not just the last page:
+        # txn_b (Target) was removed and txn_a's amount was modified.
+        aggregates = {
+            a.key: (a.count, a.total_cents)
+            for a in db.scalars(select(UserSpendAggregate).where(UserSpendAggregate.user_id == user.id))
+        }
+        assert aggregates == {
+            "merchant:amazon": (1, 1250),
+            "merchant:walmart": (1, 3000),
+            "category:shopping": (2, 4250),
+        }
+        features = {
+            f.feature_key: f.value_json
+            for f in db.scalars(select(UserFeature).where(UserFeature.user_id == user.id, UserFeature.source == "plaid"))
+        }
+        assert features == {key: {"count": count} for key, (count, _) in aggregates.items()}
+
+        # Raw payloads follow upserts and removals in the side table.
+        payloads = load_raw_payloads(db, PlaidTransactionPayload, user.id, ["txn_a", "txn_b", "txn_c"])
+        assert set(payloads) == {"txn_a", "txn_c"}
+        assert payloads["txn_a"]["amount"] == 12.5
+    finally:
+        db.close()
+
+
 # ---------------------------------------------------------------------------
 # Test: reauth required error handling
 # ---------------------------------------------------------------------------
@@ -320,9 +437,10 @@ def test_sync_handles_reauth_required(client):
         )
         assert exch_resp.status_code == 200, exch_resp.text
 
-        resp = client.post("/integrations/plaid/sync", headers=_auth(token))
-        # ValueError is re-raised → FastAPI returns 500 (unhandled) or 400.
-        assert resp.status_code in (400, 500), resp.text
+        resp = run_sync(client, "plaid", _auth(token))
+        # ValueError fails the job without retrying.
+        assert resp.json()["status"] == "failed", resp.text
+        assert resp.json()["attempt_count"] == 1
 
     db = TestingSessionLocal()
     try:
@@ -398,9 +516,9 @@ def test_sync_mock_fallback(client, monkeypatch):
     monkeypatch.setattr(_mod.settings, "mock_plaid", True)
     token = _signup_and_token(client, "plaid_mock_fallback_user")
 
-    resp = client.post("/integrations/plaid/sync", headers=_auth(token))
+    resp = run_sync(client, "plaid", _auth(token))
     assert resp.status_code == 200, resp.text
-    data = resp.json()
+    data = resp.json()["result"]
     assert data["status"] == "ok"
     assert data["inserted_transactions"] >= 1
 
@@ -435,7 +553,7 @@ def test_sync_dispatches_to_real_when_mock_disabled():
         mock_db.scalar.return_value = object()  # Simulate an active PlaidItem.
         result = plaid_sync.sync_plaid(mock_db, mock_user)
 
-    fake_real.assert_called_once_with(mock_db, mock_user)
+    fake_real.assert_called_once_with(mock_db, mock_user, heartbeat=None)
     assert result["status"] == "ok"
 
 
@@ -455,7 +573,7 @@ def test_sync_dispatches_to_real_when_connected_even_if_mock_enabled():
         mock_db.scalar.return_value = object()  # Simulate an active PlaidItem.
         result = plaid_sync.sync_plaid(mock_db, mock_user)
 
-    fake_real.assert_called_once_with(mock_db, mock_user)
+    fake_real.assert_called_once_with(mock_db, mock_user, heartbeat=None)
     assert result["status"] == "ok"
 
 
@@ -538,9 +656,9 @@ def test_feature_extraction_from_transactions(client):
         )
         assert exch_resp.status_code == 200, exch_resp.text
 
-        resp = client.post("/integrations/plaid/sync", headers=_auth(token))
+        resp = run_sync(client, "plaid", _auth(token))
         assert resp.status_code == 200, resp.text
-        data = resp.json()
+        data = resp.json()["result"]
         assert data["inserted_transactions"] == 3
 
     db = TestingSessionLocal()
@@ -1,7 +1,7 @@
 from sqlalchemy import select
 
-from app.models.entities import Event, PlaidTransaction, UserFeature
-from app.tests.conftest import TestingSessionLocal
+from app.models.entities import Event, PlaidTransaction, UserFeature, UserSpendAggregate
+from app.tests.conftest import TestingSessionLocal, run_sync
 
 
 def _token(client):
@@ -16,12 +16,14 @@ def test_plaid_sync_inserts_transactions_and_features_idempotent(client, monkeyp
     monkeypatch.setattr(_mod.settings, "mock_plaid", True)
     token = _token(client)
     headers = {"Authorization": f"Bearer {token}"}
-    first = client.post("/integrations/plaid/sync", headers=headers)
+    first = run_sync(client, "plaid", headers)
     assert first.status_code == 200
-    assert first.json()["inserted_transactions"] >= 1
-    second = client.post("/integrations/plaid/sync", headers=headers)
+    assert first.json()["status"] == "done"
+    assert first.json()["result"]["inserted_transactions"] >= 1
+    second = run_sync(client, "plaid", headers)
     assert second.status_code == 200
-    assert second.json()["inserted_transactions"] == 0
+    assert second.json()["job_id"] != first.json()["job_id"]
+    assert second.json()["result"]["inserted_transactions"] == 0
 
     db = TestingSessionLocal()
     try:
@@ -31,5 +33,12 @@ def test_plaid_sync_inserts_transactions_and_features_idempotent(client, monkeyp
         assert len(txns) >= 4
         assert len(features) >= 3
         assert len(events) >= 2
+        # Re-running the mock sync must not double-count the aggregate.
+        aggregates = {a.key: a for a in db.scalars(select(UserSpendAggregate))}
+        assert {f.feature_key for f in features} == set(aggregates)
+        merchant_counts = sum(a.count for key, a in aggregates.items() if key.startswith("merchant:"))
+        assert merchant_counts == sum(1 for t in txns if t.merchant_name)
+        for feature in features:
+            assert feature.value_json == {"count": aggregates[feature.feature_key].count}
     finally:
         db.close()
@@ -0,0 +1,52 @@
+import threading
+from contextlib import closing
+
+import pytest
+
+from app.services.ingestion.prefetch import prefetch
+
+
+def test_prefetch_yields_in_order_and_bounds_read_ahead():
+    produced: list[int] = []
+    release = threading.Event()
+
+    def pages():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    with closing(prefetch(pages(), depth=2)) as it:
+        assert next(it) == 0
+        # Give the producer time to run ahead; it may only fill the queue.
+        release.wait(0.3)
+        assert len(produced) <= 1 + 2 + 1
+        assert list(it) == list(range(1, 10))
+
+
+def test_prefetch_reraises_producer_errors():
+    def pages():
+        yield 1
+        raise RuntimeError("list failed")
+
+    it = prefetch(pages(), depth=1)
+    assert next(it) == 1
+    with pytest.raises(RuntimeError, match="list failed"):
+        next(it)
+
+
+def test_closing_stops_the_producer():
+    produced: list[int] = []
+
+    def pages():
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    with closing(prefetch(pages(), depth=1)) as it:
+        assert next(it) == 0
+    threading.Event().wait(0.3)
+    stopped_at = len(produced)
+    threading.Event().wait(0.3)
+    assert len(produced) == stopped_at
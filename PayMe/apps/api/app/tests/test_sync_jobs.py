@@ -0,0 +1,206 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import select
+
+from app.models.entities import SyncJob, User
+from app.services.ingestion import sync_jobs
+from app.services.ingestion.sync_jobs import (
+    claim_next_job,
+    enqueue_sync,
+    requeue_stale_jobs,
+    run_next_job,
+    schedule_periodic_syncs,
+)
+from app.tests.conftest import TestingSessionLocal
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=UTC)
+
+
+def _users(db, count: int, **fields) -> list[User]:
+    users = [
+        User(username=f"sync{i}", email=f"sync{i}@example.com", password_hash="x", **fields) for i in range(count)
+    ]
+    db.add_all(users)
+    db.flush()
+    return users
+
+
+def test_enqueue_coalesces_onto_active_job(db_setup):
+    db = TestingSessionLocal()
+    try:
+        (user,) = _users(db, 1)
+        scheduled = enqueue_sync(db, user.id, "gmail", trigger="scheduled", now=NOW + timedelta(minutes=5))
+        manual = enqueue_sync(db, user.id, "gmail", now=NOW)
+        assert manual.id == scheduled.id
+        assert manual.run_after == NOW
+        assert enqueue_sync(db, user.id, "plaid", now=NOW).id != scheduled.id
+
+        # Still coalesces while running; a new job is created once it finishes.
+        claimed = claim_next_job(db, NOW)
+        assert claimed.id == scheduled.id
+        assert enqueue_sync(db, user.id, "gmail", now=NOW).id == scheduled.id
+        claimed.status = "done"
+        db.flush()
+        assert enqueue_sync(db, user.id, "gmail", now=NOW).id != scheduled.id
+    finally:
+        db.close()
+
+
+def test_claim_respects_concurrency_and_rate_limits(db_setup, monkeypatch):
+    monkeypatch.setattr(sync_jobs.settings, "sync_max_concurrency", 3)
+    monkeypatch.setattr(sync_jobs.settings, "sync_gmail_max_concurrency", 2)
+    monkeypatch.setattr(sync_jobs.settings, "sync_plaid_starts_per_minute", 1)
+    db = TestingSessionLocal()
+    try:
+        users = _users(db, 4)
+        for user in users:
+            enqueue_sync(db, user.id, "gmail", now=NOW)
+            enqueue_sync(db, user.id, "plaid", now=NOW)
+
+        claimed = [claim_next_job(db, NOW) for _ in range(5)]
+        providers = sorted(job.provider for job in claimed if job is not None)
+        # gmail capped at 2 running, plaid at 1 start per minute, 3 overall.
+        assert providers == ["gmail", "gmail", "plaid"]
+        assert claimed[3] is None and claimed[4] is None
+
+        # Finishing a gmail job frees a global slot; plaid stays rate limited.
+        claimed[0].status = "done"
+        db.flush()
+        assert claim_next_job(db, NOW).provider == "gmail"
+        assert claim_next_job(db, NOW) is None
+    finally:
+        db.close()
+
+
+def test_run_retries_with_backoff_then_fails(db_setup, monkeypatch):
+    monkeypatch.setattr(sync_jobs.settings, "sync_max_retries", 2)
+    db = TestingSessionLocal()
+    try:
+        (user,) = _users(db, 1)
+        user_id = user.id
+        job_id = enqueue_sync(db, user_id, "gmail", now=NOW).id
+        db.commit()
+    finally:
+        db.close()
+
+    with patch.object(sync_jobs, "sync_gmail", side_effect=RuntimeError("provider 503")):
+        first = run_next_job(TestingSessionLocal, NOW)
+        assert first.status == "queued"
+        assert first.run_after > NOW
+        # Not claimable until the backoff elapses.
+        assert run_next_job(TestingSessionLocal, NOW) is None
+        second = run_next_job(TestingSessionLocal, first.run_after)
+    assert second.id == job_id
+    assert second.status == "failed"
+    assert second.attempt_count == 2
+    assert second.error_message == "provider 503"
+
+    with patch.object(sync_jobs, "sync_gmail", side_effect=ValueError("token revoked")):
+        db = TestingSessionLocal()
+        try:
+            enqueue_sync(db, user_id, "gmail", now=NOW)
+            db.commit()
+        finally:
+            db.close()
+        failed = run_next_job(TestingSessionLocal, NOW)
+    assert failed.status == "failed"
+    assert failed.attempt_count == 1
+
+
+def test_schedule_periodic_syncs_by_frequency(db_setup):
+    db = TestingSessionLocal()
+    try:
+        due, fresh, never, weekly = _users(db, 4, finance_check_frequency="daily")
+        due.gmail_synced_at = NOW - timedelta(days=2)
+        due.plaid_synced_at = NOW - timedelta(days=2)
+        fresh.gmail_synced_at = NOW - timedelta(hours=1)
+        weekly.finance_check_frequency = "weekly"
+        weekly.gmail_synced_at = NOW - timedelta(days=3)
+        db.flush()
+
+        assert schedule_periodic_syncs(db, NOW) == 2
+        assert schedule_periodic_syncs(db, NOW) == 0
+        jobs = db.scalars(select(SyncJob)).all()
+        assert {(job.user_id, job.provider) for job in jobs} == {(due.id, "gmail"), (due.id, "plaid")}
+        assert {job.trigger for job in jobs} == {"scheduled"}
+    finally:
+        db.close()
+
+
+def test_requeue_stale_heartbeat_counts_attempts(db_setup, monkeypatch):
+    monkeypatch.setattr(sync_jobs.settings, "sync_max_retries", 2)
+    monkeypatch.setattr(sync_jobs.settings, "sync_heartbeat_timeout_seconds", 300)
+    db = TestingSessionLocal()
+    try:
+        (user,) = _users(db, 1)
+        enqueue_sync(db, user.id, "plaid", now=NOW)
+        job = claim_next_job(db, NOW)
+        # Long-running but still heartbeating: left alone.
+        job.heartbeat_at = NOW + timedelta(minutes=58)
+        db.flush()
+        assert requeue_stale_jobs(db, NOW + timedelta(hours=1)) == (0, 0)
+
+        later = NOW + timedelta(hours=2)
+        assert requeue_stale_jobs(db, later) == (1, 0)
+        db.refresh(job)
+        assert job.status == "queued"
+        assert job.run_after == later + timedelta(seconds=sync_jobs.settings.sync_retry_delay_seconds)
+        assert job.error_message == "sync worker stopped heartbeating"
+
+        # The second lost run exhausts sync_max_retries.
+        assert claim_next_job(db, job.run_after).attempt_count == 2
+        assert requeue_stale_jobs(db, later + timedelta(hours=1)) == (0, 1)
+        db.refresh(job)
+        assert job.status == "failed"
+        assert job.completed_at is not None
+    finally:
+        db.close()
+
+
+def test_running_sync_refreshes_heartbeat(db_setup, monkeypatch):
+    monkeypatch.setattr(sync_jobs.settings, "sync_heartbeat_interval_seconds", 0)
+    db = TestingSessionLocal()
+    try:
+        (user,) = _users(db, 1)
+        job_id = enqueue_sync(db, user.id, "gmail", now=NOW).id
+        db.commit()
+    finally:
+        db.close()
+
+    beats = []
+
+    def fake_sync(db, user, heartbeat=None):
+        heartbeat()
+        # Visible to other sessions while the sync's transaction is open.
+        other = TestingSessionLocal()
+        try:
+            beats.append(other.get(SyncJob, job_id).heartbeat_at)
+        finally:
+            other.close()
+        return {"status": "ok"}
+
+    with patch.object(sync_jobs, "sync_gmail", side_effect=fake_sync):
+        job = run_next_job(TestingSessionLocal, NOW)
+    assert job.status == "done"
+    assert beats[0] > NOW
+
+
+def test_sync_route_returns_job_handle(client):
+    def signup(name: str) -> dict:
+        token = client.post(
+            "/auth/signup",
+            json={"username": name, "email": f"{name}@example.com", "password": "password123"},
+        ).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    headers = signup("syncroute")
+    first = client.post("/integrations/gmail/sync", headers=headers)
+    second = client.post("/integrations/gmail/sync", headers=headers)
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    assert second.json()["job_id"] == first.json()["job_id"]
+
+    job_id = first.json()["job_id"]
+    assert client.get(f"/integrations/sync/jobs/{job_id}", headers=headers).json()["status"] == "queued"
+    assert client.get(f"/integrations/sync/jobs/{job_id}", headers=signup("other")).status_code == 404
@@ -0,0 +1,101 @@
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.models.entities import TrainingJob
+from app.services.ml import training_jobs
+from app.services.ml.training_jobs import (
+    cancel_training_job,
+    claim_next_training_job,
+    enqueue_training,
+    fail_stale_training_jobs,
+    plan_training,
+    run_training_job,
+)
+from app.tests.conftest import TestingSessionLocal
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=UTC)
+
+
+def test_training_runs_are_serialized(db_setup):
+    db = TestingSessionLocal()
+    try:
+        first = enqueue_training(db)
+        assert enqueue_training(db).id == first.id
+
+        assert claim_next_training_job(db, NOW).id == first.id
+        # A request during the run queues one follow-up job, which waits for the run.
+        second = enqueue_training(db)
+        assert second.id != first.id
+        assert enqueue_training(db).id == second.id
+        assert claim_next_training_job(db, NOW) is None
+
+        first.status = "done"
+        db.flush()
+        assert claim_next_training_job(db, NOW).id == second.id
+    finally:
+        db.close()
+
+
+def test_cancel_running_job_stops_worker(db_setup, monkeypatch, tmp_path):
+    monkeypatch.setattr(training_jobs.settings, "ml_artifacts_dir", str(tmp_path))
+    db = TestingSessionLocal()
+    try:
+        job = enqueue_training(db)
+        claim_next_training_job(db)
+        cancel_training_job(db, job.id)
+        job_id = job.id
+        db.commit()
+    finally:
+        db.close()
+
+    finished = run_training_job(TestingSessionLocal, job_id)
+    assert finished.status == "cancelled"
+    assert finished.completed_at is not None
+    assert not (tmp_path / "weights.json").exists()
+
+
+def test_fail_stale_training_jobs(db_setup, monkeypatch):
+    monkeypatch.setattr(training_jobs.settings, "ml_train_heartbeat_timeout_seconds", 60)
+    db = TestingSessionLocal()
+    try:
+        job = enqueue_training(db)
+        claim_next_training_job(db, NOW)
+        assert fail_stale_training_jobs(db, NOW + timedelta(seconds=30)) == 0
+        assert fail_stale_training_jobs(db, NOW + timedelta(seconds=90)) == 1
+        db.expire_all()
+        stale = db.get(TrainingJob, job.id)
+        assert stale.status == "failed"
+        assert stale.error_message == "training worker stopped responding"
+    finally:
+        db.close()
+
+
+def test_plan_training_schedules_full_refits(monkeypatch, tmp_path):
+    monkeypatch.setattr(training_jobs.settings, "ml_train_full_refit_every", 3)
+    assert plan_training("auto", tmp_path) == ("full", None)
+    with pytest.raises(ValueError, match="full refit first"):
+        plan_training("incremental", tmp_path)
+
+    def activate(version: int, last_full: int) -> None:
+        weights = {"_version": version, "_last_full_version": last_full, "_trained_through": NOW.isoformat()}
+        (tmp_path / "weights.json").write_text(json.dumps(weights), encoding="utf-8")
+
+    activate(1, 1)
+    assert plan_training("auto", tmp_path) == ("incremental", NOW)
+    assert plan_training("full", tmp_path) == ("full", None)
+    activate(3, 1)  # this run would be the third since the last full refit
+    assert plan_training("auto", tmp_path) == ("full", None)
+    assert plan_training("incremental", tmp_path) == ("incremental", NOW)
+
+
+def test_enqueue_upgrades_coalesced_job_to_full(db_setup):
+    db = TestingSessionLocal()
+    try:
+        job = enqueue_training(db, "incremental")
+        assert enqueue_training(db).mode == "incremental"
+        assert enqueue_training(db, "full").id == job.id
+        assert enqueue_training(db, "auto").mode == "full"
+    finally:
+        db.close()
@@ -2,6 +2,8 @@ import json
 import subprocess
 from pathlib import Path
 
+import pytest
+
 
 def test_generate_synthetic_data_outputs_schema():
     root = Path(__file__).resolve().parents[4]
@@ -19,3 +21,247 @@ def test_train_ranker_produces_weights():
     subprocess.run(["python", "scripts/train_ranker.py"], cwd=root, check=True)
     weights = json.loads((root / "artifacts/weights.json").read_text(encoding="utf-8"))
     assert "rules_confidence" in weights
+
+
+def _import_script(name: str):
+    import importlib
+    import sys
+
+    scripts = str(Path(__file__).resolve().parents[4] / "scripts")
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+    return importlib.import_module(name)
+
+
+def test_train_ranker_memory_maps_columnar_export(tmp_path):
+    import uuid
+
+    import numpy as np
+
+    from app.services.ml.dataset_export import write_training_arrays
+    from app.services.ml.feedback import DATASET_FIELDS
+
+    rng = np.random.default_rng(7)
+    users = [uuid.uuid4() for _ in range(20)]
+    partitions = []
+    for _ in range(3):
+        partition = []
+        for _ in range(100):
+            features = rng.random(5)
+            label = int(features[0] + 0.2 * rng.standard_normal() > 0.5)
+            row = {
+                "user_id": users[int(rng.integers(len(users)))],
+                "label": None if rng.random() < 0.1 else label,
+                **dict(zip(("rules_confidence", "similarity", "payout", "urgency", "ease"), features)),
+            }
+            partition.append(tuple(row.get(name) for name in DATASET_FIELDS))
+        partitions.append(partition)
+
+    meta = write_training_arrays(partitions, tmp_path / "feedback_export")
+    assert meta["sample_count"] == 300
+    labeled = [row for part in partitions for row in part if row[DATASET_FIELDS.index("label")] is not None]
+    assert meta["labeled_count"] == len(labeled)
+
+    from app.services.ml import ranker
+    data = ranker.load_columnar(tmp_path / "feedback_export")
+    assert isinstance(data.X, np.memmap) and isinstance(data.y, np.memmap)
+    assert data.X.shape == (len(labeled), 5)
+    assert data.total_rows == 300
+    assert len(np.unique(data.groups)) <= len(users)
+
+    result = ranker.main(artifacts_dir=tmp_path)
+    assert set(result["timings"]) == {"load_seconds", "cv_seconds", "train_seconds", "metrics_seconds"}
+    assert result["new_metrics"]["sample_count"] == 300
+    assert result["new_metrics"]["evaluation"] == "cross_validation"
+    assert result["new_metrics"]["l2"] in ranker.L2_GRID
+    assert set(result["new_metrics"]["l2_sweep"]) == {str(v) for v in ranker.L2_GRID}
+    weights = json.loads((tmp_path / "weights.json").read_text(encoding="utf-8"))
+    assert weights["rules_confidence"] > 0
+
+
+def test_ranker_eval_matches_brute_force():
+    import numpy as np
+
+    from app.services.ml import ranker_eval
+    rng = np.random.default_rng(11)
+    scores = rng.integers(0, 20, 400) / 20.0  # coarse scores so ties occur
+    y = (rng.random(400) < 0.3).astype(np.int8)
+    groups = rng.integers(0, 25, 400)
+
+    pos, neg = scores[y == 1], scores[y == 0]
+    pairs = [(p > n) + 0.5 * (p == n) for p in pos for n in neg]
+    assert ranker_eval.roc_auc(scores, y) == pytest.approx(np.mean(pairs))
+
+    precision, recall, ndcg = [], [], []
+    for g in np.unique(groups):
+        mask = groups == g
+        ranked = y[mask][np.argsort(-scores[mask], kind="stable")]
+        top = ranked[:5]
+        precision.append(top.sum() / min(5, len(ranked)))
+        if ranked.sum():
+            recall.append(top.sum() / ranked.sum())
+            dcg = sum(rel / np.log2(i + 2) for i, rel in enumerate(top))
+            ideal = sum(1 / np.log2(i + 2) for i in range(min(5, int(ranked.sum()))))
+            ndcg.append(dcg / ideal)
+
+    metrics = ranker_eval.evaluate(scores, y, groups, n_boot=50)
+    assert metrics["precision_at_5"] == pytest.approx(np.mean(precision))
+    assert metrics["recall_at_5"] == pytest.approx(np.mean(recall))
+    assert metrics["ndcg_at_5"] == pytest.approx(np.mean(ndcg))
+    lo, hi = metrics["ndcg_at_5_ci"]
+    assert lo <= metrics["ndcg_at_5"] <= hi
+    assert metrics["auc_ci"][0] < metrics["auc"] < metrics["auc_ci"][1]
+
+
+def test_ranker_eval_promotion_rule():
+    from app.services.ml import ranker_eval
+    new = {"precision_at_5": 0.6, "precision_at_5_ci": [0.45, 0.7], "ndcg_at_5": 0.4}
+
+    assert ranker_eval.should_promote(new, None)
+    assert ranker_eval.should_promote(new, {"precision_at_5": 0.5})
+    assert not ranker_eval.should_promote(new, {"precision_at_5": 0.5}, require_ci=True)
+    assert not ranker_eval.should_promote(new, {"ndcg_at_5": 0.4}, metric="ndcg_at_5")
+
+
+def _write_arrays(directory, X, y, groups):
+    import numpy as np
+
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / "X.npy", X)
+    np.save(directory / "y.npy", y.astype(np.int8))
+    np.save(directory / "groups.npy", groups.astype(np.int64))
+    meta = {
+        "format": "payme-ranker-npy/1",
+        "features": ["rules_confidence", "similarity", "payout", "urgency", "ease"],
+        "sample_count": len(y),
+        "labeled_count": len(y),
+    }
+    (directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def test_train_ranker_incremental_warm_start(tmp_path):
+    import numpy as np
+
+    from app.services.ml import ranker
+    rng = np.random.default_rng(3)
+
+    def batch(n):
+        X = rng.random((n, 5))
+        y = (X[:, 0] + 0.2 * rng.standard_normal(n) > 0.5).astype(np.int8)
+        return X, y, rng.integers(0, 30, n)
+
+    X, y, groups = batch(600)
+    _write_arrays(tmp_path / "feedback_export", X, y, groups)
+    with pytest.raises(SystemExit, match="run a full refit first"):
+        ranker.main(artifacts_dir=tmp_path, mode="incremental")
+    full = ranker.main(artifacts_dir=tmp_path, trained_through="2026-10-01T00:00:00+00:00")
+    assert full["promoted"] and full["mode"] == "full"
+    active = json.loads((tmp_path / "weights.json").read_text(encoding="utf-8"))
+    assert active["_last_full_version"] == active["_version"] == 1
+    assert active["_trained_through"] == "2026-10-01T00:00:00+00:00"
+
+    # The update only sees the new batch and starts from the active weights.
+    X_new, y_new, groups_new = batch(200)
+    w0 = np.array([active[f] for f in ranker.FEATURES])
+    losses = []
+    w = ranker.train_incremental(
+        X_new, y_new, w0, on_iteration=lambda epoch, loss: losses.append(loss)
+    )
+    assert len(losses) == ranker.INCREMENTAL_EPOCHS
+    assert losses[-1] <= ranker._binary_cross_entropy(w0, X_new, y_new)
+    anchored = ranker.train_incremental(X_new, y_new, w0, anchor=1e6)
+    assert np.abs(anchored - w0).max() < np.abs(w - w0).max()
+
+    _write_arrays(tmp_path / "feedback_export_incremental", X_new, y_new, groups_new)
+    result = ranker.main(artifacts_dir=tmp_path, mode="incremental")
+    assert result["mode"] == "incremental"
+    assert result["new_metrics"]["labeled_count"] == 200
+    assert result["previous_metrics"]["weights_version"] == 1
+    if result["promoted"]:
+        promoted = json.loads((tmp_path / "weights.json").read_text(encoding="utf-8"))
+        assert promoted["_mode"] == "incremental"
+        assert promoted["_last_full_version"] == 1
+
+    _write_arrays(
+        tmp_path / "feedback_export_incremental",
+        np.empty((0, 5)),
+        np.empty(0, dtype=np.int8),
+        np.empty(0, dtype=np.int64),
+    )
+    assert ranker.main(artifacts_dir=tmp_path, mode="incremental")["skipped"]
+
+
+def test_ranker_cv_grouped_folds_in_shared_memory_pool():
+    import numpy as np
+
+    from app.services.ml import ranker_cv
+    from app.services.ml import ranker
+    rng = np.random.default_rng(5)
+    groups = rng.integers(0, 40, 800)
+    X = rng.random((800, 5))
+    y = (X[:, 0] + 0.3 * rng.standard_normal(800) > 0.5).astype(np.int8)
+
+    folds = ranker_cv.group_folds(groups, 4)
+    for g in np.unique(groups):
+        assert len(np.unique(folds[groups == g])) == 1
+    sizes = np.bincount(folds)
+    assert sizes.max() - sizes.min() <= np.bincount(groups).max()
+
+    grid = [0.0, 10.0]
+    serial = ranker_cv.cross_validate(X, y, groups, ranker.train, grid, k=4, workers=1)
+    done = []
+    pooled = ranker_cv.cross_validate(
+        X, y, groups, ranker.train, grid, k=4, workers=2, on_task=lambda d, t: done.append((d, t))
+    )
+    assert done[-1] == (8, 8)
+    np.testing.assert_allclose(pooled.scores, serial.scores)
+    # Each held-out margin comes from the model fitted without that fold.
+    w = serial.fold_weights[(1, 2)]
+    np.testing.assert_allclose(serial.scores[1, folds == 2], X[folds == 2] @ w)
+    # Stronger L2 shrinks the weights.
+    assert np.linalg.norm(serial.fold_weights[(1, 0)]) < np.linalg.norm(serial.fold_weights[(0, 0)])
+
+    best, sweep = ranker.select_l2(serial, y, 800, groups, "auc")
+    assert set(sweep) == {"0.0", "10.0"}
+    assert sweep[str(grid[best])] == max(sweep.values())
+
+
+def test_ranker_replay_matches_per_run_evaluation():
+    import numpy as np
+
+    from app.services.ml import ranker_eval
+    ranker_replay = _import_script("ranker_replay")
+    rng = np.random.default_rng(5)
+    sizes = rng.integers(1, 15, 60)
+    runs = np.repeat(np.arange(len(sizes)), sizes)
+    X = rng.integers(0, 5, (len(runs), 5)) / 4.0  # coarse features so ties occur
+    labels = rng.choice([-1, 0, 1], size=len(runs), p=[0.2, 0.5, 0.3]).astype(np.int8)
+    candidates = {
+        "payout_heavy": {"rules_confidence": 0.1, "similarity": 0.1, "payout": 0.8, "_version": 3},
+        "rules_only": {"rules_confidence": 1.0},
+        "mixed": dict(zip(ranker_replay.FEATURES, [0.4, 0.3, 0.1, 0.1, 0.1])),
+    }
+
+    report = ranker_replay.replay(X, runs, labels, candidates)
+    assert report["runs"] == len(sizes)
+    assert report["paid_out_rows"] == int((labels == 1).sum())
+
+    y = (labels == 1).astype(np.int8)
+    logged = ranker_eval.evaluate(-np.arange(len(runs)) * 1.0, y, runs, n_boot=0)
+    for name, weights in candidates.items():
+        w = np.array([weights.get(f, 0.0) for f in ranker_replay.FEATURES])
+        scores = np.clip(X @ w, 0.0, 1.0).round(12)
+        expected = ranker_eval.evaluate(scores, y, runs, n_boot=0)
+        entry = report["candidates"][name]
+        for metric in ("precision_at_5", "recall_at_5", "ndcg_at_10"):
+            assert entry[metric] == pytest.approx(expected[metric])
+            assert entry["delta"][metric] == pytest.approx(expected[metric] - logged[metric])
+
+        top1_changed, shifts = [], []
+        for run in range(len(sizes)):
+            rows = np.flatnonzero(runs == run)
+            order = np.argsort(-scores[rows], kind="stable")
+            top1_changed.append(order[0] != 0)
+            shifts.extend(np.abs(np.argsort(order) - np.arange(len(rows))))
+        assert entry["top1_changed"] == pytest.approx(np.mean(top1_changed))
+        assert entry["mean_abs_rank_shift"] == pytest.approx(np.mean(shifts))
@@ -11,6 +11,7 @@ import {
   Match,
   OngoingClaim,
   SettlementQuestion,
+  SyncJob,
   UserStats,
 } from "../types";
 
@@ -31,6 +32,7 @@ type AppContextValue = {
   rerunMatch: () => Promise<void>;
   syncGmailAndMatch: () => Promise<void>;
   syncBankAndMatch: () => Promise<void>;
+  syncStillRunning: SyncJob["provider"][];
   ongoingClaims: OngoingClaim[];
   loadOngoingClaims: () => Promise<void>;
   markClaimOutcome: (settlementId: string, outcome: "paid_out" | "not_paid_out") => Promise<void>;
@@ -64,6 +66,33 @@ async function tokenToUser(token: string): Promise<AuthUser> {
   return apiFetch<AuthUser>("/auth/me");
 }
 
+const SYNC_POLL_INITIAL_MS = 1000;
+const SYNC_POLL_MAX_MS = 10000;
+const SYNC_POLL_TIMEOUT_MS = 120000;
+
+function syncActive(job: SyncJob): boolean {
+  return job.status === "queued" || job.status === "running";
+}
+
+// Sync routes queue a background job; poll it (backing off up to
+// SYNC_POLL_MAX_MS) until it finishes or SYNC_POLL_TIMEOUT_MS passes.  A job
+// still queued/running at the deadline is returned as is: the worker keeps
+// going, and syncing again later coalesces onto the same job.
+async function runSync(provider: SyncJob["provider"]): Promise<SyncJob> {
+  let job = await apiFetch<SyncJob>(`/integrations/${provider}/sync`, { method: "POST" });
+  const deadline = Date.now() + SYNC_POLL_TIMEOUT_MS;
+  let delay = SYNC_POLL_INITIAL_MS;
+  while (syncActive(job) && Date.now() + delay <= deadline) {
+    await new Promise((resolve) => setTimeout(resolve, delay));
+    delay = Math.min(delay * 2, SYNC_POLL_MAX_MS);
+    job = await apiFetch<SyncJob>(`/integrations/sync/jobs/${job.job_id}`);
+  }
+  if (job.status === "failed") {
+    throw new Error(job.error_message || "Sync failed");
+  }
+  return job;
+}
+
 export function AppProvider({ children }: { children: ReactNode }) {
   const navigate = useNavigate();
   const [authStatus, setAuthStatus] = useState<AuthStatus>("booting");
@@ -72,6 +101,7 @@ export function AppProvider({ children }: { children: ReactNode }) {
 
   const [matches, setMatches] = useState<Match[]>([]);
   const [matchesLoading, setMatchesLoading] = useState(false);
+  const [syncStillRunning, setSyncStillRunning] = useState<SyncJob["provider"][]>([]);
   const [ongoingClaims, setOngoingClaims] = useState<OngoingClaim[]>([]);
   const [claimPrompt, setClaimPrompt] = useState<{ settlementId: string; title: string } | null>(null);
 
@@ -90,6 +120,7 @@ export function AppProvider({ children }: { children: ReactNode }) {
     localStorage.removeItem("token");
     setToken("");
     setUser(null);
+    setSyncStillRunning([]);
   };
 
   const refreshUser = async () => {
@@ -111,6 +142,15 @@ export function AppProvider({ children }: { children: ReactNode }) {
     refreshUser().finally(() => setAuthStatus("ready"));
   }, []);
 
+  // Record whether a sync outlived runSync's deadline; true once it is done.
+  const trackSync = (job: SyncJob) => {
+    const active = syncActive(job);
+    setSyncStillRunning((prev) =>
+      active ? (prev.includes(job.provider) ? prev : [...prev, job.provider]) : prev.filter((p) => p !== job.provider)
+    );
+    return !active;
+  };
+
   const login = async (usernameOrEmail: string, password: string) => {
     const res = await apiFetch<{ access_token: string }>("/auth/login", {
       method: "POST",
@@ -125,8 +165,9 @@ export function AppProvider({ children }: { children: ReactNode }) {
     if (me.gmail_oauth_connected) {
       void (async () => {
         try {
-          await apiFetch("/integrations/gmail/sync", { method: "POST" });
-          await apiFetch("/match/run", { method: "POST" });
+          if (trackSync(await runSync("gmail"))) {
+            await apiFetch("/match/run", { method: "POST" });
+          }
         } catch {
           // Non-blocking sync: login should still succeed even if sync fails.
         } finally {
@@ -173,10 +214,12 @@ export function AppProvider({ children }: { children: ReactNode }) {
     }
   };
 
-  const syncGmailAndMatch = async () => {
+  const syncAndMatch = async (provider: SyncJob["provider"]) => {
     setMatchesLoading(true);
     try {
-      await apiFetch("/integrations/gmail/sync", { method: "POST" });
+      if (!trackSync(await runSync(provider))) {
+        return;
+      }
       await apiFetch("/match/run", { method: "POST" });
       const rows = await apiFetch<Match[]>("/match/results");
       setMatches(rows);
@@ -187,19 +230,9 @@ export function AppProvider({ children }: { children: ReactNode }) {
     }
   };
 
-  const syncBankAndMatch = async () => {
-    setMatchesLoading(true);
-    try {
-      await apiFetch("/integrations/plaid/sync", { method: "POST" });
-      await apiFetch("/match/run", { method: "POST" });
-      const rows = await apiFetch<Match[]>("/match/results");
-      setMatches(rows);
-      await loadOngoingClaims();
-      await refreshUser();
-    } finally {
-      setMatchesLoading(false);
-    }
-  };
+  const syncGmailAndMatch = () => syncAndMatch("gmail");
+
+  const syncBankAndMatch = () => syncAndMatch("plaid");
 
   const loadAdminDashboard = async () => {
     setAdminLoading(true);
@@ -392,6 +425,7 @@ export function AppProvider({ children }: { children: ReactNode }) {
       rerunMatch,
       syncGmailAndMatch,
       syncBankAndMatch,
+      syncStillRunning,
       ongoingClaims,
       loadOngoingClaims,
       markClaimOutcome,
@@ -423,6 +457,7 @@ export function AppProvider({ children }: { children: ReactNode }) {
       user,
       matches,
       matchesLoading,
+      syncStillRunning,
       ongoingClaims,
       claimPrompt,
       adminLoading,
@@ -3,7 +3,7 @@ import { useNavigate } from "react-router-dom";
 import { apiFetch } from "../api";
 import { AppShell } from "../components/AppShell";
 import { useApp } from "../context/AppContext";
-import type { PayoutHistoryItem, PayoutQueueItem, SettlementQuestion } from "../types";
+import type { PayoutHistoryItem, PayoutHistoryPage, PayoutQueueItem, SettlementQuestion } from "../types";
 
 type AttorneyInfo = {
   attorney_id: string;
@@ -593,19 +593,36 @@ function QueueTab({ attorney, onPayoutComplete }: { attorney: AttorneyInfo; onPa
 
 function HistoryTab({ attorney }: { attorney: AttorneyInfo }) {
   const [history, setHistory] = useState<PayoutHistoryItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
 
   // attorney is accessed if we ever need to scope future queries, suppress the unused warning
   void attorney;
 
   useEffect(() => {
-    apiFetch<PayoutHistoryItem[]>("/gateway/payouts/history")
-      .then(setHistory)
+    apiFetch<PayoutHistoryPage>("/gateway/payouts/history")
+      .then((page) => {
+        setHistory(page.items);
+        setNextCursor(page.next_cursor);
+      })
       .catch((e: Error) => setError(e.message))
       .finally(() => setLoading(false));
   }, []);
 
+  const loadMore = () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    apiFetch<PayoutHistoryPage>(`/gateway/payouts/history?cursor=${encodeURIComponent(nextCursor)}`)
+      .then((page) => {
+        setHistory((prev) => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor);
+      })
+      .catch((e: Error) => setError(e.message))
+      .finally(() => setLoadingMore(false));
+  };
+
   if (loading) return <p className="muted">Loading history...</p>;
   if (error) return <p className="error">{error}</p>;
 
@@ -616,10 +633,13 @@ function HistoryTab({ attorney }: { attorney: AttorneyInfo }) {
   return (
     <div className="panel stack">
       <div style={{ display: "flex", gap: "1rem", alignItems: "baseline", flexWrap: "wrap" }}>
-        <strong>{history.length} transfer{history.length !== 1 ? "s" : ""}</strong>
+        <strong>
+          {history.length}
+          {nextCursor ? "+" : ""} transfer{history.length !== 1 ? "s" : ""}
+        </strong>
         {totalPaidCents > 0 && (
           <span className="muted" style={{ fontSize: "0.85rem" }}>
-            ${(totalPaidCents / 100).toFixed(2)} successfully disbursed
+            ${(totalPaidCents / 100).toFixed(2)} successfully disbursed{nextCursor ? " in the transfers shown" : ""}
           </span>
         )}
       </div>
@@ -694,6 +714,12 @@ function HistoryTab({ attorney }: { attorney: AttorneyInfo }) {
           </table>
         </div>
       )}
+
+      {nextCursor && (
+        <button onClick={loadMore} disabled={loadingMore} style={{ alignSelf: "center" }}>
+          {loadingMore ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
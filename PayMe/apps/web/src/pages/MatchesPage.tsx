@@ -16,6 +16,7 @@ export function MatchesPage() {
     rerunMatch,
     syncGmailAndMatch,
     syncBankAndMatch,
+    syncStillRunning,
     user,
     ongoingClaims,
     loadOngoingClaims,
@@ -234,6 +235,9 @@ export function MatchesPage() {
             </button>
           )}
         </div>
+        {syncStillRunning.includes("gmail") && (
+          <p className="muted">Gmail sync is still running in the background. Sync again in a minute to refresh matches.</p>
+        )}
         <div className="tab-row" role="tablist" aria-label="Matches navigation">
           <button
             type="button"
@@ -303,6 +307,11 @@ export function MatchesPage() {
                       })
                     : "—"}
                 </p>
+                {syncStillRunning.includes("plaid") && (
+                  <p className="muted" style={{ margin: "0.1rem 0 0", fontSize: "0.78rem" }}>
+                    Sync still running in the background
+                  </p>
+                )}
               </>
             ) : (
               <p style={{ margin: 0, fontSize: "0.9rem", color: "var(--muted)" }}>
@@ -82,6 +82,20 @@ export type AutofillStep = {
   completed_at?: string | null;
 };
 
+export type SyncJob = {
+  job_id: string;
+  provider: "gmail" | "plaid";
+  status: "queued" | "running" | "done" | "failed";
+  trigger: string;
+  attempt_count: number;
+  result: Record<string, unknown> | null;
+  error_message: string | null;
+  run_after: string | null;
+  started_at: string | null;
+  completed_at: string | null;
+  created_at: string | null;
+};
+
 export type AutofillJob = {
   id: string;
   user_id: string;
@@ -165,10 +179,16 @@ export type PayoutHistoryItem = {
   status: string;
   provider_transfer_id?: string | null;
   failure_reason?: string | null;
+  created_at?: string | null;
   initiated_at?: string | null;
   completed_at?: string | null;
 };
 
+export type PayoutHistoryPage = {
+  items: PayoutHistoryItem[];
+  next_cursor: string | null;
+};
+
 export type AdminOverview = Record<string, number>;
 
 export type AdminUser = {
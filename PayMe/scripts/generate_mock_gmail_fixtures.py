@@ -47,7 +47,11 @@ def main() -> None:
     if not target.is_absolute():
         target = root / target
     target.parent.mkdir(parents=True, exist_ok=True)
-    target.write_text(json.dumps(messages, indent=2), encoding="utf-8")
+    if target.suffix == ".ndjson":
+        # One record per line; streamed by the mock sync for large fixtures.
+        target.write_text("".join(json.dumps(row) + "\n" for row in messages), encoding="utf-8")
+    else:
+        target.write_text(json.dumps(messages, indent=2), encoding="utf-8")
     print(f"wrote {len(messages)} messages to {target}")
 
 
@@ -44,7 +44,11 @@ def main() -> None:
     if not target.is_absolute():
         target = root / target
     target.parent.mkdir(parents=True, exist_ok=True)
-    target.write_text(json.dumps(txs, indent=2), encoding="utf-8")
+    if target.suffix == ".ndjson":
+        # One record per line; streamed by the mock sync for large fixtures.
+        target.write_text("".join(json.dumps(row) + "\n" for row in txs), encoding="utf-8")
+    else:
+        target.write_text(json.dumps(txs, indent=2), encoding="utf-8")
     print(f"wrote {len(txs)} transactions to {target}")
 
 
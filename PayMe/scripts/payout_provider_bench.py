@@ -0,0 +1,173 @@
+"""Benchmark payout dispatch throughput against the local mock payout API.
+
+Usage:
+    python scripts/payout_provider_bench.py [--transfers 2000] [--latency 0.05] \
+        [--concurrency 1 8 32] [--rate 0] [--server-rate-limit 0] [--transient-failures 0]
+
+Starts apps/api/app/services/gateway/mock_payout_server.py on a free port
+(every response delayed by --latency seconds) plus a local receiver for its
+status callbacks, then dispatches --transfers fresh transfers through
+HttpPayoutProvider once per --concurrency value.  --rate sets the client
+token bucket (requests per second, 0 = unlimited); --server-rate-limit makes
+the mock answer 429 above that many requests per second, so pacing with the
+token bucket can be compared with retrying through 429s.
+
+Reported per concurrency level: wall time, transfers/second, total attempts
+(retries included), transfers left in error, and the time until every status
+callback had been received.  Results go to artifacts/payout_provider_bench.json.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_repo_root = Path(__file__).resolve().parents[1]
+_api_src = _repo_root / "apps" / "api"
+if str(_api_src) not in sys.path:
+    sys.path.insert(0, str(_api_src))
+
+from app.services.gateway.mock_payout_server import MockPayoutServer  # noqa: E402
+from app.services.gateway.payout_provider import (  # noqa: E402
+    HttpPayoutProvider,
+    TransferRequest,
+    dispatch_transfers,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+log = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+
+
+class CallbackReceiver:
+    """Counts status callbacks POSTed by the mock payout API."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.last_at = 0.0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:  # noqa: N802
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with receiver._lock:
+                    receiver.received += 1
+                    receiver.last_at = time.perf_counter()
+                self.send_response(204)
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/callbacks"
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.received >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_level(args: argparse.Namespace, concurrency: int) -> dict:
+    receiver = CallbackReceiver()
+    requests = [
+        TransferRequest(uuid.uuid4(), f"bench:{uuid.uuid4().hex}", 5000) for _ in range(args.transfers)
+    ]
+    with MockPayoutServer(
+        latency=args.latency,
+        rate_limit=args.server_rate_limit,
+        transient_failures=args.transient_failures,
+        callback_workers=8,
+    ) as server:
+
+        async def dispatch():
+            provider = HttpPayoutProvider(
+                base_url=server.base_url, callback_url=receiver.url, max_connections=concurrency
+            )
+            try:
+                return await dispatch_transfers(
+                    provider, requests, concurrency=concurrency, rate_per_second=args.rate, burst=args.burst
+                )
+            finally:
+                await provider.aclose()
+
+        start = time.perf_counter()
+        results = asyncio.run(dispatch())
+        elapsed = time.perf_counter() - start
+        accepted = sum(r.status == "processing" for r in results)
+        receiver.wait_for(accepted, timeout=60 + accepted * 0.01)
+        settled = (receiver.last_at - start) if receiver.received else None
+        stats = {
+            "concurrency": concurrency,
+            "transfers": len(requests),
+            "seconds": round(elapsed, 3),
+            "transfers_per_second": round(len(requests) / elapsed, 1),
+            "attempts": sum(r.attempts for r in results),
+            "errors": sum(r.status == "error" for r in results),
+            "server_rate_limited": server.rate_limited,
+            "server_max_in_flight": server.max_in_flight,
+            "callbacks_received": receiver.received,
+            "all_callbacks_seconds": round(settled, 3) if settled is not None else None,
+        }
+    receiver.close()
+    return stats
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent payout dispatch")
+    parser.add_argument("--transfers", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock API response delay (seconds)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=0.0, help="client token bucket (req/s, 0 = off)")
+    parser.add_argument("--burst", type=int, default=None)
+    parser.add_argument("--server-rate-limit", type=float, default=0.0, help="mock 429s above this req/s")
+    parser.add_argument("--transient-failures", type=int, default=0, help="first N requests answer 503")
+    parser.add_argument("--output", type=Path, default=Path("artifacts") / "payout_provider_bench.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    levels = [run_level(args, concurrency) for concurrency in args.concurrency]
+    for stats in levels:
+        log.info(
+            "concurrency=%-4d %8.1f transfers/s  %.2fs  attempts=%d errors=%d 429s=%d callbacks in %ss",
+            stats["concurrency"],
+            stats["transfers_per_second"],
+            stats["seconds"],
+            stats["attempts"],
+            stats["errors"],
+            stats["server_rate_limited"],
+            stats["all_callbacks_seconds"],
+        )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    report = {"args": {**vars(args), "output": str(args.output)}, "levels": levels}
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    log.info("Results written to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
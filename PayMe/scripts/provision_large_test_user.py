@@ -1,7 +1,10 @@
 import argparse
+from collections.abc import Iterable, Iterator
 from datetime import date
 from datetime import datetime, timedelta, UTC
+import json
 import os
+from pathlib import Path
 import random
 
 from sqlalchemy import and_, func, select
@@ -16,7 +19,7 @@ from app.services.ingestion.plaid_sync import sync_plaid_mock
 from app.services.matching.engine import run_match
 
 
-def build_messages(count: int, seed: int = 42) -> list[dict]:
+def iter_messages(count: int, seed: int = 42) -> Iterator[dict]:
     random.seed(seed)
     merchants = [
         ("amazon.com", "Amazon", "Prime subscription renewed"),
@@ -25,22 +28,18 @@ def build_messages(count: int, seed: int = 42) -> list[dict]:
         ("paramountplus.com", "Paramount+", "Monthly streaming subscription charge"),
     ]
     base_time = datetime.now(UTC)
-    messages = []
     for i in range(count):
         domain, brand, snippet = merchants[i % len(merchants)]
-        messages.append(
-            {
-                "id": f"msg_{i+1:05d}",
-                "internalDate": (base_time.replace(microsecond=0)).isoformat(),
-                "from_domain": domain,
-                "subject": f"{brand} statement #{i+1}",
-                "snippet": snippet if i % 11 else f"{snippet} and gaming bonus terms update",
-            }
-        )
-    return messages
+        yield {
+            "id": f"msg_{i+1:05d}",
+            "internalDate": (base_time.replace(microsecond=0)).isoformat(),
+            "from_domain": domain,
+            "subject": f"{brand} statement #{i+1}",
+            "snippet": snippet if i % 11 else f"{snippet} and gaming bonus terms update",
+        }
 
 
-def build_transactions(count: int, seed: int = 42) -> list[dict]:
+def iter_transactions(count: int, seed: int = 42) -> Iterator[dict]:
     random.seed(seed)
     merchants = [
         ("Amazon", "shopping", True),
@@ -49,34 +48,33 @@ def build_transactions(count: int, seed: int = 42) -> list[dict]:
         ("Paramount+", "streaming", True),
     ]
     start = datetime.now(UTC) - timedelta(days=180)
-    rows = []
     for i in range(count):
         merchant, category, is_subscription = merchants[i % len(merchants)]
-        rows.append(
-            {
-                "transaction_id": f"txn_{i+1:05d}",
-                "merchant_name": merchant,
-                "amount": round(random.uniform(5.0, 180.0), 2),
-                "date": (start + timedelta(hours=i * 3)).isoformat(),
-                "category": category,
-                "is_subscription": is_subscription if i % 3 else False,
-            }
-        )
-    return rows
+        yield {
+            "transaction_id": f"txn_{i+1:05d}",
+            "merchant_name": merchant,
+            "amount": round(random.uniform(5.0, 180.0), 2),
+            "date": (start + timedelta(hours=i * 3)).isoformat(),
+            "category": category,
+            "is_subscription": is_subscription if i % 3 else False,
+        }
 
 
-def ensure_fixtures(email_count: int, txn_count: int) -> None:
-    import json
-    from pathlib import Path
+def write_ndjson(path: Path, records: Iterable[dict]) -> None:
+    """Write one JSON object per line; records are streamed, never held in memory."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        for record in records:
+            fh.write(json.dumps(record, separators=(",", ":")))
+            fh.write("\n")
 
-    root = Path(__file__).resolve().parents[1]
-    gmail_path = root / "fixtures/gmail/sample_messages.json"
-    gmail_path.parent.mkdir(parents=True, exist_ok=True)
-    gmail_path.write_text(json.dumps(build_messages(email_count), indent=2), encoding="utf-8")
 
-    plaid_path = root / "fixtures/plaid/transactions.json"
-    plaid_path.parent.mkdir(parents=True, exist_ok=True)
-    plaid_path.write_text(json.dumps(build_transactions(txn_count), indent=2), encoding="utf-8")
+def ensure_fixtures(email_count: int, txn_count: int) -> None:
+    # NDJSON fixtures take precedence over the checked-in JSON arrays and are
+    # streamed by the mock sync, so counts in the millions stay cheap.
+    root = Path(__file__).resolve().parents[1]
+    write_ndjson(root / "fixtures/gmail/sample_messages.ndjson", iter_messages(email_count))
+    write_ndjson(root / "fixtures/plaid/transactions.ndjson", iter_transactions(txn_count))
 
 
 def main() -> None: